@@ -1,3 +1,4 @@
+import operator
 from typing import Annotated, List, TypedDict
 
 from langchain_core.messages import BaseMessage
@@ -41,6 +42,15 @@ class IndicatorAgentState(TypedDict):
     pattern_images: Annotated[
         dict, "Dictionary of base64-encoded K-line charts for multi-timeframe pattern recognition"
     ]
+    pattern_mode: Annotated[
+        str, "Pattern analysis mode: vision (chart image), numeric (feature descriptor) or hybrid"
+    ]
+    pattern_features: Annotated[
+        dict, "Numeric pattern features (pivots, boundary lines, candidate patterns), per timeframe in multi-timeframe mode"
+    ]
+    candlestick_patterns: Annotated[
+        List[dict], "Sparse TA-Lib CDL hit table (timeframe, pattern, bar position, direction) from the pre-scan"
+    ]
 
     # Trend Agent
     trend_image: Annotated[
@@ -62,19 +72,28 @@ class IndicatorAgentState(TypedDict):
         dict, "Dictionary of base64-encoded trend charts for multi-timeframe trend analysis"
     ]
 
+    # 提示词 Token 预算：压缩前后的估算 Token 数、预算与最终尾部窗口长度
+    indicator_prompt_tokens: Annotated[dict, "Prompt token stats for the indicator agent (before/after/budget/tail_bars)"]
+    trend_prompt_tokens: Annotated[dict, "Prompt token stats for the trend agent (before/after/budget/tail_bars)"]
+
     # Price information (哈雷酱添加：确保价格信息在状态中传递)
     latest_price: Annotated[float, "Latest trading price from kline data"]
     price_info: Annotated[str, "Formatted price information string"]
 
     # Final analysis and messaging context
     analysis_results: Annotated[str, "Computed result of the analysis or decision"]
-    messages: Annotated[
-        List[BaseMessage], "List of chat messages used in LLM prompt construction"
-    ]
+    # 并行分支各自返回本节点新增的消息，由 operator.add 归并
+    messages: Annotated[List[BaseMessage], operator.add]
     decision_prompt: Annotated[str, "decision prompt for reflection"]
     final_trade_decision: Annotated[
         str, "Final BUY or SELL decision made after analyzing indicators"
     ]
+    # 超过分析师截止时间、决策时缺失的报告键（如 pattern_report），并行分支由 operator.add 归并
+    missing_reports: Annotated[List[str], operator.add]
+    # LLM 调用失败的报告键（分析师报告或 final_trade_decision），供结果缓存 / 批量 / 回测识别失败的分析
+    failed_reports: Annotated[List[str], operator.add]
+    # 多版本决策：各决策版本并行写入 {版本: 决策输出}，由 operator.or_ 合并
+    ensemble_decisions: Annotated[dict, operator.or_]
     
     # Multi-timeframe support
     multi_timeframe_mode: Annotated[bool, "Flag indicating if multi-timeframe analysis is active"]
@@ -4,6 +4,7 @@
 """
 
 import sys
+import time
 from pathlib import Path
 
 try:
@@ -25,6 +26,13 @@ except ImportError:
     def monitor_llm_call(model_name=None):
         return performance_monitor(f"LLM调用: {model_name}" if model_name else "LLM调用")
 
+from app.utils.candlestick_scan import format_candlestick_patterns
+from app.core.llm_scheduler import ainvoke_llm
+from app.core.progress import publish_decision_fields
+from app.utils.decision_stream import IncrementalDecisionParser
+from .prompt_layout import build_decision_messages, prompt_cache_stats, split_prompt_template
+
+
 def create_generic_decision_agent(llm, prompt_template: str, agent_name: str, agent_version: str = None):
     """
     创建通用的决策智能体
@@ -41,9 +49,11 @@ def create_generic_decision_agent(llm, prompt_template: str, agent_name: str, ag
     Returns:
         trade_decision_node 函数
     """
+    # 模板在创建时拆成稳定前缀（逐字节不变，可命中供应商前缀缓存）和需要填充的后缀
+    prompt_prefix, prompt_suffix_template = split_prompt_template(prompt_template)
     
     @performance_monitor(agent_name)
-    def trade_decision_node(state) -> dict:
+    async def trade_decision_node(state) -> dict:
         # 1. 进度更新
         update_agent_progress("decision", 10, f"正在启动{agent_name}...")
         
@@ -107,14 +117,21 @@ def create_generic_decision_agent(llm, prompt_template: str, agent_name: str, ag
             analysis_errors.append(f"趋势分析失败: {trend_report['error']}")
             trend_report = "趋势分析失败"
 
+        # TA-Lib K线组合形态预扫描结果附在形态报告之后
+        candlestick_patterns = state.get("candlestick_patterns")
+        if candlestick_patterns and isinstance(pattern_report, str):
+            pattern_report = (
+                f"{pattern_report}\n\n**K线组合形态预扫描（TA-Lib）**：\n"
+                f"{format_candlestick_patterns(candlestick_patterns)}"
+            )
+
         print(f"🧠 {agent_name} 收到分析结果，正在为 {stock_name} ({time_frame}) 进行分析...")
         print(f"💰 当前价格信息: {price_summary}")
         
-        # 5. 构建 Prompt
-        # 使用 safe_format 避免模板中存在的其他花括号导致报错（如 JSON 示例中的花括号）
-        # 但通常我们使用双花括号 {{ }} 来转义，所以直接 format 应该没问题，前提是模板里的 JSON 示例已经转义
+        # 5. 构建 Prompt：只格式化后缀，前缀原样复用
+        # 模板里的 JSON 示例使用双花括号 {{ }} 转义，所以直接 format 应该没问题
         try:
-            prompt = prompt_template.format(
+            prompt_suffix = prompt_suffix_template.format(
                 stock_name=stock_name,
                 time_frame=time_frame,
                 price_summary=price_summary,
@@ -125,21 +142,45 @@ def create_generic_decision_agent(llm, prompt_template: str, agent_name: str, ag
                 trend_report=trend_report,
                 multi_tf_summary=multi_tf_summary  # ✅ 新增多时间框架摘要
             )
+            prompt = prompt_prefix + prompt_suffix
+            messages = build_decision_messages(llm, prompt_prefix, prompt_suffix)
         except KeyError as e:
             print(f"❌ Prompt 格式化错误: 缺少键值 {e}")
-            prompt = f"Prompt Error: {e}"
+            prompt = messages = f"Prompt Error: {e}"
         except Exception as e:
             print(f"❌ Prompt 格式化发生未知错误: {e}")
-            prompt = f"Prompt Error: {e}"
+            prompt = messages = f"Prompt Error: {e}"
 
         # 6. 调用 LLM
         update_agent_progress("decision", 80, f"正在生成{agent_name}决策...")
         
+        llm_failed = False
         try:
-            response = llm.invoke(prompt)
+            # 流式模式下边输出边解析，方向/止损/止盈一出现就推送给前端
+            decision_parser = IncrementalDecisionParser()
+            started = time.monotonic()
+            first_token_at = None
+
+            def on_delta(delta: str):
+                nonlocal first_token_at
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                fields = decision_parser.feed(delta)
+                if fields:
+                    publish_decision_fields(fields)
+
+            response = await ainvoke_llm(
+                llm, messages, stream_agent="decision",
+                on_delta=on_delta, on_reset=decision_parser.reset,
+            )
             content = response.content
+            prompt_cache_stats.record(
+                llm, response, len(prompt_prefix),
+                ttft=first_token_at - started if first_token_at is not None else None,
+            )
         except Exception as e:
             print(f"❌ LLM 调用失败: {e}")
+            llm_failed = True
             content = f'{{"error": "LLM调用失败: {str(e)}", "decision": "观望"}}'
             # 构造一个伪造的 response 对象以保持接口一致性
             from langchain_core.messages import AIMessage
@@ -154,6 +195,9 @@ def create_generic_decision_agent(llm, prompt_template: str, agent_name: str, ag
             "decision_prompt": prompt,
         }
         
+        if llm_failed:
+            result["failed_reports"] = ["final_trade_decision"]
+
         if agent_version:
             result["agent_version"] = agent_version
         
@@ -6,19 +6,13 @@ Combines indicator, pattern, and trend reports to issue a LONG or SHORT order.
 from .core_decision import create_generic_decision_agent
 
 # 约束版 Prompt 模板
-CONSTRAINED_PROMPT_TEMPLATE = """你是一名专业的量化交易分析师，正在分析{stock_name}的{time_frame}K线图。你的任务是发布**立即执行指令**：**做多**或**做空**。在输出最终JSON之前，必须进行严谨的深度思考与内部推理，最终只输出JSON结果。
-
-            **当前价格信息：**
-            {price_summary}
-            {price_info_str}
-            
-            {multi_tf_summary}
+CONSTRAINED_PROMPT_TEMPLATE = """你是一名专业的量化交易分析师，正在分析指定交易对的K线图（交易对、时间框架与当前价格见文末的**本次分析数据**）。你的任务是发布**立即执行指令**：**做多**或**做空**。在输出最终JSON之前，必须进行严谨的深度思考与内部推理，最终只输出JSON结果。
 
             你的决策应该预测未来N根K线的市场走势，其中：
             - 例如：时间框架=15分钟，N=1 → 预测未来15分钟级别
             - 时间框架=4小时， → 预测未来4小时级别
 
-            **重要：你必须基于当前价格 {latest_price_str} 来计算具体的止损止盈点位！**
+            **重要：你必须基于本次分析数据中的当前价格来计算具体的止损止盈点位！**
 
             ---
 
@@ -252,6 +246,17 @@ CONSTRAINED_PROMPT_TEMPLATE = """你是一名专业的量化交易分析师，
             - 仅输出最终JSON，不要输出内部思考过程或步骤
 
             --------
+            ## 📌 本次分析数据
+
+            **交易对**：{stock_name} | **时间框架**：{time_frame}
+
+            **当前价格信息：**
+            {price_summary}
+            {price_info_str}
+            **止损止盈计算基准价：{latest_price_str}**
+
+            {multi_tf_summary}
+
             **技术指标报告**
             {indicator_report}
 
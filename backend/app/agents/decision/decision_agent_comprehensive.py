@@ -5,13 +5,7 @@
 
 from .core_decision import create_generic_decision_agent
 
-COMPREHENSIVE_PROMPT_TEMPLATE = """你是一名专业的量化交易分析师，正在分析{stock_name}的{time_frame}K线图。请综合技术指标、形态与趋势，直接给出数值型止损与止盈，不得使用或推导任何风险回报比。
-
-当前价格信息：
-{price_summary}
-{price_info_str}
-
-{multi_tf_summary}
+COMPREHENSIVE_PROMPT_TEMPLATE = """你是一名专业的量化交易分析师，正在分析指定交易对的K线图（交易对、时间框架与当前价格见文末的本次分析数据）。请综合技术指标、形态与趋势，直接给出数值型止损与止盈，不得使用或推导任何风险回报比。
 
 预测范围说明：
 - 例如 TIME_FRAME = 15分钟 → 预测接下来的15分钟
@@ -65,6 +59,17 @@ COMPREHENSIVE_PROMPT_TEMPLATE = """你是一名专业的量化交易分析师，
   "take_profit": <数值>
 }}
 
+--------
+本次分析数据：
+
+交易对：{stock_name} | 时间框架：{time_frame}
+
+当前价格信息：
+{price_summary}
+{price_info_str}
+
+{multi_tf_summary}
+
 技术指标报告：
 {indicator_report}
 
@@ -3,6 +3,7 @@
 支持根据配置动态创建不同版本的决策智能体
 """
 
+import asyncio
 import os
 import json
 from typing import Dict, Any, Optional
@@ -145,11 +146,8 @@ class DecisionAgentFactory:
         return get_default_version()
 
     def _wrap_agent_with_version_info(self, agent_func, version: str):
-        """包装智能体函数，添加版本信息"""
-        def wrapped_agent(state):
-            # 执行原始智能体
-            result = agent_func(state)
-
+        """包装智能体函数，添加版本信息（异步智能体返回异步包装，LangGraph 据此按异步节点执行）"""
+        def finalize(result):
             # 确保结果包含版本信息
             if isinstance(result, dict):
                 result["agent_version"] = version
@@ -162,6 +160,15 @@ class DecisionAgentFactory:
 
             return result
 
+        if asyncio.iscoroutinefunction(agent_func):
+            async def async_wrapped_agent(state):
+                return finalize(await agent_func(state))
+
+            return async_wrapped_agent
+
+        def wrapped_agent(state):
+            return finalize(agent_func(state))
+
         return wrapped_agent
 
     def _track_usage(self, version: str):
@@ -5,8 +5,9 @@
 
 from .core_decision import create_generic_decision_agent
 
-# 100% 复刻原始 Prompt，保留英文，不做任何本地化修改，以保证逻辑一致性
-ORIGINAL_PROMPT_TEMPLATE = """You are a high-frequency quantitative trading (HFT) analyst operating on the current {time_frame} K-line chart for {stock_name}. Your task is to issue an **immediate execution order**: **LONG** or **SHORT**. ⚠️ HOLD is prohibited due to HFT constraints.
+# 复刻原始 Prompt，保留英文，不做本地化修改以保证逻辑一致性；
+# 仅把交易对与时间框架移到末尾的报告区，使前面的静态说明可以命中供应商的前缀缓存
+ORIGINAL_PROMPT_TEMPLATE = """You are a high-frequency quantitative trading (HFT) analyst operating on the current K-line chart (symbol and TIME_FRAME are given with the reports at the end). Your task is to issue an **immediate execution order**: **LONG** or **SHORT**. ⚠️ HOLD is prohibited due to HFT constraints.
 
             Your decision should forecast the market move over the **next N candlesticks**, where:
             - For example: TIME_FRAME = 15min, N = 1 → Predict the next 15 minutes.
@@ -68,6 +69,8 @@ ORIGINAL_PROMPT_TEMPLATE = """You are a high-frequency quantitative trading (HFT
             }}
 
             --------
+            **Symbol**: {stock_name} | **TIME_FRAME**: {time_frame}
+
             **Technical Indicator Report**  
             {indicator_report}
 
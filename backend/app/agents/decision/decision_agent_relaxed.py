@@ -6,13 +6,7 @@ Combines indicator, pattern, and trend reports to issue a LONG, SHORT, or HOLD o
 
 from .core_decision import create_generic_decision_agent
 
-RELAXED_PROMPT_TEMPLATE = """你是一名具有创新思维的量化交易分析师，正在分析{stock_name}的{time_frame}K线图。与传统的约束性分析不同，你拥有更自由的思维空间和决策选项。
-
-        **当前价格信息：**
-        {price_summary}
-        {price_info_str}
-        
-        {multi_tf_summary}
+RELAXED_PROMPT_TEMPLATE = """你是一名具有创新思维的量化交易分析师，正在分析指定交易对的K线图（交易对、时间框架与当前价格见文末的**本次分析数据**）。与传统的约束性分析不同，你拥有更自由的思维空间和决策选项。
 
         **🆕 宽松决策选项：**
         你的任务是基于深度分析，发布最适合的交易指令：**做多**、**做空**或**观望**。
@@ -25,7 +19,7 @@ RELAXED_PROMPT_TEMPLATE = """你是一名具有创新思维的量化交易分析
         - 例如：时间框架=15分钟，N=1 → 预测未来15分钟级别
         - 时间框架=4小时， → 预测未来4小时级别
 
-        **重要：你必须基于当前价格 {latest_price_str} 来计算具体的止损止盈点位！**
+        **重要：你必须基于本次分析数据中的当前价格来计算具体的止损止盈点位！**
 
         ---
 
@@ -239,6 +233,17 @@ RELAXED_PROMPT_TEMPLATE = """你是一名具有创新思维的量化交易分析
         - 可以表达不确定性，但要有充分的理由支撑决策
 
         --------
+        ## 📌 本次分析数据
+
+        **交易对**：{stock_name} | **时间框架**：{time_frame}
+
+        **当前价格信息：**
+        {price_summary}
+        {price_info_str}
+        **止损止盈计算基准价：{latest_price_str}**
+
+        {multi_tf_summary}
+
         **技术指标报告**
         {indicator_report}
 
@@ -0,0 +1,136 @@
+"""
+Prompt Layout - 决策提示词的前缀缓存布局
+决策模板很长，但绝大部分是固定的说明文字。把模板拆成：
+- 稳定前缀：第一个占位符之前的全部内容，作为 SystemMessage 发送，逐字节不变，可命中供应商的前缀缓存
+- 可变后缀：从第一个包含占位符的行开始，填入本次请求的交易对、价格和三份报告，作为 HumanMessage 发送
+支持显式缓存提示的模型（providers.py 中的 cache_control_models）在前缀上附加 cache_control；
+OpenAI / DeepSeek / Qwen 等自动前缀缓存的供应商只需前缀稳定即可。
+每次调用记录命中缓存的 Token 占比和首 Token 延迟，供 /system/prompt-cache 查看。
+"""
+
+import re
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.core.providers import PROVIDERS
+
+# 单花括号占位符（{{ }} 为转义的 JSON 示例，不算占位符）
+_PLACEHOLDER = re.compile(r"(?<!\{)\{[a-z_]+\}(?!\})")
+
+# 每个模型保留的最近首 Token 延迟样本数
+TTFT_WINDOW = 100
+
+
+def split_prompt_template(template: str) -> Tuple[str, str]:
+    """
+    拆分模板
+
+    Returns:
+        (prefix, suffix_template)：prefix 已去除 {{ }} 转义，可直接发送；
+        suffix_template 仍需 format 填入本次请求的字段。模板第一行就含占位符时 prefix 为空。
+    """
+    lines = template.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        if _PLACEHOLDER.search(line):
+            return "".join(lines[:i]).format(), "".join(lines[i:])
+    return template.format(), ""
+
+
+def _provider_for(llm: Any) -> Optional[Dict[str, Any]]:
+    base_url = getattr(llm, "openai_api_base", None) or ""
+    for cfg in PROVIDERS.values():
+        if cfg.get("base_url") == base_url:
+            return cfg
+    return None
+
+
+def wants_cache_control(llm: Any) -> bool:
+    """模型是否需要显式的 cache_control 提示（如 OpenRouter 上的 Anthropic / Gemini 模型）"""
+    cfg = _provider_for(llm)
+    if not cfg:
+        return False
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or ""
+    return any(model.startswith(prefix) for prefix in cfg.get("cache_control_models", ()))
+
+
+def build_decision_messages(llm: Any, prefix: str, suffix: str) -> List[Any]:
+    """组装发送给 LLM 的消息：稳定前缀在前（必要时附加缓存提示），本次请求数据在后"""
+    if not prefix.strip():
+        return [HumanMessage(content=suffix)]
+    if wants_cache_control(llm):
+        system = SystemMessage(content=[
+            {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+        ])
+    else:
+        system = SystemMessage(content=prefix)
+    return [system, HumanMessage(content=suffix)]
+
+
+def _prompt_usage(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    """从响应中取 (提示词 Token 数, 命中缓存的 Token 数)，各供应商字段不同"""
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    prompt_tokens = token_usage.get("prompt_tokens")
+    cached = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    if cached is None:
+        cached = token_usage.get("prompt_cache_hit_tokens")  # DeepSeek
+    if cached is None:
+        cached = token_usage.get("cache_read_input_tokens")  # Anthropic 兼容字段
+
+    if prompt_tokens is None:
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt_tokens = usage.get("input_tokens")
+        if cached is None:
+            cached = (usage.get("input_token_details") or {}).get("cache_read")
+    if prompt_tokens is None:
+        return None, None
+    return int(prompt_tokens), int(cached or 0)
+
+
+class PromptCacheStats:
+    """按模型统计决策调用的缓存命中 Token 占比与首 Token 延迟"""
+
+    def __init__(self):
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._ttft: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, llm: Any, response: Any, prefix_chars: int, ttft: Optional[float] = None):
+        model = str(getattr(llm, "model_name", None) or getattr(llm, "model", None) or "unknown")
+        prompt_tokens, cached = _prompt_usage(response)
+        with self._lock:
+            stats = self._models.setdefault(model, {
+                "calls": 0, "calls_with_usage": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                "cache_hit_calls": 0, "prefix_chars": 0,
+            })
+            stats["calls"] += 1
+            stats["prefix_chars"] = prefix_chars
+            if prompt_tokens is not None:
+                stats["calls_with_usage"] += 1
+                stats["prompt_tokens"] += prompt_tokens
+                stats["cached_tokens"] += cached
+                if cached:
+                    stats["cache_hit_calls"] += 1
+            if ttft is not None:
+                self._ttft.setdefault(model, deque(maxlen=TTFT_WINDOW)).append(ttft)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = [(model, dict(stats), sorted(self._ttft.get(model, ()))) for model, stats in self._models.items()]
+        result = []
+        for model, stats, ttft in items:
+            prompt_tokens = stats["prompt_tokens"]
+            result.append({
+                "model": model,
+                **stats,
+                "cached_ratio": round(stats["cached_tokens"] / prompt_tokens, 3) if prompt_tokens else None,
+                "ttft_p50": round(ttft[len(ttft) // 2], 2) if ttft else None,
+                "ttft_avg": round(sum(ttft) / len(ttft), 2) if ttft else None,
+            })
+        return result
+
+
+# 全局统计实例
+prompt_cache_stats = PromptCacheStats()
@@ -5,7 +5,6 @@ Agent for technical indicator analysis in high-frequency trading (HFT) context.
 """
 
 import copy
-import json
 import pandas as pd
 
 from langchain_core.messages import ToolMessage
@@ -34,6 +33,14 @@ except ImportError:
     def monitor_llm_call(model_name=None):
         return performance_monitor(f"LLM调用: {model_name}" if model_name else "LLM调用")
 
+from app.core.llm_scheduler import ainvoke_llm
+from app.utils.prompt_budget import budget_for, build_budgeted_sections
+
+
+def _escape_braces(text):
+    """转义花括号，避免被 ChatPromptTemplate 当作模板变量"""
+    return text.replace("{", "{{").replace("}", "}}")
+
 
 # 辅助函数：将 DataFrame 或其他格式转换为 list[dict]
 def convert_to_list_of_dicts(data):
@@ -78,7 +85,7 @@ def create_indicator_agent(llm, toolkit):
     """
 
     @performance_monitor("技术指标智能体执行")
-    def indicator_agent_node(state):
+    async def indicator_agent_node(state):
         # 哈雷酱的进度跟踪！
         update_agent_progress("indicator", 10, "正在启动技术指标分析智能体...")
 
@@ -203,7 +210,7 @@ def create_indicator_agent(llm, toolkit):
         except Exception as e:
             update_agent_progress("indicator", 100, "技术指标计算失败")
             return {
-                "messages": state.get("messages", []),
+                "messages": [],
                 "indicator_report": f"技术指标计算失败: {str(e)}",
                 "error": str(e)
             }
@@ -243,13 +250,15 @@ def create_indicator_agent(llm, toolkit):
 
 """
             
-            # 为每个时间框架生成指标展示
-            for tf_name, indicators in multi_tf_indicators.items():
-                macd_json = json.dumps(indicators.get("MACD", {}), indent=2, ensure_ascii=False).replace("{", "{{").replace("}", "}}")
-                rsi_json = json.dumps(indicators.get("RSI", {}), indent=2, ensure_ascii=False).replace("{", "{{").replace("}", "}}")
-                roc_json = json.dumps(indicators.get("ROC", {}), indent=2, ensure_ascii=False).replace("{", "{{").replace("}", "}}")
-                stoch_json = json.dumps(indicators.get("Stochastic", {}), indent=2, ensure_ascii=False).replace("{", "{{").replace("}", "}}")
-                willr_json = json.dumps(indicators.get("Williams_R", {}), indent=2, ensure_ascii=False).replace("{", "{{").replace("}", "}}")
+            # 为每个时间框架生成指标展示（按预算压缩为尾部窗口 + 极值 + 交叉信号）
+            sections, prompt_tokens = build_budgeted_sections(multi_tf_indicators, budget_tokens=budget_for(llm))
+            indicators_text += f"每条指标序列保留最近 {prompt_tokens['tail_bars']} 根K线，并附全区间极值（bars_ago 为距今K线数）与近期交叉信号\n"
+            for tf_name in multi_tf_indicators:
+                macd_json = _escape_braces(sections[tf_name].get("MACD", "{}"))
+                rsi_json = _escape_braces(sections[tf_name].get("RSI", "{}"))
+                roc_json = _escape_braces(sections[tf_name].get("ROC", "{}"))
+                stoch_json = _escape_braces(sections[tf_name].get("Stochastic", "{}"))
+                willr_json = _escape_braces(sections[tf_name].get("Williams_R", "{}"))
                 
                 indicators_text += f"""
 ## 📊 **{tf_name} 时间框架分析**
@@ -274,15 +283,21 @@ def create_indicator_agent(llm, toolkit):
 """
         else:
             # 单一时间框架模式：保持原有Prompt
-            # 转义JSON花括号避免LangChain模板变量解析问题
-            macd_json = json.dumps(indicator_results.get("MACD", {}), indent=2, ensure_ascii=False).replace("{", "{{").replace("}", "}}")
-            rsi_json = json.dumps(indicator_results.get("RSI", {}), indent=2, ensure_ascii=False).replace("{", "{{").replace("}", "}}")
-            roc_json = json.dumps(indicator_results.get("ROC", {}), indent=2, ensure_ascii=False).replace("{", "{{").replace("}", "}}")
-            stoch_json = json.dumps(indicator_results.get("Stochastic", {}), indent=2, ensure_ascii=False).replace("{", "{{").replace("}", "}}")
-            willr_json = json.dumps(indicator_results.get("Williams_R", {}), indent=2, ensure_ascii=False).replace("{", "{{").replace("}", "}}")
-
-            # 转义完整的OHLC数据
-            ohlc_data_json = json.dumps(kline_data, indent=2, ensure_ascii=False).replace("{", "{{").replace("}", "}}")
+            # 按预算压缩指标与OHLC数据，并转义JSON花括号避免LangChain模板变量解析问题
+            sections, prompt_tokens = build_budgeted_sections(
+                {time_frame: indicator_results},
+                ohlc_by_tf={time_frame: kline_data},
+                budget_tokens=budget_for(llm),
+            )
+            tf_sections = sections[time_frame]
+            macd_json = _escape_braces(tf_sections.get("MACD", "{}"))
+            rsi_json = _escape_braces(tf_sections.get("RSI", "{}"))
+            roc_json = _escape_braces(tf_sections.get("ROC", "{}"))
+            stoch_json = _escape_braces(tf_sections.get("Stochastic", "{}"))
+            willr_json = _escape_braces(tf_sections.get("Williams_R", "{}"))
+
+            # OHLC：全区间摘要 + 最近K线
+            ohlc_data_json = _escape_braces(tf_sections.get("OHLC", "{}"))
 
             # 哈雷酱的灵魂增强！营造真实交易环境
             indicators_text = f"""
@@ -293,10 +308,10 @@ def create_indicator_agent(llm, toolkit):
 💰 **当前价位**：{latest_price if latest_price else '未知'}
 {price_info}
 
-## 📊 **完整OHLC历史数据**
+## 📊 **OHLC历史数据**（全区间摘要 + 最近 {prompt_tokens['tail_bars']} 根K线）
 {ohlc_data_json}
 
-🎯 **关键指标雷达扫描完成** - 已为你筛选出最重要的技术信号：
+🎯 **关键指标雷达扫描完成** - 已为你筛选出最重要的技术信号（尾部窗口 + 全区间极值，bars_ago 为距今K线数，crossovers 为近期交叉信号）：
 
 ### 🔥 MACD指标 - 趋势追踪器
 {macd_json}
@@ -415,16 +430,16 @@ def create_indicator_agent(llm, toolkit):
             ("human", indicators_text)
         ])
 
-        chain = analysis_prompt | llm
-        final_response = chain.invoke({})
+        final_response = await ainvoke_llm(llm, analysis_prompt.format_messages(), stream_agent="indicator")
 
         update_agent_progress("indicator", 100, "技术指标分析完成")
         return {
-            "messages": state.get("messages", []) + [final_response],
+            "messages": [final_response],
             "indicator_report": final_response.content,
             "indicator_data": multi_tf_indicators if is_multi_tf else indicator_results,
             "latest_price": latest_price,
             "price_info": price_info,
+            "indicator_prompt_tokens": prompt_tokens,
             "multi_timeframe_mode": is_multi_tf,
             "timeframes": list(kline_data.keys()) if is_multi_tf else [time_frame]
         }
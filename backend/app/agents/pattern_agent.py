@@ -1,11 +1,10 @@
 import copy
 import json
-import time
+import asyncio
 import pandas as pd
 
 from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from openai import RateLimitError
 
 # 哈雷酱的进度跟踪导入！
 import sys
@@ -30,6 +29,15 @@ except ImportError:
     def monitor_llm_call(model_name=None):
         return performance_monitor(f"LLM调用: {model_name}" if model_name else "LLM调用")
 
+from app.utils.pattern_features import (
+    PATTERN_MODE_HYBRID,
+    PATTERN_MODE_NUMERIC,
+    PATTERN_MODE_VISION,
+    build_pattern_descriptor,
+)
+from app.utils.candlestick_scan import format_candlestick_patterns
+from app.core.llm_scheduler import ainvoke_llm
+
 
 def convert_to_list_of_dicts(data):
     """将 DataFrame 或 list 转换为 list[dict] 格式供图表工具调用"""
@@ -45,31 +53,21 @@ def convert_to_list_of_dicts(data):
         raise TypeError(f"Unsupported data type: {type(data)}")
 
 
-def invoke_tool_with_retry(tool_fn, tool_args, retries=3, wait_sec=4):
-    """
-    Invoke a tool function with retries if the result is missing an image.
-    """
-    for attempt in range(retries):
-        result = tool_fn.invoke(tool_args)
-        img_b64 = result.get("pattern_image")
-        if img_b64:
-            return result
-        print(
-            f"Tool returned no image, retrying in {wait_sec}s (attempt {attempt + 1}/{retries})..."
-        )
-        time.sleep(wait_sec)
-    raise RuntimeError("Tool failed to generate image after multiple retries")
-
-
 @performance_monitor("模式识别智能体")
-def create_pattern_agent(graph_llm, toolkit):
+def create_pattern_agent(graph_llm, toolkit, text_llm=None):
     """
     Create a pattern recognition agent node for candlestick pattern analysis.
     现在直接生成K线图，然后让LLM分析，不再通过工具调用。
+
+    state["pattern_mode"] 选择分析方式：
+    - vision: 生成K线图交给视觉模型 graph_llm（默认）
+    - numeric: 只提取数值形态特征，交给文本模型 text_llm，不生成图片
+    - hybrid: K线图 + 数值特征一起交给视觉模型
     """
+    text_llm = text_llm or graph_llm
 
     @performance_monitor("模式识别智能体执行")
-    def pattern_agent_node(state):
+    async def pattern_agent_node(state):
         # 哈雷酱的进度跟踪！
         update_agent_progress("pattern", 10, "正在启动模式识别智能体...")
 
@@ -108,18 +106,54 @@ def create_pattern_agent(graph_llm, toolkit):
         16. 对称三角形：高点和低点向顶点收敛，通常后有突破
         """
 
-        # --- 重试包装器 ---
-        def invoke_with_retry(call_fn, *args, retries=3, wait_sec=8):
-            for attempt in range(retries):
-                try:
-                    return call_fn(*args)
-                except RateLimitError:
-                    print(f"API限速，{wait_sec}秒后重试 (尝试 {attempt + 1}/{retries})...")
-                    time.sleep(wait_sec)
-                except Exception as e:
-                    print(f"其他错误: {e}，{wait_sec}秒后重试 (尝试 {attempt + 1}/{retries})...")
-                    time.sleep(wait_sec)
-            raise RuntimeError("超过最大重试次数")
+        # --- TA-Lib 预扫描得到的K线组合形态候选 ---
+        candlestick_text = ""
+        if state.get("candlestick_patterns"):
+            candlestick_text = (
+                "程序预扫描（TA-Lib）在最近K线上检测到以下K线组合形态候选，请逐一确认是否有效：\n"
+                f"{format_candlestick_patterns(state['candlestick_patterns'])}"
+            )
+
+        # --- 数值形态特征（numeric / hybrid 模式） ---
+        pattern_mode = state.get("pattern_mode") or PATTERN_MODE_VISION
+        descriptor = None
+        if pattern_mode in (PATTERN_MODE_NUMERIC, PATTERN_MODE_HYBRID):
+            update_agent_progress("pattern", 15, "正在提取形态数值特征...")
+            try:
+                descriptor = build_pattern_descriptor(kline_data)
+            except Exception as e:
+                print(f"⚠️ 形态特征提取失败，回退到视觉分析: {e}")
+                pattern_mode = PATTERN_MODE_VISION
+
+        if pattern_mode == PATTERN_MODE_NUMERIC:
+            update_agent_progress("pattern", 50, "正在根据数值特征分析形态...")
+            final_response = await ainvoke_llm(
+                text_llm,
+                [
+                    SystemMessage(content="你是一名专业的交易形态识别助手，任务是根据K线数值特征识别经典形态。擅长多时间框架综合分析。"),
+                    HumanMessage(content=(
+                        f"交易对：{state.get('stock_name', '未知')} | 分析周期：{time_frame}\n\n"
+                        "以下是由程序从最近K线中提取的形态特征（摆动高低点、边界线斜率、候选形态）：\n\n"
+                        f"{descriptor['text']}\n\n"
+                        f"{candlestick_text}\n\n"
+                        f"{pattern_text}\n\n"
+                        "请结合上述特征判断是否匹配所列出的经典形态，对候选形态逐一确认或否定，"
+                        "明确说出匹配的形态名称并解释理由，并做出你的未来预测。请用中文回答。"
+                    )),
+                ],
+                stream_agent="pattern",
+            )
+
+            update_agent_progress("pattern", 100, "模式识别分析完成")
+            result = {
+                "messages": [final_response],
+                "pattern_report": final_response.content,
+                "pattern_features": descriptor["features"],
+            }
+            if is_multi_tf:
+                result["multi_timeframe_mode"] = True
+                result["timeframes"] = list(kline_data.keys())
+            return result
 
         # --- 直接生成K线图，不通过LLM工具调用 ---
         
@@ -144,18 +178,18 @@ def create_pattern_agent(graph_llm, toolkit):
                     
                     for attempt in range(max_retries):
                         try:
-                            chart_result = toolkit.generate_kline_image.invoke({
+                            chart_result = await asyncio.to_thread(toolkit.generate_kline_image.invoke, {
                                 "kline_data": copy.deepcopy(tf_data_list)
                             })
                             if chart_result and chart_result.get("pattern_image"):
                                 break
                             print(f"图表生成无结果，{wait_sec}秒后重试 (尝试 {attempt + 1}/{max_retries})...")
                             if attempt < max_retries - 1:
-                                time.sleep(wait_sec)
+                                await asyncio.sleep(wait_sec)
                         except Exception as e:
                             print(f"图表生成出错: {e}，{wait_sec}秒后重试 (尝试 {attempt + 1}/{max_retries})...")
                             if attempt < max_retries - 1:
-                                time.sleep(wait_sec)
+                                await asyncio.sleep(wait_sec)
                     
                     if not chart_result or not chart_result.get("pattern_image"):
                         print(f"⚠️ {tf_name} 图表生成失败，跳过该时间框架")
@@ -172,7 +206,7 @@ def create_pattern_agent(graph_llm, toolkit):
             except Exception as e:
                 update_agent_progress("pattern", 100, "K线图表生成失败")
                 return {
-                    "messages": state.get("messages", []),
+                    "messages": [],
                     "pattern_report": f"K线图表生成失败: {str(e)}",
                     "error": str(e)
                 }
@@ -188,16 +222,16 @@ def create_pattern_agent(graph_llm, toolkit):
 
                 for attempt in range(max_retries):
                     try:
-                        chart_result = toolkit.generate_kline_image.invoke({"kline_data": copy.deepcopy(kline_data)})
+                        chart_result = await asyncio.to_thread(toolkit.generate_kline_image.invoke, {"kline_data": copy.deepcopy(kline_data)})
                         if chart_result and chart_result.get("pattern_image"):
                             break
                         print(f"图表生成无结果，{wait_sec}秒后重试 (尝试 {attempt + 1}/{max_retries})...")
                         if attempt < max_retries - 1:
-                            time.sleep(wait_sec)
+                            await asyncio.sleep(wait_sec)
                     except Exception as e:
                         print(f"图表生成出错: {e}，{wait_sec}秒后重试 (尝试 {attempt + 1}/{max_retries})...")
                         if attempt < max_retries - 1:
-                            time.sleep(wait_sec)
+                            await asyncio.sleep(wait_sec)
 
                 if not chart_result or not chart_result.get("pattern_image"):
                     raise RuntimeError("图表生成失败，超过最大重试次数")
@@ -209,7 +243,7 @@ def create_pattern_agent(graph_llm, toolkit):
             except Exception as e:
                 update_agent_progress("pattern", 100, "K线图表生成失败")
                 return {
-                    "messages": state.get("messages", []),
+                    "messages": [],
                     "pattern_report": f"K线图表生成失败: {str(e)}",
                     "error": str(e)
                 }
@@ -265,29 +299,42 @@ def create_pattern_agent(graph_llm, toolkit):
                 },
             ]
 
-        final_response = invoke_with_retry(
-            graph_llm.invoke,
+        if candlestick_text:
+            image_content.insert(1, {"type": "text", "text": f"\n{candlestick_text}\n"})
+
+        # hybrid 模式：把数值特征附在图片提示之后，帮助视觉模型聚焦
+        if descriptor:
+            image_content.insert(1, {
+                "type": "text",
+                "text": f"\n程序提取的K线数值特征（供参考）：\n{descriptor['text']}\n",
+            })
+
+        final_response = await ainvoke_llm(
+            graph_llm,
             [
                 SystemMessage(content="你是一名专业的交易形态识别助手，任务是分析K线图表。擅长多时间框架综合分析。"),
                 HumanMessage(content=image_content),
             ],
+            stream_agent="pattern",
         )
 
         update_agent_progress("pattern", 100, "模式识别分析完成")
         
         if is_multi_tf:
             return {
-                "messages": state.get("messages", []) + [final_response],
+                "messages": [final_response],
                 "pattern_report": final_response.content,
                 "pattern_images": multi_tf_images,  # ✅ 多张图表的字典
+                "pattern_features": descriptor["features"] if descriptor else None,
                 "multi_timeframe_mode": True,
                 "timeframes": list(multi_tf_images.keys())
             }
         else:
             return {
-                "messages": state.get("messages", []) + [final_response],
+                "messages": [final_response],
                 "pattern_report": final_response.content,
                 "pattern_image": pattern_image_b64,  # ✅ 单张图表（向后兼容）
+                "pattern_features": descriptor["features"] if descriptor else None,
             }
 
     return pattern_agent_node
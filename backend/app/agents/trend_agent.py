@@ -3,13 +3,11 @@ Agent for trend analysis in high-frequency trading (HFT) context.
 Uses LLM and toolkit to generate and interpret trendline charts for short-term prediction.
 """
 
-import json
-import time
+import asyncio
 import copy
 import pandas as pd
 
 from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
-from openai import RateLimitError
 
 # 哈雷酱的进度跟踪导入！
 import sys
@@ -34,6 +32,9 @@ except ImportError:
     def monitor_llm_call(model_name=None):
         return performance_monitor(f"LLM调用: {model_name}" if model_name else "LLM调用")
 
+from app.core.llm_scheduler import ainvoke_llm
+from app.utils.prompt_budget import budget_for, build_budgeted_sections
+
 
 def convert_to_list_of_dicts(data):
     """将 DataFrame 或 list 转换为 list[dict] 格式供工具调用"""
@@ -49,29 +50,6 @@ def convert_to_list_of_dicts(data):
         raise TypeError(f"Unsupported data type: {type(data)}")
 
 
-# --- Retry wrapper for LLM invocation ---
-def invoke_with_retry(call_fn, *args, retries=3, wait_sec=4):
-    """
-    Retry a function call with exponential backoff for rate limits or errors.
-    """
-    for attempt in range(retries):
-        try:
-            result = call_fn(*args)
-            return result
-        except RateLimitError:
-            print(
-                f"Rate limit hit, retrying in {wait_sec}s (attempt {attempt + 1}/{retries})..."
-            )
-        except Exception as e:
-            print(
-                f"Other error: {e}, retrying in {wait_sec}s (attempt {attempt + 1}/{retries})..."
-            )
-        # Only sleep if not the last attempt
-        if attempt < retries - 1:
-            time.sleep(wait_sec)
-    raise RuntimeError("Max retries exceeded")
-
-
 @performance_monitor("趋势分析智能体")
 def create_trend_agent(graph_llm, toolkit):
     """
@@ -80,7 +58,7 @@ def create_trend_agent(graph_llm, toolkit):
     """
 
     @performance_monitor("趋势分析智能体执行")
-    def trend_agent_node(state):
+    async def trend_agent_node(state):
         # 哈雷酱的进度跟踪！
         update_agent_progress("trend", 10, "正在启动趋势分析智能体...")
 
@@ -121,18 +99,18 @@ def create_trend_agent(graph_llm, toolkit):
                     
                     for attempt in range(max_retries):
                         try:
-                            chart_result = toolkit.generate_trend_image.invoke({
+                            chart_result = await asyncio.to_thread(toolkit.generate_trend_image.invoke, {
                                 "kline_data": copy.deepcopy(tf_data_list)
                             })
                             if chart_result and chart_result.get("trend_image"):
                                 break
                             print(f"趋势图生成无结果，{wait_sec}秒后重试 (尝试 {attempt + 1}/{max_retries})...")
                             if attempt < max_retries - 1:
-                                time.sleep(wait_sec)
+                                await asyncio.sleep(wait_sec)
                         except Exception as e:
                             print(f"趋势图生成出错: {e}，{wait_sec}秒后重试 (尝试 {attempt + 1}/{max_retries})...")
                             if attempt < max_retries - 1:
-                                time.sleep(wait_sec)
+                                await asyncio.sleep(wait_sec)
                     
                     if not chart_result or not chart_result.get("trend_image"):
                         print(f"⚠️ {tf_name} 趋势图生成失败，跳过该时间框架")
@@ -212,18 +190,18 @@ def create_trend_agent(graph_llm, toolkit):
 
                 for attempt in range(max_retries):
                     try:
-                        chart_result = toolkit.generate_trend_image.invoke({
+                        chart_result = await asyncio.to_thread(toolkit.generate_trend_image.invoke, {
                             "kline_data": copy.deepcopy(kline_data)
                         })
                         if chart_result and chart_result.get("trend_image"):
                             break
                         print(f"趋势图生成无结果，{wait_sec}秒后重试 (尝试 {attempt + 1}/{max_retries})...")
                         if attempt < max_retries - 1:
-                            time.sleep(wait_sec)
+                            await asyncio.sleep(wait_sec)
                     except Exception as e:
                         print(f"趋势图生成出错: {e}，{wait_sec}秒后重试 (尝试 {attempt + 1}/{max_retries})...")
                         if attempt < max_retries - 1:
-                            time.sleep(wait_sec)
+                            await asyncio.sleep(wait_sec)
 
                 if not chart_result or not chart_result.get("trend_image"):
                     raise RuntimeError("趋势图生成失败，超过最大重试次数")
@@ -310,25 +288,30 @@ def create_trend_agent(graph_llm, toolkit):
                 }
             ]
             
-            # 为每个时间框架添加图表和指标数据
+            # 为每个时间框架添加图表和指标数据（按预算压缩为尾部窗口 + 极值 + 交叉信号）
+            sections, prompt_tokens = build_budgeted_sections(
+                {tf_name: tf_info["indicators"] for tf_name, tf_info in multi_tf_trends.items()},
+                budget_tokens=budget_for(graph_llm),
+            )
             for tf_name, tf_info in multi_tf_trends.items():
+                tf_sections = sections[tf_name]
                 indicators_summary = f"""
-**📊 {tf_name} 真实技术指标：**
+**📊 {tf_name} 真实技术指标**（最近 {prompt_tokens['tail_bars']} 根K线 + 全区间极值，bars_ago 为距今K线数，crossovers 为近期交叉信号）：
 
 ### 🔥 MACD指标
-{json.dumps(tf_info["indicators"].get("MACD", {}), indent=2, ensure_ascii=False)}
+{tf_sections.get("MACD", "{}")}
 
 ### ⚡ RSI指标  
-{json.dumps(tf_info["indicators"].get("RSI", {}), indent=2, ensure_ascii=False)}
+{tf_sections.get("RSI", "{}")}
 
 ### 📈 ROC指标
-{json.dumps(tf_info["indicators"].get("ROC", {}), indent=2, ensure_ascii=False)}
+{tf_sections.get("ROC", "{}")}
 
 ### 🌊 Stochastic指标
-{json.dumps(tf_info["indicators"].get("Stochastic", {}), indent=2, ensure_ascii=False)}
+{tf_sections.get("Stochastic", "{}")}
 
 ### 🎯 Williams %R指标
-{json.dumps(tf_info["indicators"].get("Williams_R", {}), indent=2, ensure_ascii=False)}
+{tf_sections.get("Williams_R", "{}")}
 """
                 
                 image_content.append({
@@ -362,24 +345,30 @@ def create_trend_agent(graph_llm, toolkit):
         else:
             # ✅ 单一时间框架模式：保持原有 Prompt
             ohlc_data = kline_data if kline_data else state.get("kline_data", {})
+            sections, prompt_tokens = build_budgeted_sections(
+                {time_frame: indicator_results},
+                ohlc_by_tf={time_frame: ohlc_data},
+                budget_tokens=budget_for(graph_llm),
+            )
+            tf_sections = sections[time_frame]
             
             indicators_summary = f"""
-**📊 真实计算的技术指标数据：**
+**📊 真实计算的技术指标数据**（最近 {prompt_tokens['tail_bars']} 根K线 + 全区间极值，bars_ago 为距今K线数，crossovers 为近期交叉信号）：
 
 ### 🔥 MACD指标
-{json.dumps(indicator_results.get("MACD", {}), indent=2, ensure_ascii=False)}
+{tf_sections.get("MACD", "{}")}
 
 ### ⚡ RSI指标  
-{json.dumps(indicator_results.get("RSI", {}), indent=2, ensure_ascii=False)}
+{tf_sections.get("RSI", "{}")}
 
 ### 📈 ROC指标
-{json.dumps(indicator_results.get("ROC", {}), indent=2, ensure_ascii=False)}
+{tf_sections.get("ROC", "{}")}
 
 ### 🌊 Stochastic指标
-{json.dumps(indicator_results.get("Stochastic", {}), indent=2, ensure_ascii=False)}
+{tf_sections.get("Stochastic", "{}")}
 
 ### 🎯 Williams %R指标
-{json.dumps(indicator_results.get("Williams_R", {}), indent=2, ensure_ascii=False)}
+{tf_sections.get("Williams_R", "{}")}
 """
             
             image_content = [
@@ -388,8 +377,8 @@ def create_trend_agent(graph_llm, toolkit):
                     "text": (
                         f"⚠️ 重要：请使用中文进行专业分析，你可以选择一些关键的指标进行分析，可以忽略你觉得不重要的指标。\n\n"
                         f"这张{time_frame}K线图表包含了自动绘制的趋势线：**蓝色线**是支撑线，**红色线**是阻力线，两者都基于最近的收盘价格计算得出。\n\n"
-                        f"**OHLC历史数据：**\n"
-                        f"{json.dumps(ohlc_data, indent=2, ensure_ascii=False)}\n\n"
+                        f"**OHLC历史数据（全区间摘要 + 最近K线）：**\n"
+                        f"{tf_sections.get('OHLC', '{}')}\n\n"
                         f"{indicators_summary}\n\n"
                         f"**🎯 专业趋势分析要求：**\n"
                         f"1. **趋势强度分析**：结合真实技术指标评估趋势线的可靠性\n"
@@ -419,8 +408,8 @@ def create_trend_agent(graph_llm, toolkit):
 
         update_agent_progress("trend", 90, "正在分析趋势线和K线形态...")
 
-        final_response = invoke_with_retry(
-            graph_llm.invoke,
+        final_response = await ainvoke_llm(
+            graph_llm,
             [
                 SystemMessage(
                     content="你是专业的量化交易趋势分析师，拥有丰富的市场经验。"
@@ -433,16 +422,18 @@ def create_trend_agent(graph_llm, toolkit):
                 ),
                 HumanMessage(content=image_content),  # ✅ 使用统一的 image_content
             ],
+            stream_agent="trend",
         )
 
         update_agent_progress("trend", 100, "趋势分析完成")
         
         if is_multi_tf:
             return {
-                "messages": state.get("messages", []) + [final_response],
+                "messages": [final_response],
                 "trend_report": final_response.content,
                 "trend_images": {tf: info["trend_image"] for tf, info in multi_tf_trends.items()},  # ✅ 多张图
                 "trend_data": multi_tf_trends,  # ✅ 完整数据（图表+指标）
+                "trend_prompt_tokens": prompt_tokens,
                 "multi_timeframe_mode": True,
                 "timeframes": list(multi_tf_trends.keys())
             }
@@ -452,11 +443,12 @@ def create_trend_agent(graph_llm, toolkit):
             trend_image_description = chart_result.get("trend_image_description", "Trend-enhanced candlestick chart with support/resistance lines") if chart_result else "Trend-enhanced candlestick chart with support/resistance lines"
             
             return {
-                "messages": state.get("messages", []) + [final_response],
+                "messages": [final_response],
                 "trend_report": final_response.content,
                 "trend_image": trend_image_b64,  # ✅ 单张图（向后兼容）
                 "trend_image_filename": trend_image_filename,
                 "trend_image_description": trend_image_description,
+                "trend_prompt_tokens": prompt_tokens,
             }
 
     return trend_agent_node
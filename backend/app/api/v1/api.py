@@ -1,9 +1,14 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import market, analyze, ws, system, export, auth
+from app.api.v1.endpoints import market, analyze, jobs, batch, backtest, screener, watch, ws, system, export, auth
 
 api_router = APIRouter()
 api_router.include_router(market.router, prefix="/market", tags=["market"])
 api_router.include_router(analyze.router, prefix="/analyze", tags=["analyze"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(batch.router, prefix="/batch", tags=["batch"])
+api_router.include_router(backtest.router, prefix="/backtests", tags=["backtest"])
+api_router.include_router(screener.router, prefix="/screener", tags=["screener"])
+api_router.include_router(watch.router, prefix="/watch", tags=["watch"])
 api_router.include_router(export.router, prefix="/export", tags=["export"])
 api_router.include_router(ws.router, prefix="/ws", tags=["websocket"])
 api_router.include_router(system.router, prefix="/system", tags=["system"])
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException
+from app.models.schemas.backtest import BacktestRequest
+from app.services.backtest_service import backtest_manager
+
+router = APIRouter()
+
+@router.post("/")
+async def start_backtest(request: BacktestRequest):
+    """
+    启动滚动回测，立即返回 backtest_id（每完成一个决策点写一次检查点）
+    """
+    try:
+        return backtest_manager.start(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/")
+async def list_backtests(limit: int = 20):
+    """
+    最近的回测及其汇总
+    """
+    return {"backtests": backtest_manager.list_backtests(limit)}
+
+@router.get("/{backtest_id}")
+async def get_backtest(backtest_id: str, records: bool = False):
+    """
+    回测进度与汇总（按决策版本 / 模型的命中率、收益、MFE/MAE）；records=true 时附带逐点记录
+    """
+    view = backtest_manager.get(backtest_id, include_records=records)
+    if not view:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    return view
+
+@router.post("/{backtest_id}/resume")
+async def resume_backtest(backtest_id: str):
+    """
+    续跑：只执行未完成或失败的决策点
+    """
+    view = backtest_manager.resume(backtest_id)
+    if not view:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    return view
+
+@router.post("/{backtest_id}/cancel")
+async def cancel_backtest(backtest_id: str):
+    """
+    取消运行中的回测（已完成的决策点保留，可续跑）
+    """
+    view = await backtest_manager.cancel(backtest_id)
+    if not view:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    return view
@@ -0,0 +1,27 @@
+import json
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.models.schemas.analyze import BatchAnalyzeRequest
+from app.services.batch_service import BatchRunner
+
+router = APIRouter()
+
+@router.post("/")
+async def run_batch_analysis(batch: BatchAnalyzeRequest):
+    """
+    批量分析：以 NDJSON 流逐行返回结果（start / prefetched / row / done），
+    结束时汇总表写入 data/batch/<batch_id>.csv。连接断开会取消未完成的行。
+    CSV / XLSX 表格请用 tools/batch_analyze.py 读取后提交。
+    """
+    if not batch.rows:
+        raise HTTPException(status_code=400, detail="rows is empty")
+    try:
+        runner = BatchRunner(batch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def stream():
+        async for event in runner.events():
+            yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
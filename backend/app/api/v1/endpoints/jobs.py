@@ -0,0 +1,60 @@
+from fastapi import APIRouter, HTTPException
+from app.models.schemas.analyze import AnalyzeRequest
+from app.services.analysis_service import InvalidAnalysisRequest
+from app.services.job_service import JOB_SUCCEEDED, JobQueueFull, job_manager
+
+router = APIRouter()
+
+@router.post("/")
+async def submit_analysis_job(request: AnalyzeRequest):
+    """
+    提交分析任务，立即返回 job_id 和 result_id（进度仍通过 /ws/progress 推送）
+    """
+    try:
+        return await job_manager.submit(request)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except InvalidAnalysisRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/")
+async def list_analysis_jobs(limit: int = 20):
+    """
+    最近提交的任务
+    """
+    return {"jobs": job_manager.list_jobs(limit), **job_manager.snapshot()}
+
+@router.get("/{job_id}")
+async def get_analysis_job(job_id: str):
+    """
+    查询任务状态：queued / running / succeeded / failed / cancelled
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{job_id}/result")
+async def get_analysis_job_result(job_id: str):
+    """
+    获取已完成任务的分析结果（未完成时返回 409 和当前状态）
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != JOB_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}" + (f": {job['error']}" if job["error"] else ""))
+    result = job_manager.get_result(job_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Analysis result not found")
+    return result
+
+@router.post("/{job_id}/cancel")
+async def cancel_analysis_job(job_id: str):
+    """
+    取消任务：排队中的直接移出，运行中的中止正在进行的 LLM 调用
+    """
+    job = await job_manager.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
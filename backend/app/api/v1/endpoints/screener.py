@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException
+from app.models.schemas.screener import ScreenerRequest
+from app.services.screener_service import load_universe, screener_service
+
+router = APIRouter()
+
+@router.post("/scan")
+async def run_scan(request: ScreenerRequest):
+    """
+    全市场筛选：拉取最新K线、向量化打分排序，前 top_n 名自动提交完整分析任务
+    （进度通过 /ws/progress 的 screener 消息推送）
+    """
+    try:
+        return await screener_service.scan(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/")
+async def list_scans(limit: int = 10):
+    """
+    最近的筛选结果（不含完整排名）
+    """
+    return {"scans": screener_service.list_scans(limit)}
+
+@router.get("/universe")
+async def get_universe():
+    """
+    默认筛选的交易对列表
+    """
+    try:
+        symbols = load_universe()
+    except OSError as e:
+        raise HTTPException(status_code=404, detail=f"交易对列表不可用: {e}")
+    return {"count": len(symbols), "symbols": symbols}
+
+@router.get("/{scan_id}")
+async def get_scan(scan_id: str, limit: int = 50):
+    """
+    单次筛选结果，ranking 截取前 limit 名
+    """
+    scan = screener_service.get(scan_id)
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return {**scan, "ranking": scan["ranking"][:limit]}
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Body
 from app.utils.temp_file_manager import cleanup_all_temp_files, cleanup_exports_files
 
@@ -59,3 +60,112 @@ async def reload_config():
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"配置重新加载失败: {str(e)}")
+
+@router.get("/llm-scheduler")
+async def get_llm_scheduler_status():
+    """
+    查看 LLM 调度器状态（各模型在途请求、排队次数、429 次数、退避剩余时间）
+    """
+    from app.core.llm_scheduler import llm_scheduler
+    return {"status": "success", "limiters": llm_scheduler.snapshot()}
+
+@router.get("/engine-pool")
+async def get_engine_pool_status():
+    """
+    查看 TradingEngine 复用池状态（缓存的配置组合、命中/构建次数、累计构建耗时）
+    """
+    from app.services.engine_pool import engine_pool
+    return {"status": "success", "pool": engine_pool.snapshot()}
+
+@router.get("/http-transport")
+async def get_http_transport_status():
+    """
+    查看 LLM 客户端共享 HTTP 连接池（是否启用 HTTP/2、连接数上限、已建立连接池的供应商）
+    """
+    from app.core.http_transport import transport_registry
+    return {"status": "success", "transport": transport_registry.snapshot()}
+
+@router.get("/llm-usage")
+async def get_llm_usage_status(result_id: str = None):
+    """
+    查看 LLM 用量与延迟：最近调用按模型/智能体的滚动分位数；传 result_id 时返回该次分析的汇总
+    """
+    from app.core.llm_usage import usage_ledger
+    if result_id:
+        return {"status": "success", "result_id": result_id, "usage": usage_ledger.summary_for(result_id)}
+    return {"status": "success", **usage_ledger.snapshot()}
+
+@router.get("/llm-hedging")
+async def get_llm_hedging_status():
+    """
+    查看 LLM 对冲调用状态（各模型延迟分位数、各路径胜出次数、最近调用记录）
+    """
+    from app.core import llm_hedging
+    return {"status": "success", **llm_hedging.snapshot()}
+
+@router.get("/llm-cache")
+async def get_llm_cache_status():
+    """
+    查看 LLM 响应缓存状态（各供应商命中/未命中/写入/过期/淘汰次数）
+    """
+    from app.core import llm_cache
+    return {"status": "success", "caches": llm_cache.snapshot()}
+
+@router.get("/result-cache")
+async def get_result_cache_status():
+    """
+    查看分析结果缓存状态（命中 / 等待相同请求 / 未命中 / 强制刷新次数，K线变化次数）
+    """
+    from app.services.result_cache import result_cache
+    return {"status": "success", **result_cache.snapshot()}
+
+@router.get("/late-reports")
+async def get_late_reports_status():
+    """
+    查看分析师截止时间的效果（超时 / 已补写 / 超过宽限期被取消的分析师数，正在后台运行的数量）
+    """
+    from app.services.late_reports import late_reports
+    return {"status": "success", **late_reports.snapshot()}
+
+@router.get("/prompt-cache")
+async def get_prompt_cache_status():
+    """
+    查看决策提示词前缀缓存效果（各模型命中缓存的 Token 占比、首 Token 延迟）
+    """
+    from app.agents.decision.prompt_layout import prompt_cache_stats
+    return {"status": "success", "models": prompt_cache_stats.snapshot()}
+
+@router.get("/signal-gate")
+async def get_signal_gate_status():
+    """
+    查看预筛选状态（是否启用、阈值、已评估/拦截次数）
+    """
+    from app.services.signal_gate import gate_stats
+    return {"status": "success", **gate_stats.snapshot()}
+
+@router.post("/clear-llm-cache")
+async def clear_llm_cache():
+    """
+    清除磁盘上的全部 LLM 响应缓存
+    """
+    try:
+        from app.core.llm_cache import DiskLLMCache, DEFAULT_CACHE_DIR
+        from app.core.config import settings
+        from pathlib import Path
+        cache_dir = Path(settings.LLM_CACHE_DIR) if settings.LLM_CACHE_DIR else DEFAULT_CACHE_DIR
+        await asyncio.to_thread(DiskLLMCache(cache_dir=cache_dir).clear)
+        return {"status": "success", "message": "LLM 响应缓存已清除"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/clear-result-cache")
+async def clear_result_cache():
+    """
+    清除分析结果缓存索引（历史记录保留）
+    """
+    try:
+        from app.services.result_cache import result_cache
+        await asyncio.to_thread(result_cache.clear)
+        return {"status": "success", "message": "分析结果缓存已清除"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
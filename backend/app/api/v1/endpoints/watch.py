@@ -0,0 +1,59 @@
+from fastapi import APIRouter, HTTPException
+from app.models.schemas.watch import WatchRuleRequest
+from app.services.watch_service import watch_scheduler
+
+router = APIRouter()
+
+@router.post("/")
+async def add_rule(request: WatchRuleRequest):
+    """
+    登记盯盘规则：每个时间框架在K线收盘后自动分析（结果写入历史记录，并通过 /ws/progress 推送 watch 消息）
+    """
+    try:
+        return await watch_scheduler.add_rule(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/")
+async def list_rules():
+    """
+    所有规则及其最近一次执行状态
+    """
+    return {"rules": watch_scheduler.list_rules(), "stats": watch_scheduler.stats()}
+
+@router.get("/{rule_id}")
+async def get_rule(rule_id: str):
+    rule = watch_scheduler.get(rule_id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Watch rule not found")
+    return rule
+
+@router.delete("/{rule_id}")
+async def delete_rule(rule_id: str):
+    if not await watch_scheduler.delete_rule(rule_id):
+        raise HTTPException(status_code=404, detail="Watch rule not found")
+    return {"status": "success", "message": "Watch rule deleted"}
+
+@router.post("/{rule_id}/pause")
+async def pause_rule(rule_id: str):
+    rule = watch_scheduler.set_enabled(rule_id, False)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Watch rule not found")
+    return rule
+
+@router.post("/{rule_id}/resume")
+async def resume_rule(rule_id: str):
+    rule = watch_scheduler.set_enabled(rule_id, True)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Watch rule not found")
+    return rule
+
+@router.post("/{rule_id}/run")
+async def run_rule(rule_id: str):
+    """
+    立即执行一次（不等待收盘）
+    """
+    rule = await watch_scheduler.run_now(rule_id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Watch rule not found")
+    return rule
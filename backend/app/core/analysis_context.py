@@ -0,0 +1,71 @@
+"""
+Analysis Context - 当前分析请求的上下文
+用 contextvars 保存 result_id / session_id / 是否开启流式输出 / 是否读取 LLM 缓存 / 分析截止时间 / 分析师截止时间，
+智能体在 LangGraph 的并行分支中调用 LLM 时无需层层传参即可拿到这些信息
+（asyncio 创建子任务时会复制当前上下文）。
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+_result_id: ContextVar[Optional[str]] = ContextVar("analysis_result_id", default=None)
+_session_id: ContextVar[Optional[str]] = ContextVar("analysis_session_id", default=None)
+_stream_enabled: ContextVar[bool] = ContextVar("analysis_stream_enabled", default=False)
+_llm_cache_enabled: ContextVar[bool] = ContextVar("analysis_llm_cache_enabled", default=True)
+_deadline: ContextVar[Optional[float]] = ContextVar("analysis_deadline", default=None)
+_analyst_deadline: ContextVar[Optional[float]] = ContextVar("analysis_analyst_deadline", default=None)
+
+
+def bind_analysis_context(result_id: Optional[str], session_id: Optional[str] = None, stream: bool = False,
+                          use_llm_cache: bool = True):
+    """在当前任务中绑定分析上下文（每个 HTTP 请求运行在独立任务中，请求结束即失效）"""
+    _result_id.set(result_id)
+    _session_id.set(session_id)
+    _stream_enabled.set(bool(stream))
+    _llm_cache_enabled.set(bool(use_llm_cache))
+
+
+def get_result_id() -> Optional[str]:
+    return _result_id.get()
+
+
+def get_session_id() -> Optional[str]:
+    return _session_id.get()
+
+
+def is_streaming() -> bool:
+    """当前请求是否要求把 LLM 输出逐 Token 推送给前端"""
+    return _stream_enabled.get()
+
+
+def disable_streaming():
+    """在当前上下文中关闭流式输出（只影响当前任务，如 LangGraph 的某个并行节点）"""
+    _stream_enabled.set(False)
+
+
+def is_llm_cache_enabled() -> bool:
+    """当前请求是否允许读取 LLM 响应缓存（False 时强制重新调用，结果仍会写入缓存）"""
+    return _llm_cache_enabled.get()
+
+
+def set_analysis_deadline(seconds: Optional[float]):
+    """设置整次分析的截止时间（从现在起 seconds 秒，None 表示不限制）"""
+    _deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def remaining_time() -> Optional[float]:
+    """距分析截止时间的剩余秒数，未设置截止时间时返回 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def set_analyst_deadline(seconds: Optional[float]):
+    """设置本次分析的分析师截止时间（秒，None 表示使用 ANALYST_DEADLINE，0 表示不限制）"""
+    _analyst_deadline.set(seconds)
+
+
+def get_analyst_deadline() -> Optional[float]:
+    return _analyst_deadline.get()
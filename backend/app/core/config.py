@@ -1,4 +1,4 @@
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, List
 from pydantic import AnyHttpUrl, field_validator, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from langchain_openai import ChatOpenAI
@@ -38,6 +38,75 @@ class Settings(BaseSettings):
     GRAPH_MODEL: str = "Qwen/Qwen3-VL-30B-A3B-Instruct"
     GRAPH_TEMPERATURE: float = 0.1
 
+    # 备用供应商/模型：主模型过慢时发出对冲请求，报错时故障转移（留空则不启用）
+    AGENT_FALLBACK_PROVIDER: str = ""
+    AGENT_FALLBACK_MODEL: str = ""
+    GRAPH_FALLBACK_PROVIDER: str = ""
+    GRAPH_FALLBACK_MODEL: str = ""
+
+    # 截止时间（秒）：单次 LLM 调用 / 整次 AI 分析
+    LLM_CALL_TIMEOUT: float = 120.0
+    ANALYSIS_DEADLINE: float = 300.0
+    # 分析师截止时间（0 为不限制）：超时的分析师报告标记为缺失，决策阶段用已到达的报告先行决策；
+    # 超时的分析师继续在后台运行，ANALYST_LATE_GRACE 秒内完成的报告补写到历史记录
+    ANALYST_DEADLINE: float = 0.0
+    ANALYST_LATE_GRACE: float = 300.0
+
+    # 对冲时机：主模型耗时超过其历史延迟的该分位数时发出对冲请求
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_DEFAULT_DELAY: float = 30.0  # 延迟样本不足时的等待
+    LLM_HEDGE_MIN_DELAY: float = 5.0
+
+    # LLM 响应磁盘缓存（回放相同窗口时直接复用响应）
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_DIR: str = ""          # 留空使用 backend/data/llm_cache
+    LLM_CACHE_TTL: float = 7 * 24 * 3600
+    LLM_CACHE_MAX_MB: float = 512
+
+    # 结果级缓存：已收盘的历史窗口（to_end / date_range）相同请求直接返回已保存的分析结果
+    RESULT_CACHE_ENABLED: bool = True
+
+    # 指标/趋势提示词中指标与 OHLC 数据的 Token 预算（供应商可在 providers.py 用 prompt_token_budget 覆盖）
+    PROMPT_TOKEN_BUDGET: int = 6000
+    PROMPT_TAIL_BARS: int = 30       # 每条序列保留的最近K线数（超预算时自动缩短）
+
+    # LLM 客户端共享 HTTP 连接池（每个供应商一组长连接）
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 120.0
+    HTTP_HTTP2: bool = True          # 需要安装 h2，未安装时自动使用 HTTP/1.1
+
+    # 异步分析任务队列：同时执行的分析数 / 最多排队数
+    ANALYSIS_JOB_CONCURRENCY: int = 2
+    ANALYSIS_JOB_QUEUE_LIMIT: int = 100
+
+    # 批量分析：同时执行的分析数 / 预取行情的并发数 / 单批最多行数
+    BATCH_CONCURRENCY: int = 3
+    BATCH_PREFETCH_CONCURRENCY: int = 4
+    BATCH_MAX_ROWS: int = 500
+
+    # 滚动回测：同时执行的分析数 / 单次回测最多决策点数
+    BACKTEST_CONCURRENCY: int = 2
+    BACKTEST_MAX_POINTS: int = 5000
+
+    # LLM 分析前的预筛选（默认关闭，可按请求开启）：
+    # 多空票数差 / 最低 ATR 百分比 / 贴近趋势线的距离（ATR 倍数）
+    SIGNAL_GATE_ENABLED: bool = False
+    GATE_MIN_SIGNAL_AGREEMENT: int = 2
+    GATE_MIN_ATR_PCT: float = 0.3
+    GATE_TRENDLINE_ATR: float = 0.5
+
+    # 全市场筛选：交易对列表文件（为空时使用 随机表格/OKX_交易对列表_简化.md）/ 拉取K线的并发数
+    SCREENER_UNIVERSE_FILE: str = ""
+    SCREENER_FETCH_CONCURRENCY: int = 8
+
+    # 定时分析（盯盘规则）：同时执行的分析数 / 收盘后等待秒数（等交易所落盘最后一根K线）/
+    # 各规则在收盘后错开执行的最大秒数（避免整点时所有规则同时拉取行情、调用 LLM）/ 规则数上限
+    WATCH_CONCURRENCY: int = 2
+    WATCH_CLOSE_DELAY_SECONDS: float = 5.0
+    WATCH_JITTER_SECONDS: float = 60.0
+    WATCH_MAX_RULES: int = 500
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -114,10 +183,24 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
+# 配置重载后需要执行的回调（如清空引擎池），通过 add_reload_listener 注册
+_reload_listeners: List[Callable[[], None]] = []
+
+
+def add_reload_listener(callback: Callable[[], None]):
+    """注册配置重载回调"""
+    if callback not in _reload_listeners:
+        _reload_listeners.append(callback)
+
 
 def reload_config():
     global settings
     settings = Settings()
+    for callback in list(_reload_listeners):
+        try:
+            callback()
+        except Exception as e:
+            print(f"配置重载回调执行失败: {e}")
 
 
 def create_llm_client(role: str = "agent") -> ChatOpenAI:
@@ -139,12 +222,15 @@ def create_llm_client(role: str = "agent") -> ChatOpenAI:
     if not api_key:
         raise ValueError(f"API Key not found for provider {provider}. Please set {cfg['api_key_env']} in .env file")
 
+    from app.core.http_transport import transport_registry
+
     return ChatOpenAI(
         model=model,
         temperature=temperature,
         api_key=api_key,
         base_url=cfg["base_url"],
+        **transport_registry.client_kwargs(cfg["base_url"]),
     )
 
 
-__all__ = ["settings", "reload_config", "create_llm_client"]
+__all__ = ["settings", "reload_config", "add_reload_listener", "create_llm_client"]
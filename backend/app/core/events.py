@@ -35,8 +35,10 @@ class EnvFileHandler:
             self.last_modified = env_path.stat().st_mtime
 
 def create_start_app_handler(app: FastAPI) -> Callable:
-    def start_app() -> None:
+    async def start_app() -> None:
         from app.core.config import reload_config
+        from app.services.job_service import job_manager
+        from app.services.watch_service import watch_scheduler
         
         global _env_observer
         _env_observer = EnvFileHandler(reload_callback=reload_config)
@@ -44,12 +46,24 @@ def create_start_app_handler(app: FastAPI) -> Callable:
         
         logger.info("Application starting up...")
         logger.info("配置文件监听已启动（修改 .env 后自动生效）")
+
+        await job_manager.start()
+        await watch_scheduler.start()
     return start_app
 
 def create_stop_app_handler(app: FastAPI) -> Callable:
-    def stop_app() -> None:
+    async def stop_app() -> None:
+        from app.core.http_transport import transport_registry
+        from app.services.backtest_service import backtest_manager
+        from app.services.job_service import job_manager
+        from app.services.watch_service import watch_scheduler
+
         global _env_observer
         _env_observer = None
+        await watch_scheduler.shutdown()
+        await job_manager.shutdown()
+        await backtest_manager.shutdown()
+        await transport_registry.aclose()
         logger.info("Application shutting down...")
     return stop_app
 
@@ -1,8 +1,5 @@
-from typing import Dict
-import time
-import threading
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 import sys
 import io
@@ -19,6 +16,8 @@ from pathlib import Path
 
 from app.agents.agent_state import IndicatorAgentState
 from app.agents.decision.decision_agent import create_final_trade_decider
+from app.core import config as app_config
+from app.core.analysis_context import disable_streaming, get_analyst_deadline, get_result_id
 from app.utils.graph_util import TechnicalTools
 from app.agents.indicator_agent import create_indicator_agent
 from app.agents.pattern_agent import create_pattern_agent
@@ -34,6 +33,7 @@ class SetGraph:
         tool_nodes: Dict[str, ToolNode],
         decision_agent_version: str = "constrained",
         include_decision_agent: bool = True,
+        ensemble_versions: Optional[List[str]] = None,
     ):
         self.agent_llm = agent_llm
         self.graph_llm = graph_llm
@@ -41,11 +41,25 @@ class SetGraph:
         self.tool_nodes = tool_nodes
         self.decision_agent_version = decision_agent_version  # 哈雷酱的AI版本功能！
         self.include_decision_agent = include_decision_agent
+        # 多版本决策：分析师只运行一次，多个决策版本共享同一份报告并行决策
+        self.ensemble_versions = ensemble_versions
+
+    def _create_decision_agent(self, version: str):
+        """按版本从工厂创建决策智能体，失败时回退到约束版本"""
+        try:
+            from app.agents.decision.decision_agent_factory import get_decision_agent_factory
+            factory = get_decision_agent_factory()
+            decision_agent_node = factory.create_agent(version, self.agent_llm)
+            print(f"[AI版本] 图形设置使用决策智能体版本: {version}")
+        except Exception as e:
+            print(f"[AI版本] 使用决策智能体工厂失败，回退到约束版本: {e}")
+            decision_agent_node = create_final_trade_decider(self.agent_llm)
+        return decision_agent_node
 
     def set_graph(self):
         """
-        设置图结构，实现三个分析智能体顺序启动（间隔4秒和7秒），
-        决策智能体等待所有分析完成后立即执行
+        设置图结构，三个分析智能体作为异步节点从 START 并行扇出（限流由 llm_scheduler 按供应商/模型统一调度），
+        决策智能体等待所有分析完成（或到达分析师截止时间）后立即执行；多版本决策模式下每个版本一个决策节点，同时从分析节点扇出
         """
         # Create analyst nodes
         agent_nodes = {}
@@ -55,7 +69,7 @@ class SetGraph:
 
         # create nodes for pattern agent
         agent_nodes["pattern"] = create_pattern_agent(
-            self.graph_llm, self.toolkit
+            self.graph_llm, self.toolkit, text_llm=self.agent_llm
         )
 
         # create nodes for trend agent
@@ -63,125 +77,130 @@ class SetGraph:
             self.graph_llm, self.toolkit
         )
 
-        # create nodes for decision agent - 哈雷酱的AI版本功能！
-        try:
-            from app.agents.decision.decision_agent_factory import get_decision_agent_factory
-            factory = get_decision_agent_factory()
-            decision_agent_node = factory.create_agent(self.decision_agent_version, self.agent_llm)
-            print(f"[AI版本] 图形设置使用决策智能体版本: {self.decision_agent_version}")
-        except Exception as e:
-            print(f"[AI版本] 使用决策智能体工厂失败，回退到约束版本: {e}")
-            decision_agent_node = create_final_trade_decider(self.agent_llm)
-
         # create graph
         graph = StateGraph(IndicatorAgentState)
 
-        # add rest of the nodes
-        if self.include_decision_agent:
-            graph.add_node("Decision Maker", decision_agent_node)
-
-        # 创建并行启动协调器
-        def sequential_start_coordinator(state):
-            """
-            协调三个分析智能体的顺序启动
-            """
-            print("🚀 开始顺序启动分析智能体...")
-
-            # 创建共享状态和结果收集器
-            shared_state = state.copy()
-            results = {}
-            completion_events = {}
-
-            def run_agent_with_delay(agent_name, agent_node, delay):
-                """
-                延迟启动智能体并收集结果
-                """
-                if delay > 0:
-                    print(f"⏳ {agent_name} 智能体将在 {delay} 秒后启动...")
-                    time.sleep(delay)
-
-                print(f"🔄 启动 {agent_name} 智能体...")
-                try:
-                    result = agent_node(shared_state)
-                    results[agent_name] = result
-                    completion_events[agent_name] = True
-                    print(f"✅ {agent_name} 智能体完成")
-                    return result
-                except Exception as e:
-                    print(f"❌ {agent_name} 智能体失败: {e}")
-                    results[agent_name] = {"error": str(e)}
-                    completion_events[agent_name] = True
-                    return {"error": str(e)}
-
-            # 启动三个分析智能体，间隔调整为4秒和7秒（更安全）
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                # 提交任务，分别延迟 0, 5.0, 8.0 秒
-                futures = [
-                    executor.submit(run_agent_with_delay, "Indicator", agent_nodes["indicator"], 0),
-                    executor.submit(run_agent_with_delay, "Pattern", agent_nodes["pattern"], 5.0),
-                    executor.submit(run_agent_with_delay, "Trend", agent_nodes["trend"], 8.0)
-                ]
-
-                # 等待所有任务完成
-                for future in futures:
-                    future.result()
-
-            if self.include_decision_agent:
-                print("🎉 所有分析智能体完成，准备启动决策智能体...")
-
-            # 整合所有分析结果到状态中
-            combined_messages = []
-            for agent_name, result in results.items():
-                if "messages" in result and result["messages"]:
-                    combined_messages.extend(result["messages"])
-
-                # 保存各个智能体的报告
-                if f"{agent_name.lower()}_report" in result:
-                    shared_state[f"{agent_name.lower()}_report"] = result[f"{agent_name.lower()}_report"]
-
-                # 保存计算数据和图像
-                if "indicators_data" in result:
-                    shared_state["indicators_data"] = result["indicators_data"]
-                
-                # 单周期图表
-                if "pattern_image" in result:
-                    shared_state["pattern_image"] = result["pattern_image"]
-                if "trend_image" in result:
-                    shared_state["trend_image"] = result["trend_image"]
-                
-                # 多周期图表 (哈雷酱修复：支持多周期数据传递)
-                if "pattern_images" in result:
-                    shared_state["pattern_images"] = result["pattern_images"]
-                if "trend_images" in result:
-                    shared_state["trend_images"] = result["trend_images"]
-                if "multi_timeframe_mode" in result:
-                    shared_state["multi_timeframe_mode"] = result["multi_timeframe_mode"]
-                if "timeframes" in result:
-                    shared_state["timeframes"] = result["timeframes"]
-
-                # 哈雷酱添加：保存价格信息和指标数据（从技术指标智能体获取）
-                if agent_name.lower() == "indicator":
-                    if "latest_price" in result:
-                        shared_state["latest_price"] = result["latest_price"]
-                    if "price_info" in result:
-                        shared_state["price_info"] = result["price_info"]
-                    if "indicator_data" in result:
-                        shared_state["indicator_data"] = result["indicator_data"]
-
-            shared_state["messages"] = combined_messages
-            shared_state["analysis_results"] = results
-
-            return shared_state
-
-        # 添加协调器节点
-        graph.add_node("Sequential Coordinator", sequential_start_coordinator)
-
-        # set start of graph
-        graph.add_edge(START, "Sequential Coordinator")
-        if self.include_decision_agent:
-            graph.add_edge("Sequential Coordinator", "Decision Maker")
+        # create nodes for decision agent - 哈雷酱的AI版本功能！
+        if self.include_decision_agent and self.ensemble_versions:
+            for index, version in enumerate(self.ensemble_versions):
+                graph.add_node(
+                    f"Decision Maker [{version}]",
+                    self._ensemble_decision_node(version, self._create_decision_agent(version), stream=index == 0),
+                )
+        elif self.include_decision_agent:
+            graph.add_node("Decision Maker", self._create_decision_agent(self.decision_agent_version))
+
+        # 三个分析智能体作为独立节点从 START 并行扇出，各自只写自己的状态键，
+        # 决策节点等三条分支全部完成后执行（同一步内写同一个键会触发 InvalidUpdateError）
+        analyst_outputs = {
+            "Indicator Analyst": (agent_nodes["indicator"], (
+                "messages", "indicator_report", "latest_price", "price_info", "indicator_prompt_tokens",
+            )),
+            "Pattern Analyst": (agent_nodes["pattern"], (
+                "messages", "pattern_report", "pattern_image", "pattern_images",
+                "pattern_image_filename", "pattern_image_description", "pattern_features",
+            )),
+            "Trend Analyst": (agent_nodes["trend"], (
+                "messages", "trend_report", "trend_image", "trend_images",
+                "trend_image_filename", "trend_image_description", "trend_prompt_tokens",
+            )),
+        }
+
+        for node_name, (agent_node, output_keys) in analyst_outputs.items():
+            graph.add_node(node_name, self._analyst_node(node_name, agent_node, output_keys))
+            graph.add_edge(START, node_name)
+
+        if self.include_decision_agent and self.ensemble_versions:
+            for version in self.ensemble_versions:
+                graph.add_edge(list(analyst_outputs.keys()), f"Decision Maker [{version}]")
+                graph.add_edge(f"Decision Maker [{version}]", END)
+        elif self.include_decision_agent:
+            graph.add_edge(list(analyst_outputs.keys()), "Decision Maker")
             graph.add_edge("Decision Maker", END)
         else:
-            graph.add_edge("Sequential Coordinator", END)
+            for node_name in analyst_outputs:
+                graph.add_edge(node_name, END)
 
         return graph.compile()
+
+    @staticmethod
+    def _analyst_node(node_name: str, agent_node, output_keys):
+        """
+        包装分析智能体：捕获异常（单个分析失败不阻断决策），并只保留该智能体负责的状态键
+
+        设置了分析师截止时间时，超时的分析师不再阻塞决策：报告标记为缺失（missing_reports），
+        分析师继续在后台运行，完成后由 late_reports 补写到历史记录
+        """
+        report_key = output_keys[1]
+
+        async def node(state):
+            print(f"🔄 启动 {node_name}...")
+            deadline = get_analyst_deadline()
+            if deadline is None:
+                deadline = app_config.settings.ANALYST_DEADLINE
+            task = asyncio.ensure_future(agent_node(state))
+            try:
+                if deadline and deadline > 0:
+                    result = await asyncio.wait_for(asyncio.shield(task), timeout=deadline)
+                else:
+                    result = await task
+            except asyncio.TimeoutError:
+                print(f"⏰ {node_name} 未在 {deadline:g} 秒内完成，决策阶段先行")
+                result_id = get_result_id()
+                if result_id:
+                    from app.services.late_reports import late_reports
+                    late_reports.track(result_id, node_name, task, output_keys)
+                else:
+                    task.cancel()
+                return {
+                    "messages": [],
+                    report_key: (
+                        f"【缺失】{node_name} 未在 {deadline:g} 秒内完成，本报告不可用。"
+                        f"请仅依据其余报告决策，并相应降低置信度。"
+                    ),
+                    "missing_reports": [report_key],
+                }
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            except Exception as e:
+                print(f"❌ {node_name} 失败: {e}")
+                return {"messages": [], report_key: f"{node_name} 执行失败: {e}", "failed_reports": [report_key]}
+
+            print(f"✅ {node_name} 完成")
+            return {key: result[key] for key in output_keys if key in result}
+
+        return node
+
+    @staticmethod
+    def _ensemble_decision_node(version: str, agent_node, stream: bool):
+        """
+        包装多版本决策中的一个版本：只写 ensemble_decisions[version]（并行节点不能同时写 final_trade_decision），
+        只有主版本推送流式输出，避免多路决策输出交错
+        """
+
+        async def node(state):
+            if not stream:
+                disable_streaming()
+            print(f"🔄 启动决策版本 {version}...")
+            try:
+                result = agent_node(state)
+                if asyncio.iscoroutine(result):
+                    result = await result
+            except Exception as e:
+                print(f"❌ 决策版本 {version} 失败: {e}")
+                return {"messages": [], "ensemble_decisions": {version: {"error": f"{version} 决策失败: {e}"}}}
+
+            if result.get("failed_reports"):
+                print(f"❌ 决策版本 {version} LLM 调用失败")
+                error = f"{version} 决策失败: {result.get('final_trade_decision', '')}"
+                return {"messages": [], "ensemble_decisions": {version: {"error": error}}}
+
+            print(f"✅ 决策版本 {version} 完成")
+            output_keys = ("final_trade_decision", "decision_prompt", "agent_version_name", "agent_version_description", "error")
+            return {
+                "messages": result.get("messages", []),
+                "ensemble_decisions": {version: {key: result[key] for key in output_keys if key in result}},
+            }
+
+        return node
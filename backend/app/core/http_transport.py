@@ -0,0 +1,130 @@
+"""
+HTTP Transport - 所有 LLM 客户端共享的 HTTP 连接池
+ChatOpenAI 默认每个实例各自创建 httpx 客户端，引擎重建后到 ModelScope / DeepSeek / iflow / OpenRouter 的
+连接无法复用，每次调用都要重新握手 TLS。这里按供应商 base_url 维护进程级的一对同步/异步 httpx 客户端：
+- keep-alive 长连接，连接数与空闲保活时间可配置（HTTP_* 配置项）
+- 安装了 h2 时启用 HTTP/2（同一连接多路复用并发请求），否则退回 HTTP/1.1
+- 通过 http_client / http_async_client 注入到每个 ChatOpenAI 实例
+异步客户端的连接绑定在创建它的事件循环上，服务进程内只有 uvicorn 一个事件循环。
+配置重载时丢弃现有客户端，之后重建的引擎按新的 HTTP_* / LLM_CALL_TIMEOUT 创建连接；
+旧客户端等仍在使用它们的分析结束（ANALYSIS_DEADLINE 之后）再关闭。
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from app.core import config as app_config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 建立连接的超时（秒）；读取超时跟随 LLM_CALL_TIMEOUT
+CONNECT_TIMEOUT = 10.0
+# 配置重载后旧客户端在 ANALYSIS_DEADLINE 之外再保留的秒数
+RETIRE_MARGIN = 30.0
+
+
+class TransportRegistry:
+    """base_url -> (httpx.Client, httpx.AsyncClient)，首次使用时创建"""
+
+    def __init__(self):
+        self._clients: Dict[str, Tuple[httpx.Client, httpx.AsyncClient]] = {}
+        # 配置重载后等待关闭的旧客户端
+        self._retired: List[Tuple[httpx.Client, httpx.AsyncClient]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _client_options() -> Dict[str, Any]:
+        settings = app_config.settings
+        return {
+            "http2": settings.HTTP_HTTP2 and HTTP2_AVAILABLE,
+            "limits": httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            "timeout": httpx.Timeout(settings.LLM_CALL_TIMEOUT, connect=CONNECT_TIMEOUT),
+        }
+
+    def clients_for(self, base_url: str) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        with self._lock:
+            clients = self._clients.get(base_url)
+            if clients is None:
+                options = self._client_options()
+                clients = (httpx.Client(**options), httpx.AsyncClient(**options))
+                self._clients[base_url] = clients
+                logger.info(f"HTTP transport created for {base_url} (http2={options['http2']})")
+            return clients
+
+    def client_kwargs(self, base_url: str) -> Dict[str, Any]:
+        """传给 ChatOpenAI 的参数"""
+        sync_client, async_client = self.clients_for(base_url)
+        return {"http_client": sync_client, "http_async_client": async_client}
+
+    def reset(self):
+        """配置重载：丢弃现有客户端，进行中的分析结束后再关闭"""
+        with self._lock:
+            retired = list(self._clients.values())
+            self._clients.clear()
+            self._retired.extend(retired)
+        if not retired:
+            return
+        logger.info(f"HTTP transport reset after config reload ({len(retired)} base URLs)")
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 没有运行中的事件循环（命令行工具）：不会有进行中的异步调用，直接关闭
+            for sync_client, _ in retired:
+                sync_client.close()
+            with self._lock:
+                self._retired = [c for c in self._retired if c not in retired]
+            return
+        delay = app_config.settings.ANALYSIS_DEADLINE + RETIRE_MARGIN
+        loop.call_later(delay, lambda: loop.create_task(self._close(retired)))
+
+    async def _close(self, clients: List[Tuple[httpx.Client, httpx.AsyncClient]]):
+        with self._lock:
+            clients = [c for c in clients if c in self._retired]
+            self._retired = [c for c in self._retired if c not in clients]
+        for sync_client, async_client in clients:
+            sync_client.close()
+            await async_client.aclose()
+
+    async def aclose(self):
+        """关闭全部连接（应用关闭时调用）"""
+        with self._lock:
+            clients = list(self._clients.values()) + self._retired
+            self._clients.clear()
+            self._retired = []
+        for sync_client, async_client in clients:
+            sync_client.close()
+            await async_client.aclose()
+
+    def snapshot(self) -> Dict[str, Any]:
+        settings = app_config.settings
+        with self._lock:
+            base_urls = list(self._clients)
+            retired = len(self._retired)
+        return {
+            "http2": settings.HTTP_HTTP2 and HTTP2_AVAILABLE,
+            "http2_available": HTTP2_AVAILABLE,
+            "max_connections": settings.HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.HTTP_MAX_KEEPALIVE,
+            "keepalive_expiry": settings.HTTP_KEEPALIVE_EXPIRY,
+            "base_urls": base_urls,
+            "retired": retired,
+        }
+
+
+# 全局连接池实例
+transport_registry = TransportRegistry()
+app_config.add_reload_listener(transport_registry.reset)
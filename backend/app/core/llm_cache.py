@@ -0,0 +1,284 @@
+"""
+LLM Cache - 磁盘持久化的 LLM 响应缓存
+回放历史窗口（to_end / date_range 使用相同K线、模型、温度和提示词）时，
+各智能体的提示词逐字节相同，直接返回缓存的响应，无需再次调用 LLM。
+
+- 键：sha256(供应商 + 模型参数串（含模型名、温度） + 完整消息序列化内容（图片以 base64 参与哈希）)
+- 存储：data/llm_cache/<前两位>/<哈希>.json，一个响应一个文件
+- 过期：超过 LLM_CACHE_TTL 秒的条目视为未命中并删除
+- 容量：总大小超过 LLM_CACHE_MAX_MB 时按最后写入时间淘汰最旧的条目
+- 绕过：analysis_context 中 use_llm_cache=False 时跳过读取（仍写入新结果）
+- 查询与写入只在 llm_scheduler 中进行（调用前查询、调用后写入）；ChatOpenAI 客户端本身 cache=False，
+  只通过 metadata 标明所属供应商，避免 BaseChatModel 对同一次未命中再查一遍
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from app.core import config as app_config
+from app.core.analysis_context import is_llm_cache_enabled
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+DEFAULT_CACHE_DIR = BASE_DIR / "data" / "llm_cache"
+
+# 淘汰时清理到容量上限的该比例，避免每次写入都触发淘汰
+EVICT_TARGET_RATIO = 0.9
+
+
+class DiskLLMCache(BaseCache):
+    """可直接传给 ChatOpenAI(cache=...) 的磁盘缓存"""
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, namespace: str = "",
+                 ttl_seconds: float = 7 * 24 * 3600, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "expired": 0, "evicted": 0}
+
+    # ---- 键与路径 ----
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        digest = hashlib.sha256()
+        for part in (self.namespace, llm_string, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    # ---- BaseCache 接口 ----
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if not is_llm_cache_enabled():
+            return None
+
+        path = self._path(self._key(prompt, llm_string))
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+
+        if self.ttl_seconds and time.time() - stat.st_mtime > self.ttl_seconds:
+            self._remove(path, stat.st_size)
+            self._count("expired")
+            self._count("misses")
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            generations = [loads(item) for item in entry["generations"]]
+        except Exception as e:
+            logger.warning(f"LLM cache entry unreadable, dropping {path.name}: {e}")
+            self._remove(path, stat.st_size)
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        path = self._path(self._key(prompt, llm_string))
+        payload = json.dumps({
+            "created": time.time(),
+            "namespace": self.namespace,
+            "llm_string": llm_string,
+            "generations": [dumps(gen) for gen in return_val],
+        }, ensure_ascii=False)
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            old_size = path.stat().st_size if path.exists() else 0
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write LLM cache entry: {e}")
+            return
+
+        with self._lock:
+            self.stats["writes"] += 1
+            if self._total_bytes is not None:
+                self._total_bytes += len(payload.encode("utf-8")) - old_size
+        self._evict_if_needed()
+
+    def clear(self, **kwargs: Any) -> None:
+        """删除全部缓存条目（所有命名空间共享同一目录）"""
+        removed = 0
+        for path in self._entries():
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._total_bytes = 0
+        logger.info(f"LLM cache cleared ({removed} entries)")
+
+    # ---- 容量管理 ----
+
+    def _entries(self) -> List[Path]:
+        if not self.cache_dir.exists():
+            return []
+        return list(self.cache_dir.glob("*/*.json"))
+
+    def _scan(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            if self._total_bytes <= self.max_bytes:
+                return
+
+            target = int(self.max_bytes * EVICT_TARGET_RATIO)
+            entries = sorted(self._scan())
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+                evicted += 1
+            self._total_bytes = total
+            self.stats["evicted"] += evicted
+        if evicted:
+            logger.info(f"LLM cache evicted {evicted} entries to stay under {self.max_bytes // (1024 * 1024)}MB")
+
+    def _remove(self, path: Path, size: int):
+        try:
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "namespace": self.namespace,
+                "ttl_seconds": self.ttl_seconds,
+                "max_bytes": self.max_bytes,
+                "total_bytes": self._total_bytes,
+                **self.stats,
+            }
+
+
+# 每个供应商一个缓存实例（共享目录，命名空间参与键计算）
+_caches: Dict[str, DiskLLMCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(provider: str) -> Optional[DiskLLMCache]:
+    """获取供应商对应的缓存实例，LLM_CACHE_ENABLED 关闭时返回 None"""
+    settings = app_config.settings
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+
+    with _caches_lock:
+        cache = _caches.get(provider)
+        if cache is None:
+            cache = DiskLLMCache(
+                cache_dir=Path(settings.LLM_CACHE_DIR) if settings.LLM_CACHE_DIR else DEFAULT_CACHE_DIR,
+                namespace=provider,
+                ttl_seconds=settings.LLM_CACHE_TTL,
+                max_bytes=int(settings.LLM_CACHE_MAX_MB * 1024 * 1024),
+            )
+            _caches[provider] = cache
+        return cache
+
+
+def reset_llm_caches():
+    """丢弃缓存实例（配置重载后按新配置重建），磁盘内容保留"""
+    with _caches_lock:
+        _caches.clear()
+
+
+# ChatOpenAI.metadata 中标明缓存所属供应商的键（metadata 和 cache 都不参与 llm_string，不影响缓存键）
+CACHE_PROVIDER_KEY = "llm_cache_provider"
+
+
+def llm_cache_metadata(provider: str) -> Dict[str, str]:
+    """创建客户端时传入的 metadata：ChatOpenAI(cache=False, metadata=llm_cache_metadata(provider))"""
+    return {CACHE_PROVIDER_KEY: provider}
+
+
+def _cache_key_parts(llm: Any, messages: Any) -> Optional[Tuple[DiskLLMCache, str, str]]:
+    """复现 BaseChatModel 计算缓存键的方式（prompt = dumps(消息列表)，llm_string = 模型参数串）"""
+    provider = (getattr(llm, "metadata", None) or {}).get(CACHE_PROVIDER_KEY)
+    cache = get_llm_cache(provider) if provider else None
+    if cache is None:
+        return None
+    prompt = dumps(llm._convert_input(messages).to_messages())
+    return cache, prompt, llm._get_llm_string()
+
+
+def lookup_cached_message(llm: Any, messages: Any) -> Optional[Any]:
+    """在调用调度器之前查缓存：命中时直接返回 AIMessage，不占用限流名额"""
+    parts = _cache_key_parts(llm, messages)
+    if parts is None:
+        return None
+    cache, prompt, llm_string = parts
+    generations = cache.lookup(prompt, llm_string)
+    if not generations:
+        return None
+    return generations[0].message
+
+
+def store_message(llm: Any, messages: Any, message: Any):
+    """调用结束后写入缓存（流式与非流式调用都由调度器写入）"""
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration
+
+    parts = _cache_key_parts(llm, messages)
+    if parts is None:
+        return
+    cache, prompt, llm_string = parts
+    final = AIMessage(
+        content=message.content,
+        response_metadata=getattr(message, "response_metadata", {}) or {},
+    )
+    cache.update(prompt, llm_string, [ChatGeneration(message=final)])
+
+
+def snapshot() -> List[Dict[str, Any]]:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [cache.snapshot() for cache in caches]
+
+
+app_config.add_reload_listener(reset_llm_caches)
@@ -0,0 +1,262 @@
+"""
+LLM Hedging - 带截止时间的对冲调用与供应商故障转移
+- 每次调用有单次超时，并受整次分析的截止时间约束（analysis_context）
+- 主模型超过其历史延迟分位数仍未返回时，向备用供应商/模型发出对冲请求，先返回者胜出
+- 主模型报错时立即切换到备用模型（故障转移）
+- 记录每次调用由哪条路径胜出，供 /system/llm-hedging 查看
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from app.core.analysis_context import get_result_id
+
+logger = logging.getLogger(__name__)
+
+# 延迟样本不足时使用的固定对冲等待（秒）
+DEFAULT_HEDGE_DELAY = 30.0
+# 开始按分位数计算对冲等待所需的最少样本数
+MIN_LATENCY_SAMPLES = 20
+# 每个模型保留的最近延迟样本数
+LATENCY_WINDOW = 200
+
+PATH_PRIMARY = "primary"      # 主模型在对冲前或对冲后率先返回
+PATH_HEDGE = "hedge"          # 对冲请求率先返回
+PATH_FAILOVER = "failover"    # 主模型报错，由备用模型完成
+PATH_TIMEOUT = "timeout"      # 超过截止时间，全部放弃
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """单次调用超时或整次分析的截止时间已到"""
+
+
+def _model_key(llm: Any) -> Tuple[str, str]:
+    base_url = getattr(llm, "openai_api_base", None) or ""
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or "unknown"
+    return str(base_url), str(model)
+
+
+class LatencyTracker:
+    """按 (base_url, model) 记录最近的成功调用耗时"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: Tuple[str, str], seconds: float):
+        with self._lock:
+            samples = self._samples.setdefault(key, deque(maxlen=self.window))
+            samples.append(seconds)
+
+    def percentile(self, key: Tuple[str, str], pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * pct))
+        return samples[index]
+
+    def snapshot(self) -> list:
+        with self._lock:
+            items = [(key, sorted(samples)) for key, samples in self._samples.items()]
+        result = []
+        for (base_url, model), samples in items:
+            if not samples:
+                continue
+            result.append({
+                "base_url": base_url,
+                "model": model,
+                "samples": len(samples),
+                "p50": round(samples[len(samples) // 2], 2),
+                "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+                "p99": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+            })
+        return result
+
+
+class HedgeTelemetry:
+    """统计各路径胜出次数，并保留最近的调用记录"""
+
+    def __init__(self, history: int = 200):
+        self.counts: Dict[str, int] = {
+            PATH_PRIMARY: 0, PATH_HEDGE: 0, PATH_FAILOVER: 0, PATH_TIMEOUT: 0,
+        }
+        self.hedges_sent = 0
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def record(self, path: str, primary_key: Tuple[str, str], winner_key: Optional[Tuple[str, str]],
+               elapsed: float, hedged: bool, agent: Optional[str] = None):
+        with self._lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+            if hedged:
+                self.hedges_sent += 1
+            self.recent.append({
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "result_id": get_result_id(),
+                "agent": agent,
+                "path": path,
+                "primary_model": primary_key[1],
+                "winner_model": winner_key[1] if winner_key else None,
+                "elapsed": round(elapsed, 2),
+                "hedged": hedged,
+            })
+
+    def snapshot(self, recent: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counts": dict(self.counts),
+                "hedges_sent": self.hedges_sent,
+                "recent": list(self.recent)[-recent:],
+            }
+
+
+# 主模型实例 -> 备用模型实例：按对象 id 登记并只持有主模型的弱引用（pydantic 模型不可哈希，不能用 WeakKeyDictionary），
+# 主模型随引擎被回收后登记自动失效，仍在使用旧引擎的分析不受引擎池淘汰影响
+_fallbacks: Dict[int, Tuple[weakref.ref, Any]] = {}
+_fallbacks_lock = threading.Lock()
+# 已回收主模型的登记，弱引用回调可能在任意时刻（含持锁时）触发，只记下 id，下次访问时清理
+_collected: Deque[Tuple[int, weakref.ref]] = deque()
+
+
+def _purge_collected():
+    while _collected:
+        key, ref = _collected.popleft()
+        entry = _fallbacks.get(key)
+        if entry is not None and entry[0] is ref:
+            _fallbacks.pop(key)
+
+
+def register_fallback(primary_llm: Any, fallback_llm: Any):
+    """为主模型登记备用模型（由 TradingEngine 在创建客户端时调用）"""
+    key = id(primary_llm)
+    ref = weakref.ref(primary_llm, lambda r: _collected.append((key, r)))
+    with _fallbacks_lock:
+        _purge_collected()
+        _fallbacks[key] = (ref, fallback_llm)
+
+
+def get_fallback(primary_llm: Any) -> Optional[Any]:
+    with _fallbacks_lock:
+        _purge_collected()
+        entry = _fallbacks.get(id(primary_llm))
+    if entry and entry[0]() is primary_llm:
+        return entry[1]
+    return None
+
+
+def hedge_delay_for(llm: Any) -> float:
+    """主模型发出后等待多久再发对冲请求：历史延迟的分位数，样本不足时用固定值"""
+    from app.core import config as app_config
+    settings = app_config.settings
+    observed = latency_tracker.percentile(_model_key(llm), settings.LLM_HEDGE_PERCENTILE)
+    if observed is None:
+        return settings.LLM_HEDGE_DEFAULT_DELAY
+    return max(settings.LLM_HEDGE_MIN_DELAY, observed)
+
+
+async def hedged_call(
+    llm: Any,
+    call: Callable[[Any, bool], Awaitable[Any]],
+    timeout: float,
+    agent: Optional[str] = None,
+) -> Tuple[Any, str]:
+    """
+    以对冲方式执行一次 LLM 调用
+
+    Args:
+        llm: 主模型
+        call: call(target_llm, is_hedge) -> 协程，执行一次实际调用
+        timeout: 本次调用允许的最长时间（秒）
+        agent: 调用方智能体名称（仅用于遥测）
+
+    Returns:
+        (response, path)：响应及胜出路径（primary / hedge / failover）
+    """
+    if timeout <= 0:
+        telemetry.record(PATH_TIMEOUT, _model_key(llm), None, 0.0, False, agent)
+        raise LLMDeadlineExceeded("分析截止时间已到，放弃 LLM 调用")
+
+    fallback = get_fallback(llm)
+    started = time.monotonic()
+    deadline = started + timeout
+    # 任务 -> (路径, 目标模型, 发出时间)；延迟样本按各自的发出时间计，不含对冲等待
+    tasks: Dict[asyncio.Future, Tuple[str, Any, float]] = {
+        asyncio.ensure_future(call(llm, False)): (PATH_PRIMARY, llm, started),
+    }
+    hedge_at = started + hedge_delay_for(llm) if fallback is not None else None
+    primary_error: Optional[BaseException] = None
+
+    def launch_fallback(path: str):
+        logger.info(f"LLM {path}: {_model_key(llm)[1]} -> {_model_key(fallback)[1]}")
+        tasks[asyncio.ensure_future(call(fallback, True))] = (path, fallback, time.monotonic())
+
+    try:
+        pending = set(tasks)
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wait_until = deadline
+            if hedge_at is not None and len(tasks) == 1:
+                wait_until = min(wait_until, hedge_at)
+
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0.0, wait_until - now), return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in done:
+                path, target, launched = tasks[task]
+                error = task.exception()
+                if error is None:
+                    finished = time.monotonic()
+                    latency_tracker.record(_model_key(target), finished - launched)
+                    # 遥测记录端到端耗时（含对冲等待）
+                    elapsed = finished - started
+                    telemetry.record(path, _model_key(llm), _model_key(target), elapsed, len(tasks) > 1, agent)
+                    return task.result(), path
+                if path == PATH_PRIMARY:
+                    primary_error = error
+                    # 主模型失败：未发对冲时立即故障转移
+                    if fallback is not None and len(tasks) == 1:
+                        launch_fallback(PATH_FAILOVER)
+                        pending = {t for t in tasks if not t.done()}
+                elif primary_error is None and not pending:
+                    primary_error = error
+
+            # 到达对冲时间点且主模型仍未返回
+            if (hedge_at is not None and len(tasks) == 1 and pending
+                    and time.monotonic() >= hedge_at):
+                launch_fallback(PATH_HEDGE)
+                pending = {t for t in tasks if not t.done()}
+
+        if not pending and primary_error is not None:
+            raise primary_error
+
+        elapsed = time.monotonic() - started
+        telemetry.record(PATH_TIMEOUT, _model_key(llm), None, elapsed, len(tasks) > 1, agent)
+        raise LLMDeadlineExceeded(f"LLM 调用超时 ({elapsed:.0f}s): {_model_key(llm)[1]}")
+    finally:
+        leftovers = [t for t in tasks if not t.done()]
+        for task in leftovers:
+            task.cancel()
+        if leftovers:
+            await asyncio.gather(*leftovers, return_exceptions=True)
+
+
+def snapshot() -> Dict[str, Any]:
+    return {
+        "latency": latency_tracker.snapshot(),
+        "telemetry": telemetry.snapshot(),
+    }
+
+
+# 全局实例
+latency_tracker = LatencyTracker()
+telemetry = HedgeTelemetry()
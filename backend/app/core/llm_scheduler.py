@@ -0,0 +1,391 @@
+"""
+LLM Scheduler - 按供应商/模型自适应调度 LLM 调用
+替代原先 Indicator/Pattern/Trend 智能体固定错开 0/5/8 秒启动的做法：
+每个 (base_url, model) 维护请求数/分钟、Token 数/分钟两个令牌桶和并发上限，
+有余量时立即放行，没有余量时才排队；遇到 429 时按指数退避暂停该模型的新请求。
+异步调用另经 llm_hedging 施加截止时间，并在主模型过慢或报错时切换到备用模型。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langchain_core.messages import AIMessageChunk
+from openai import RateLimitError
+
+from app.core import config as app_config
+from app.core.analysis_context import is_streaming, remaining_time
+from app.core.llm_cache import lookup_cached_message, store_message
+from app.core.llm_hedging import LLMDeadlineExceeded, PATH_PRIMARY, hedged_call
+from app.core.llm_usage import usage_ledger
+from app.core.progress import publish_agent_stream
+from app.core.providers import PROVIDERS
+
+logger = logging.getLogger(__name__)
+
+# 供应商未配置 rate_limits 时使用的默认限额
+DEFAULT_RATE_LIMITS = {
+    "rpm": 30,          # 每分钟请求数
+    "tpm": 200_000,     # 每分钟 Token 数
+    "concurrency": 3,   # 同时在途请求数
+}
+
+# 429 退避参数（秒）
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+
+# 单张图片按固定 Token 估算
+IMAGE_TOKEN_ESTIMATE = 1000
+# 预留的输出 Token 估算
+COMPLETION_TOKEN_ESTIMATE = 1500
+
+# 流式输出时合并片段的推送间隔（秒），避免每个 Token 一条 WebSocket 消息
+STREAM_FLUSH_INTERVAL = 0.1
+
+
+class TokenBucket:
+    """经典令牌桶：容量 capacity，每秒补充 refill_rate"""
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """拿到 amount 个令牌还需等待的秒数（0 表示现在就够）"""
+        self._refill(now)
+        # 单次请求超过桶容量时按满桶处理，避免永远等不到
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """按实际用量修正（delta > 0 表示多扣，< 0 表示退还）"""
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class ModelLimiter:
+    """单个 (base_url, model) 的限流状态，线程安全，可同时服务同步和异步调用"""
+
+    def __init__(self, key: Tuple[str, str], rpm: int, tpm: int, concurrency: int):
+        self.key = key
+        self.concurrency = max(1, int(concurrency))
+        self.request_bucket = TokenBucket(rpm, rpm / 60.0)
+        self.token_bucket = TokenBucket(tpm, tpm / 60.0)
+        self.in_flight = 0
+        self.backoff_until = 0.0
+        self.consecutive_429 = 0
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "queued": 0, "rate_limited": 0, "wait_seconds": 0.0}
+
+    def _try_acquire(self, tokens: int) -> float:
+        """尝试占用一个调用名额；成功返回 0，否则返回建议等待秒数"""
+        with self._lock:
+            now = time.monotonic()
+            waits = []
+            if now < self.backoff_until:
+                waits.append(self.backoff_until - now)
+            if self.in_flight >= self.concurrency:
+                waits.append(0.2)
+            waits.append(self.request_bucket.wait_time(1, now))
+            waits.append(self.token_bucket.wait_time(tokens, now))
+
+            wait = max(waits)
+            if wait > 0:
+                return wait
+
+            self.request_bucket.take(1)
+            self.token_bucket.take(tokens)
+            self.in_flight += 1
+            self.stats["calls"] += 1
+            return 0.0
+
+    async def acquire_async(self, tokens: int) -> float:
+        """异步获取调用名额（不占用线程），返回排队秒数"""
+        started = time.monotonic()
+        queued = False
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                break
+            queued = True
+            await asyncio.sleep(min(wait, 1.0))
+        return self._record_wait(started, queued)
+
+    def _record_wait(self, started: float, queued: bool) -> float:
+        waited = time.monotonic() - started
+        with self._lock:
+            if queued:
+                self.stats["queued"] += 1
+            self.stats["wait_seconds"] += waited
+        if waited > 1:
+            logger.info(f"LLM 调用排队 {waited:.1f}s: {self.key[1]}")
+        return waited
+
+    def release(self, estimated_tokens: int, actual_tokens: Optional[int] = None, rate_limited: bool = False):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if actual_tokens is not None:
+                self.token_bucket.adjust(actual_tokens - estimated_tokens)
+
+            if rate_limited:
+                self.consecutive_429 += 1
+                self.stats["rate_limited"] += 1
+                backoff = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (self.consecutive_429 - 1)))
+                self.backoff_until = max(self.backoff_until, time.monotonic() + backoff)
+                logger.warning(f"LLM 429 限流: {self.key[1]}，暂停新请求 {backoff:.0f}s")
+            else:
+                self.consecutive_429 = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "base_url": self.key[0],
+                "model": self.key[1],
+                "in_flight": self.in_flight,
+                "concurrency": self.concurrency,
+                "backoff_remaining": max(0.0, round(self.backoff_until - time.monotonic(), 2)),
+                **self.stats,
+            }
+
+
+def _limits_for(base_url: str) -> Dict[str, int]:
+    for cfg in PROVIDERS.values():
+        if cfg.get("base_url") == base_url:
+            return {**DEFAULT_RATE_LIMITS, **cfg.get("rate_limits", {})}
+    return dict(DEFAULT_RATE_LIMITS)
+
+
+class LLMScheduler:
+    """所有智能体共享的调度器：按 (base_url, model) 懒加载 ModelLimiter"""
+
+    def __init__(self):
+        self._limiters: Dict[Tuple[str, str], ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(llm: Any) -> Tuple[str, str]:
+        base_url = getattr(llm, "openai_api_base", None) or ""
+        model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or "unknown"
+        return str(base_url), str(model)
+
+    def limiter_for(self, llm: Any) -> ModelLimiter:
+        key = self.key_for(llm)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = ModelLimiter(key, **_limits_for(key[0]))
+                self._limiters[key] = limiter
+            return limiter
+
+    def snapshot(self) -> list:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return [limiter.snapshot() for limiter in limiters]
+
+
+def estimate_tokens(messages: Any) -> int:
+    """粗略估算一次调用的 Token 数（中文约 1 字 1 Token，英文约 4 字符 1 Token，取折中）"""
+    def content_tokens(content: Any) -> int:
+        if isinstance(content, str):
+            return len(content) // 2
+        if isinstance(content, list):
+            total = 0
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "image_url":
+                    total += IMAGE_TOKEN_ESTIMATE
+                elif isinstance(part, dict):
+                    total += len(str(part.get("text", ""))) // 2
+                else:
+                    total += len(str(part)) // 2
+            return total
+        return len(str(content)) // 2
+
+    if isinstance(messages, (str, dict)):
+        messages = [messages]
+    prompt_tokens = sum(content_tokens(getattr(m, "content", m)) for m in messages)
+    return prompt_tokens + COMPLETION_TOKEN_ESTIMATE
+
+
+def _actual_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage and usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    if token_usage.get("total_tokens"):
+        return int(token_usage["total_tokens"])
+    return None
+
+
+async def _astream_collect(llm: Any, messages: Any, stream_agent: str,
+                           on_delta: Optional[Callable[[str], None]] = None,
+                           on_reset: Optional[Callable[[], None]] = None,
+                           timing: Optional[Dict[str, float]] = None):
+    """流式调用 LLM：边接收边推送给前端，返回拼接后的完整消息（timing["first_token"] 记录首个片段到达时间）"""
+    aggregate = None
+    pending = ""
+    seq = 0
+    last_flush = time.monotonic()
+    try:
+        async for chunk in llm.astream(messages):
+            aggregate = chunk if aggregate is None else aggregate + chunk
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            if not text:
+                continue
+            if timing is not None and "first_token" not in timing:
+                timing["first_token"] = time.monotonic()
+            if on_delta:
+                on_delta(text)
+            pending += text
+            now = time.monotonic()
+            if now - last_flush >= STREAM_FLUSH_INTERVAL:
+                publish_agent_stream(stream_agent, pending, seq)
+                seq += 1
+                pending = ""
+                last_flush = now
+    except BaseException:
+        # 本次输出作废（将重试或放弃），通知前端清空已显示的片段
+        publish_agent_stream(stream_agent, reset=True)
+        if on_reset:
+            on_reset()
+        raise
+
+    publish_agent_stream(stream_agent, pending, seq, done=True)
+    return aggregate if aggregate is not None else AIMessageChunk(content="")
+
+
+async def _acall_once(llm: Any, messages: Any, estimated: int, stream_agent: Optional[str],
+                     on_delta: Optional[Callable[[str], None]], on_reset: Optional[Callable[[], None]],
+                     agent: Optional[str] = None, hedge: bool = False):
+    """经调度器执行一次异步调用（stream_agent 为空时不流式），结束后记录用量"""
+    limiter = llm_scheduler.limiter_for(llm)
+    queue_wait = await limiter.acquire_async(estimated)
+    started = time.monotonic()
+    timing: Dict[str, float] = {}
+    try:
+        if stream_agent:
+            response = await _astream_collect(llm, messages, stream_agent, on_delta, on_reset, timing)
+        else:
+            response = await llm.ainvoke(messages)
+    except RateLimitError as e:
+        limiter.release(estimated, rate_limited=True)
+        usage_ledger.record(llm, messages, agent=agent, queue_wait=queue_wait,
+                            latency=time.monotonic() - started, hedge=hedge, error=e)
+        raise
+    except Exception as e:
+        limiter.release(estimated)
+        usage_ledger.record(llm, messages, agent=agent, queue_wait=queue_wait,
+                            latency=time.monotonic() - started, hedge=hedge, error=e)
+        raise
+    except BaseException:
+        # 取消（对冲落败或截止时间到）不计入用量
+        limiter.release(estimated)
+        raise
+    limiter.release(estimated, _actual_tokens(response))
+    usage_ledger.record(
+        llm, messages, response, agent=agent, queue_wait=queue_wait,
+        ttft=timing["first_token"] - started if "first_token" in timing else None,
+        latency=time.monotonic() - started,
+        prompt_estimate=estimated - COMPLETION_TOKEN_ESTIMATE, hedge=hedge,
+    )
+    # 客户端不带缓存（cache=False），查询在 ainvoke_llm 入口完成，这里写入新结果；写入失败不影响本次调用
+    try:
+        await asyncio.to_thread(store_message, llm, messages, response)
+    except Exception as e:
+        logger.warning(f"LLM cache write failed: {e}")
+    return response
+
+
+def _call_timeout() -> float:
+    """单次调用超时：配置的单次超时与分析剩余时间取小"""
+    timeout = app_config.settings.LLM_CALL_TIMEOUT
+    remaining = remaining_time()
+    return timeout if remaining is None else min(timeout, remaining)
+
+
+async def ainvoke_llm(llm: Any, messages: Any, retries: int = 3, wait_sec: float = 4,
+                      stream_agent: Optional[str] = None,
+                      on_delta: Optional[Callable[[str], None]] = None,
+                      on_reset: Optional[Callable[[], None]] = None):
+    """
+    通过调度器调用 LLM（所有智能体共用的唯一调用入口）
+
+    当前请求开启了流式模式（analysis_context.is_streaming）且指定了 stream_agent 时，
+    改用 llm.astream 逐段推送到 /ws/progress，on_delta 同时收到每段新增文本，
+    某次尝试中途失败时调用 on_reset。
+
+    调用前先查磁盘缓存（llm_cache），命中则直接返回。
+    每次尝试都经过 llm_hedging.hedged_call：受单次超时和分析截止时间约束，
+    主模型过慢时向备用模型发出对冲请求（对冲请求不流式，胜出后整段推送）。
+    """
+    streaming = bool(stream_agent) and is_streaming()
+
+    # 先查磁盘缓存：命中时不占用限流名额，也不发对冲请求
+    try:
+        cached = await asyncio.to_thread(lookup_cached_message, llm, messages)
+    except Exception as e:
+        logger.warning(f"LLM cache lookup failed: {e}")
+        cached = None
+    if cached is not None:
+        usage_ledger.record(llm, messages, cached, agent=stream_agent, cached=True)
+        if streaming:
+            text = cached.content if isinstance(cached.content, str) else ""
+            if on_delta:
+                on_delta(text)
+            publish_agent_stream(stream_agent, text, 0, done=True)
+        return cached
+
+    estimated = estimate_tokens(messages)
+
+    async def call(target: Any, is_hedge: bool):
+        return await _acall_once(
+            target, messages, estimated,
+            stream_agent if streaming and not is_hedge else None,
+            on_delta, on_reset, agent=stream_agent, hedge=is_hedge,
+        )
+
+    last_error = None
+    for attempt in range(retries):
+        try:
+            response, path = await hedged_call(llm, call, _call_timeout(), agent=stream_agent)
+        except LLMDeadlineExceeded:
+            raise
+        except RateLimitError as e:
+            last_error = e
+            print(f"API限速，由调度器退避后重试 (尝试 {attempt + 1}/{retries})...")
+            continue
+        except Exception as e:
+            last_error = e
+            remaining = remaining_time()
+            if remaining is not None and remaining <= wait_sec:
+                raise LLMDeadlineExceeded(f"分析截止时间已到，放弃重试: {e}")
+            print(f"LLM调用错误: {e}，{wait_sec}秒后重试 (尝试 {attempt + 1}/{retries})...")
+            if attempt < retries - 1:
+                await asyncio.sleep(wait_sec)
+            continue
+
+        if streaming and path != PATH_PRIMARY:
+            # 备用模型的结果没有流式推送过，整段补发
+            text = response.content if isinstance(response.content, str) else ""
+            if on_delta:
+                on_delta(text)
+            publish_agent_stream(stream_agent, text, 0, done=True)
+        return response
+    raise RuntimeError(f"超过最大重试次数: {last_error}")
+
+
+# 全局调度器实例
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,216 @@
+"""
+LLM Usage - 每次 LLM 调用的用量与延迟记录
+调度器在每次实际调用（含对冲请求、缓存命中）结束时记录：
+供应商、模型、提示词/输出 Token、图片数量与字节数、排队等待、首 Token 延迟、总耗时，
+并通过 analysis_context 关联到 result_id。
+- summary_for(result_id)：单次分析的汇总（写入分析结果和历史记录）
+- snapshot()：最近调用的滚动分位数（/system/llm-usage）
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.core.analysis_context import get_result_id
+from app.core.providers import PROVIDERS
+
+# 保留明细的最近分析数
+RESULT_HISTORY = 200
+# 计算滚动分位数的最近调用数
+ROLLING_WINDOW = 2000
+
+
+def _provider_name(base_url: str) -> str:
+    for name, cfg in PROVIDERS.items():
+        if cfg.get("base_url") == base_url:
+            return name
+    return base_url or "unknown"
+
+
+def count_images(messages: Any) -> Tuple[int, int]:
+    """统计消息中的图片数量和字节数（data URL 按 base64 长度换算）"""
+    if not isinstance(messages, (list, tuple)):
+        return 0, 0
+    count = 0
+    size = 0
+    for message in messages:
+        content = getattr(message, "content", None)
+        if not isinstance(content, list):
+            continue
+        for part in content:
+            if not isinstance(part, dict) or part.get("type") != "image_url":
+                continue
+            count += 1
+            image_url = part.get("image_url")
+            url = image_url.get("url", "") if isinstance(image_url, dict) else str(image_url or "")
+            if url.startswith("data:") and "," in url:
+                size += len(url.split(",", 1)[1]) * 3 // 4
+    return count, size
+
+
+def _token_counts(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    """从响应中取 (提示词 Token, 输出 Token)，供应商未返回用量时为 None"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("input_tokens") is not None:
+        return int(usage["input_tokens"]), int(usage.get("output_tokens") or 0)
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    if token_usage.get("prompt_tokens") is not None:
+        return int(token_usage["prompt_tokens"]), int(token_usage.get("completion_tokens") or 0)
+    return None, None
+
+
+def _percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    values = sorted(values)
+    last = len(values) - 1
+    return {
+        "p50": round(values[last // 2], 3),
+        "p95": round(values[min(last, int(len(values) * 0.95))], 3),
+        "p99": round(values[min(last, int(len(values) * 0.99))], 3),
+    }
+
+
+class UsageLedger:
+    """按 result_id 保存调用明细，并保留最近调用用于滚动分位数"""
+
+    def __init__(self, result_history: int = RESULT_HISTORY, window: int = ROLLING_WINDOW):
+        self.result_history = result_history
+        self._by_result: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        llm: Any,
+        messages: Any,
+        response: Any = None,
+        agent: Optional[str] = None,
+        queue_wait: float = 0.0,
+        ttft: Optional[float] = None,
+        latency: float = 0.0,
+        prompt_estimate: Optional[int] = None,
+        hedge: bool = False,
+        cached: bool = False,
+        error: Optional[BaseException] = None,
+    ) -> Dict[str, Any]:
+        """
+        记录一次调用
+
+        Args:
+            prompt_estimate: 调度器的提示词 Token 估算，供应商未返回用量时使用
+            hedge: 是否为对冲/故障转移请求
+            cached: 是否为磁盘缓存命中（不产生 Token 消耗）
+            error: 调用失败时的异常
+        """
+        base_url = str(getattr(llm, "openai_api_base", None) or "")
+        images, image_bytes = count_images(messages)
+
+        prompt_tokens = completion_tokens = None
+        estimated = False
+        if cached:
+            prompt_tokens = completion_tokens = 0
+        elif response is not None:
+            prompt_tokens, completion_tokens = _token_counts(response)
+            if prompt_tokens is None:
+                # 流式调用通常不返回用量，按估算记录并标记
+                content = response.content if isinstance(response.content, str) else ""
+                prompt_tokens = prompt_estimate or 0
+                completion_tokens = len(content) // 2
+                estimated = True
+
+        entry = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "result_id": get_result_id(),
+            "agent": agent,
+            "provider": _provider_name(base_url),
+            "model": str(getattr(llm, "model_name", None) or getattr(llm, "model", None) or "unknown"),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_estimated": estimated,
+            "images": images,
+            "image_bytes": image_bytes,
+            "queue_wait": round(queue_wait, 3),
+            "ttft": round(ttft, 3) if ttft is not None else None,
+            "latency": round(latency, 3),
+            "hedge": hedge,
+            "cached": cached,
+            "error": f"{type(error).__name__}: {error}" if error is not None else None,
+        }
+
+        with self._lock:
+            self._recent.append(entry)
+            result_id = entry["result_id"]
+            if result_id:
+                records = self._by_result.get(result_id)
+                if records is None:
+                    records = self._by_result[result_id] = []
+                    while len(self._by_result) > self.result_history:
+                        self._by_result.popitem(last=False)
+                records.append(entry)
+        return entry
+
+    @staticmethod
+    def _totals(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "calls": len(records),
+            "errors": sum(1 for r in records if r["error"]),
+            "cached_calls": sum(1 for r in records if r["cached"]),
+            "hedge_calls": sum(1 for r in records if r["hedge"]),
+            "prompt_tokens": sum(r["prompt_tokens"] or 0 for r in records),
+            "completion_tokens": sum(r["completion_tokens"] or 0 for r in records),
+            "images": sum(r["images"] for r in records),
+            "image_bytes": sum(r["image_bytes"] for r in records),
+            "queue_wait_seconds": round(sum(r["queue_wait"] for r in records), 3),
+            "latency_seconds": round(sum(r["latency"] for r in records), 3),
+        }
+
+    def summary_for(self, result_id: Optional[str]) -> Dict[str, Any]:
+        """单次分析的用量汇总：总计 + 按智能体细分 + 调用明细"""
+        with self._lock:
+            records = list(self._by_result.get(result_id, ())) if result_id else []
+
+        by_agent: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            by_agent.setdefault(record["agent"] or "unknown", []).append(record)
+        return {
+            **self._totals(records),
+            "by_agent": {agent: self._totals(items) for agent, items in by_agent.items()},
+            "calls_detail": [{k: v for k, v in r.items() if k != "result_id"} for r in records],
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """最近调用按 (供应商, 模型) 和智能体汇总的滚动分位数"""
+        with self._lock:
+            recent = list(self._recent)
+
+        def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+            live = [r for r in records if not r["cached"] and not r["error"]]
+            return {
+                **self._totals(records),
+                "latency": _percentiles([r["latency"] for r in live]),
+                "ttft": _percentiles([r["ttft"] for r in live if r["ttft"] is not None]),
+                "queue_wait": _percentiles([r["queue_wait"] for r in live]),
+                "prompt_tokens_pct": _percentiles([r["prompt_tokens"] for r in live]),
+                "completion_tokens_pct": _percentiles([r["completion_tokens"] for r in live]),
+            }
+
+        by_model: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        by_agent: Dict[str, List[Dict[str, Any]]] = {}
+        for record in recent:
+            by_model.setdefault((record["provider"], record["model"]), []).append(record)
+            by_agent.setdefault(record["agent"] or "unknown", []).append(record)
+
+        return {
+            "window": len(recent),
+            "models": [
+                {"provider": provider, "model": model, **summarize(records)}
+                for (provider, model), records in by_model.items()
+            ],
+            "agents": {agent: summarize(records) for agent, records in by_agent.items()},
+        }
+
+
+# 全局用量账本
+usage_ledger = UsageLedger()
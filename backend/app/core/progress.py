@@ -1,63 +1,124 @@
 import logging
 import asyncio
+from typing import Any, Dict
+
+from app.core.analysis_context import get_result_id, get_session_id
 
 logger = logging.getLogger(__name__)
 
 # Simple in-memory progress tracker for now
 progress_store = {}
 
-def update_agent_progress(agent_name: str, progress_within_agent: int = 0, status: str = "", session_id: str = "default"):
-    """
-    Update progress for a specific agent.
-    """
-    logger.info(f"[Progress] {agent_name}: {progress_within_agent}% - {status}")
-    
-    # Broadcast via WebSocket
+def _resolve_session(session_id: str) -> str:
+    """未显式传入 session_id 时使用当前分析请求绑定的 session_id"""
+    if session_id == "default":
+        return get_session_id() or session_id
+    return session_id
+
+
+def _broadcast(msg: Dict[str, Any]):
+    """在事件循环中异步广播，没有运行中的事件循环时直接丢弃"""
     try:
         from app.api.v1.endpoints.ws import manager
-        msg = {
-            "type": "agent_progress",
-            "agent": agent_name,
-            "progress": progress_within_agent,
-            "status": status,
-            "session_id": session_id
-        }
-        # Since this might be called from sync code, we need to handle async
-        # For now, just fire and forget if possible, or use a background task approach if in FastAPI context
-        # But here we are deep in logic. 
-        # Ideally, we should use an async event loop or a queue.
-        # For simplicity in this refactor, we might skip actual async send if running synchronously.
-        # But let's try to get the running loop.
         try:
             loop = asyncio.get_event_loop()
             if loop.is_running():
                 loop.create_task(manager.broadcast(msg))
         except RuntimeError:
-            pass # No loop running
-            
+            pass
     except ImportError:
         pass
 
+
+def update_agent_progress(agent_name: str, progress_within_agent: int = 0, status: str = "", session_id: str = "default"):
+    """
+    Update progress for a specific agent.
+    """
+    logger.info(f"[Progress] {agent_name}: {progress_within_agent}% - {status}")
+
+    # Broadcast via WebSocket
+    _broadcast({
+        "type": "agent_progress",
+        "agent": agent_name,
+        "progress": progress_within_agent,
+        "status": status,
+        "session_id": _resolve_session(session_id),
+        "result_id": get_result_id(),
+    })
+
 def update_analysis_progress(stage: str, progress: int, status: str, session_id: str = "default"):
     """
     Update overall analysis progress.
     """
     logger.info(f"[Analysis Progress] {stage}: {progress}% - {status}")
-    
-    try:
-        from app.api.v1.endpoints.ws import manager
-        msg = {
-            "type": "analysis_progress",
-            "stage": stage,
-            "progress": progress,
-            "status": status,
-            "session_id": session_id
-        }
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                loop.create_task(manager.broadcast(msg))
-        except RuntimeError:
-            pass
-    except ImportError:
-        pass
+
+    _broadcast({
+        "type": "analysis_progress",
+        "stage": stage,
+        "progress": progress,
+        "status": status,
+        "session_id": _resolve_session(session_id),
+        "result_id": get_result_id(),
+    })
+
+
+def publish_agent_stream(agent_name: str, delta: str = "", seq: int = 0, done: bool = False, reset: bool = False):
+    """
+    推送智能体的流式输出片段（按 agent + result_id 标记，前端按顺序拼接）
+
+    Args:
+        delta: 新增文本
+        seq: 片段序号（从 0 开始），前端据此保证拼接顺序
+        done: 该智能体输出结束
+        reset: 调用失败重试，前端应清空已收到的文本
+    """
+    _broadcast({
+        "type": "agent_stream",
+        "agent": agent_name,
+        "delta": delta,
+        "seq": seq,
+        "done": done,
+        "reset": reset,
+        "session_id": get_session_id() or "default",
+        "result_id": get_result_id(),
+    })
+
+
+def publish_decision_fields(fields: Dict[str, Any]):
+    """推送决策 JSON 中已经完整输出的字段（action / stop_loss / take_profit 等）"""
+    _broadcast({
+        "type": "decision_fields",
+        "fields": fields,
+        "session_id": get_session_id() or "default",
+        "result_id": get_result_id(),
+    })
+
+
+def publish_late_report(result_id: str, node_name: str, report_keys: list):
+    """推送超时分析师的报告已补写到历史记录"""
+    _broadcast({
+        "type": "late_report",
+        "result_id": result_id,
+        "agent": node_name,
+        "report_keys": report_keys,
+    })
+
+
+def publish_screener_event(event: str, scan_id: str, **payload: Any):
+    """推送全市场筛选的进度与结果（started / fetched / ranked / enqueued / completed / failed）"""
+    _broadcast({
+        "type": "screener",
+        "event": event,
+        "scan_id": scan_id,
+        **payload,
+    })
+
+
+def publish_watch_event(event: str, rule_id: str, **payload: Any):
+    """推送定时分析的执行情况（scheduled / skipped / completed / failed）"""
+    _broadcast({
+        "type": "watch",
+        "event": event,
+        "rule_id": rule_id,
+        **payload,
+    })
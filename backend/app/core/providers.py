@@ -5,6 +5,10 @@ PROVIDERS = {
         "name": "ModelScope",
         "base_url": "https://api-inference.modelscope.cn/v1",
         "api_key_env": "MODELSCOPE_API_KEY",
+        # 调度器限额：每分钟请求数 / 每分钟 Token 数 / 并发上限
+        "rate_limits": {"rpm": 20, "tpm": 200000, "concurrency": 2},
+        # 指标/趋势提示词的数据 Token 预算（未配置时使用 PROMPT_TOKEN_BUDGET）
+        "prompt_token_budget": 4000,
         "agent_models": [
             "Qwen/Qwen3-Next-80B-A3B-Instruct",
             "Qwen/Qwen3-235B-A22B-Instruct",
@@ -18,6 +22,7 @@ PROVIDERS = {
         "name": "DeepSeek",
         "base_url": "https://api.deepseek.com/v1",
         "api_key_env": "DEEPSEEK_API_KEY",
+        "rate_limits": {"rpm": 60, "tpm": 500000, "concurrency": 8},
         "agent_models": [
             "deepseek-ai/DeepSeek-V3.2",
             "deepseek-ai/DeepSeek-V3.2-Exp",
@@ -32,6 +37,7 @@ PROVIDERS = {
         "name": "Iflow",
         "base_url": "https://apis.iflow.cn/v1",
         "api_key_env": "IFLOW_API_KEY",
+        "rate_limits": {"rpm": 30, "tpm": 300000, "concurrency": 3},
         "agent_models": [
             "qwen3-max",
        
@@ -45,6 +51,10 @@ PROVIDERS = {
         "name": "OpenRouter",
         "base_url": "https://openrouter.ai/api/v1",
         "api_key_env": "OPENROUTER_API_KEY",
+        "rate_limits": {"rpm": 60, "tpm": 1000000, "concurrency": 8},
+        "prompt_token_budget": 10000,
+        # 需要显式 cache_control 提示才会缓存提示词前缀的模型（按模型名前缀匹配）
+        "cache_control_models": ["anthropic/", "google/gemini"],
         "agent_models": [
             "anthropic/claude-haiku-4.5",
             "anthropic/claude-sonnet-4.5",
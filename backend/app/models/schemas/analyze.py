@@ -1,5 +1,10 @@
 from pydantic import BaseModel
-from typing import Optional, Union, List
+from typing import Literal, Optional, Union, List
+
+# 图表返回方式（也是结果缓存键的一部分，取值必须规范）
+ChartMode = Literal["image", "spec"]
+# 形态识别方式（非法取值返回 422，而不是静默按 vision 处理）
+PatternMode = Literal["vision", "numeric", "hybrid"]
 
 class AnalyzeRequest(BaseModel):
     asset: str
@@ -20,3 +25,60 @@ class AnalyzeRequest(BaseModel):
     # Multi-Timeframe Mode
     multi_timeframe_mode: bool = False
     timeframes: Optional[List[str]] = None
+
+    # 图表返回方式: "image" 返回 base64 PNG；"spec" 返回前端可渲染的图表数据 (chart_specs)
+    chart_mode: ChartMode = "image"
+
+    # 形态识别方式: "vision" 视觉模型看图；"numeric" 数值特征 + 文本模型（不调用视觉模型）；"hybrid" 两者结合
+    pattern_mode: PatternMode = "vision"
+
+    # 流式输出: 开启后各智能体的输出通过 /ws/progress 逐段推送（agent_stream / decision_fields 消息）
+    stream: bool = False
+    # 前端生成的会话 ID，WebSocket 消息携带该 ID 供前端过滤
+    session_id: Optional[str] = None
+
+    # LLM 响应缓存: False 时忽略已有缓存强制重新调用（新结果仍会写入缓存）
+    use_llm_cache: bool = True
+
+    # 预筛选: 中性行情跳过 LLM 分析直接返回观望结果；为空时使用 SIGNAL_GATE_ENABLED
+    signal_gate: Optional[bool] = None
+
+    # 结果缓存: 已收盘的历史窗口默认直接返回相同请求已保存的结果；True 时重新执行并覆盖缓存
+    force_refresh: bool = False
+
+    # 多版本决策: 分析师只运行一次，列出的决策版本（至少两个）共享同一份报告并行决策，
+    # 第一个版本作为主决策（decision 字段），全部版本的决策与一致性汇总见结果的 ensemble 字段
+    ensemble_versions: Optional[List[str]] = None
+
+    # 分析师截止时间（秒）：超时的分析师报告标记为缺失，决策阶段先行；为空时使用 ANALYST_DEADLINE，0 为不限制
+    analyst_deadline: Optional[float] = None
+
+
+class BatchRow(BaseModel):
+    """批量分析的一行：交易对 + 截止时间，未填的字段使用批次默认值"""
+    asset: str
+    timeframe: Optional[str] = None
+    # 截止日期 YYYY-MM-DD（为空时取最新数据）与时间 HH:MM
+    end_date: Optional[str] = None
+    end_time: Optional[str] = None
+    ai_version: Optional[str] = None
+
+
+class BatchAnalyzeRequest(BaseModel):
+    rows: List[BatchRow]
+
+    # 批次默认值
+    timeframe: str = "1h"
+    ai_version: str = "constrained"
+    kline_count: int = 100
+    future_kline_count: int = 13
+    chart_mode: ChartMode = "image"
+    pattern_mode: PatternMode = "vision"
+    use_llm_cache: bool = True
+    # 筛选大量交易对时建议开启预筛选；为空时使用 SIGNAL_GATE_ENABLED
+    signal_gate: Optional[bool] = None
+    # 忽略已缓存的分析结果重新执行
+    force_refresh: bool = False
+
+    # 同时执行的分析数，为空时使用 BATCH_CONCURRENCY
+    concurrency: Optional[int] = None
@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from app.models.schemas.analyze import ChartMode, PatternMode
+
+class BacktestRequest(BaseModel):
+    assets: List[str]
+    timeframe: str = "1h"
+
+    # 决策时间点范围（YYYY-MM-DD HH:MM）与间隔（如 "4h"、"1d"）；间隔为空时取 future_kline_count 根K线，验证窗口互不重叠
+    start: str
+    end: str
+    step: Optional[str] = None
+
+    # 参与对比的决策版本
+    ai_versions: List[str] = ["constrained"]
+
+    kline_count: int = 100
+    future_kline_count: int = 13
+
+    # 回测只需要结构化的决策和未来K线，默认不渲染验证图
+    chart_mode: ChartMode = "spec"
+    pattern_mode: PatternMode = "vision"
+    use_llm_cache: bool = True
+    # 忽略已缓存的分析结果重新执行（默认复用相同决策点的已有结果）
+    force_refresh: bool = False
+    # 多版本决策：同一 (交易对, 时间点) 只运行一次分析师，ai_versions 共享报告并行决策
+    ensemble: bool = False
+
+    # 同时执行的分析数，为空时使用 BACKTEST_CONCURRENCY
+    concurrency: Optional[int] = None
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Optional, List, Dict
+from app.models.schemas.analyze import ChartMode, PatternMode
+
+class ScreenerRequest(BaseModel):
+    # 为空时使用 SCREENER_UNIVERSE_FILE 中的交易对列表
+    symbols: Optional[List[str]] = None
+    timeframe: str = "4h"
+    kline_count: int = 100
+    # 动量 / 趋势 / 突破等特征的回看K线数
+    lookback: int = 20
+
+    # 打分项权重（momentum / trend / volume / breakout / rsi_extreme / volatility），未给出的项使用默认权重
+    weights: Optional[Dict[str, float]] = None
+
+    # 排名前 top_n 的交易对自动提交完整分析任务（/jobs）
+    top_n: int = 5
+    enqueue: bool = True
+    ai_version: str = "constrained"
+    chart_mode: ChartMode = "spec"
+    pattern_mode: PatternMode = "vision"
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from app.models.schemas.analyze import ChartMode, PatternMode
+
+class WatchRuleRequest(BaseModel):
+    asset: str
+    # 每个时间框架在各自的K线收盘后执行一次分析
+    timeframes: List[str] = ["1h"]
+    ai_version: str = "constrained"
+    kline_count: int = 100
+
+    chart_mode: ChartMode = "spec"
+    pattern_mode: PatternMode = "vision"
+    use_llm_cache: bool = True
+    # 预筛选开关，为空时使用 SIGNAL_GATE_ENABLED（定时分析建议开启）
+    signal_gate: Optional[bool] = None
+    enabled: bool = True
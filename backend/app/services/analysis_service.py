@@ -0,0 +1,369 @@
+"""
+Analysis Service - 单次 AI 分析的完整流程
+获取行情 → 后台获取未来验证数据 → TradingEngine 分析 → 组装结果 → 保存 HTML 报告和 JSON 历史。
+同步接口 POST /analyze/ 与异步任务队列（job_service）共用这一流程。
+"""
+
+import asyncio
+import datetime
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models.schemas.analyze import AnalyzeRequest
+from app.agents.decision.decision_configs import DECISION_AGENT_VERSIONS
+from app.services.market_data import MarketDataService
+from app.services.engine_pool import engine_pool
+from app.services.history_service import history_service
+from app.services.future_verification import fetch_future_verification
+from app.services.signal_gate import evaluate_gate, gate_enabled, gated_result
+from app.services.result_cache import candle_fingerprint, result_cache
+from app.services.late_reports import late_reports
+from app.core.progress import update_analysis_progress
+from app.core.analysis_context import bind_analysis_context, set_analyst_deadline
+from app.core.llm_usage import usage_ledger
+from app.utils.id_manager import get_result_id_manager
+from app.utils.analysis_log import get_analysis_logger
+from app.core.config import settings
+from app.core.events import check_env_changes
+
+logger = logging.getLogger(__name__)
+
+
+class MarketDataNotFound(LookupError):
+    """请求的交易对/时间框架没有可用的行情数据"""
+
+
+class InvalidAnalysisRequest(ValueError):
+    """请求参数不合法（如未知的决策版本），接口层映射为 400"""
+
+
+def allocate_result_id(request: AnalyzeRequest) -> str:
+    """按交易对和时间框架分配结果 ID"""
+    id_manager = get_result_id_manager()
+
+    # 处理时间框架：如果是多时间框架模式，使用逗号连接或者特殊格式
+    timeframe_for_id = request.timeframe
+    if request.multi_timeframe_mode and request.timeframes:
+         # 为了避免文件名/ID过长，可以使用 "+" 连接，或者简写
+         # 这里选择用 "+" 连接，如 4h+1d
+         timeframe_for_id = "+".join(request.timeframes)
+    elif isinstance(request.timeframe, list):
+         timeframe_for_id = "+".join(request.timeframe)
+
+    return id_manager.get_next_id(asset=request.asset, timeframe=timeframe_for_id)
+
+
+def market_window(request: AnalyzeRequest) -> Tuple[Optional[str], Optional[str]]:
+    """按请求的取数方式得到 (start_date, end_date) 字符串，latest 模式均为 None"""
+    # Determine start/end time based on request
+    # (Simplified logic compared to original for brevity, but should be robust)
+    start_dt_str = None
+    end_dt_str = None
+
+    if request.data_method == "date_range":
+         if request.start_date:
+             start_dt_str = f"{request.start_date} {request.start_time}:00"
+         if request.end_date:
+             end_dt_str = f"{request.end_date} {request.end_time}:00"
+    elif request.data_method == "to_end" and request.end_date:
+         end_dt_str = f"{request.end_date} {request.end_time}:00"
+    return start_dt_str, end_dt_str
+
+
+def validate_request(request: AnalyzeRequest):
+    """
+    提交 / 执行前校验 schema 之外的请求参数
+
+    Raises:
+        InvalidAnalysisRequest: 参数不合法
+    """
+    ensemble_versions(request)
+
+
+def ensemble_versions(request: AnalyzeRequest) -> Optional[List[str]]:
+    """
+    去重后的多版本决策列表；少于两个版本时为 None（按 ai_version 单版本分析）
+
+    Raises:
+        InvalidAnalysisRequest: 包含未知的决策版本
+    """
+    versions = list(dict.fromkeys(request.ensemble_versions or []))
+    unknown = [v for v in versions if v not in DECISION_AGENT_VERSIONS]
+    if unknown:
+        raise InvalidAnalysisRequest(f"未知的决策版本: {unknown}，可选 {list(DECISION_AGENT_VERSIONS)}")
+    return versions if len(versions) > 1 else None
+
+
+async def run_analysis(request: AnalyzeRequest, result_id: str,
+                       market_service: Optional[MarketDataService] = None) -> Dict[str, Any]:
+    """
+    执行一次完整分析并保存 HTML 报告与历史记录
+
+    在当前任务中绑定分析上下文（result_id / session_id / 流式 / 缓存开关），
+    任务被取消时 CancelledError 会一路传到 LangGraph 和进行中的 LLM 请求。
+    已收盘的历史窗口命中结果缓存时直接返回已保存的结果，其 result_id 为首次分析的 ID（不是传入的 result_id）。
+
+    Returns:
+        dict: 完整分析结果（spec 模式下的图片裁剪由调用方通过 response_payload 处理）
+    """
+    market_service = market_service or MarketDataService()
+    # 进度 / 流式消息都带上 result_id 和前端的 session_id
+    bind_analysis_context(result_id, request.session_id, request.stream, request.use_llm_cache)
+    result = await result_cache.run(request, lambda: _run_pipeline(request, result_id, market_service))
+    if result.get("result_cache"):
+        update_analysis_progress("completed", 100, f"[{result_id}] Reused cached result {result['result_id']}")
+    return result
+
+
+async def _run_pipeline(request: AnalyzeRequest, result_id: str,
+                        market_service: MarketDataService) -> Dict[str, Any]:
+    """run_analysis 的完整流程（未命中结果缓存时执行）"""
+    future_task = None
+    versions = ensemble_versions(request)
+    try:
+        # 1. Log Analysis Start（Result ID 由调用方分配）
+        analysis_logger = get_analysis_logger()
+        analysis_logger.append_start_log(result_id, request.asset, request.timeframe)
+
+        update_analysis_progress("start", 0, f"[{result_id}] Starting analysis for {request.asset}")
+
+        logger.info(f"[{result_id}] Fetching market data for {request.asset} ({request.timeframe})...")
+        update_analysis_progress("fetching_data", 10, f"[{result_id}] Fetching market data...")
+
+        start_dt_str, end_dt_str = market_window(request)
+
+        # Multi-Timeframe Support
+        if request.multi_timeframe_mode and request.timeframes:
+            logger.info(f"[{result_id}] Multi-timeframe mode enabled with timeframes: {request.timeframes}")
+
+            # 获取多个时间框架的数据
+            multi_df = {}
+            for tf in request.timeframes:
+                logger.info(f"[{result_id}] Fetching {tf} timeframe data...")
+                df_single = await asyncio.to_thread(market_service.get_ohlcv_data_enhanced,
+                    symbol=request.asset,
+                    timeframe=tf,
+                    limit=request.kline_count,
+                    method=request.data_method,
+                    start_date=start_dt_str,
+                    end_date=end_dt_str
+                )
+
+                if df_single is None or df_single.empty:
+                    logger.warning(f"[{result_id}] No data found for timeframe {tf}")
+                    continue
+
+                multi_df[tf] = df_single
+
+            if not multi_df:
+                raise MarketDataNotFound("No market data found for any timeframe")
+
+            df = multi_df
+            timeframe_for_result = ",".join(request.timeframes)
+        else:
+            # Single Timeframe Mode (original logic)
+            timeframe = request.timeframe if isinstance(request.timeframe, str) else request.timeframe[0]
+            df = await asyncio.to_thread(market_service.get_ohlcv_data_enhanced,
+                symbol=request.asset,
+                timeframe=timeframe,
+                limit=request.kline_count,
+                method=request.data_method,
+                start_date=start_dt_str,
+                end_date=end_dt_str
+            )
+
+            if df is None or df.empty:
+                raise MarketDataNotFound("No market data found")
+
+            timeframe_for_result = timeframe
+
+        # 哈雷酱添加：如果是在做回测（to_end 或 date_range），且请求了未来K线，则获取“未来”数据用于验证
+        # 该阶段不依赖 AI 输出，放到后台线程与 Agent 图并发执行，结束后再合并
+        use_chart_specs = request.chart_mode == "spec"
+
+        # 预筛选：中性行情直接返回观望结果，不调用 LLM、不生成图表（多周期模式按主周期判断）
+        gate = None
+        if gate_enabled(request.signal_gate):
+            gate_df = df
+            if isinstance(df, dict):
+                gate_df = df.get(request.timeframes[0]) if request.timeframes else None
+                if gate_df is None:
+                    gate_df = next(iter(df.values()))
+            gate = await asyncio.to_thread(evaluate_gate, gate_df)
+        gated = gate is not None and not gate["passed"]
+
+        if request.data_method in ["to_end", "date_range"] and request.future_kline_count > 0:
+            future_task = asyncio.create_task(asyncio.to_thread(
+                fetch_future_verification,
+                market_service,
+                request.asset,
+                timeframe_for_result,
+                df,
+                request.future_kline_count,
+                end_dt_str,
+                not use_chart_specs and not gated
+            ))
+
+        check_env_changes()
+
+        agent_cfg_dict = settings.get_agent_config()
+        graph_cfg_dict = settings.get_graph_config()
+        agent_provider = agent_cfg_dict.get("provider")
+        graph_provider = graph_cfg_dict.get("provider")
+
+        if gated:
+            logger.info(f"[{result_id}] Signal gate rejected setup, skipping AI analysis: {gate['reasons']}")
+            update_analysis_progress("gated", 90, f"[{result_id}] Signal gate: no-trade setup, AI analysis skipped")
+            result = gated_result(gate, request.ai_version)
+        else:
+            engine_config = {
+                "decision_agent_version": request.ai_version,
+            }
+            if versions:
+                # 多版本决策：分析师阶段只运行一次，决策阶段按版本并行扇出
+                engine_config = {
+                    "decision_agent_version": versions[0],
+                    "ensemble_versions": versions,
+                }
+
+            trading_engine = await engine_pool.get(engine_config)
+
+            logger.info(f"[{result_id}] Starting AI analysis with engine config: {engine_config}")
+            update_analysis_progress("analyzing", 30, "Running AI analysis...")
+            # 分析师截止时间：超时的分析师不阻塞决策，报告稍后补写到历史记录
+            set_analyst_deadline(request.analyst_deadline)
+            result = await trading_engine.run_analysis(
+                df, 
+                request.asset, 
+                timeframe_for_result,
+                pattern_mode=request.pattern_mode
+            )
+        if gate is not None:
+            result['signal_gate'] = gate
+        if result.get('missing_reports'):
+            logger.warning(f"[{result_id}] Decision made without late reports: {result['missing_reports']}")
+
+        # 合并后台的回测验证结果
+        future_verification = await future_task if future_task else {}
+        future_df = future_verification.get("future_df")
+        future_kline_list = future_verification.get("future_kline_data") or []
+        future_kline_chart_base64 = future_verification.get("future_kline_chart_base64")
+
+        # Inject Result ID and Request Metadata
+        result['result_id'] = result_id
+        result['data_fingerprint'] = candle_fingerprint(df)
+        result['asset'] = request.asset
+        result['timeframe'] = timeframe_for_result
+        result['multi_timeframe_mode'] = request.multi_timeframe_mode
+        if request.multi_timeframe_mode:
+            result['timeframes'] = request.timeframes
+            # 多周期模式下，data_length 使用主周期（第一个）的数据长度
+            if isinstance(df, dict) and request.timeframes:
+                 first_tf = request.timeframes[0]
+                 if first_tf in df:
+                     result['data_length'] = len(df[first_tf])
+                 else:
+                     result['data_length'] = 0
+            else:
+                 result['data_length'] = 0
+        else:
+            # 单周期模式
+            result['data_length'] = len(df) if hasattr(df, '__len__') else 0
+
+        # 哈雷酱添加：注入未来验证数据
+        if future_kline_list:
+            result['future_kline_data'] = future_kline_list
+            result['future_kline_chart_base64'] = future_kline_chart_base64
+
+        # Determine analysis time display
+        analysis_time_display = None
+        if request.data_method == "to_end" and end_dt_str:
+            analysis_time_display = end_dt_str
+        elif request.data_method == "date_range" and end_dt_str:
+            analysis_time_display = f"{start_dt_str} to {end_dt_str}"
+        else:
+             # For latest, use current time
+             analysis_time_display = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        result['analysis_time_display'] = analysis_time_display
+        result['data_method_short'] = request.data_method
+
+        # 4. Generate Charts for Frontend (Optional but good for UX)
+        # 既然用户不想要综合图表，且 pattern_chart 和 trend_chart 已经在 TradingEngine 中处理，
+        # 这里就不再生成 summary_chart 了，避免生成用户不想要的“奇怪图表”。
+        result['summary_chart_base64'] = None
+
+        if use_chart_specs:
+            try:
+                from app.utils.chart_spec import build_chart_specs
+                result['chart_specs'] = build_chart_specs(
+                    df,
+                    future_df if future_kline_list else None
+                )
+            except Exception as e:
+                logger.warning(f"[{result_id}] Failed to build chart specs: {e}")
+
+        result['llm_config'] = {
+            "agent": {
+                "provider": agent_provider,
+                "name": agent_provider,
+                "model": agent_cfg_dict.get("model"),
+                "temperature": agent_cfg_dict.get("temperature"),
+            },
+            "graph": {
+                "provider": graph_provider,
+                "name": graph_provider,
+                "model": graph_cfg_dict.get("model"),
+                "temperature": graph_cfg_dict.get("temperature"),
+            },
+        }
+
+        # 本次分析所有 LLM 调用的 Token、图片、排队与延迟汇总（随结果写入历史记录）
+        result['llm_usage'] = usage_ledger.summary_for(result_id)
+
+        # 5. Auto-save HTML Report (User Requirement: Automation, No Browser Dependency)
+        # 预筛选拦下的结果没有报告内容，只写历史记录（HTML 导出会补绘验证图）
+        if not gated:
+            try:
+                from app.services.html_export_service import html_export_service
+                # HTML 导出可能需要补绘回测验证图，放到线程中避免阻塞事件循环
+                saved_path = await asyncio.to_thread(html_export_service.save_html, result)
+                logger.info(f"[{result_id}] HTML report automatically saved to: {saved_path}")
+                result['html_report_path'] = saved_path
+                update_analysis_progress("completed", 99, f"Report saved: {saved_path}")
+            except Exception as e:
+                logger.error(f"[{result_id}] Failed to auto-save HTML report: {e}")
+                # Do not block response, but log error
+
+        # 6. Save JSON History (For History Recall)
+        try:
+            history_service.save_result(result_id, result)
+        except Exception as e:
+             logger.error(f"[{result_id}] Failed to save JSON history: {e}")
+        # 历史记录已落盘，已到达的迟到报告此时补写，之后到达的直接补写
+        await late_reports.mark_saved(result_id)
+
+        logger.info("Analysis completed successfully")
+        update_analysis_progress("completed", 100, "Analysis completed")
+
+
+        return result
+    except BaseException as e:
+        if future_task and not future_task.done():
+            future_task.cancel()
+        late_reports.discard(result_id)
+        if isinstance(e, asyncio.CancelledError):
+            logger.info(f"[{result_id}] Analysis cancelled")
+            update_analysis_progress("cancelled", 0, f"[{result_id}] Analysis cancelled")
+        elif isinstance(e, Exception):
+            logger.error(f"[{result_id}] Analysis error: {e}")
+            update_analysis_progress("error", 0, f"Error: {str(e)}")
+        raise
+
+
+def response_payload(request: AnalyzeRequest, result: Dict[str, Any]) -> Dict[str, Any]:
+    """spec 模式：图片只保留在历史记录和 HTML 报告中，响应只携带 chart_specs"""
+    if request.chart_mode == "spec":
+        from app.utils.chart_spec import strip_chart_images
+        return strip_chart_images(result)
+    return result
@@ -0,0 +1,362 @@
+"""
+Backtest Service - 基于 to_end 模式与未来K线验证的滚动回测
+在时间范围内按固定间隔生成决策时间点，对每个 (交易对, 时间点, 决策版本) 跑一次完整分析
+（ensemble 模式下同一 (交易对, 时间点) 的各版本共享一次分析师阶段，只有决策阶段按版本并行），
+再用 trade_evaluator 按分析结果里的未来K线评估决策，汇总命中率、收益与 MFE/MAE。
+- 并发：同时执行 BACKTEST_CONCURRENCY 个分析；同一回测内行情通过 SharedMarketData 共享，
+  不同决策版本的分析师阶段提示词相同，可命中 LLM 响应缓存（use_llm_cache）
+- 断点续跑：每完成一个决策点就写入 data/backtests/<backtest_id>.json，
+  取消、服务重启或失败后通过 resume 只重跑未完成的决策点（失败、无行情、缺少未来K线的点都会重跑）
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from app.core import config as app_config
+from app.models.schemas.analyze import AnalyzeRequest
+from app.models.schemas.backtest import BacktestRequest
+from app.services.analysis_service import MarketDataNotFound, allocate_result_id, run_analysis
+from app.services.batch_service import SharedMarketData
+from app.services.future_verification import timeframe_delta
+from app.services.result_cache import window_closed
+from app.services.result_status import analysis_failures, decision_failure
+from app.services.trade_evaluator import aggregate_evaluations, evaluate_decision
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKTEST_DIR = Path("data") / "backtests"
+
+BACKTEST_RUNNING = "running"
+BACKTEST_COMPLETED = "completed"
+BACKTEST_CANCELLED = "cancelled"
+BACKTEST_FAILED = "failed"
+# 进程退出时仍在运行（状态文件停留在 running）
+BACKTEST_INTERRUPTED = "interrupted"
+
+POINT_EVALUATED = "evaluated"
+POINT_NO_DATA = "no_data"
+POINT_FAILED = "failed"
+# 未来验证K线尚未全部收盘，决策已做出但暂不评估
+POINT_AWAITING_DATA = "awaiting_data"
+# 续跑时跳过的决策点状态（失败 / 无行情 / 等待数据多为暂时性问题，续跑时重跑）
+POINT_DONE_STATES = (POINT_EVALUATED,)
+
+
+def decision_times(request: BacktestRequest) -> List[str]:
+    """决策时间点（YYYY-MM-DD HH:MM），间隔默认 future_kline_count 根K线"""
+    step = timeframe_delta(request.step) if request.step else timeframe_delta(request.timeframe) * max(1, request.future_kline_count)
+    times = pd.date_range(pd.to_datetime(request.start), pd.to_datetime(request.end), freq=step)
+    return [t.strftime("%Y-%m-%d %H:%M") for t in times]
+
+
+def backtest_points(request: BacktestRequest) -> List[Dict[str, str]]:
+    return [
+        {"key": f"{asset}|{decision_time}|{ai_version}", "asset": asset, "decision_time": decision_time, "ai_version": ai_version}
+        for decision_time in decision_times(request)
+        for asset in request.assets
+        for ai_version in request.ai_versions
+    ]
+
+
+def summarize_records(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """总体 / 按决策版本 / 按模型 / 按 (版本, 模型) 汇总"""
+    evaluated = [r for r in records if r.get("status") == POINT_EVALUATED]
+
+    def group(key_fn: Callable[[Dict[str, Any]], str]) -> Dict[str, Any]:
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in evaluated:
+            groups.setdefault(key_fn(record), []).append(record["evaluation"])
+        return {key: aggregate_evaluations(items) for key, items in groups.items()}
+
+    return {
+        "overall": aggregate_evaluations([r["evaluation"] for r in evaluated]),
+        "by_ai_version": group(lambda r: r["ai_version"]),
+        "by_model": group(lambda r: r.get("model") or "unknown"),
+        "by_ai_version_model": group(lambda r: f"{r['ai_version']} / {r.get('model') or 'unknown'}"),
+    }
+
+
+class BacktestRun:
+    """一次回测的状态与执行（状态即检查点文件内容）"""
+
+    def __init__(self, state: Dict[str, Any], backtest_dir: Path = DEFAULT_BACKTEST_DIR):
+        self.state = state
+        self.request = BacktestRequest(**state["request"])
+        self.path = Path(backtest_dir) / f"{state['backtest_id']}.json"
+
+    @classmethod
+    def create(cls, request: BacktestRequest, backtest_dir: Path = DEFAULT_BACKTEST_DIR) -> "BacktestRun":
+        total = len(backtest_points(request))
+        if total == 0:
+            raise ValueError("时间范围内没有决策时间点")
+        if total > app_config.settings.BACKTEST_MAX_POINTS:
+            raise ValueError(f"决策点数 {total} 超过上限 {app_config.settings.BACKTEST_MAX_POINTS}")
+
+        state = {
+            "backtest_id": f"bt_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}",
+            "status": BACKTEST_RUNNING,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "request": request.model_dump(),
+            "total": total,
+            "records": {},
+            "summary": None,
+        }
+        run = cls(state, backtest_dir)
+        run.save()
+        return run
+
+    @classmethod
+    def load(cls, path: Path) -> "BacktestRun":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), path.parent)
+
+    @property
+    def backtest_id(self) -> str:
+        return self.state["backtest_id"]
+
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Failed to checkpoint backtest {self.backtest_id}: {e}")
+
+    def view(self) -> Dict[str, Any]:
+        """状态与进度（不含逐点记录）"""
+        records = self.state["records"].values()
+        done = sum(1 for r in records if r["status"] in POINT_DONE_STATES)
+        return {
+            "backtest_id": self.backtest_id,
+            "status": self.state["status"],
+            "error": self.state["error"],
+            "created_at": self.state["created_at"],
+            "started_at": self.state["started_at"],
+            "finished_at": self.state["finished_at"],
+            "total": self.state["total"],
+            "done": done,
+            "failed": sum(1 for r in records if r["status"] == POINT_FAILED),
+            "no_data": sum(1 for r in records if r["status"] in (POINT_NO_DATA, POINT_AWAITING_DATA)),
+            "progress": round(done / self.state["total"] * 100, 1) if self.state["total"] else 0,
+            "assets": self.request.assets,
+            "timeframe": self.request.timeframe,
+            "ai_versions": self.request.ai_versions,
+            "summary": self.state["summary"],
+        }
+
+    def _point_groups(self, points: List[Dict[str, str]]) -> List[List[Dict[str, str]]]:
+        """多版本决策模式下同一 (交易对, 时间点) 的各版本合成一次分析，否则每个决策点单独分析"""
+        if not self.request.ensemble:
+            return [[point] for point in points]
+        groups: Dict[tuple, List[Dict[str, str]]] = {}
+        for point in points:
+            groups.setdefault((point["asset"], point["decision_time"]), []).append(point)
+        return list(groups.values())
+
+    def _analyze_request(self, point: Dict[str, str], ensemble_versions: Optional[List[str]] = None) -> AnalyzeRequest:
+        request = self.request
+        end_date, end_time = point["decision_time"].split(" ")
+        return AnalyzeRequest(
+            asset=point["asset"],
+            timeframe=request.timeframe,
+            data_method="to_end",
+            kline_count=request.kline_count,
+            future_kline_count=request.future_kline_count,
+            end_date=end_date,
+            end_time=end_time,
+            ai_version=point["ai_version"],
+            chart_mode=request.chart_mode,
+            pattern_mode=request.pattern_mode,
+            use_llm_cache=request.use_llm_cache,
+            force_refresh=request.force_refresh,
+            ensemble_versions=ensemble_versions,
+        )
+
+    async def _run_group(self, semaphore: asyncio.Semaphore, market: SharedMarketData,
+                         points: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """执行一次分析并评估其中每个版本的决策（单版本时即一个决策点）"""
+        async with semaphore:
+            versions = [point["ai_version"] for point in points]
+            analyze_request = self._analyze_request(points[0], versions if len(versions) > 1 else None)
+            result_id = allocate_result_id(analyze_request)
+            records: List[Dict[str, Any]] = [{**point, "result_id": result_id, "error": None} for point in points]
+            started = time.time()
+            try:
+                # 独立任务：每个决策点绑定自己的分析上下文
+                result = await asyncio.create_task(run_analysis(analyze_request, result_id, market))
+            except MarketDataNotFound as e:
+                for record in records:
+                    record.update(status=POINT_NO_DATA, error=str(e))
+            except Exception as e:
+                for record in records:
+                    record.update(status=POINT_FAILED, error=f"{type(e).__name__}: {e}")
+            else:
+                future_klines = result.get("future_kline_data") or []
+                failures = analysis_failures(result)
+                ensemble_decisions = (result.get("ensemble") or {}).get("decisions") or {}
+                for record in records:
+                    record.update(
+                        result_id=result.get("result_id", result_id),
+                        model=((result.get("llm_config") or {}).get("agent") or {}).get("model"),
+                    )
+                    decision = ensemble_decisions.get(record["ai_version"]) or result.get("decision") or {}
+                    # LLM 失败（超时 / 429 等）不抛异常，而是变成失败报告或带 error 的观望决策，不能当作观望评估
+                    failure = "; ".join(failures) or decision_failure(decision)
+                    if failure:
+                        record.update(status=POINT_FAILED, error=failure)
+                        continue
+                    record["action"] = decision.get("action")
+                    if not future_klines and self.request.future_kline_count > 0:
+                        # 窗口已收盘却没有未来K线是取数失败，否则是K线尚未收盘；两者都在续跑时重试
+                        if window_closed(analyze_request):
+                            record.update(status=POINT_FAILED, error="future klines missing for closed window")
+                        else:
+                            record.update(status=POINT_AWAITING_DATA, error="future klines not closed yet")
+                        continue
+                    record.update(status=POINT_EVALUATED, evaluation=evaluate_decision(decision, future_klines))
+            for record in records:
+                record["elapsed_seconds"] = round(time.time() - started, 2)
+            return records
+
+    async def run(self, on_record: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """执行（或续跑）未完成的决策点；每完成一个点写一次检查点"""
+        records = self.state["records"]
+        pending = [p for p in backtest_points(self.request) if records.get(p["key"], {}).get("status") not in POINT_DONE_STATES]
+        self.state.update(status=BACKTEST_RUNNING, error=None, started_at=self.state["started_at"] or time.time(), finished_at=None)
+        self.save()
+        logger.info(f"[{self.backtest_id}] Backtest running: {len(pending)} of {self.state['total']} points pending")
+
+        concurrency = max(1, self.request.concurrency or app_config.settings.BACKTEST_CONCURRENCY)
+        semaphore = asyncio.Semaphore(concurrency)
+        market = SharedMarketData()
+        tasks = [asyncio.create_task(self._run_group(semaphore, market, group)) for group in self._point_groups(pending)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for record in await next_done:
+                    records[record["key"]] = record
+                    if on_record:
+                        on_record(record)
+                self.state["summary"] = summarize_records(list(records.values()))
+                self.save()
+        except asyncio.CancelledError:
+            self.state.update(status=BACKTEST_CANCELLED, finished_at=time.time())
+            raise
+        except Exception as e:
+            self.state.update(status=BACKTEST_FAILED, error=str(e), finished_at=time.time())
+            raise
+        else:
+            self.state.update(status=BACKTEST_COMPLETED, finished_at=time.time())
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.state["summary"] = summarize_records(list(records.values()))
+            self.save()
+            logger.info(f"[{self.backtest_id}] Backtest {self.state['status']} (market data {market.stats()})")
+
+
+class BacktestManager:
+    """服务进程内的回测：后台任务执行，状态从检查点文件读取"""
+
+    def __init__(self, backtest_dir: Path = DEFAULT_BACKTEST_DIR):
+        self.backtest_dir = Path(backtest_dir)
+        self._runs: Dict[str, BacktestRun] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def load(self, backtest_id: str) -> Optional[BacktestRun]:
+        run = self._runs.get(backtest_id)
+        if run is not None:
+            return run
+        path = self.backtest_dir / f"{backtest_id}.json"
+        if not path.exists():
+            return None
+        try:
+            run = BacktestRun.load(path)
+        except Exception as e:
+            logger.warning(f"Failed to load backtest {backtest_id}: {e}")
+            return None
+        if run.state["status"] == BACKTEST_RUNNING:
+            run.state["status"] = BACKTEST_INTERRUPTED
+        self._runs[backtest_id] = run
+        return run
+
+    def _launch(self, run: BacktestRun):
+        task = asyncio.create_task(run.run())
+        self._tasks[run.backtest_id] = task
+
+        def _done(t: asyncio.Task):
+            self._tasks.pop(run.backtest_id, None)
+            if not t.cancelled() and t.exception() is not None:
+                logger.error(f"[{run.backtest_id}] Backtest failed: {t.exception()}")
+
+        task.add_done_callback(_done)
+
+    def start(self, request: BacktestRequest) -> Dict[str, Any]:
+        run = BacktestRun.create(request, self.backtest_dir)
+        self._runs[run.backtest_id] = run
+        self._launch(run)
+        return run.view()
+
+    def resume(self, backtest_id: str) -> Optional[Dict[str, Any]]:
+        run = self.load(backtest_id)
+        if run is None:
+            return None
+        if backtest_id not in self._tasks:
+            self._launch(run)
+        return run.view()
+
+    async def cancel(self, backtest_id: str) -> Optional[Dict[str, Any]]:
+        run = self.load(backtest_id)
+        if run is None:
+            return None
+        task = self._tasks.get(backtest_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return run.view()
+
+    def get(self, backtest_id: str, include_records: bool = False) -> Optional[Dict[str, Any]]:
+        run = self.load(backtest_id)
+        if run is None:
+            return None
+        view = run.view()
+        if include_records:
+            view["records"] = list(run.state["records"].values())
+        return view
+
+    def list_backtests(self, limit: int = 20) -> List[Dict[str, Any]]:
+        if not self.backtest_dir.exists():
+            return []
+        paths = sorted(self.backtest_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)[:limit]
+        views = []
+        for path in paths:
+            run = self.load(path.stem)
+            if run is not None:
+                views.append(run.view())
+        return views
+
+    async def shutdown(self):
+        """应用关闭时取消运行中的回测（状态保留为 cancelled，可续跑）"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# 全局回测管理器
+backtest_manager = BacktestManager()
@@ -0,0 +1,311 @@
+"""
+Batch Service - 多交易对 / 多截止时间的批量分析
+回测常用 随机表格 生成的 (币种, 日期, 时间) 表逐行手动提交分析，每行都重新拉一遍行情。这里：
+- 行去重：参数完全相同的行只分析一次，结果共享给重复行
+- 行情共享：按 (交易对, 时间框架, 截止时间, K线数) 去重后先并发预取，分析和未来验证数据都从同一份缓存读取
+- 有界并发：同时执行 BATCH_CONCURRENCY 个分析（LLM 调用仍受 llm_scheduler 的全局限流）
+- 逐行推送：每行完成即产出一条事件，最后写出汇总表 data/batch/<batch_id>.csv
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core import config as app_config
+from app.models.schemas.analyze import AnalyzeRequest, BatchAnalyzeRequest, BatchRow
+from app.services.analysis_service import (
+    MarketDataNotFound, allocate_result_id, market_window, run_analysis,
+)
+from app.services.market_data import MarketDataService
+from app.services.result_status import result_failures
+from app.utils.batch_table import write_table
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_DIR = Path("data") / "batch"
+
+ROW_SUCCEEDED = "succeeded"
+ROW_NO_DATA = "no_data"
+ROW_FAILED = "failed"
+ROW_CANCELLED = "cancelled"
+
+# 汇总表的列顺序
+TABLE_COLUMNS = (
+    "row", "asset", "timeframe", "end_date", "end_time", "ai_version", "status", "result_id",
+    "action", "confidence", "entry_point", "stop_loss", "take_profit", "risk_reward_ratio",
+    "gate_passed", "elapsed_seconds", "duplicate_of", "error", "html_report_path",
+)
+
+
+class SharedMarketData:
+    """
+    MarketDataService 的共享缓存包装：相同参数的行情请求在整个批次内只发一次
+
+    并发的相同请求由第一个调用方拉取，其余调用方等待同一个 Future；
+    每次返回 DataFrame 副本，避免各分析之间互相修改。
+    ttl 为空时缓存在实例生命周期内有效（批次/回测）；长期存在的实例（如全市场筛选）设置 ttl 使最新K线按时刷新。
+    """
+
+    def __init__(self, service: Optional[MarketDataService] = None, ttl: Optional[float] = None):
+        self._service = service or MarketDataService()
+        self._cache: Dict[Tuple, Tuple[float, concurrent.futures.Future]] = {}
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self.fetches = 0
+        self.hits = 0
+
+    def _cached(self, name: str, args: tuple, kwargs: Dict[str, Any]):
+        key = (name, args, tuple(sorted(kwargs.items())))
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and self.ttl is not None and now - entry[0] > self.ttl:
+                entry = None
+            owner = entry is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._cache[key] = (now, future)
+                self.fetches += 1
+            else:
+                future = entry[1]
+                self.hits += 1
+
+        if owner:
+            try:
+                df = getattr(self._service, name)(*args, **kwargs)
+            except BaseException as e:
+                # 失败不缓存，后续调用重新拉取
+                self._forget(key, future)
+                future.set_exception(e)
+            else:
+                # MarketDataService 出错时返回 None 而不是抛异常：空结果同样不缓存，后续调用重新拉取
+                if df is None or df.empty:
+                    self._forget(key, future)
+                future.set_result(df)
+
+        df = future.result()
+        return df.copy() if df is not None else None
+
+    def _forget(self, key: Tuple, future: concurrent.futures.Future):
+        with self._lock:
+            if self._cache.get(key, (None, None))[1] is future:
+                self._cache.pop(key)
+
+    def get_ohlcv_data(self, *args, **kwargs):
+        return self._cached("get_ohlcv_data", args, kwargs)
+
+    def get_ohlcv_data_enhanced(self, *args, **kwargs):
+        return self._cached("get_ohlcv_data_enhanced", args, kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._service, name)
+
+    def stats(self) -> Dict[str, int]:
+        return {"fetches": self.fetches, "hits": self.hits}
+
+
+def build_request(row: BatchRow, batch: BatchAnalyzeRequest) -> AnalyzeRequest:
+    """批量行 + 批次默认值 -> 单次分析请求（有截止日期时按 to_end 取数，否则取最新数据）"""
+    return AnalyzeRequest(
+        asset=row.asset,
+        timeframe=row.timeframe or batch.timeframe,
+        data_method="to_end" if row.end_date else "latest",
+        kline_count=batch.kline_count,
+        future_kline_count=batch.future_kline_count,
+        end_date=row.end_date,
+        end_time=row.end_time or "23:59",
+        ai_version=row.ai_version or batch.ai_version,
+        chart_mode=batch.chart_mode,
+        pattern_mode=batch.pattern_mode,
+        use_llm_cache=batch.use_llm_cache,
+        signal_gate=batch.signal_gate,
+        force_refresh=batch.force_refresh,
+    )
+
+
+def _market_kwargs(request: AnalyzeRequest) -> Dict[str, Any]:
+    """与 run_analysis 完全一致的取数参数，预取结果才能被命中"""
+    start_dt_str, end_dt_str = market_window(request)
+    return {
+        "symbol": request.asset,
+        "timeframe": request.timeframe,
+        "limit": request.kline_count,
+        "method": request.data_method,
+        "start_date": start_dt_str,
+        "end_date": end_dt_str,
+    }
+
+
+def _row_key(request: AnalyzeRequest) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in request.model_dump().items()))
+
+
+def _table_row(index: int, request: AnalyzeRequest, outcome: Dict[str, Any]) -> Dict[str, Any]:
+    row = {column: None for column in TABLE_COLUMNS}
+    row.update(
+        row=index,
+        asset=request.asset,
+        timeframe=request.timeframe,
+        end_date=request.end_date,
+        end_time=request.end_time if request.end_date else None,
+        ai_version=request.ai_version,
+    )
+    row.update(outcome)
+    return row
+
+
+class BatchRunner:
+    """单个批次的执行状态"""
+
+    def __init__(self, batch: BatchAnalyzeRequest, batch_dir: Path = DEFAULT_BATCH_DIR):
+        settings = app_config.settings
+        if len(batch.rows) > settings.BATCH_MAX_ROWS:
+            raise ValueError(f"单批最多 {settings.BATCH_MAX_ROWS} 行，当前 {len(batch.rows)} 行")
+
+        self.batch = batch
+        self.batch_id = f"batch_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        self.table_path = Path(batch_dir) / f"{self.batch_id}.csv"
+        self.requests = [build_request(row, batch) for row in batch.rows]
+        self.market = SharedMarketData()
+        self.concurrency = max(1, batch.concurrency or settings.BATCH_CONCURRENCY)
+
+        # 去重：key -> 首次出现的行号；每行 -> key
+        self.unique: Dict[Tuple, int] = {}
+        self.row_keys: List[Tuple] = []
+        for index, request in enumerate(self.requests):
+            key = _row_key(request)
+            self.unique.setdefault(key, index)
+            self.row_keys.append(key)
+
+        self.table: List[Optional[Dict[str, Any]]] = [None] * len(self.requests)
+
+    async def _prefetch(self):
+        """并发预取所有去重后的行情窗口，失败的窗口留给分析阶段重试并报错"""
+        windows = {}
+        for index in self.unique.values():
+            kwargs = _market_kwargs(self.requests[index])
+            windows[tuple(sorted(kwargs.items()))] = kwargs
+
+        semaphore = asyncio.Semaphore(max(1, app_config.settings.BATCH_PREFETCH_CONCURRENCY))
+
+        async def fetch(kwargs: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    await asyncio.to_thread(self.market.get_ohlcv_data_enhanced, **kwargs)
+                except Exception as e:
+                    logger.warning(f"[{self.batch_id}] Prefetch failed for {kwargs['symbol']} {kwargs['timeframe']}: {e}")
+
+        await asyncio.gather(*(fetch(kwargs) for kwargs in windows.values()))
+        return len(windows)
+
+    async def _run_row(self, semaphore: asyncio.Semaphore, index: int) -> Tuple[int, Dict[str, Any]]:
+        request = self.requests[index]
+        async with semaphore:
+            started = time.time()
+            result_id = allocate_result_id(request)
+            outcome: Dict[str, Any] = {"result_id": result_id}
+            try:
+                # 独立任务：每行绑定自己的分析上下文
+                result = await asyncio.create_task(run_analysis(request, result_id, self.market))
+            except MarketDataNotFound as e:
+                outcome.update(status=ROW_NO_DATA, error=str(e))
+            except Exception as e:
+                outcome.update(status=ROW_FAILED, error=f"{type(e).__name__}: {e}")
+            else:
+                # 命中结果缓存时为首次分析的 result_id
+                outcome["result_id"] = result.get("result_id", result_id)
+                failures = result_failures(result)
+                if failures:
+                    # LLM 失败（超时 / 429 等）不抛异常，而是变成失败报告或带 error 的观望决策
+                    outcome.update(status=ROW_FAILED, error="; ".join(failures))
+                else:
+                    decision = result.get("decision") or {}
+                    outcome.update(
+                        status=ROW_SUCCEEDED,
+                        action=decision.get("action"),
+                        confidence=decision.get("confidence"),
+                        entry_point=decision.get("entry_point"),
+                        stop_loss=decision.get("stop_loss"),
+                        take_profit=decision.get("take_profit"),
+                        risk_reward_ratio=decision.get("risk_reward_ratio"),
+                        gate_passed=(result.get("signal_gate") or {}).get("passed"),
+                        html_report_path=result.get("html_report_path"),
+                    )
+            outcome["elapsed_seconds"] = round(time.time() - started, 2)
+            return index, outcome
+
+    def _finish_rows(self, index: int, outcome: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """把一次分析的结果写入它本身和所有重复行"""
+        finished = []
+        key = self.row_keys[index]
+        for row_index, row_key in enumerate(self.row_keys):
+            if row_key != key:
+                continue
+            row = _table_row(row_index, self.requests[row_index], outcome)
+            if row_index != index:
+                row["duplicate_of"] = index
+            self.table[row_index] = row
+            finished.append(row)
+        return finished
+
+    def _write_table(self) -> str:
+        rows = [
+            row if row is not None else _table_row(i, request, {"status": ROW_CANCELLED})
+            for i, (row, request) in enumerate(zip(self.table, self.requests))
+        ]
+        return write_table(rows, self.table_path)
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        批次事件流：start -> prefetched -> row（每行完成一条，重复行同时产出）-> done
+
+        消费方中途断开（生成器被关闭）时取消未完成的分析，已完成的行仍写入汇总表。
+        """
+        yield {
+            "type": "start",
+            "batch_id": self.batch_id,
+            "rows": len(self.requests),
+            "unique_rows": len(self.unique),
+            "concurrency": self.concurrency,
+        }
+
+        started = time.time()
+        windows = await self._prefetch()
+        yield {"type": "prefetched", "windows": windows, **self.market.stats()}
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.create_task(self._run_row(semaphore, index)) for index in self.unique.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, outcome = await next_done
+                for row in self._finish_rows(index, outcome):
+                    yield {"type": "row", **row}
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            try:
+                table_path = self._write_table()
+            except Exception as e:
+                logger.error(f"[{self.batch_id}] Failed to write batch table: {e}")
+                table_path = None
+
+        counts: Dict[str, int] = {}
+        for row in self.table:
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+        logger.info(f"[{self.batch_id}] Batch finished: {counts} in {time.time() - started:.1f}s")
+        yield {
+            "type": "done",
+            "batch_id": self.batch_id,
+            "counts": counts,
+            "elapsed_seconds": round(time.time() - started, 2),
+            "market_data": self.market.stats(),
+            "table_path": table_path,
+        }
@@ -0,0 +1,127 @@
+"""
+Engine Pool - TradingEngine 复用池
+按 (决策版本, 供应商, 模型, 温度, 备用模型) 缓存已构建好的 TradingEngine，
+复用其中的 ChatOpenAI 客户端（及底层 HTTP 连接池）和编译好的 LangGraph，
+避免每个分析请求都重新创建客户端、工具节点并编译图。
+配置重载（reload_config）时整池清空，下一次请求按新配置重建。
+被淘汰或清空的引擎只是移出池，仍在使用它的分析照常完成（备用模型登记随客户端对象一起回收）。
+引擎在线程中构建（编译图不阻塞事件循环），同一配置的并发首个请求共享同一次构建。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core import config as app_config
+from app.services.trading_engine import TradingEngine
+
+logger = logging.getLogger(__name__)
+
+# 池中最多保留的引擎数（不同配置组合），超出时淘汰最久未使用的
+DEFAULT_MAX_ENGINES = 8
+
+
+class EnginePool:
+    """线程安全的 TradingEngine LRU 池；编译后的图可被多个请求并发 ainvoke"""
+
+    def __init__(self, max_engines: int = DEFAULT_MAX_ENGINES):
+        self.max_engines = max_engines
+        self._engines: "OrderedDict[Tuple, TradingEngine]" = OrderedDict()
+        # 正在构建的引擎：同一配置的并发请求等待同一个构建任务
+        self._building: Dict[Tuple, asyncio.Task] = {}
+        # 每次清空加一，清空前开始的构建不再放入池中（按旧配置构建）
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "build_seconds": 0.0}
+
+    @staticmethod
+    def key_for(config: Optional[Dict[str, Any]] = None) -> Tuple:
+        """按当前配置解析出引擎的实际参数，作为池的键（与 TradingEngine 的取值规则一致）"""
+        config = config or {}
+        settings = app_config.settings
+
+        agent_temp = config.get("agent_llm_temperature")
+        graph_temp = config.get("graph_llm_temperature")
+        return (
+            config.get("decision_agent_version", "constrained"),
+            bool(config.get("include_decision_agent", True)),
+            settings.AGENT_PROVIDER,
+            config.get("agent_llm_model") or settings.AGENT_MODEL,
+            agent_temp if agent_temp is not None else settings.AGENT_TEMPERATURE,
+            settings.GRAPH_PROVIDER,
+            config.get("graph_llm_model") or settings.GRAPH_MODEL,
+            graph_temp if graph_temp is not None else settings.GRAPH_TEMPERATURE,
+            settings.AGENT_FALLBACK_PROVIDER,
+            settings.AGENT_FALLBACK_MODEL,
+            settings.GRAPH_FALLBACK_PROVIDER,
+            settings.GRAPH_FALLBACK_MODEL,
+            tuple(config.get("ensemble_versions") or ()),
+        )
+
+    async def get(self, config: Optional[Dict[str, Any]] = None) -> TradingEngine:
+        """获取（必要时构建）与配置对应的引擎"""
+        key = self.key_for(config)
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is not None:
+                self._engines.move_to_end(key)
+                self.stats["hits"] += 1
+                return engine
+            build = self._building.get(key)
+            if build is None:
+                build = asyncio.ensure_future(self._build(key, config, self._generation))
+                self._building[key] = build
+        # 构建任务不随某个请求的取消而中断，其他等待同一配置的请求仍可拿到结果
+        return await asyncio.shield(build)
+
+    async def _build(self, key: Tuple, config: Optional[Dict[str, Any]], generation: int) -> TradingEngine:
+        try:
+            started = time.perf_counter()
+            engine = await asyncio.to_thread(TradingEngine, config=config)
+            elapsed = time.perf_counter() - started
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+
+        with self._lock:
+            self.stats["misses"] += 1
+            self.stats["build_seconds"] += elapsed
+            if generation == self._generation:
+                self._engines[key] = engine
+                if len(self._engines) > self.max_engines:
+                    self._engines.popitem(last=False)
+                    self.stats["evictions"] += 1
+
+        logger.info(f"TradingEngine built in {elapsed * 1000:.0f}ms for {key}")
+        return engine
+
+    def clear(self):
+        """清空引擎池（配置重载时调用）"""
+        with self._lock:
+            count = len(self._engines)
+            self._engines.clear()
+            self._generation += 1
+            self.stats["invalidations"] += 1
+        if count:
+            logger.info(f"Engine pool cleared ({count} engines) after config reload")
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._engines)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._engines),
+                "max_engines": self.max_engines,
+                "keys": [list(key) for key in self._engines],
+                **self.stats,
+            }
+
+
+# 全局引擎池实例
+engine_pool = EnginePool()
+app_config.add_reload_listener(engine_pool.clear)
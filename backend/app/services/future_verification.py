@@ -0,0 +1,143 @@
+"""
+Future Verification - 回测验证数据
+在 to_end / date_range 模式下获取分析时间点之后的真实K线并绘制验证图。
+该阶段不依赖 AI 分析结果，由接口在后台线程中与 Agent 图并发执行，最后再合并进结果。
+"""
+
+import logging
+from typing import Any, Dict, Optional, Union
+
+import pandas as pd
+
+from app.services.market_data import MarketDataService
+
+logger = logging.getLogger(__name__)
+
+
+def timeframe_delta(tf: str) -> Optional[pd.Timedelta]:
+    """把时间框架字符串转换为单根K线的时间跨度"""
+    if tf == '1mo':
+        return pd.Timedelta(days=31)
+    if tf == '1w':
+        return pd.Timedelta(weeks=1)
+    # 尝试将 m 替换为 min (pandas 使用 min 表示分钟，避免歧义)
+    # 注意：要避免把 1mo 替换成 1mino
+    if tf.endswith('m') and not tf.endswith('mo'):
+        tf = tf.replace('m', 'min')
+    return pd.Timedelta(tf)
+
+
+def fetch_future_verification(
+    market_service: MarketDataService,
+    symbol: str,
+    timeframe: str,
+    df: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
+    future_kline_count: int,
+    end_dt_str: Optional[str] = None,
+    render_chart: bool = True,
+) -> Dict[str, Any]:
+    """
+    获取未来K线并生成验证图（同步，供 asyncio.to_thread 调用）
+
+    Args:
+        market_service: 行情服务
+        symbol: 交易对
+        timeframe: 结果使用的时间框架（多时间框架模式下为逗号连接的字符串）
+        df: 主分析数据（单个 DataFrame 或 {timeframe: DataFrame}）
+        future_kline_count: 需要的未来K线数量
+        end_dt_str: 分析截止时间，作为未来数据的起点
+        render_chart: 是否生成 base64 验证图（spec 模式下由前端绘制）
+
+    Returns:
+        dict: {"future_df", "future_kline_data", "future_kline_chart_base64"}，失败时各项为空
+    """
+    result: Dict[str, Any] = {
+        "future_df": None,
+        "future_kline_data": [],
+        "future_kline_chart_base64": None,
+    }
+
+    try:
+        # 关键修复：直接使用用户指定的结束时间作为未来数据的起始时间
+        # 避免从 df.index[-1] 转换带来的格式或时区问题
+        # end_dt_str 已经在前面构造好，格式为 "YYYY-MM-DD HH:MM:00"，这是 API 验证通过的格式
+        future_start_str = end_dt_str
+
+        # 如果因为某种原因 end_dt_str 为空（防御性编程），则回退到 last_dt
+        if not future_start_str:
+            # 多时间框架模式下，使用第一个时间框架的数据
+            reference_df = df[list(df.keys())[0]] if isinstance(df, dict) else df
+            last_dt = reference_df.index[-1]
+            future_start_str = last_dt.strftime("%Y-%m-%d %H:%M:%S")
+
+        logger.info(f"Fetching future verification data starting from {future_start_str}...")
+
+        # 多时间框架模式下，使用第一个时间框架
+        tf = timeframe.split(",")[0] if "," in timeframe else timeframe
+
+        # 计算未来的结束时间，以确保 API 能返回我们需要的数据范围
+        # 假设 API 忽略 start_time，只看 end_time，且返回 end_time 之前的 limit 条
+        future_end_str = None
+        try:
+            delta = timeframe_delta(tf)
+            if delta:
+                # 加上缓冲，确保覆盖所需范围
+                # 比如需要 13 条，我们计算 13+20 条的时间跨度
+                total_delta = delta * (future_kline_count + 20)
+                future_end_dt = pd.to_datetime(future_start_str) + total_delta
+                future_end_str = future_end_dt.strftime("%Y-%m-%d %H:%M:%S")
+                logger.info(f"Calculated future end date: {future_end_str}")
+        except Exception as e:
+            logger.warning(f"Failed to calculate future end date: {e}")
+
+        # 获取比请求多一点的数据，以便过滤
+        # 如果 future_end_str 有值，就用它。否则用 None (默认到 Now)
+        future_df = market_service.get_ohlcv_data(
+            symbol=symbol,
+            timeframe=tf,
+            limit=future_kline_count + 50,  # 大幅增加 limit 以防止不足
+            start_date=future_start_str,
+            end_date=future_end_str
+        )
+
+        if future_df is None or future_df.empty:
+            return result
+
+        # 过滤掉已经包含在主分析数据中的时间点
+        reference_df = df[tf] if isinstance(df, dict) else df
+        last_dt = reference_df.index[-1]
+        future_df = future_df[future_df.index > last_dt]
+
+        # 截取用户请求的数量
+        future_df = future_df.head(future_kline_count)
+        if future_df.empty:
+            return result
+
+        # 1. 生成图表（spec 模式下由前端绘制，HTML 导出时再按需生成）
+        if render_chart:
+            from app.utils.chart_generator import chart_generator
+            result["future_kline_chart_base64"] = chart_generator.generate_kline_chart(
+                future_df,
+                title=f"未来{len(future_df)}根K线走势 (回测验证)"
+            )
+
+        # 2. 准备数据列表
+        future_df_reset = future_df.reset_index()
+        # 处理索引列名
+        date_col = 'Date' if 'Date' in future_df_reset.columns else 'index'
+        if date_col in future_df_reset.columns:
+            future_df_reset[date_col] = future_df_reset[date_col].dt.strftime('%Y-%m-%d %H:%M:%S')
+            future_df_reset.rename(columns={date_col: 'datetime'}, inplace=True)
+
+        # 转换为全小写列名
+        future_df_reset.columns = [str(c).lower() for c in future_df_reset.columns]
+
+        result["future_df"] = future_df
+        result["future_kline_data"] = future_df_reset.to_dict(orient='records')
+        logger.info(f"Successfully fetched {len(result['future_kline_data'])} future klines for verification")
+
+    except Exception as e:
+        logger.warning(f"Failed to fetch future verification data: {e}")
+        # 不阻断主流程，只是没有未来数据而已
+
+    return result
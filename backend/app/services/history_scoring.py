@@ -0,0 +1,159 @@
+"""
+History Scoring - 对 data/history 中的全部历史分析做批量交易评估
+历史记录 JSON 含 base64 图表，单个文件较大，解析是主要耗时：
+- 多进程并行读取，每个文件只提取决策、未来K线和元数据（交易对 / 时间框架 / 决策版本 / 模型）
+- 提取结果按文件修改时间缓存在内存中，重复评分（如切换 ambiguity 规则）无需重新解析
+- 所有决策对齐为K线矩阵后用 trade_evaluator.evaluate_batch 一次向量化评估
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.trade_evaluator import (
+    AMBIGUITY_STOP_FIRST, aggregate_evaluations, align_klines, batch_records, evaluate_batch,
+    parse_direction, parse_price,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DIR = Path("data") / "history"
+
+# 文件数少于该值时直接在当前进程读取（进程池启动开销不划算）
+PARALLEL_THRESHOLD = 64
+
+
+def _extract(path: str) -> Optional[Dict[str, Any]]:
+    """读取一个历史文件，只保留评分需要的字段；没有决策或未来K线时返回 None（在子进程中执行）"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+    except Exception:
+        return None
+    decision = result.get("decision")
+    klines = result.get("future_kline_data")
+    if not isinstance(decision, dict) or not klines:
+        return None
+
+    return {
+        "result_id": result.get("result_id") or Path(path).stem,
+        "asset": result.get("asset"),
+        "timeframe": result.get("timeframe"),
+        "ai_version": result.get("agent_version"),
+        "model": ((result.get("llm_config") or {}).get("agent") or {}).get("model"),
+        "analysis_time": result.get("analysis_time_display"),
+        "action": decision.get("action") or decision.get("decision"),
+        "entry_point": decision.get("entry_point"),
+        "stop_loss": decision.get("stop_loss"),
+        "take_profit": decision.get("take_profit"),
+        "klines": [
+            {key: k.get(key) for key in ("open", "high", "low", "close")}
+            for k in klines if isinstance(k, dict)
+        ],
+    }
+
+
+class HistoryScorer:
+    """历史记录评分（提取结果按文件路径 + 修改时间缓存）"""
+
+    def __init__(self, history_dir: Path = DEFAULT_HISTORY_DIR):
+        self.history_dir = Path(history_dir)
+        self._cache: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+
+    def _history_files(self) -> List[Path]:
+        if not self.history_dir.exists():
+            return []
+        return sorted(self.history_dir.glob("*/*.json"))
+
+    def _load(self, workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        files = self._history_files()
+        stale = []
+        for path in files:
+            cached = self._cache.get(str(path))
+            if cached is None or cached[0] != path.stat().st_mtime:
+                stale.append(str(path))
+
+        if stale:
+            if len(stale) >= PARALLEL_THRESHOLD:
+                with ProcessPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+                    extracted = list(pool.map(_extract, stale, chunksize=32))
+            else:
+                extracted = [_extract(path) for path in stale]
+            for path, item in zip(stale, extracted):
+                self._cache[path] = (os.path.getmtime(path), item)
+
+        live = {str(path) for path in files}
+        for path in list(self._cache):
+            if path not in live:
+                self._cache.pop(path)
+        return [self._cache[str(path)][1] for path in files if self._cache[str(path)][1] is not None]
+
+    def score(self, ambiguity: str = AMBIGUITY_STOP_FIRST, max_bars: Optional[int] = None,
+              workers: Optional[int] = None, include_records: bool = False) -> Dict[str, Any]:
+        """
+        评估全部历史分析
+
+        Returns:
+            dict: files, scored, summary（总体 / 按决策版本 / 按模型 / 按交易对），
+            include_records=True 时附带逐条评估
+        """
+        started = time.time()
+        items = self._load(workers)
+        load_seconds = time.time() - started
+
+        directions = [parse_direction(item["action"]) for item in items]
+        klines = [item["klines"] for item in items]
+        entries = [
+            parse_price(item["entry_point"]) or (parse_price(k[0]["open"]) if k else None)
+            for item, k in zip(items, klines)
+        ]
+        arrays = align_klines(klines, max_bars=max_bars)
+        batch = evaluate_batch(
+            directions,
+            [e if e is not None else float("nan") for e in entries],
+            [parse_price(item["stop_loss"]) for item in items],
+            [parse_price(item["take_profit"]) for item in items],
+            arrays["open"], arrays["high"], arrays["low"], arrays["close"],
+            ambiguity=ambiguity,
+        )
+        evaluations = batch_records(batch)
+
+        records = [
+            {**{k: v for k, v in item.items() if k != "klines"}, "evaluation": evaluation}
+            for item, evaluation in zip(items, evaluations)
+        ]
+
+        def group(field: str) -> Dict[str, Any]:
+            groups: Dict[str, List[Dict[str, Any]]] = {}
+            for record in records:
+                groups.setdefault(record.get(field) or "unknown", []).append(record["evaluation"])
+            return {key: aggregate_evaluations(values) for key, values in groups.items()}
+
+        summary = {
+            "overall": aggregate_evaluations(evaluations),
+            "by_ai_version": group("ai_version"),
+            "by_model": group("model"),
+            "by_asset": group("asset"),
+        }
+        elapsed = time.time() - started
+        logger.info(f"Scored {len(records)} history results in {elapsed:.2f}s (load {load_seconds:.2f}s)")
+
+        response = {
+            "files": len(self._cache),
+            "scored": len(records),
+            "ambiguity": ambiguity,
+            "load_seconds": round(load_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "summary": summary,
+        }
+        if include_records:
+            response["records"] = records
+        return response
+
+
+# 全局历史评分实例
+history_scorer = HistoryScorer()
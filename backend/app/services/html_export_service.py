@@ -60,12 +60,37 @@ class HTMLExportService:
             except:
                 return str(data)
 
+    def _ensure_future_chart(self, result: Dict[str, Any]) -> None:
+        """
+        Render the future verification chart on demand.
+        In chart_mode="spec" the endpoint skips rendering it, so the report builds it from future_kline_data.
+        """
+        if result.get("future_kline_chart_base64") or not result.get("future_kline_data"):
+            return
+        try:
+            import pandas as pd
+            from app.utils.chart_generator import chart_generator
+
+            future_df = pd.DataFrame(result["future_kline_data"])
+            time_col = "datetime" if "datetime" in future_df.columns else "date"
+            future_df[time_col] = pd.to_datetime(future_df[time_col])
+            future_df = future_df.set_index(time_col)
+            future_df.columns = [str(c).capitalize() for c in future_df.columns]
+
+            result["future_kline_chart_base64"] = chart_generator.generate_kline_chart(
+                future_df,
+                title=f"未来{len(future_df)}根K线走势 (回测验证)"
+            )
+        except Exception as e:
+            print(f"Error rendering future verification chart: {e}")
+
     def generate_html(self, result_data: Dict[str, Any]) -> str:
         """
         Generates the HTML string from the result data.
         """
         # Sanitize data first to prevent serialization errors
         safe_result = self._sanitize_data(result_data)
+        self._ensure_future_chart(safe_result)
         
         template = self.env.get_template("output.html")
         
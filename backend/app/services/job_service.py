@@ -0,0 +1,294 @@
+"""
+Job Service - 异步分析任务队列
+POST /jobs/ 立即返回 job_id，分析在后台按固定并发的工作协程池中执行，客户端轮询状态和结果，
+断线后可凭 job_id 重新获取，也可以取消：取消会向分析任务抛出 CancelledError，
+LangGraph 节点和进行中的 LLM 请求（httpx 连接）随之中止。
+- 任务状态持久化到 data/jobs/<job_id>.json；结果由分析流程写入历史记录（data/history）
+- 服务重启后：排队中的任务重新入队，运行中的任务标记为失败
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core import config as app_config
+from app.models.schemas.analyze import AnalyzeRequest
+from app.services.analysis_service import allocate_result_id, response_payload, run_analysis, validate_request
+from app.services.history_service import history_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_DIR = Path("data") / "jobs"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+TERMINAL_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+# 内存中保留的任务数（更早的任务仍可从磁盘读取）
+MAX_JOBS_IN_MEMORY = 500
+# 内存中缓存的已完成结果数（超出后从历史记录读取）
+MAX_CACHED_RESULTS = 20
+# 取消运行中的任务后，等待其真正结束的最长时间（秒）
+CANCEL_WAIT_SECONDS = 5.0
+
+
+class JobQueueFull(RuntimeError):
+    """排队任务数已达上限"""
+
+
+class JobManager:
+    """分析任务队列：asyncio.Queue + ANALYSIS_JOB_CONCURRENCY 个工作协程"""
+
+    def __init__(self, job_dir: Path = DEFAULT_JOB_DIR):
+        self.job_dir = Path(job_dir)
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._requests: Dict[str, AnalyzeRequest] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        # 仍在排队的任务：取消的任务留在 asyncio.Queue 中直到被工作协程取出，不能用 qsize() 计数
+        self._queued: set = set()
+        self._workers: List[asyncio.Task] = []
+        self._closing = False
+
+    # ---- 持久化 ----
+
+    def _path(self, job_id: str) -> Path:
+        return self.job_dir / f"{job_id}.json"
+
+    def _save(self, job: Dict[str, Any]):
+        try:
+            self.job_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(job["job_id"])
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(job, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Failed to persist job {job.get('job_id')}: {e}")
+
+    def _remember(self, job: Dict[str, Any]):
+        self._jobs[job["job_id"]] = job
+        self._jobs.move_to_end(job["job_id"])
+        while len(self._jobs) > MAX_JOBS_IN_MEMORY:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest["status"] not in TERMINAL_STATES:
+                break
+            self._jobs.pop(oldest_id)
+
+    def _load(self) -> List[str]:
+        """读取磁盘上的任务；返回需要重新入队的任务 ID"""
+        if not self.job_dir.exists():
+            return []
+        paths = sorted(self.job_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)[-MAX_JOBS_IN_MEMORY:]
+        requeue = []
+        for path in paths:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable job file {path.name}: {e}")
+                continue
+
+            if job.get("status") == JOB_QUEUED:
+                try:
+                    self._requests[job["job_id"]] = AnalyzeRequest(**job["request"])
+                    requeue.append(job["job_id"])
+                except Exception as e:
+                    job.update(status=JOB_FAILED, error=f"任务请求无法恢复: {e}", finished_at=time.time())
+                    self._save(job)
+            elif job.get("status") == JOB_RUNNING:
+                job.update(status=JOB_FAILED, error="服务重启，任务中断", finished_at=time.time())
+                self._save(job)
+            self._remember(job)
+        return requeue
+
+    # ---- 生命周期 ----
+
+    async def start(self):
+        """启动工作协程（应用启动时调用），并恢复上次未执行的排队任务"""
+        if self._queue is not None:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue()
+        concurrency = max(1, app_config.settings.ANALYSIS_JOB_CONCURRENCY)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(concurrency)]
+        requeue = self._load()
+        for job_id in requeue:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+        logger.info(f"Job manager started with {concurrency} workers ({len(requeue)} jobs requeued)")
+
+    async def shutdown(self):
+        """取消运行中的任务和工作协程（应用关闭时调用）"""
+        self._closing = True
+        tasks = list(self._tasks.values()) + self._workers
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._queued.clear()
+
+    # ---- 提交 / 查询 / 取消 ----
+
+    async def submit(self, request: AnalyzeRequest) -> Dict[str, Any]:
+        """
+        Raises:
+            InvalidAnalysisRequest: 请求参数不合法（提交时校验，不等到执行时才失败）
+            JobQueueFull: 排队任务已达上限
+        """
+        validate_request(request)
+        await self.start()
+        if len(self._queued) >= app_config.settings.ANALYSIS_JOB_QUEUE_LIMIT:
+            raise JobQueueFull(f"排队任务已达上限 ({app_config.settings.ANALYSIS_JOB_QUEUE_LIMIT})")
+
+        job = {
+            "job_id": uuid.uuid4().hex[:12],
+            "result_id": allocate_result_id(request),
+            "status": JOB_QUEUED,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "request": request.model_dump(),
+        }
+        self._requests[job["job_id"]] = request
+        self._remember(job)
+        self._save(job)
+        self._queued.add(job["job_id"])
+        self._queue.put_nowait(job["job_id"])
+        logger.info(f"[{job['result_id']}] Job {job['job_id']} queued (queue size {len(self._queued)})")
+        return self.view(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None and self._path(job_id).exists():
+            try:
+                with open(self._path(job_id), "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except Exception:
+                return None
+        return self.view(job) if job else None
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        jobs = list(self._jobs.values())[-limit:]
+        return [self.view(job) for job in reversed(jobs)]
+
+    def get_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """已完成任务的结果（优先内存，其次历史记录）"""
+        if job_id in self._results:
+            return self._results[job_id]
+        job = self.get(job_id)
+        if not job or job["status"] != JOB_SUCCEEDED:
+            return None
+        result = history_service.get_result(job["result_id"])
+        if result and job.get("chart_mode") == "spec":
+            from app.utils.chart_spec import strip_chart_images
+            result = strip_chart_images(result)
+        return result
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job["status"] == JOB_QUEUED:
+            # 工作协程取到后会跳过
+            job.update(status=JOB_CANCELLED, finished_at=time.time())
+            self._requests.pop(job_id, None)
+            self._queued.discard(job_id)
+            self._save(job)
+        elif job["status"] == JOB_RUNNING:
+            task = self._tasks.get(job_id)
+            if task is not None:
+                task.cancel()
+                await asyncio.wait([task], timeout=CANCEL_WAIT_SECONDS)
+        return self.view(job)
+
+    @staticmethod
+    def view(job: Dict[str, Any]) -> Dict[str, Any]:
+        """对外返回的任务信息（请求参数只保留关键字段）"""
+        request = job.get("request") or {}
+        return {
+            "job_id": job["job_id"],
+            "result_id": job.get("result_id"),
+            "status": job.get("status"),
+            "error": job.get("error"),
+            "created_at": job.get("created_at"),
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at"),
+            "asset": request.get("asset"),
+            "timeframe": request.get("timeframes") if request.get("multi_timeframe_mode") else request.get("timeframe"),
+            "chart_mode": request.get("chart_mode"),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "workers": len(self._workers),
+            "queued": len(self._queued),
+            "running": len(self._tasks),
+            "counts": counts,
+        }
+
+    # ---- 执行 ----
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._execute(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {index} failed on {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job_id: str):
+        job = self._jobs.get(job_id)
+        request = self._requests.pop(job_id, None)
+        if job is None or job["status"] != JOB_QUEUED or request is None:
+            return
+
+        job.update(status=JOB_RUNNING, started_at=time.time())
+        self._save(job)
+
+        # 独立任务运行：run_analysis 绑定的 contextvars 不影响工作协程，取消时只中止这一次分析
+        task = asyncio.create_task(run_analysis(request, job["result_id"]))
+        self._tasks[job_id] = task
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            job.update(status=JOB_CANCELLED, finished_at=time.time())
+            logger.info(f"[{job['result_id']}] Job {job_id} cancelled")
+            if self._closing:
+                raise
+        except Exception as e:
+            job.update(status=JOB_FAILED, error=str(e), finished_at=time.time())
+        else:
+            # 命中结果缓存时指向首次分析的 result_id，重启后从历史记录读取结果
+            job.update(status=JOB_SUCCEEDED, result_id=result.get("result_id", job["result_id"]), finished_at=time.time())
+            self._results[job_id] = response_payload(request, result)
+            while len(self._results) > MAX_CACHED_RESULTS:
+                self._results.popitem(last=False)
+        finally:
+            self._tasks.pop(job_id, None)
+            self._save(job)
+
+
+# 全局任务管理器
+job_manager = JobManager()
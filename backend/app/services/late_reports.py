@@ -0,0 +1,162 @@
+"""
+Late Reports - 超过分析师截止时间的报告补写
+分析师未在 ANALYST_DEADLINE 内完成时，决策阶段用已到达的报告先行（缺失的报告键记录在 missing_reports），
+超时的分析师继续在后台运行；完成后把报告补写到该次分析的历史记录，并推送 late_report 消息。
+
+- 报告先于历史记录保存到达时暂存，run_analysis 保存历史后调用 mark_saved 再补写
+- 超过 ANALYST_LATE_GRACE 仍未完成的分析师被取消；分析失败或被取消时 discard 取消全部后台分析师
+- 只更新历史记录（报告、图表、market_data.analysis、llm_usage），已生成的 HTML 报告不重新生成
+"""
+
+import asyncio
+import datetime
+import logging
+import threading
+from typing import Any, Dict, List, Set, Tuple
+
+from app.core import config as app_config
+from app.core.llm_usage import usage_ledger
+from app.core.progress import publish_late_report
+from app.services.history_service import history_service
+
+logger = logging.getLogger(__name__)
+
+# 报告键 → market_data.analysis 中的字段
+ANALYSIS_FIELDS = {
+    "indicator_report": "indicators",
+    "pattern_report": "patterns",
+    "trend_report": "trend",
+}
+# 图片键 → 结果中供前端和 HTML 导出使用的图表字段
+CHART_FIELDS = {
+    "pattern_image": "pattern_chart",
+    "trend_image": "trend_chart",
+}
+
+
+class LateReports:
+    """跟踪超时的分析师任务，完成后补写历史记录（除文件写入外都在事件循环中执行）"""
+
+    def __init__(self):
+        # result_id → 历史记录保存前已到达的 [(节点名, 报告键, 输出)]
+        self._pending: Dict[str, List[Tuple[str, str, Dict[str, Any]]]] = {}
+        # 历史记录已保存、报告到达后可直接补写的 result_id
+        self._saved: Set[str] = set()
+        self._watchers: Dict[str, Set[asyncio.Task]] = {}
+        # 同一结果的多个迟到报告串行读写历史记录
+        self._write_lock = threading.Lock()
+        self.stats = {"late": 0, "attached": 0, "expired": 0, "failed": 0, "discarded": 0}
+
+    def track(self, result_id: str, node_name: str, task: asyncio.Future, output_keys: Tuple[str, ...]):
+        """接管一个超时的分析师任务"""
+        self.stats["late"] += 1
+        watcher = asyncio.ensure_future(self._watch(result_id, node_name, task, output_keys))
+        self._watchers.setdefault(result_id, set()).add(watcher)
+        watcher.add_done_callback(lambda w: self._forget(result_id, w))
+
+    def _forget(self, result_id: str, watcher: asyncio.Task):
+        watchers = self._watchers.get(result_id)
+        if watchers is None:
+            return
+        watchers.discard(watcher)
+        if not watchers:
+            self._watchers.pop(result_id, None)
+            if result_id not in self._pending:
+                self._saved.discard(result_id)
+
+    async def _watch(self, result_id: str, node_name: str, task: asyncio.Future, output_keys: Tuple[str, ...]):
+        grace = app_config.settings.ANALYST_LATE_GRACE
+        try:
+            result = await asyncio.wait_for(task, timeout=grace if grace > 0 else None)
+        except asyncio.TimeoutError:
+            self.stats["expired"] += 1
+            logger.warning(f"[{result_id}] {node_name} still running after late grace, cancelled")
+            return
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.warning(f"[{result_id}] Late {node_name} failed: {e}")
+            return
+
+        report_key = output_keys[1]
+        output = {key: result[key] for key in output_keys if key in result and key != "messages"}
+        logger.info(f"[{result_id}] Late {node_name} finished, attaching {report_key}")
+        if result_id in self._saved:
+            await self._attach_and_publish(result_id, node_name, report_key, output)
+        else:
+            self._pending.setdefault(result_id, []).append((node_name, report_key, output))
+
+    async def mark_saved(self, result_id: str):
+        """历史记录已保存：补写已到达的报告，之后到达的报告直接补写"""
+        if result_id not in self._watchers and result_id not in self._pending:
+            return
+        self._saved.add(result_id)
+        for node_name, report_key, output in self._pending.pop(result_id, []):
+            await self._attach_and_publish(result_id, node_name, report_key, output)
+        if result_id not in self._watchers:
+            self._saved.discard(result_id)
+
+    def discard(self, result_id: str):
+        """分析失败或被取消：取消后台分析师并丢弃已到达的报告"""
+        watchers = self._watchers.pop(result_id, set())
+        pending = self._pending.pop(result_id, [])
+        self._saved.discard(result_id)
+        for watcher in watchers:
+            watcher.cancel()
+        if watchers or pending:
+            self.stats["discarded"] += len(watchers) + len(pending)
+
+    async def _attach_and_publish(self, result_id: str, node_name: str, report_key: str, output: Dict[str, Any]):
+        # 文件读写放到线程中，WebSocket 推送需要在事件循环中发出
+        if await asyncio.to_thread(self._attach, result_id, node_name, report_key, output):
+            self.stats["attached"] += 1
+            publish_late_report(result_id, node_name, list(output))
+
+    def _attach(self, result_id: str, node_name: str, report_key: str, output: Dict[str, Any]) -> bool:
+        with self._write_lock:
+            data = history_service.get_result(result_id)
+            if data is None:
+                self.stats["failed"] += 1
+                logger.warning(f"[{result_id}] History not found, dropping late {report_key}")
+                return False
+
+            data.update(output)
+            data["missing_reports"] = [key for key in data.get("missing_reports") or [] if key != report_key]
+            data.setdefault("late_reports", {})[node_name] = {
+                "report_key": report_key,
+                "arrived_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            }
+            analysis = (data.get("market_data") or {}).get("analysis")
+            if isinstance(analysis, dict) and report_key in ANALYSIS_FIELDS:
+                analysis[ANALYSIS_FIELDS[report_key]] = output.get(report_key)
+            for image_key, chart_key in CHART_FIELDS.items():
+                if output.get(image_key):
+                    data[chart_key] = output[image_key]
+            # 保存历史时迟到分析师尚未完成，用量汇总需要重新计算才包含它们的调用
+            usage = usage_ledger.summary_for(result_id)
+            if usage["calls"]:
+                data["llm_usage"] = usage
+
+            try:
+                history_service.save_result(result_id, data)
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"[{result_id}] Failed to attach late {report_key}: {e}")
+                return False
+        logger.info(f"[{result_id}] Attached late {report_key} to history")
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "deadline": app_config.settings.ANALYST_DEADLINE,
+            "grace": app_config.settings.ANALYST_LATE_GRACE,
+            **self.stats,
+            "running": sum(len(watchers) for watchers in self._watchers.values()),
+            "pending": sum(len(reports) for reports in self._pending.values()),
+        }
+
+
+# 全局迟到报告跟踪
+late_reports = LateReports()
@@ -0,0 +1,271 @@
+"""
+Result Cache - 历史窗口分析的结果级缓存
+to_end / date_range 请求的K线不再变化，相同的交易对 / 时间框架 / 截止时间 / 决策版本 / 模型配置
+重复提交时直接返回已保存的结果（同一个 result_id），不再拉取行情、绘图或调用 LLM；
+相同请求正在执行时等待那一次的结果，而不是再跑一遍。
+
+- 键：sha256(规范化的请求参数 + 模型配置指纹)，流式 / 会话 / LLM 缓存开关等不影响结果的字段不参与
+- 可缓存条件：历史窗口，且截止时间加上未来验证K线都已收盘（否则K线和验证数据还会变化）
+- 存储：data/result_cache/<前两位>/<键>.json 只记录 result_id、K线指纹和模型指纹，结果本身从历史记录读取；
+  历史记录被删除时视为未命中
+- force_refresh：忽略已有结果重新执行，新结果覆盖缓存；K线指纹与上次不同时记录 data_changed
+- 不完整的结果不写入缓存，下次相同请求重新执行：分析异常、分析师或决策 LLM 调用失败（超时 / 429 等，
+  见 result_status）、多版本决策中有失败的版本、请求了未来验证但没有拿到验证K线、有分析师超时（missing_reports 非空）
+"""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+import pandas as pd
+
+from app.core import config as app_config
+from app.models.schemas.analyze import AnalyzeRequest
+from app.services.future_verification import timeframe_delta
+from app.services.history_service import history_service
+from app.services.result_status import result_failures
+from app.services.signal_gate import gate_enabled
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+DEFAULT_RESULT_CACHE_DIR = BASE_DIR / "data" / "result_cache"
+
+# 内存中保留的已命中结果数（超出后从历史记录读取）
+MAX_RESULTS_IN_MEMORY = 32
+# 参与缓存键的请求字段（stream / session_id / use_llm_cache / force_refresh / analyst_deadline 不影响完整结果）
+KEY_FIELDS = (
+    "asset", "timeframe", "data_source", "data_method", "kline_count", "future_kline_count",
+    "ai_version", "multi_timeframe_mode", "timeframes", "chart_mode", "pattern_mode", "ensemble_versions",
+)
+
+
+def candle_fingerprint(df: Union[pd.DataFrame, Dict[str, pd.DataFrame]]) -> str:
+    """K线数据指纹（多周期模式按时间框架排序后合并）"""
+    frames = df if isinstance(df, dict) else {"": df}
+    digest = hashlib.sha256()
+    for timeframe in sorted(frames):
+        digest.update(timeframe.encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(frames[timeframe], index=True).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def model_fingerprint(request: AnalyzeRequest) -> Dict[str, Any]:
+    """影响结果的模型与预筛选配置（不含 API Key）"""
+    settings = app_config.settings
+    fingerprint = {
+        role: {k: cfg.get(k) for k in ("provider", "model", "temperature", "base_url")}
+        for role, cfg in (("agent", settings.get_agent_config()), ("graph", settings.get_graph_config()))
+    }
+    if gate_enabled(request.signal_gate):
+        fingerprint["signal_gate"] = [
+            settings.GATE_MIN_SIGNAL_AGREEMENT, settings.GATE_MIN_ATR_PCT, settings.GATE_TRENDLINE_ATR,
+        ]
+    return fingerprint
+
+
+def window_closed(request: AnalyzeRequest) -> bool:
+    """截止时间之后的未来验证K线也都已收盘"""
+    if request.data_method not in ("to_end", "date_range") or not request.end_date:
+        return False
+    try:
+        end = datetime.datetime.strptime(f"{request.end_date} {request.end_time or '23:59'}", "%Y-%m-%d %H:%M")
+        timeframes = request.timeframes if request.multi_timeframe_mode and request.timeframes else [request.timeframe]
+        longest = max(timeframe_delta(tf).to_pytimedelta() for tf in timeframes)
+    except Exception:
+        return False
+    return end + longest * (request.future_kline_count + 1) <= datetime.datetime.now()
+
+
+def request_key(request: AnalyzeRequest) -> Optional[str]:
+    """可缓存请求的键；实时窗口返回 None"""
+    if not app_config.settings.RESULT_CACHE_ENABLED or not window_closed(request):
+        return None
+    params = {field: getattr(request, field) for field in KEY_FIELDS}
+    params["asset"] = params["asset"].upper()
+    params["end"] = f"{request.end_date} {request.end_time}"
+    if request.data_method == "date_range":
+        params["start"] = f"{request.start_date} {request.start_time}"
+    params["signal_gate"] = gate_enabled(request.signal_gate)
+    payload = json.dumps({"request": params, "models": model_fingerprint(request)}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """结果缓存：磁盘索引 + 执行中请求的合并"""
+
+    def __init__(self, cache_dir: Path = DEFAULT_RESULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0, "inflight_hits": 0, "misses": 0, "refreshes": 0,
+            "uncacheable": 0, "stores": 0, "stale": 0, "data_changed": 0, "incomplete": 0,
+        }
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _read_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        """已保存的结果；索引指向的历史记录不存在时删除索引"""
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        entry = self._read_entry(key)
+        if entry is None:
+            return None
+        result = history_service.get_result(entry["result_id"])
+        if result is None:
+            self._count("stale")
+            self._path(key).unlink(missing_ok=True)
+            return None
+        self._remember(key, result)
+        return result
+
+    def _remember(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > MAX_RESULTS_IN_MEMORY:
+                self._results.popitem(last=False)
+
+    @staticmethod
+    def _incomplete(request: AnalyzeRequest, result: Dict[str, Any]) -> bool:
+        """失败、缺少未来验证数据或缺少分析师报告的结果（多为暂时性问题，不能长期复用）"""
+        if result_failures(result) or result.get("missing_reports"):
+            return True
+        return request.future_kline_count > 0 and not result.get("future_kline_data")
+
+    def _store(self, key: str, request: AnalyzeRequest, result: Dict[str, Any]):
+        if self._incomplete(request, result):
+            self._count("incomplete")
+            logger.info(f"[{result.get('result_id')}] Incomplete result, not cached")
+            return
+        fingerprint = result.get("data_fingerprint")
+        previous = self._read_entry(key)
+        if previous and fingerprint and previous.get("data_fingerprint") not in (None, fingerprint):
+            self._count("data_changed")
+            logger.warning(f"[{result['result_id']}] Candles changed since cached result {previous['result_id']}")
+        entry = {
+            "result_id": result["result_id"],
+            "data_fingerprint": fingerprint,
+            "models": model_fingerprint(request),
+            "request": request.model_dump(
+                exclude={"stream", "session_id", "use_llm_cache", "force_refresh", "analyst_deadline"}
+            ),
+            "created_at": time.time(),
+        }
+        try:
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"[{result['result_id']}] Failed to write result cache entry: {e}")
+            return
+        self._remember(key, result)
+        self._count("stores")
+
+    @staticmethod
+    def _tagged(result: Dict[str, Any], source: str) -> Dict[str, Any]:
+        return {**result, "result_cache": {"hit": True, "source": source, "cached_result_id": result.get("result_id")}}
+
+    async def run(self, request: AnalyzeRequest,
+                  pipeline: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        命中时返回已保存或执行中的相同请求的结果（带 result_cache 标记），否则执行 pipeline 并写入缓存
+
+        相同请求的执行方被取消时，等待方改为自己执行；执行方失败时等待方收到同一个异常。
+        """
+        key = request_key(request)
+        if key is None:
+            self._count("uncacheable")
+            return await pipeline()
+
+        if not request.force_refresh:
+            result = await asyncio.to_thread(self._load, key)
+            if result is not None:
+                self._count("hits")
+                logger.info(f"Result cache hit: {result.get('result_id')} ({request.asset} {request.timeframe})")
+                return self._tagged(result, "stored")
+
+            future = self._inflight.get(key)
+            if future is not None:
+                try:
+                    result = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        raise
+                else:
+                    self._count("inflight_hits")
+                    return self._tagged(result, "in_flight")
+
+        self._count("refreshes" if request.force_refresh else "misses")
+        future = asyncio.get_running_loop().create_future()
+        # 等待方可能没有 await（全部提前退出），避免"异常未被获取"的警告
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            result = await pipeline()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            await asyncio.to_thread(self._store, key, request, result)
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                self._inflight.pop(key)
+
+    def clear(self):
+        """删除全部缓存索引（历史记录保留）"""
+        with self._lock:
+            self._results.clear()
+        if not self.cache_dir.exists():
+            return
+        for path in self.cache_dir.glob("*/*.json"):
+            path.unlink(missing_ok=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            cached_in_memory = len(self._results)
+        lookups = stats["hits"] + stats["inflight_hits"] + stats["misses"]
+        return {
+            "enabled": app_config.settings.RESULT_CACHE_ENABLED,
+            **stats,
+            "hit_ratio": round((stats["hits"] + stats["inflight_hits"]) / lookups, 3) if lookups else None,
+            "in_flight": len(self._inflight),
+            "cached_in_memory": cached_in_memory,
+        }
+
+
+# 全局结果缓存
+result_cache = ResultCache()
@@ -0,0 +1,41 @@
+"""
+Result Status - 判断一次分析结果是否完整
+LLM 调用失败通常不会以异常形式出现：分析师失败变成"执行失败"报告（failed_reports），
+决策失败变成带 error 的观望决策，决策输出无法解析时 signal_type 为 "Error"。
+结果缓存、批量分析和回测都用这里的检查区分"真实的观望"与"调用失败"，失败的结果不缓存、可重试。
+"""
+
+from typing import Any, Dict, List, Optional
+
+
+def decision_failure(decision: Optional[Dict[str, Any]]) -> Optional[str]:
+    """单个决策的失败原因，正常决策返回 None"""
+    if not decision:
+        return None
+    if decision.get("error"):
+        return str(decision["error"])
+    if decision.get("signal_type") == "Error":
+        return decision.get("reasoning") or "决策输出无法解析"
+    return None
+
+
+def analysis_failures(result: Dict[str, Any]) -> List[str]:
+    """与决策版本无关的失败：整次分析异常、分析师或决策 LLM 调用失败"""
+    reasons = []
+    if result.get("error"):
+        reasons.append(str(result["error"]))
+    for key in result.get("failed_reports") or []:
+        reasons.append(f"{key} LLM 调用失败")
+    return reasons
+
+
+def result_failures(result: Dict[str, Any]) -> List[str]:
+    """整个结果的失败原因（含主决策与多版本决策中失败的版本），完整的结果返回空列表"""
+    reasons = analysis_failures(result)
+    failure = decision_failure(result.get("decision"))
+    if failure and failure not in reasons:
+        reasons.append(failure)
+    agreement = (result.get("ensemble") or {}).get("agreement") or {}
+    for version in agreement.get("failed") or []:
+        reasons.append(f"决策版本 {version} 失败")
+    return reasons
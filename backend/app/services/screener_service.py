@@ -0,0 +1,216 @@
+"""
+Screener Service - 全市场筛选，只对排名靠前的交易对做多智能体深度分析
+- 交易对列表：请求指定，或读取 随机表格/OKX_交易对列表_简化.md（去掉 -USDT-SWAP 等后缀，与 update_excel2.py 一致）
+- 行情：通过带 TTL 的 SharedMarketData 并发拉取最新K线，短时间内重复筛选（如调整权重）不重复请求
+- 特征与排序：screener_features 一次性向量化计算，几百个交易对毫秒级完成
+- 深度分析：前 top_n 名自动提交到任务队列（/jobs），进度与结果通过 /ws/progress 的 screener 消息推送
+- 筛选结果保存到 data/screener/<scan_id>.json
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core import config as app_config
+from app.core.progress import publish_screener_event
+from app.models.schemas.analyze import AnalyzeRequest
+from app.models.schemas.screener import ScreenerRequest
+from app.services.batch_service import SharedMarketData
+from app.services.job_service import JobQueueFull, job_manager
+from app.utils.screener_features import (
+    DEFAULT_WEIGHTS, VOLUME_RECENT_BARS, align_frames, compute_features, rank_symbols,
+)
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+DEFAULT_UNIVERSE_FILE = PROJECT_ROOT / "随机表格" / "OKX_交易对列表_简化.md"
+DEFAULT_SCREENER_DIR = Path("data") / "screener"
+
+# 最新K线缓存时间（秒）
+MARKET_CACHE_TTL = 60
+# 内存中保留的筛选结果数
+MAX_SCANS_IN_MEMORY = 20
+# 合约后缀（分析流程使用基础币种名）
+_PAIR_SUFFIXES = ("-USDT-SWAP", "-USD-SWAP", "-USD_UM-SWAP", "-USDC-SWAP")
+
+
+def load_universe(path: Optional[str] = None) -> List[str]:
+    """读取交易对列表文件（每行一个交易对，跳过标题、引用和空行）"""
+    path = Path(path or app_config.settings.SCREENER_UNIVERSE_FILE or DEFAULT_UNIVERSE_FILE)
+    symbols = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith(("#", ">")):
+                continue
+            for suffix in _PAIR_SUFFIXES:
+                if line.endswith(suffix):
+                    line = line[:-len(suffix)]
+                    break
+            if line not in symbols:
+                symbols.append(line)
+    return symbols
+
+
+class ScreenerService:
+    """全市场筛选（同一时间只运行一次筛选，其余请求排队等待）"""
+
+    def __init__(self, screener_dir: Path = DEFAULT_SCREENER_DIR):
+        self.screener_dir = Path(screener_dir)
+        self.market = SharedMarketData(ttl=MARKET_CACHE_TTL)
+        self._scans: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _save(self, scan: Dict[str, Any]):
+        try:
+            self.screener_dir.mkdir(parents=True, exist_ok=True)
+            path = self.screener_dir / f"{scan['scan_id']}.json"
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(scan, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Failed to save screener scan {scan.get('scan_id')}: {e}")
+
+    def _remember(self, scan: Dict[str, Any]):
+        self._scans[scan["scan_id"]] = scan
+        while len(self._scans) > MAX_SCANS_IN_MEMORY:
+            self._scans.popitem(last=False)
+
+    async def _fetch_all(self, symbols: List[str], request: ScreenerRequest) -> Dict[str, Any]:
+        semaphore = asyncio.Semaphore(max(1, app_config.settings.SCREENER_FETCH_CONCURRENCY))
+
+        async def fetch(symbol: str):
+            async with semaphore:
+                try:
+                    return symbol, await asyncio.to_thread(
+                        self.market.get_ohlcv_data_enhanced,
+                        symbol=symbol,
+                        timeframe=request.timeframe,
+                        limit=request.kline_count,
+                        method="latest",
+                    )
+                except Exception as e:
+                    logger.warning(f"Screener fetch failed for {symbol}: {e}")
+                    return symbol, None
+
+        return dict(await asyncio.gather(*(fetch(symbol) for symbol in symbols)))
+
+    async def _enqueue(self, items: List[Dict[str, Any]], request: ScreenerRequest):
+        for item in items:
+            try:
+                job = await job_manager.submit(AnalyzeRequest(
+                    asset=item["symbol"],
+                    timeframe=request.timeframe,
+                    kline_count=request.kline_count,
+                    ai_version=request.ai_version,
+                    chart_mode=request.chart_mode,
+                    pattern_mode=request.pattern_mode,
+                ))
+                item["job_id"] = job["job_id"]
+                item["result_id"] = job["result_id"]
+            except JobQueueFull as e:
+                item["enqueue_error"] = str(e)
+
+    async def scan(self, request: ScreenerRequest) -> Dict[str, Any]:
+        """
+        执行一次筛选
+
+        Raises:
+            ValueError: 权重含未知打分项，或没有任何交易对拉到足够的K线
+        """
+        unknown = set(request.weights or {}) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"未知的打分项: {sorted(unknown)}，可选 {sorted(DEFAULT_WEIGHTS)}")
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            return await self._scan(request)
+
+    async def _scan(self, request: ScreenerRequest) -> Dict[str, Any]:
+        scan_id = f"scan_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        symbols = request.symbols or load_universe()
+        started = time.time()
+        publish_screener_event("started", scan_id, symbols=len(symbols), timeframe=request.timeframe)
+
+        try:
+            hits_before = self.market.hits
+            frames = await self._fetch_all(symbols, request)
+            fetch_seconds = time.time() - started
+            min_bars = request.lookback + VOLUME_RECENT_BARS + 2
+            matrices = align_frames(frames, min_bars)
+            if matrices is None:
+                raise ValueError("没有交易对获取到足够的K线")
+            skipped = [s for s in symbols if s not in matrices["symbols"]]
+            publish_screener_event("fetched", scan_id, fetched=len(matrices["symbols"]), skipped=len(skipped),
+                                   seconds=round(fetch_seconds, 2))
+
+            rank_started = time.time()
+            features = compute_features(matrices["high"], matrices["low"], matrices["close"], matrices["volume"],
+                                        lookback=request.lookback)
+            ranking = rank_symbols(matrices["symbols"], features, request.weights)
+            rank_seconds = time.time() - rank_started
+            top = ranking[:max(0, request.top_n)]
+            publish_screener_event("ranked", scan_id, top=[
+                {k: item[k] for k in ("symbol", "rank", "score", "direction")} for item in top
+            ])
+
+            if request.enqueue and top:
+                await self._enqueue(top, request)
+                publish_screener_event("enqueued", scan_id, jobs=[
+                    {k: item.get(k) for k in ("symbol", "job_id", "result_id", "enqueue_error")} for item in top
+                ])
+        except Exception as e:
+            publish_screener_event("failed", scan_id, error=str(e))
+            raise
+
+        scan = {
+            "scan_id": scan_id,
+            "created_at": started,
+            "request": request.model_dump(),
+            "universe": len(symbols),
+            "ranked": len(ranking),
+            "skipped": skipped,
+            "market_cache_hits": self.market.hits - hits_before,
+            "fetch_seconds": round(fetch_seconds, 3),
+            "rank_seconds": round(rank_seconds, 4),
+            "elapsed_seconds": round(time.time() - started, 3),
+            "weights": {**DEFAULT_WEIGHTS, **(request.weights or {})},
+            "top": top,
+            "ranking": ranking,
+        }
+        self._remember(scan)
+        self._save(scan)
+        logger.info(f"[{scan_id}] Screened {len(ranking)}/{len(symbols)} symbols in {scan['elapsed_seconds']}s "
+                    f"(fetch {scan['fetch_seconds']}s, rank {scan['rank_seconds']}s)")
+        publish_screener_event("completed", scan_id, elapsed_seconds=scan["elapsed_seconds"])
+        return scan
+
+    def get(self, scan_id: str) -> Optional[Dict[str, Any]]:
+        scan = self._scans.get(scan_id)
+        if scan is None:
+            path = self.screener_dir / f"{scan_id}.json"
+            if path.exists():
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        scan = json.load(f)
+                except Exception:
+                    return None
+        return scan
+
+    def list_scans(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """最近的筛选（不含完整排名）"""
+        scans = list(self._scans.values())[-limit:]
+        return [{k: v for k, v in scan.items() if k != "ranking"} for scan in reversed(scans)]
+
+
+# 全局筛选服务
+screener_service = ScreenerService()
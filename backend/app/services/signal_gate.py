@@ -0,0 +1,196 @@
+"""
+Signal Gate - LLM 分析前的确定性预筛选
+多智能体流程每次分析要调用 3~4 次 LLM 并绘制多张图表，而筛选大量交易对时多数行情处于中性状态。
+在执行 Agent 图之前用廉价的数值条件判断是否值得分析：
+- 信号一致性：TechnicalTools 指标汇总的多空票数差（MACD/RSI/随机指标/威廉%R/ROC/布林带）
+- 波动率：最近 14 根K线 ATR 占价格的百分比
+- 趋势线距离：与趋势图相同的最近 50 根K线拟合支撑/阻力线，收盘价到两条线的距离（ATR 倍数）
+波动率足够且（多空信号明确或价格贴近趋势线）时放行；否则直接返回"观望"结果，不调用 LLM、不生成图表。
+指标计算失败（如K线不足）时放行，由完整流程处理。
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core import config as app_config
+from app.utils.graph_util import fit_trendlines_high_low
+from app.utils.technical_indicators import TechnicalTools
+
+logger = logging.getLogger(__name__)
+
+# 与 generate_trend_image 的窗口保持一致
+TRENDLINE_WINDOW = 50
+ATR_PERIOD = 14
+
+_tools = TechnicalTools()
+
+
+def gate_enabled(override: Optional[bool] = None) -> bool:
+    """请求未指定时使用 SIGNAL_GATE_ENABLED"""
+    return app_config.settings.SIGNAL_GATE_ENABLED if override is None else override
+
+
+def _atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = ATR_PERIOD) -> float:
+    prev_close = np.concatenate(([close[0]], close[:-1]))
+    true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return float(true_range[-period:].mean())
+
+
+def _trendline_distances(candles: pd.DataFrame, atr: float) -> Dict[str, Optional[float]]:
+    """收盘价到支撑线 / 阻力线（最后一根K线处）的距离，单位 ATR"""
+    high = candles["High"].to_numpy(dtype=float)
+    low = candles["Low"].to_numpy(dtype=float)
+    close = candles["Close"].to_numpy(dtype=float)
+    support_coefs, resist_coefs = fit_trendlines_high_low(high, low, close)
+    x = len(close) - 1
+    support = support_coefs[0] * x + support_coefs[1]
+    resistance = resist_coefs[0] * x + resist_coefs[1]
+    if atr <= 0:
+        return {"support": None, "resistance": None}
+    return {
+        "support": round(float((close[-1] - support) / atr), 2),
+        "resistance": round(float((resistance - close[-1]) / atr), 2),
+    }
+
+
+def evaluate_gate(data: pd.DataFrame) -> Dict[str, Any]:
+    """
+    对一个时间框架的K线做预筛选
+
+    Returns:
+        dict: passed（是否进入 LLM 分析）、reasons、各项指标与阈值
+    """
+    settings = app_config.settings
+    started = time.perf_counter()
+    thresholds = {
+        "min_signal_agreement": settings.GATE_MIN_SIGNAL_AGREEMENT,
+        "min_atr_pct": settings.GATE_MIN_ATR_PCT,
+        "trendline_atr": settings.GATE_TRENDLINE_ATR,
+    }
+    gate: Dict[str, Any] = {"passed": True, "reasons": [], "thresholds": thresholds}
+
+    try:
+        summary = _tools.calculate_all_indicators(data)["summary"]
+        candles = data.tail(TRENDLINE_WINDOW)
+        high = candles["High"].to_numpy(dtype=float)
+        low = candles["Low"].to_numpy(dtype=float)
+        close = candles["Close"].to_numpy(dtype=float)
+        atr = _atr(high, low, close)
+        distances = _trendline_distances(candles, atr)
+    except Exception as e:
+        logger.warning(f"Signal gate skipped: {e}")
+        gate["reasons"].append(f"预筛选指标计算失败，放行: {e}")
+        gate["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return gate
+
+    net_signal = len(summary["bullish_signals"]) - len(summary["bearish_signals"])
+    atr_pct = atr / close[-1] * 100 if close[-1] else 0.0
+    nearest = min((abs(d) for d in distances.values() if d is not None), default=None)
+
+    strong_signal = abs(net_signal) >= thresholds["min_signal_agreement"]
+    near_trendline = nearest is not None and nearest <= thresholds["trendline_atr"]
+    volatile = atr_pct >= thresholds["min_atr_pct"]
+
+    if not volatile:
+        gate["reasons"].append(f"波动率过低：ATR {atr_pct:.3f}% < {thresholds['min_atr_pct']}%")
+    if not strong_signal and not near_trendline:
+        gate["reasons"].append(
+            f"信号中性：多空票数差 {net_signal:+d}（需 ≥{thresholds['min_signal_agreement']}），"
+            f"距最近趋势线 {nearest if nearest is not None else '-'} ATR（需 ≤{thresholds['trendline_atr']}）"
+        )
+    gate.update(
+        passed=not gate["reasons"],
+        overall_signal=summary["overall_signal"],
+        bullish_signals=summary["bullish_signals"],
+        bearish_signals=summary["bearish_signals"],
+        net_signal=net_signal,
+        atr_pct=round(atr_pct, 3),
+        support_distance_atr=distances["support"],
+        resistance_distance_atr=distances["resistance"],
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+    )
+    gate_stats.record(gate["passed"])
+    return gate
+
+
+def gated_result(gate: Dict[str, Any], ai_version: str) -> Dict[str, Any]:
+    """被预筛选拦下时的分析结果：观望决策 + 筛选依据（字段与 TradingEngine 的结果一致）"""
+    reasoning = "预筛选未通过，跳过 AI 分析：" + "；".join(gate["reasons"])
+    decision = {
+        "decision": "观望",
+        "decision_rationale": reasoning,
+        "confidence_level": "0",
+        "market_environment": "信号中性",
+    }
+    report = (
+        f"预筛选：综合信号 {gate.get('overall_signal')}，"
+        f"看多 {gate.get('bullish_signals')}，看空 {gate.get('bearish_signals')}，"
+        f"ATR {gate.get('atr_pct')}%，距支撑线 {gate.get('support_distance_atr')} ATR，"
+        f"距阻力线 {gate.get('resistance_distance_atr')} ATR"
+    )
+    return {
+        "final_trade_decision": json.dumps(decision, ensure_ascii=False),
+        "decision": {
+            "action": "HOLD",
+            "reasoning": reasoning,
+            "confidence": "0",
+            "signal_type": "signal_gate",
+            "stop_loss": None,
+            "take_profit": None,
+            **decision,
+        },
+        "indicator_report": report,
+        "pattern_report": "预筛选未通过，未执行形态分析",
+        "trend_report": "预筛选未通过，未执行趋势分析",
+        "market_data": {
+            "analysis": {
+                "indicators": report,
+                "patterns": "预筛选未通过，未执行形态分析",
+                "trend": "预筛选未通过，未执行趋势分析",
+            }
+        },
+        "pattern_chart": None,
+        "trend_chart": None,
+        "agent_version": ai_version,
+    }
+
+
+class GateStats:
+    """预筛选放行/拦截计数（/system/signal-gate）"""
+
+    def __init__(self):
+        self.evaluated = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def record(self, passed: bool):
+        with self._lock:
+            self.evaluated += 1
+            if not passed:
+                self.skipped += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        settings = app_config.settings
+        with self._lock:
+            evaluated, skipped = self.evaluated, self.skipped
+        return {
+            "enabled": settings.SIGNAL_GATE_ENABLED,
+            "evaluated": evaluated,
+            "skipped": skipped,
+            "skip_ratio": round(skipped / evaluated, 3) if evaluated else None,
+            "thresholds": {
+                "min_signal_agreement": settings.GATE_MIN_SIGNAL_AGREEMENT,
+                "min_atr_pct": settings.GATE_MIN_ATR_PCT,
+                "trendline_atr": settings.GATE_TRENDLINE_ATR,
+            },
+        }
+
+
+# 全局计数
+gate_stats = GateStats()
@@ -0,0 +1,364 @@
+"""
+Trade Evaluator - 用决策时间点之后的真实K线评估一次交易决策
+按决策给出的方向、入场价、止损、止盈逐根K线推演：
+- 同一根K线内同时触及止损和止盈时的先后顺序由 ambiguity 规则决定：
+  stop_first（默认，保守）/ target_first / open_distance（离该K线开盘价更近的价位先触发）
+- 两者都未触及时以最后一根K线收盘价平仓（timeout）
+- 记录最大有利偏移 MFE / 最大不利偏移 MAE（相对入场价的百分比）和 R 倍数（收益 / 止损距离）
+观望（或无法识别方向）的决策不计入交易。
+evaluate_decision 逐个评估；evaluate_batch 对 N 个决策的对齐K线矩阵做向量化评估，规则一致。
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+OUTCOME_TAKE_PROFIT = "take_profit"
+OUTCOME_STOP_LOSS = "stop_loss"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_NO_TRADE = "no_trade"
+OUTCOME_NO_DATA = "no_data"
+
+AMBIGUITY_STOP_FIRST = "stop_first"
+AMBIGUITY_TARGET_FIRST = "target_first"
+AMBIGUITY_OPEN_DISTANCE = "open_distance"
+AMBIGUITY_RULES = (AMBIGUITY_STOP_FIRST, AMBIGUITY_TARGET_FIRST, AMBIGUITY_OPEN_DISTANCE)
+
+_LONG_WORDS = ("做多", "多", "long", "buy")
+_SHORT_WORDS = ("做空", "空", "short", "sell")
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def parse_direction(action: Any) -> int:
+    """决策方向：1 做多，-1 做空，0 观望/未知"""
+    text = str(action or "").strip().lower()
+    if not text or "观望" in text or "hold" in text:
+        return 0
+    if any(word in text for word in _SHORT_WORDS):
+        return -1
+    if any(word in text for word in _LONG_WORDS):
+        return 1
+    return 0
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """价格字段可能是数字、"65,000" 或带说明的文字，取第一个数字"""
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+    match = _NUMBER.search(str(value or "").replace(",", ""))
+    if not match:
+        return None
+    price = float(match.group())
+    return price if price > 0 else None
+
+
+def _bar(kline: Dict[str, Any], key: str) -> float:
+    return float(kline.get(key, kline.get(key.capitalize())))
+
+
+def evaluate_decision(
+    decision: Dict[str, Any],
+    future_klines: List[Dict[str, Any]],
+    reference_price: Optional[float] = None,
+    ambiguity: str = AMBIGUITY_STOP_FIRST,
+) -> Dict[str, Any]:
+    """
+    评估单个决策
+
+    Args:
+        decision: 分析结果中的 decision（action / entry_point / stop_loss / take_profit）
+        future_klines: future_kline_data（小写列名的K线记录，按时间升序）
+        reference_price: 决策没有给出入场价时使用（决策时刻的收盘价）
+        ambiguity: 同一根K线同时触及止损和止盈时的判定规则
+
+    Returns:
+        dict: direction, outcome, entry, exit, pnl_pct, mfe_pct, mae_pct, r_multiple, bars_held
+    """
+    direction = parse_direction(decision.get("action") or decision.get("decision"))
+    evaluation: Dict[str, Any] = {
+        "direction": direction,
+        "outcome": OUTCOME_NO_TRADE,
+        "entry": None,
+        "exit": None,
+        "pnl_pct": None,
+        "mfe_pct": None,
+        "mae_pct": None,
+        "r_multiple": None,
+        "bars_held": 0,
+    }
+    if direction == 0:
+        return evaluation
+    if not future_klines:
+        evaluation["outcome"] = OUTCOME_NO_DATA
+        return evaluation
+
+    entry = parse_price(decision.get("entry_point")) or reference_price or _bar(future_klines[0], "open")
+    stop_loss = parse_price(decision.get("stop_loss"))
+    take_profit = parse_price(decision.get("take_profit"))
+    # 方向与止损止盈矛盾的价位视为未设置
+    if stop_loss is not None and (stop_loss - entry) * direction >= 0:
+        stop_loss = None
+    if take_profit is not None and (take_profit - entry) * direction <= 0:
+        take_profit = None
+
+    outcome = OUTCOME_TIMEOUT
+    exit_price = _bar(future_klines[-1], "close")
+    best = worst = 0.0
+    bars_held = len(future_klines)
+    for i, kline in enumerate(future_klines):
+        high, low = _bar(kline, "high"), _bar(kline, "low")
+        favorable = (high - entry) if direction > 0 else (entry - low)
+        adverse = (low - entry) if direction > 0 else (entry - high)
+        best = max(best, favorable)
+        worst = min(worst, adverse)
+
+        hit_stop = stop_loss is not None and (low <= stop_loss if direction > 0 else high >= stop_loss)
+        hit_target = take_profit is not None and (high >= take_profit if direction > 0 else low <= take_profit)
+        if hit_stop and hit_target:
+            bar_open = _bar(kline, "open")
+            if ambiguity == AMBIGUITY_TARGET_FIRST or (
+                ambiguity == AMBIGUITY_OPEN_DISTANCE and abs(bar_open - take_profit) < abs(bar_open - stop_loss)
+            ):
+                hit_stop = False
+        if hit_stop:
+            outcome, exit_price, bars_held = OUTCOME_STOP_LOSS, stop_loss, i + 1
+            break
+        if hit_target:
+            outcome, exit_price, bars_held = OUTCOME_TAKE_PROFIT, take_profit, i + 1
+            break
+
+    evaluation.update(
+        outcome=outcome,
+        entry=entry,
+        exit=exit_price,
+        stop_loss=stop_loss,
+        take_profit=take_profit,
+        pnl_pct=round((exit_price - entry) / entry * 100 * direction, 4),
+        mfe_pct=round(best / entry * 100, 4),
+        mae_pct=round(worst / entry * 100, 4),
+        r_multiple=round((exit_price - entry) * direction / abs(entry - stop_loss), 4) if stop_loss is not None else None,
+        bars_held=bars_held,
+    )
+    return evaluation
+
+
+def aggregate_evaluations(evaluations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """一组评估的汇总：交易数、命中率（止盈）、胜率（收益为正）、收益与 MFE/MAE 统计"""
+    trades = [e for e in evaluations if e.get("direction") and e.get("pnl_pct") is not None]
+    pnls = [e["pnl_pct"] for e in trades]
+
+    def avg(values: List[float]) -> Optional[float]:
+        return round(sum(values) / len(values), 4) if values else None
+
+    return {
+        "decisions": len(evaluations),
+        "trades": len(trades),
+        "no_trade": sum(1 for e in evaluations if e.get("outcome") == OUTCOME_NO_TRADE),
+        "long": sum(1 for e in trades if e["direction"] > 0),
+        "short": sum(1 for e in trades if e["direction"] < 0),
+        "take_profit": sum(1 for e in trades if e["outcome"] == OUTCOME_TAKE_PROFIT),
+        "stop_loss": sum(1 for e in trades if e["outcome"] == OUTCOME_STOP_LOSS),
+        "timeout": sum(1 for e in trades if e["outcome"] == OUTCOME_TIMEOUT),
+        "hit_rate": round(sum(1 for e in trades if e["outcome"] == OUTCOME_TAKE_PROFIT) / len(trades), 4) if trades else None,
+        "win_rate": round(sum(1 for p in pnls if p > 0) / len(pnls), 4) if pnls else None,
+        "total_pnl_pct": round(sum(pnls), 4) if pnls else 0.0,
+        "avg_pnl_pct": avg(pnls),
+        "avg_mfe_pct": avg([e["mfe_pct"] for e in trades]),
+        "avg_mae_pct": avg([e["mae_pct"] for e in trades]),
+        "avg_r_multiple": avg([e["r_multiple"] for e in trades if e.get("r_multiple") is not None]),
+        "total_r": round(sum(e["r_multiple"] for e in trades if e.get("r_multiple") is not None), 4),
+        "avg_bars_held": avg([e["bars_held"] for e in trades]),
+    }
+
+
+def align_klines(kline_lists: Sequence[List[Dict[str, Any]]], max_bars: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    把 N 组长度不一的未来K线对齐为 (N, T) 的 open/high/low/close 矩阵，不足部分填 NaN
+
+    Args:
+        max_bars: 每个决策最多评估的K线数，默认取最长的一组
+    """
+    lengths = [len(klines) for klines in kline_lists]
+    width = max(lengths, default=0)
+    if max_bars is not None:
+        width = min(width, max_bars)
+    arrays = {key: np.full((len(kline_lists), width), np.nan) for key in ("open", "high", "low", "close")}
+    for i, klines in enumerate(kline_lists):
+        for j, kline in enumerate(klines[:width]):
+            for key, array in arrays.items():
+                array[i, j] = _bar(kline, key)
+    return arrays
+
+
+def evaluate_batch(
+    directions: Sequence[int],
+    entries: Sequence[float],
+    stops: Sequence[Optional[float]],
+    targets: Sequence[Optional[float]],
+    opens: np.ndarray,
+    highs: np.ndarray,
+    lows: np.ndarray,
+    closes: np.ndarray,
+    ambiguity: str = AMBIGUITY_STOP_FIRST,
+) -> Dict[str, np.ndarray]:
+    """
+    向量化评估 N 个决策（与 evaluate_decision 的规则一致）
+
+    Args:
+        directions: 1 / -1 / 0
+        entries: 入场价（无入场价时由调用方填入参考价或首根开盘价）
+        stops / targets: 止损 / 止盈，None 或 NaN 表示未设置
+        opens / highs / lows / closes: align_klines 得到的 (N, T) 矩阵，每行K线左对齐、尾部为 NaN
+
+    Returns:
+        dict of (N,) 数组：outcome, exit, pnl_pct, mfe_pct, mae_pct, r_multiple,
+        bars_held（平仓所在K线序号 + 1）, time_to_hit（触发止损/止盈所用K线数，timeout 为 NaN）
+    """
+    if ambiguity not in AMBIGUITY_RULES:
+        raise ValueError(f"未知的判定规则: {ambiguity}")
+
+    n, width = closes.shape
+    rows = np.arange(n)
+    d = np.asarray(directions, dtype=float)
+    entry = np.asarray(entries, dtype=float)
+    stop = np.array([np.nan if v is None else v for v in stops], dtype=float)
+    target = np.array([np.nan if v is None else v for v in targets], dtype=float)
+
+    with np.errstate(invalid="ignore"):
+        # 方向与止损止盈矛盾的价位视为未设置
+        stop = np.where((stop - entry) * d < 0, stop, np.nan)
+        target = np.where((target - entry) * d > 0, target, np.nan)
+
+    if n == 0 or width == 0:
+        # 没有决策或没有任何未来K线（空历史、max_bars=0）：argmax 不能作用于空轴，直接返回
+        nan = np.full(n, np.nan)
+        return {
+            "direction": d.astype(int),
+            "outcome": np.where(d == 0, OUTCOME_NO_TRADE, OUTCOME_NO_DATA),
+            "entry": nan, "exit": nan, "stop_loss": stop, "take_profit": target,
+            "pnl_pct": nan, "mfe_pct": nan, "mae_pct": nan, "r_multiple": nan,
+            "bars_held": np.zeros(n, dtype=int), "time_to_hit": nan,
+        }
+
+    with np.errstate(invalid="ignore"):
+        valid = ~np.isnan(closes)
+        long = (d > 0)[:, None]
+        hit_stop = np.where(long, lows <= stop[:, None], highs >= stop[:, None]) & valid
+        hit_target = np.where(long, highs >= target[:, None], lows <= target[:, None]) & valid
+
+    # 首次触发的K线序号，未触发为 width
+    stop_idx = np.where(hit_stop.any(axis=1), hit_stop.argmax(axis=1), width)
+    target_idx = np.where(hit_target.any(axis=1), hit_target.argmax(axis=1), width)
+
+    same_bar = (stop_idx == target_idx) & (stop_idx < width)
+    if ambiguity == AMBIGUITY_STOP_FIRST:
+        stop_wins_tie = np.ones(n, dtype=bool)
+    elif ambiguity == AMBIGUITY_TARGET_FIRST:
+        stop_wins_tie = np.zeros(n, dtype=bool)
+    else:
+        bar_open = opens[rows, np.minimum(stop_idx, width - 1)] if width else np.full(n, np.nan)
+        stop_wins_tie = ~(np.abs(bar_open - target) < np.abs(bar_open - stop))
+    stopped = (stop_idx < target_idx) | (same_bar & stop_wins_tie)
+    targeted = (target_idx < stop_idx) | (same_bar & ~stop_wins_tie)
+
+    bars = valid.sum(axis=1)
+    last = np.maximum(bars - 1, 0)
+    exit_idx = np.where(stopped, stop_idx, np.where(targeted, target_idx, last))
+    last_close = closes[rows, last] if width else np.full(n, np.nan)
+    exit_price = np.where(stopped, stop, np.where(targeted, target, last_close))
+
+    # MFE / MAE：入场到平仓K线（含）之间，初始为 0（入场即平）
+    upto = (np.arange(width)[None, :] <= exit_idx[:, None]) & valid
+    favorable = np.where(long, highs - entry[:, None], entry[:, None] - lows)
+    adverse = np.where(long, lows - entry[:, None], entry[:, None] - highs)
+    best = np.max(np.where(upto, favorable, 0.0), axis=1, initial=0.0)
+    worst = np.min(np.where(upto, adverse, 0.0), axis=1, initial=0.0)
+
+    trade = (d != 0) & (bars > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pnl = (exit_price - entry) * d
+        r_multiple = np.where(np.isnan(stop), np.nan, pnl / np.abs(entry - stop))
+        pnl_pct = pnl / entry * 100
+
+    outcome = np.select(
+        [d == 0, bars == 0, stopped, targeted],
+        [OUTCOME_NO_TRADE, OUTCOME_NO_DATA, OUTCOME_STOP_LOSS, OUTCOME_TAKE_PROFIT],
+        default=OUTCOME_TIMEOUT,
+    )
+    nan = np.full(n, np.nan)
+    return {
+        "direction": d.astype(int),
+        "outcome": outcome,
+        "entry": np.where(trade, entry, nan),
+        "exit": np.where(trade, exit_price, nan),
+        "stop_loss": stop,
+        "take_profit": target,
+        "pnl_pct": np.where(trade, pnl_pct, nan),
+        "mfe_pct": np.where(trade, best / entry * 100, nan),
+        "mae_pct": np.where(trade, worst / entry * 100, nan),
+        "r_multiple": np.where(trade, r_multiple, nan),
+        "bars_held": np.where(trade, exit_idx + 1, 0),
+        "time_to_hit": np.where(trade & (stopped | targeted), exit_idx + 1, nan),
+    }
+
+
+def batch_records(batch: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """evaluate_batch 的结果转为逐个决策的 dict（NaN 转 None，数值保留 4 位小数），可直接交给 aggregate_evaluations"""
+    records = []
+    keys = list(batch)
+    for i in range(len(batch["outcome"])):
+        record = {}
+        for key in keys:
+            value = batch[key][i]
+            if isinstance(value, np.floating):
+                value = None if np.isnan(value) else round(float(value), 4)
+            elif isinstance(value, np.integer):
+                value = int(value)
+            elif isinstance(value, np.str_):
+                value = str(value)
+            record[key] = value
+        records.append(record)
+    return records
+
+
+_DIRECTION_NAMES = {1: "long", -1: "short", 0: "hold"}
+
+
+def ensemble_agreement(decisions: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    多版本决策的一致性汇总
+
+    Returns:
+        votes（各方向的版本列表）、majority（多数方向，多空票数相同时为 hold）、agreement（多数方向占比）、
+        unanimous、conflict（同时存在做多和做空）、levels（多数方向版本的入场/止损/止盈区间）
+    """
+    votes: Dict[str, List[str]] = {"long": [], "short": [], "hold": []}
+    for version, decision in decisions.items():
+        if decision.get("error"):
+            continue
+        votes[_DIRECTION_NAMES[parse_direction(decision.get("action"))]].append(version)
+
+    counted = sum(len(versions) for versions in votes.values())
+    if len(votes["long"]) == len(votes["short"]):
+        majority = "hold"
+    else:
+        majority = max(("long", "short", "hold"), key=lambda name: len(votes[name]))
+
+    levels = {}
+    if majority != "hold":
+        for field in ("entry_point", "stop_loss", "take_profit"):
+            prices = [parse_price(decisions[v].get(field)) for v in votes[majority]]
+            prices = [p for p in prices if p is not None]
+            if prices:
+                levels[field] = {"min": min(prices), "max": max(prices), "median": float(np.median(prices))}
+
+    return {
+        "votes": votes,
+        "majority": majority,
+        "agreement": round(len(votes[majority]) / counted, 3) if counted else None,
+        "unanimous": counted > 0 and len(votes[majority]) == counted,
+        "conflict": bool(votes["long"] and votes["short"]),
+        "failed": [v for v, d in decisions.items() if d.get("error")],
+        "levels": levels,
+    }
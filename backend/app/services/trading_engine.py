@@ -4,21 +4,27 @@ import pandas as pd
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import ToolNode
 
-from app.core.config import settings
+from app.core import config as app_config
 from app.core.providers import get_provider_config
 from app.agents.decision.decision_configs import DECISION_AGENT_VERSIONS
 from app.core.graph_setup import SetGraph
 from app.utils.graph_util import TechnicalTools
+from app.utils.candlestick_scan import scan_candlestick_patterns
+from app.core.analysis_context import set_analysis_deadline
+from app.core.llm_hedging import register_fallback
+from app.core.http_transport import transport_registry
+from app.core.llm_cache import llm_cache_metadata
+from app.services.trade_evaluator import ensemble_agreement
 
 logger = logging.getLogger(__name__)
 
 class LLMConfig:
     """Configuration for LLM models used in the trading engine"""
     def __init__(self):
-        self.agent_model = settings.AGENT_MODEL
-        self.graph_model = settings.GRAPH_MODEL
-        self.agent_temperature = settings.AGENT_TEMPERATURE
-        self.graph_temperature = settings.GRAPH_TEMPERATURE
+        self.agent_model = app_config.settings.AGENT_MODEL
+        self.graph_model = app_config.settings.GRAPH_MODEL
+        self.agent_temperature = app_config.settings.AGENT_TEMPERATURE
+        self.graph_temperature = app_config.settings.GRAPH_TEMPERATURE
 
 class TradingEngine:
     """
@@ -31,6 +37,8 @@ class TradingEngine:
         self.llm_config = LLMConfig()
         self.decision_agent_version = "constrained"
         self.include_decision_agent = True
+        # 多版本决策（第一个为主版本），为空时只运行 decision_agent_version
+        self.ensemble_versions = None
         
         # Configuration overrides
         override_agent_model = None
@@ -46,6 +54,7 @@ class TradingEngine:
             
             self.decision_agent_version = config.get("decision_agent_version", "constrained")
             self.include_decision_agent = config.get("include_decision_agent", True)
+            self.ensemble_versions = config.get("ensemble_versions")
             
             override_agent_model = config.get("agent_llm_model")
             override_graph_model = config.get("graph_llm_model")
@@ -65,6 +74,14 @@ class TradingEngine:
             temperature=override_graph_temp
         )
 
+        # 备用模型：主模型过慢时对冲、报错时故障转移（未配置则为 None）
+        self.agent_fallback_llm = self._create_fallback_client("agent")
+        self.graph_fallback_llm = self._create_fallback_client("graph")
+        if self.agent_fallback_llm is not None:
+            register_fallback(self.agent_llm, self.agent_fallback_llm)
+        if self.graph_fallback_llm is not None:
+            register_fallback(self.graph_llm, self.graph_fallback_llm)
+
         self.toolkit = TechnicalTools()
         self.tool_nodes = self._set_tool_nodes()
 
@@ -76,19 +93,20 @@ class TradingEngine:
             self.tool_nodes,
             self.decision_agent_version,
             self.include_decision_agent,
+            self.ensemble_versions,
         )
         self.graph = self.graph_setup.set_graph()
 
     def _create_llm_client(self, role: str, model: Optional[str] = None, temperature: Optional[float] = None) -> ChatOpenAI:
         """创建 LLM 客户端"""
         if role == "agent":
-            provider = settings.AGENT_PROVIDER
-            default_model = settings.AGENT_MODEL
-            default_temperature = settings.AGENT_TEMPERATURE
+            provider = app_config.settings.AGENT_PROVIDER
+            default_model = app_config.settings.AGENT_MODEL
+            default_temperature = app_config.settings.AGENT_TEMPERATURE
         else:
-            provider = settings.GRAPH_PROVIDER
-            default_model = settings.GRAPH_MODEL
-            default_temperature = settings.GRAPH_TEMPERATURE
+            provider = app_config.settings.GRAPH_PROVIDER
+            default_model = app_config.settings.GRAPH_MODEL
+            default_temperature = app_config.settings.GRAPH_TEMPERATURE
 
         actual_model = model or default_model
         actual_temperature = temperature if temperature is not None else default_temperature
@@ -97,7 +115,7 @@ class TradingEngine:
         if not cfg:
             raise ValueError(f"Unknown provider: {provider}")
 
-        api_key = getattr(settings, cfg["api_key_env"], "")
+        api_key = getattr(app_config.settings, cfg["api_key_env"], "")
         if not api_key:
             raise ValueError(f"API Key not found for provider {provider}. Please set {cfg['api_key_env']} in .env file")
 
@@ -106,6 +124,40 @@ class TradingEngine:
             temperature=actual_temperature,
             api_key=api_key,
             base_url=cfg["base_url"],
+            # 缓存的查询与写入由 llm_scheduler 统一完成
+            cache=False,
+            metadata=llm_cache_metadata(provider),
+            **transport_registry.client_kwargs(cfg["base_url"]),
+        )
+
+    def _create_fallback_client(self, role: str) -> Optional[ChatOpenAI]:
+        """按 *_FALLBACK_PROVIDER / *_FALLBACK_MODEL 创建备用客户端，配置不完整时返回 None"""
+        settings = app_config.settings
+        if role == "agent":
+            provider, model = settings.AGENT_FALLBACK_PROVIDER, settings.AGENT_FALLBACK_MODEL
+            temperature = self.llm_config.agent_temperature
+        else:
+            provider, model = settings.GRAPH_FALLBACK_PROVIDER, settings.GRAPH_FALLBACK_MODEL
+            temperature = self.llm_config.graph_temperature
+
+        if not provider or not model:
+            return None
+
+        cfg = get_provider_config(provider)
+        api_key = getattr(settings, cfg["api_key_env"], "") if cfg else ""
+        if not cfg or not api_key:
+            logger.warning(f"Fallback provider {provider} for {role} is not usable (unknown provider or missing API key)")
+            return None
+
+        return ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            api_key=api_key,
+            base_url=cfg["base_url"],
+            # 缓存的查询与写入由 llm_scheduler 统一完成
+            cache=False,
+            metadata=llm_cache_metadata(provider),
+            **transport_registry.client_kwargs(cfg["base_url"]),
         )
 
     def _set_tool_nodes(self) -> Dict[str, ToolNode]:
@@ -115,10 +167,85 @@ class TradingEngine:
             "trend": ToolNode([]),
         }
 
-    async def run_analysis(self, data: Any, symbol: str, timeframe: str) -> Dict[str, Any]:
+    @staticmethod
+    def _parse_decision(decision_str: str, latest_price: Any) -> Dict[str, Any]:
+        """解析决策智能体的 JSON 输出并规范化字段名称，解析失败时返回观望"""
+        import json
+        import re
+
+        raw_content = decision_str
+        try:
+            # 尝试提取JSON块
+            json_match = re.search(r'```json\s*(\{.*?\})\s*```', decision_str, re.DOTALL)
+            if json_match:
+                decision_str = json_match.group(1)
+            else:
+                # 尝试无json标签的代码块
+                code_match = re.search(r'```\s*(\{.*?\})\s*```', decision_str, re.DOTALL)
+                if code_match:
+                    decision_str = code_match.group(1)
+
+            # 清理可能存在的非JSON字符
+            decision_str = decision_str.strip()
+
+            decision_json = json.loads(decision_str)
+
+            # 规范化字段名称以匹配前端 AnalysisResult.tsx 的期望
+            normalized_decision = {
+                "action": decision_json.get("decision", "HOLD"),
+                "reasoning": decision_json.get("decision_rationale") or decision_json.get("justification", ""),
+                "confidence": decision_json.get("confidence_level", "0"),
+                "signal_type": decision_json.get("market_environment", "N/A"),
+                "stop_loss": decision_json.get("stop_loss"),
+                "take_profit": decision_json.get("take_profit"),
+                "entry_point": decision_json.get("entry_point") or str(latest_price) if latest_price else None,
+                # 哈雷酱：保留所有原始字段供 HTML 报告使用
+                **decision_json
+            }
+
+            logger.info("Successfully parsed and normalized trade decision JSON")
+            return normalized_decision
+        except Exception as e:
+            logger.warning(f"Failed to parse final_trade_decision JSON: {e}")
+            # 降级处理：尝试手动提取关键信息
+            return {
+                "action": "HOLD",  # 默认观望
+                "reasoning": f"无法解析决策数据，请查看原始报告。错误: {str(e)}",
+                "confidence": "Low",
+                "signal_type": "Error",
+                "raw_content": raw_content,
+                "decision": "HOLD" # Fallback
+            }
+
+    def _merge_ensemble(self, result: Dict[str, Any], latest_price: Any):
+        """把各版本的决策输出解析为 result["ensemble"]（逐版本决策 + 一致性汇总）"""
+        outputs = result.pop("ensemble_decisions", None) or {}
+        decisions = {}
+        for version in self.ensemble_versions:
+            output = outputs.get(version) or {"error": "决策节点未返回结果"}
+            if isinstance(output.get("final_trade_decision"), str):
+                decision = self._parse_decision(output["final_trade_decision"], latest_price)
+            else:
+                decision = {"action": "HOLD", "reasoning": output.get("error", ""), "error": output.get("error")}
+            decision["agent_version"] = version
+            decision["agent_version_name"] = DECISION_AGENT_VERSIONS.get(version, {}).get("name", version)
+            decisions[version] = decision
+
+        primary = self.ensemble_versions[0]
+        result["final_trade_decision"] = (outputs.get(primary) or {}).get("final_trade_decision", "")
+        result["ensemble"] = {
+            "primary": primary,
+            "versions": list(self.ensemble_versions),
+            "decisions": decisions,
+            "agreement": ensemble_agreement(decisions),
+        }
+
+    async def run_analysis(self, data: Any, symbol: str, timeframe: str,
+                           pattern_mode: str = "vision") -> Dict[str, Any]:
         """
         Run the analysis graph.
         Supports both single timeframe (DataFrame) and multi-timeframe (Dict[str, DataFrame]) modes.
+        pattern_mode selects how the pattern agent works: vision / numeric / hybrid.
         """
         import json
         
@@ -175,6 +302,14 @@ class TradingEngine:
             if isinstance(kline_data, list) and len(kline_data) > 0:
                 latest_price = kline_data[-1].get('Close')
 
+        # TA-Lib K线组合形态预扫描，结果供形态/决策智能体和报告使用
+        try:
+            candlestick_patterns = scan_candlestick_patterns(kline_data)
+            logger.info(f"Candlestick pre-scan found {len(candlestick_patterns)} pattern hits")
+        except Exception as e:
+            logger.warning(f"Candlestick pre-scan failed: {e}")
+            candlestick_patterns = []
+
         initial_state = {
             "kline_data": kline_data,
             "time_frame": timeframe,
@@ -182,13 +317,15 @@ class TradingEngine:
             "messages": [],
             "latest_price": latest_price,
             "multi_timeframe_mode": is_multi_tf,
-            "timeframes": list(data.keys()) if is_multi_tf else None
+            "timeframes": list(data.keys()) if is_multi_tf else None,
+            "pattern_mode": pattern_mode,
+            "candlestick_patterns": candlestick_patterns,
         }
 
         try:
-            import asyncio
-
-            result = await asyncio.to_thread(self.graph.invoke, initial_state)
+            # 整次 AI 分析的截止时间，LLM 调用层据此收紧单次超时、放弃重试
+            set_analysis_deadline(app_config.settings.ANALYSIS_DEADLINE)
+            result = await self.graph.ainvoke(initial_state)
 
             if "error" not in result:
                 result["agent_version"] = self.decision_agent_version
@@ -197,54 +334,13 @@ class TradingEngine:
                 result["agent_version_description"] = version_cfg.get("description", "")
                 logger.info(f"Analysis completed with version: {result['agent_version_name']}")
 
+                # 多版本决策：主版本（第一个）的输出作为 final_trade_decision，其余版本汇总到 ensemble
+                if self.ensemble_versions:
+                    self._merge_ensemble(result, latest_price)
+
                 # 哈雷酱添加：解析决策智能体的JSON输出，供前端结构化展示
                 if "final_trade_decision" in result and isinstance(result["final_trade_decision"], str):
-                    try:
-                        import json
-                        import re
-                        
-                        decision_str = result["final_trade_decision"]
-                        # 尝试提取JSON块
-                        json_match = re.search(r'```json\s*(\{.*?\})\s*```', decision_str, re.DOTALL)
-                        if json_match:
-                            decision_str = json_match.group(1)
-                        else:
-                            # 尝试无json标签的代码块
-                            code_match = re.search(r'```\s*(\{.*?\})\s*```', decision_str, re.DOTALL)
-                            if code_match:
-                                decision_str = code_match.group(1)
-                        
-                        # 清理可能存在的非JSON字符
-                        decision_str = decision_str.strip()
-                        
-                        decision_json = json.loads(decision_str)
-                        
-                        # 规范化字段名称以匹配前端 AnalysisResult.tsx 的期望
-                        normalized_decision = {
-                            "action": decision_json.get("decision", "HOLD"),
-                            "reasoning": decision_json.get("decision_rationale") or decision_json.get("justification", ""),
-                            "confidence": decision_json.get("confidence_level", "0"),
-                            "signal_type": decision_json.get("market_environment", "N/A"),
-                            "stop_loss": decision_json.get("stop_loss"),
-                            "take_profit": decision_json.get("take_profit"),
-                            "entry_point": decision_json.get("entry_point") or str(latest_price) if latest_price else None,
-                            # 哈雷酱：保留所有原始字段供 HTML 报告使用
-                            **decision_json
-                        }
-                        
-                        result["decision"] = normalized_decision
-                        logger.info("Successfully parsed and normalized trade decision JSON")
-                    except Exception as e:
-                        logger.warning(f"Failed to parse final_trade_decision JSON: {e}")
-                        # 降级处理：尝试手动提取关键信息
-                        result["decision"] = {
-                            "action": "HOLD",  # 默认观望
-                            "reasoning": f"无法解析决策数据，请查看原始报告。错误: {str(e)}",
-                            "confidence": "Low",
-                            "signal_type": "Error",
-                            "raw_content": result["final_trade_decision"],
-                            "decision": "HOLD" # Fallback
-                        }
+                    result["decision"] = self._parse_decision(result["final_trade_decision"], latest_price)
 
             # 哈雷酱：构造 market_data 结构，适配前端和 HTML 报告
             result["market_data"] = {
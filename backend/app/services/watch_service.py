@@ -0,0 +1,446 @@
+"""
+Watch Service - 定时分析（盯盘规则）
+用户登记规则（交易对、若干时间框架、决策版本），调度器在每根K线收盘后自动执行分析：
+- 按K线边界对齐：下一次执行时间由收盘时刻推算，而不是"上次执行 + 周期"，长时间运行不漂移；
+  服务停机错过的收盘只补跑一次
+- 错峰：每条规则在收盘后按 rule_id 的哈希固定错开 0 ~ WATCH_JITTER_SECONDS 秒，
+  配合 WATCH_CONCURRENCY 的有界并发，整点时几百条规则不会同时拉取行情、调用 LLM
+- 增量行情：CandleStore 按 (交易对, 时间框架) 缓存K线，收盘后只拉取上次之后的几根新K线拼接到缓存；
+  同一收盘内多条规则共享同一次拉取
+- 无变化不重跑：最新K线与上次分析时相同（交易所尚未出新K线）时跳过，沿用上次的结果
+- 结果写入历史记录（data/history），执行情况通过 /ws/progress 的 watch 消息推送
+- 规则与最近一次执行状态持久化到 data/watch/rules.json
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.core import config as app_config
+from app.core.progress import publish_watch_event
+from app.models.schemas.analyze import AnalyzeRequest
+from app.models.schemas.watch import WatchRuleRequest
+from app.services.analysis_service import MarketDataNotFound, allocate_result_id, run_analysis
+from app.services.future_verification import timeframe_delta
+from app.services.market_data import MarketDataService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WATCH_DIR = Path("data") / "watch"
+
+# 增量拉取时与缓存重叠的K线数（覆盖上次拉取时尚未收盘的K线）
+INCREMENTAL_OVERLAP_BARS = 2
+# 周线按周一 00:00 UTC 对齐（Unix 纪元是周四）
+WEEK_ANCHOR_SECONDS = 4 * 86400
+# 错峰时间不超过K线周期的这一比例（1m / 5m 等短周期）
+MAX_JITTER_RATIO = 0.25
+
+RUN_COMPLETED = "completed"
+RUN_SKIPPED = "skipped"
+RUN_FAILED = "failed"
+RUN_RUNNING = "running"
+
+
+def period_seconds(timeframe: str) -> float:
+    """K线周期（秒）；不支持按月对齐的时间框架"""
+    if timeframe == "1mo":
+        raise ValueError("定时分析不支持 1mo 时间框架")
+    try:
+        return timeframe_delta(timeframe).total_seconds()
+    except Exception:
+        raise ValueError(f"无法识别的时间框架: {timeframe}")
+
+
+def next_close(timeframe: str, after: float) -> float:
+    """after 之后的第一个K线收盘时刻（UTC 时间戳）"""
+    period = period_seconds(timeframe)
+    anchor = WEEK_ANCHOR_SECONDS if timeframe == "1w" else 0
+    return anchor + (math.floor((after - anchor) / period) + 1) * period
+
+
+def rule_jitter(rule_id: str, timeframe: str) -> float:
+    """按规则固定的错峰秒数（重启后不变）"""
+    spread = min(app_config.settings.WATCH_JITTER_SECONDS, period_seconds(timeframe) * MAX_JITTER_RATIO)
+    return (zlib.crc32(f"{rule_id}:{timeframe}".encode()) % 1000) / 1000 * max(0.0, spread)
+
+
+class CandleStore:
+    """
+    按 (交易对, 时间框架) 缓存最近的K线，刷新时只拉取上次之后的新K线
+
+    fresh_after：缓存在该时刻之后拉取过则直接返回（同一收盘内的多条规则共享一次拉取）。
+    新K线与缓存没有重叠（停机太久）或拉取失败时退回完整拉取。
+    """
+
+    def __init__(self, service: Optional[MarketDataService] = None):
+        self.service = service or MarketDataService()
+        self._frames: Dict[Tuple[str, str], pd.DataFrame] = {}
+        self._fetched_at: Dict[Tuple[str, str], float] = {}
+        self._capacity: Dict[Tuple[str, str], int] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._guard = threading.Lock()
+        self.full_fetches = 0
+        self.incremental_fetches = 0
+        self.hits = 0
+
+    def _lock_for(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def refresh(self, symbol: str, timeframe: str, limit: int, fresh_after: float = 0.0) -> Optional[pd.DataFrame]:
+        key = (symbol, timeframe)
+        with self._lock_for(key):
+            now = time.time()
+            cached = self._frames.get(key)
+            fetched_at = self._fetched_at.get(key, 0.0)
+            capacity = max(limit, self._capacity.get(key, 0))
+            self._capacity[key] = capacity
+
+            if cached is not None and len(cached) >= limit and fetched_at >= fresh_after:
+                self.hits += 1
+                return cached.tail(limit).copy()
+
+            df = None
+            if cached is not None and len(cached) >= limit:
+                missing = int((now - fetched_at) // period_seconds(timeframe)) + INCREMENTAL_OVERLAP_BARS
+                if missing < capacity:
+                    new = self.service.get_ohlcv_data(symbol, timeframe, limit=missing)
+                    if new is not None and not new.empty and new.index[0] <= cached.index[-1]:
+                        df = pd.concat([cached, new])
+                        df = df[~df.index.duplicated(keep="last")].sort_index()
+                        self.incremental_fetches += 1
+
+            if df is None:
+                df = self.service.get_ohlcv_data(symbol, timeframe, limit=capacity)
+                if df is None or df.empty:
+                    return None
+                self.full_fetches += 1
+
+            self._frames[key] = df.tail(capacity)
+            self._fetched_at[key] = now
+            return self._frames[key].tail(limit).copy()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "series": len(self._frames),
+            "full_fetches": self.full_fetches,
+            "incremental_fetches": self.incremental_fetches,
+            "hits": self.hits,
+        }
+
+
+class _StoreMarketData:
+    """run_analysis 的行情接口：latest 取数走 CandleStore，其余委托给 MarketDataService"""
+
+    def __init__(self, store: CandleStore, fresh_after: float):
+        self._store = store
+        self._fresh_after = fresh_after
+
+    def get_ohlcv_data_enhanced(self, symbol: str, timeframe: str = "1h", limit: int = 100,
+                                exchange: str = "okx", method: str = "latest",
+                                start_date: str = None, end_date: str = None):
+        if method == "latest" and exchange == "okx":
+            return self._store.refresh(symbol, timeframe, limit, self._fresh_after)
+        return self._store.service.get_ohlcv_data_enhanced(
+            symbol, timeframe, limit, exchange, method, start_date, end_date
+        )
+
+    def __getattr__(self, name: str):
+        return getattr(self._store.service, name)
+
+
+class WatchScheduler:
+    """盯盘规则调度：一个调度协程 + 按到期时间排序的堆，到期后在有界并发下执行分析"""
+
+    def __init__(self, watch_dir: Path = DEFAULT_WATCH_DIR):
+        self.watch_dir = Path(watch_dir)
+        self.rules: Dict[str, Dict[str, Any]] = {}
+        self.store = CandleStore()
+        # (到期时间, rule_id, 时间框架, 收盘时刻)；规则删除/暂停/改期后旧条目在出堆时丢弃
+        self._heap: List[Tuple[float, str, str, float]] = []
+        self._running: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    # ---- 持久化 ----
+
+    @property
+    def _path(self) -> Path:
+        return self.watch_dir / "rules.json"
+
+    def _save(self):
+        try:
+            self.watch_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(list(self.rules.values()), f, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp_path, self._path)
+        except Exception as e:
+            logger.error(f"Failed to save watch rules: {e}")
+
+    def _load(self):
+        if not self._path.exists():
+            return
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                rules = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load watch rules: {e}")
+            return
+        for rule in rules:
+            for state in rule.get("state", {}).values():
+                if state.get("status") == RUN_RUNNING:
+                    state.update(status=RUN_FAILED, error="服务重启，执行中断")
+            self.rules[rule["rule_id"]] = rule
+
+    # ---- 调度 ----
+
+    def _schedule(self, rule: Dict[str, Any], timeframe: str, after: float):
+        close_at = next_close(timeframe, after)
+        due = close_at + app_config.settings.WATCH_CLOSE_DELAY_SECONDS + rule_jitter(rule["rule_id"], timeframe)
+        rule["state"][timeframe]["next_run_at"] = due
+        heapq.heappush(self._heap, (due, rule["rule_id"], timeframe, close_at))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _schedule_rule(self, rule: Dict[str, Any], after: float):
+        for timeframe in rule["request"]["timeframes"]:
+            rule["state"].setdefault(timeframe, {"runs": 0, "skips": 0})
+            self._schedule(rule, timeframe, after)
+
+    async def _loop(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                due, rule_id, timeframe, close_at = heapq.heappop(self._heap)
+                rule = self.rules.get(rule_id)
+                state = rule["state"].get(timeframe) if rule else None
+                if not rule or not rule["enabled"] or not state or state.get("next_run_at") != due:
+                    continue
+                # 从收盘边界推算下一次，停机后错过的多个收盘只补跑一次
+                self._schedule(rule, timeframe, max(due, now))
+                self._dispatch(rule_id, timeframe, close_at + app_config.settings.WATCH_CLOSE_DELAY_SECONDS)
+
+            timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self, rule_id: str, timeframe: str, fresh_after: float, force: bool = False) -> bool:
+        key = (rule_id, timeframe)
+        if key in self._running:
+            logger.warning(f"Watch rule {rule_id} {timeframe}: previous run still in progress, skipping")
+            publish_watch_event(RUN_SKIPPED, rule_id, timeframe=timeframe, reason="上一次分析尚未完成")
+            return False
+        task = asyncio.create_task(self._run(rule_id, timeframe, fresh_after, force))
+        self._running[key] = task
+        task.add_done_callback(lambda _: self._running.pop(key, None))
+        return True
+
+    async def _run(self, rule_id: str, timeframe: str, fresh_after: float, force: bool):
+        rule = self.rules.get(rule_id)
+        if not rule:
+            return
+        request = WatchRuleRequest(**rule["request"])
+        state = rule["state"][timeframe]
+        publish_watch_event("scheduled", rule_id, asset=request.asset, timeframe=timeframe)
+
+        async with self._semaphore:
+            started = time.time()
+            state.update(status=RUN_RUNNING, last_run_at=started, error=None)
+            try:
+                df = await asyncio.to_thread(self.store.refresh, request.asset, timeframe,
+                                             request.kline_count, fresh_after)
+                if df is None or df.empty:
+                    raise MarketDataNotFound("No market data found")
+                last_candle = str(df.index[-1])
+
+                if last_candle == state.get("last_candle") and not force:
+                    state.update(status=RUN_SKIPPED, skips=state.get("skips", 0) + 1)
+                    publish_watch_event(RUN_SKIPPED, rule_id, asset=request.asset, timeframe=timeframe,
+                                        reason="没有新K线", candle=last_candle,
+                                        result_id=state.get("last_result_id"))
+                    return
+
+                analysis_request = AnalyzeRequest(
+                    asset=request.asset,
+                    timeframe=timeframe,
+                    data_method="latest",
+                    kline_count=request.kline_count,
+                    ai_version=request.ai_version,
+                    chart_mode=request.chart_mode,
+                    pattern_mode=request.pattern_mode,
+                    use_llm_cache=request.use_llm_cache,
+                    signal_gate=request.signal_gate,
+                )
+                result_id = allocate_result_id(analysis_request)
+                # 独立任务：每次执行绑定自己的分析上下文
+                result = await asyncio.create_task(run_analysis(
+                    analysis_request, result_id, _StoreMarketData(self.store, fresh_after)
+                ))
+            except asyncio.CancelledError:
+                state.update(status=RUN_FAILED, error="已取消")
+                raise
+            except Exception as e:
+                logger.error(f"Watch rule {rule_id} {request.asset} {timeframe} failed: {e}")
+                state.update(status=RUN_FAILED, error=f"{type(e).__name__}: {e}")
+                publish_watch_event(RUN_FAILED, rule_id, asset=request.asset, timeframe=timeframe, error=state["error"])
+                return
+            finally:
+                self._save()
+
+            decision = result.get("decision") or {}
+            state.update(
+                status=RUN_COMPLETED,
+                runs=state.get("runs", 0) + 1,
+                last_candle=last_candle,
+                last_result_id=result_id,
+                last_action=decision.get("action"),
+                elapsed_seconds=round(time.time() - started, 2),
+            )
+            self._save()
+            publish_watch_event(
+                RUN_COMPLETED, rule_id,
+                asset=request.asset,
+                timeframe=timeframe,
+                candle=last_candle,
+                result_id=result_id,
+                action=decision.get("action"),
+                confidence=decision.get("confidence"),
+                gate_passed=(result.get("signal_gate") or {}).get("passed"),
+                elapsed_seconds=state["elapsed_seconds"],
+            )
+
+    # ---- 生命周期 ----
+
+    async def start(self):
+        """读取规则并启动调度协程（应用启动时调用）"""
+        if self._loop_task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(max(1, app_config.settings.WATCH_CONCURRENCY))
+        self._load()
+        now = time.time()
+        for rule in self.rules.values():
+            if rule["enabled"]:
+                self._schedule_rule(rule, now)
+        self._loop_task = asyncio.create_task(self._loop())
+        logger.info(f"Watch scheduler started with {len(self.rules)} rules")
+
+    async def shutdown(self):
+        """停止调度并取消执行中的分析（应用关闭时调用）"""
+        tasks = list(self._running.values())
+        if self._loop_task is not None:
+            tasks.append(self._loop_task)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop_task = None
+        self._heap = []
+        self._save()
+
+    # ---- 规则管理 ----
+
+    def view(self, rule: Dict[str, Any]) -> Dict[str, Any]:
+        return {**rule, "running": [tf for (rule_id, tf) in self._running if rule_id == rule["rule_id"]]}
+
+    async def add_rule(self, request: WatchRuleRequest) -> Dict[str, Any]:
+        """
+        登记规则
+
+        Raises:
+            ValueError: 时间框架不支持或规则数已达上限
+        """
+        if not request.timeframes:
+            raise ValueError("至少需要一个时间框架")
+        for timeframe in request.timeframes:
+            period_seconds(timeframe)
+        if len(self.rules) >= app_config.settings.WATCH_MAX_RULES:
+            raise ValueError(f"规则数已达上限 ({app_config.settings.WATCH_MAX_RULES})")
+
+        await self.start()
+        rule = {
+            "rule_id": uuid.uuid4().hex[:10],
+            "request": request.model_dump(),
+            "enabled": request.enabled,
+            "created_at": time.time(),
+            "state": {timeframe: {"runs": 0, "skips": 0} for timeframe in request.timeframes},
+        }
+        self.rules[rule["rule_id"]] = rule
+        if rule["enabled"]:
+            self._schedule_rule(rule, time.time())
+        self._save()
+        logger.info(f"Watch rule {rule['rule_id']} added: {request.asset} {request.timeframes}")
+        return self.view(rule)
+
+    def get(self, rule_id: str) -> Optional[Dict[str, Any]]:
+        rule = self.rules.get(rule_id)
+        return self.view(rule) if rule else None
+
+    def list_rules(self) -> List[Dict[str, Any]]:
+        return [self.view(rule) for rule in self.rules.values()]
+
+    def set_enabled(self, rule_id: str, enabled: bool) -> Optional[Dict[str, Any]]:
+        rule = self.rules.get(rule_id)
+        if not rule:
+            return None
+        if enabled and not rule["enabled"]:
+            rule["enabled"] = True
+            self._schedule_rule(rule, time.time())
+        elif not enabled:
+            rule["enabled"] = False
+            for state in rule["state"].values():
+                state["next_run_at"] = None
+        self._save()
+        return self.view(rule)
+
+    async def delete_rule(self, rule_id: str) -> bool:
+        rule = self.rules.pop(rule_id, None)
+        if not rule:
+            return False
+        for timeframe in rule["state"]:
+            task = self._running.get((rule_id, timeframe))
+            if task:
+                task.cancel()
+        self._save()
+        return True
+
+    async def run_now(self, rule_id: str) -> Optional[Dict[str, Any]]:
+        """立即执行一次（忽略"没有新K线"的判断，不影响后续的定时执行）"""
+        rule = self.rules.get(rule_id)
+        if not rule:
+            return None
+        await self.start()
+        for timeframe in rule["request"]["timeframes"]:
+            self._dispatch(rule_id, timeframe, time.time(), force=True)
+        return self.view(rule)
+
+    def stats(self) -> Dict[str, Any]:
+        upcoming = [due for due, rule_id, timeframe, _ in self._heap
+                    if rule_id in self.rules and self.rules[rule_id]["state"].get(timeframe, {}).get("next_run_at") == due]
+        return {
+            "rules": len(self.rules),
+            "enabled": sum(1 for rule in self.rules.values() if rule["enabled"]),
+            "running": len(self._running),
+            "next_run_at": min(upcoming) if upcoming else None,
+            "candles": self.store.stats(),
+        }
+
+
+# 全局调度器
+watch_scheduler = WatchScheduler()
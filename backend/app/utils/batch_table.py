@@ -0,0 +1,138 @@
+"""
+Batch Table - 批量分析的输入/输出表格
+读取 (交易对, 时间框架, 截止时间, 决策版本) 行：
+- 按列名识别（asset/symbol/币种、timeframe/周期、date/日期、time/时间、ai_version/版本）
+- 没有可识别的列名时按 随机表格/update_excel2.py 生成的测试表布局：B 列币种、C 列日期（YYYY-MM-DD HH:MM）、D 列时间
+结果表按扩展名写成 CSV（utf-8-sig，Excel 可直接打开）或 XLSX。
+"""
+
+import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+COLUMN_ALIASES = {
+    "asset": ("asset", "symbol", "crypto", "coin", "币种", "交易对"),
+    "timeframe": ("timeframe", "tf", "interval", "周期", "时间框架"),
+    "end_date": ("end_date", "date", "datetime", "end", "日期", "截止时间"),
+    "end_time": ("end_time", "time", "时间"),
+    "ai_version": ("ai_version", "version", "版本", "决策版本"),
+}
+
+# 测试表布局：B/C/D 列（从 0 开始的列号）
+POSITIONAL_COLUMNS = {"asset": 1, "end_date": 2, "end_time": 3}
+
+CSV_ENCODINGS = ("utf-8-sig", "gbk", "gb18030")
+
+
+def read_table(path: Union[str, Path]) -> pd.DataFrame:
+    """读取 CSV / XLSX（CSV 依次尝试 UTF-8、GBK、GB18030 编码）"""
+    path = Path(path)
+    if path.suffix.lower() in (".xlsx", ".xls"):
+        return pd.read_excel(path, dtype=object)
+
+    last_error: Optional[Exception] = None
+    for encoding in CSV_ENCODINGS:
+        try:
+            return pd.read_csv(path, dtype=object, encoding=encoding)
+        except UnicodeDecodeError as e:
+            last_error = e
+    raise ValueError(f"无法识别 {path.name} 的编码: {last_error}")
+
+
+def _is_blank(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and pd.isna(value)) or str(value).strip() in ("", "nan", "NaT")
+
+
+def _split_datetime(value: Any) -> Tuple[Optional[str], Optional[str]]:
+    """日期单元格 -> (YYYY-MM-DD, HH:MM)；单元格只有日期时时间为 None"""
+    if _is_blank(value):
+        return None, None
+    if isinstance(value, (datetime.datetime, pd.Timestamp)):
+        return value.strftime("%Y-%m-%d"), value.strftime("%H:%M")
+    if isinstance(value, datetime.date):
+        return value.strftime("%Y-%m-%d"), None
+
+    text = str(value).strip()
+    parts = text.replace("T", " ").split()
+    date_part = parts[0]
+    time_part = parts[1][:5] if len(parts) > 1 else None
+    try:
+        date_part = pd.to_datetime(date_part).strftime("%Y-%m-%d")
+    except (ValueError, TypeError):
+        pass
+    return date_part, time_part
+
+
+def _format_time(value: Any) -> Optional[str]:
+    if _is_blank(value):
+        return None
+    if isinstance(value, (datetime.time, datetime.datetime, pd.Timestamp)):
+        return value.strftime("%H:%M")
+    text = str(value).strip()
+    # "7:50" / "07:50:00" -> "07:50"
+    pieces = text.split(":")
+    if len(pieces) >= 2 and pieces[0].isdigit():
+        return f"{int(pieces[0]):02d}:{pieces[1][:2]}"
+    return text
+
+
+def _resolve_columns(df: pd.DataFrame) -> Dict[str, Any]:
+    lowered = {str(col).strip().lower(): col for col in df.columns}
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                mapping[field] = lowered[alias]
+                break
+    if "asset" in mapping:
+        return mapping
+
+    # 测试表：表头不可识别时按列位置取值
+    return {
+        field: df.columns[index]
+        for field, index in POSITIONAL_COLUMNS.items()
+        if index < len(df.columns)
+    }
+
+
+def rows_from_frame(df: pd.DataFrame) -> List[Dict[str, Optional[str]]]:
+    """表格 -> 批量分析行（BatchRow 的字段），跳过币种为空的行"""
+    columns = _resolve_columns(df)
+    if "asset" not in columns:
+        raise ValueError("表格中找不到币种列（asset / symbol / 币种，或测试表的 B 列）")
+
+    rows = []
+    for _, record in df.iterrows():
+        asset = record[columns["asset"]]
+        if _is_blank(asset):
+            continue
+
+        end_date, end_time = _split_datetime(record[columns["end_date"]]) if "end_date" in columns else (None, None)
+        # 单独的时间列优先于日期单元格中的时间
+        if "end_time" in columns:
+            end_time = _format_time(record[columns["end_time"]]) or end_time
+
+        row = {"asset": str(asset).strip(), "end_date": end_date, "end_time": end_time}
+        for field in ("timeframe", "ai_version"):
+            if field in columns and not _is_blank(record[columns[field]]):
+                row[field] = str(record[columns[field]]).strip()
+        rows.append(row)
+    return rows
+
+
+def load_batch_rows(path: Union[str, Path]) -> List[Dict[str, Optional[str]]]:
+    return rows_from_frame(read_table(path))
+
+
+def write_table(rows: List[Dict[str, Any]], path: Union[str, Path]) -> str:
+    """按扩展名写出结果表（.xlsx 需要 openpyxl），返回文件路径"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = pd.DataFrame(rows)
+    if path.suffix.lower() == ".xlsx":
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    return str(path)
@@ -0,0 +1,150 @@
+"""
+Candlestick Scan - TA-Lib K线组合形态预扫描
+一次性对分析窗口（多时间框架模式下为全部时间框架）运行全部 CDL* 识别函数，
+输出稀疏的形态命中表（形态、方向、K线位置），供形态/决策提示词和 HTML 报告使用。
+LLM 只需确认候选列表，而不必在整张图里盲找。
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import talib
+
+# 常见形态的中文名，其余使用 TA-Lib 的英文名
+CDL_NAMES_CN = {
+    "CDL2CROWS": "两只乌鸦",
+    "CDL3BLACKCROWS": "三只乌鸦",
+    "CDL3INSIDE": "三内部上涨/下跌",
+    "CDL3LINESTRIKE": "三线打击",
+    "CDL3OUTSIDE": "三外部上涨/下跌",
+    "CDL3WHITESOLDIERS": "红三兵",
+    "CDLABANDONEDBABY": "弃婴",
+    "CDLADVANCEBLOCK": "大敌当前",
+    "CDLBELTHOLD": "捉腰带线",
+    "CDLDARKCLOUDCOVER": "乌云压顶",
+    "CDLDOJI": "十字星",
+    "CDLDOJISTAR": "十字星（星位）",
+    "CDLDRAGONFLYDOJI": "蜻蜓十字",
+    "CDLENGULFING": "吞没形态",
+    "CDLEVENINGDOJISTAR": "十字暮星",
+    "CDLEVENINGSTAR": "黄昏星",
+    "CDLGRAVESTONEDOJI": "墓碑十字",
+    "CDLHAMMER": "锤头",
+    "CDLHANGINGMAN": "上吊线",
+    "CDLHARAMI": "孕线",
+    "CDLHARAMICROSS": "十字孕线",
+    "CDLINVERTEDHAMMER": "倒锤头",
+    "CDLLONGLEGGEDDOJI": "长腿十字",
+    "CDLMARUBOZU": "光头光脚",
+    "CDLMORNINGDOJISTAR": "十字晨星",
+    "CDLMORNINGSTAR": "早晨之星",
+    "CDLPIERCING": "刺透形态",
+    "CDLSHOOTINGSTAR": "射击之星",
+    "CDLSPINNINGTOP": "纺锤线",
+    "CDLTHRUSTING": "插入形态",
+    "CDLTRISTAR": "三星",
+}
+
+# 提示词中只列出最近 N 根K线内的命中，保持候选列表简短
+PROMPT_RECENT_BARS = 5
+PROMPT_MAX_ROWS = 12
+
+
+def _cdl_functions() -> List[str]:
+    return sorted(talib.get_function_groups().get("Pattern Recognition", []))
+
+
+def _to_frame(data: Any) -> Optional[pd.DataFrame]:
+    if isinstance(data, pd.DataFrame):
+        df = data.copy()
+    elif isinstance(data, list) and data:
+        df = pd.DataFrame(data)
+    else:
+        return None
+    df = df.rename(columns={c: str(c).capitalize() for c in df.columns})
+    if not all(col in df.columns for col in ("Open", "High", "Low", "Close")):
+        return None
+    if "Datetime" not in df.columns and "Date" in df.columns:
+        df = df.rename(columns={"Date": "Datetime"})
+    return df.reset_index(drop=True)
+
+
+def _scan_frame(df: pd.DataFrame, functions: List[str], timeframe: Optional[str]) -> List[Dict[str, Any]]:
+    """对单个时间框架运行全部 CDL 函数，返回命中行"""
+    o = df["Open"].to_numpy(dtype=np.float64)
+    h = df["High"].to_numpy(dtype=np.float64)
+    l = df["Low"].to_numpy(dtype=np.float64)
+    c = df["Close"].to_numpy(dtype=np.float64)
+    n = len(c)
+
+    # (形态数, K线数) 的信号矩阵，非零即命中（+100/-100，部分形态 ±200 表示确认）
+    signals = np.vstack([getattr(talib, name)(o, h, l, c) for name in functions])
+    pattern_idx, bar_idx = np.nonzero(signals)
+
+    times = df["Datetime"].astype(str).to_numpy() if "Datetime" in df.columns else None
+    rows = []
+    for p, b in zip(pattern_idx, bar_idx):
+        value = int(signals[p, b])
+        name = functions[p]
+        rows.append({
+            "timeframe": timeframe,
+            "pattern": name,
+            "name": CDL_NAMES_CN.get(name, name[3:].title()),
+            "bar": int(b),
+            "bars_ago": int(n - 1 - b),
+            "time": times[b] if times is not None else None,
+            "direction": "bullish" if value > 0 else "bearish",
+            "strength": abs(value),
+        })
+    return rows
+
+
+def scan_candlestick_patterns(kline_data: Any) -> List[Dict[str, Any]]:
+    """
+    运行 TA-Lib CDL 全家桶
+
+    Args:
+        kline_data: 单时间框架 OHLC（DataFrame / list[dict]）或 {timeframe: 数据}
+
+    Returns:
+        list[dict]: 命中表，按时间框架、距今K线数排序
+    """
+    functions = _cdl_functions()
+    if not functions:
+        return []
+
+    if isinstance(kline_data, dict):
+        frames = {tf: _to_frame(tf_data) for tf, tf_data in kline_data.items()}
+    else:
+        frames = {None: _to_frame(kline_data)}
+
+    rows: List[Dict[str, Any]] = []
+    for tf, df in frames.items():
+        if df is None or df.empty:
+            continue
+        try:
+            rows.extend(_scan_frame(df, functions, tf))
+        except Exception as e:
+            print(f"K线组合形态扫描失败 ({tf or '单周期'}): {e}")
+
+    rows.sort(key=lambda r: (str(r["timeframe"] or ""), r["bars_ago"], -r["strength"]))
+    return rows
+
+
+def format_candlestick_patterns(rows: List[Dict[str, Any]], recent_bars: int = PROMPT_RECENT_BARS,
+                                max_rows: int = PROMPT_MAX_ROWS) -> str:
+    """把最近几根K线上的命中整理成简短候选列表，供提示词使用"""
+    recent = [r for r in rows if r["bars_ago"] < recent_bars]
+    if not recent:
+        return f"最近 {recent_bars} 根K线未扫描到K线组合形态。"
+
+    lines = []
+    for r in recent[:max_rows]:
+        tf = f"[{r['timeframe']}] " if r["timeframe"] else ""
+        direction = "看涨" if r["direction"] == "bullish" else "看跌"
+        when = "最新K线" if r["bars_ago"] == 0 else f"{r['bars_ago']} 根K线前"
+        lines.append(f"- {tf}{r['name']}（{r['pattern']}）：{direction}，{when}")
+    if len(recent) > max_rows:
+        lines.append(f"- ……其余 {len(recent) - max_rows} 项省略")
+    return "\n".join(lines)
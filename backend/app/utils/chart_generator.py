@@ -6,13 +6,18 @@ Chart Generator - 图表生成工具
 
 import base64
 import io
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import mplfinance as mpf
 import numpy as np
 import pandas as pd
-from typing import Optional
 import platform
 
 # 设置中文字体
@@ -30,6 +35,97 @@ from .performance import performance_monitor, monitor_image_generation
 from .style_config import get_trading_style
 
 
+def _resolve_base_style() -> str:
+    """
+    查找可用的 seaborn 基础样式（只在模块加载时执行一次）
+
+    新版 matplotlib 把 'seaborn' 改名为 'seaborn-v0_8' 等，找不到时退回 ggplot。
+    """
+    available = plt.style.available
+    if 'seaborn' in available:
+        return 'seaborn'
+    seaborn_styles = [s for s in available if 'seaborn' in s]
+    return seaborn_styles[0] if seaborn_styles else 'ggplot'
+
+
+BASE_MPL_STYLE = _resolve_base_style()
+
+# 图表布局名称
+LAYOUT_KLINE = "kline"
+LAYOUT_SUMMARY = "summary"
+LAYOUT_TREND = "trend"
+LAYOUT_VOLUME = "volume"
+
+
+class _PooledFigure:
+    """池中的一张图：Figure + 按布局创建好的 Axes"""
+
+    __slots__ = ("fig", "axes")
+
+    def __init__(self, fig, axes: Tuple):
+        self.fig = fig
+        self.axes = axes
+
+
+class FigurePool:
+    """
+    按布局缓存可复用的 Figure/Axes 模板
+
+    每次绘图从池中取出一张图，绘制并导出后清空内容放回池中，
+    避免反复创建/销毁 Figure、Canvas 和 Axes。
+    同一张图同一时刻只会被一个线程持有。
+    """
+
+    def __init__(self, max_per_layout: int = 4):
+        self.max_per_layout = max_per_layout
+        self._idle: Dict[str, List[_PooledFigure]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "reused": 0, "discarded": 0}
+
+    def acquire(self, layout: str, factory: Callable[[], _PooledFigure]) -> _PooledFigure:
+        with self._lock:
+            idle = self._idle[layout]
+            if idle:
+                self.stats["reused"] += 1
+                return idle.pop()
+            self.stats["created"] += 1
+        return factory()
+
+    def release(self, layout: str, item: _PooledFigure, reset: Callable[[_PooledFigure], None]):
+        try:
+            reset(item)
+        except Exception as e:
+            # 清理失败的图不再复用
+            print(f"图表模板重置失败，丢弃: {e}")
+            self.discard(item)
+            return
+
+        with self._lock:
+            idle = self._idle[layout]
+            if len(idle) < self.max_per_layout:
+                idle.append(item)
+                return
+        self.discard(item)
+
+    def discard(self, item: _PooledFigure):
+        """关闭一张已取出的图，不再放回池中"""
+        with self._lock:
+            self.stats["discarded"] += 1
+        plt.close(item.fig)
+
+    def clear(self):
+        """关闭并清空池中所有图"""
+        with self._lock:
+            items = [item for idle in self._idle.values() for item in idle]
+            self._idle.clear()
+        for item in items:
+            plt.close(item.fig)
+
+    def size(self) -> Dict[str, int]:
+        with self._lock:
+            return {layout: len(idle) for layout, idle in self._idle.items()}
+
+
 class ChartGenerator:
     """
     图表生成器
@@ -38,9 +134,127 @@ class ChartGenerator:
     现在代码职责更加清晰了！
     """
 
-    def __init__(self):
-        """初始化图表生成器"""
+    def __init__(self, use_pool: bool = True, max_pool_size: int = 4):
+        """
+        初始化图表生成器
+
+        Args:
+            use_pool: 是否复用 Figure 模板（关闭时每次新建并销毁，便于对比）
+            max_pool_size: 每种布局最多缓存的 Figure 数量
+        """
         self.style = get_trading_style()
+        self.use_pool = use_pool
+        self.pool = FigurePool(max_per_layout=max_pool_size)
+
+        # 预编译 mplfinance 样式，避免每次绘图重复构建
+        self.market_colors = mpf.make_marketcolors(up='red', down='green', edge='black',
+                                                   wick='black', volume='in')
+        self.kline_style = mpf.make_mpf_style(base_mpl_style=BASE_MPL_STYLE,
+                                              marketcolors=self.market_colors, rc=self.style)
+
+        # 布局 -> (创建 Figure, 创建 Axes, 是否整图重建 Axes)
+        self._layouts = {
+            LAYOUT_KLINE: (self._new_kline_figure, self._build_kline_axes, True),
+            LAYOUT_SUMMARY: (lambda: self._new_figure((16, 12)), self._build_summary_axes, False),
+            LAYOUT_TREND: (lambda: self._new_figure((12, 10)), self._build_trend_axes, False),
+            LAYOUT_VOLUME: (lambda: self._new_figure((12, 8)), self._build_volume_axes, False),
+        }
+
+    # ------------------------------------------------------------------
+    # Figure 模板
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _new_figure(figsize: Tuple[int, int]):
+        # 不经过 pyplot 管理，避免池中的图计入全局 figure 列表
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        return fig
+
+    def _new_kline_figure(self):
+        # mpf.figure 在 add_subplot 时应用样式（背景、网格等）
+        return mpf.figure(style=self.kline_style, figsize=(12, 8))
+
+    @staticmethod
+    def _build_kline_axes(fig) -> Tuple:
+        gs = fig.add_gridspec(2, 1, height_ratios=[3, 1], hspace=0.05)
+        ax_main = fig.add_subplot(gs[0])
+        ax_volume = fig.add_subplot(gs[1], sharex=ax_main)
+        return ax_main, ax_volume
+
+    @staticmethod
+    def _build_summary_axes(fig) -> Tuple:
+        gs = fig.add_gridspec(4, 2, height_ratios=[2, 1, 1, 1], width_ratios=[3, 1])
+        return (
+            fig.add_subplot(gs[0, 0]),  # 主图
+            fig.add_subplot(gs[0, 1]),  # 决策面板
+            fig.add_subplot(gs[1, 0]),  # RSI
+            fig.add_subplot(gs[1, 1]),  # 信号汇总
+            fig.add_subplot(gs[2, :]),  # MACD
+            fig.add_subplot(gs[3, :]),  # 成交量
+        )
+
+    @staticmethod
+    def _build_trend_axes(fig) -> Tuple:
+        return tuple(fig.subplots(3, 1))
+
+    @staticmethod
+    def _build_volume_axes(fig) -> Tuple:
+        return tuple(fig.subplots(2, 1, gridspec_kw={'height_ratios': [3, 1]}))
+
+    def _create(self, layout: str) -> _PooledFigure:
+        new_figure, build_axes, _ = self._layouts[layout]
+        fig = new_figure()
+        return _PooledFigure(fig, build_axes(fig))
+
+    def _reset(self, layout: str, item: _PooledFigure):
+        _, build_axes, rebuild = self._layouts[layout]
+        if rebuild:
+            # mplfinance 样式只在创建 Axes 时生效，K线图整图清空后重建 Axes
+            item.fig.clear()
+            item.axes = build_axes(item.fig)
+        else:
+            for ax in item.axes:
+                ax.clear()
+                ax.axis('on')
+
+    @contextmanager
+    def _figure(self, layout: str):
+        """取出一张指定布局的图，用完后清空放回池中（或直接关闭）"""
+        if not self.use_pool:
+            item = self._create(layout)
+            try:
+                yield item.fig, item.axes
+            finally:
+                plt.close(item.fig)
+            return
+
+        item = self.pool.acquire(layout, lambda: self._create(layout))
+        try:
+            yield item.fig, item.axes
+        except Exception:
+            # 绘制中途出错的图状态未知，直接丢弃
+            self.pool.discard(item)
+            raise
+        self.pool.release(layout, item, lambda it: self._reset(layout, it))
+
+    @staticmethod
+    def _figure_to_base64(fig, save_path: Optional[str] = None) -> str:
+        """导出为 base64 PNG，并按需保存到文件"""
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+        png_bytes = buffer.getvalue()
+
+        # 保存到文件（如果指定了路径）
+        if save_path:
+            with open(save_path, 'wb') as f:
+                f.write(png_bytes)
+
+        return base64.b64encode(png_bytes).decode()
+
+    # ------------------------------------------------------------------
+    # 图表
+    # ------------------------------------------------------------------
 
     @performance_monitor("K线图生成")
     def generate_kline_chart(self, data: pd.DataFrame, title: str = "K线图",
@@ -62,243 +276,78 @@ class ChartGenerator:
                 if not all(col in data.columns for col in ['Open', 'High', 'Low', 'Close']):
                     raise ValueError("数据缺少必要的OHLC列")
 
-                # 设置mplfinance样式
-                # 兼容性处理：检查可用的 matplotlib 样式
-                base_style = 'seaborn'
-                if base_style not in plt.style.available:
-                    # 尝试查找替代的 seaborn 样式（新版 matplotlib 改名了）
-                    seaborn_styles = [s for s in plt.style.available if 'seaborn' in s]
-                    if seaborn_styles:
-                        base_style = seaborn_styles[0]
-                    else:
-                        base_style = 'ggplot' # 保底方案
-
-                mc = mpf.make_marketcolors(up='red', down='green', edge='black',
-                                         wick='black', volume='in')
-                s = mpf.make_mpf_style(base_mpl_style=base_style, marketcolors=mc, rc=self.style)
-
-                # 创建图表
-                fig, axes = mpf.plot(
-                    data,
-                    type='candle',
-                    style=s,
-                    title=title,
-                    ylabel='价格',
-                    volume=True,
-                    figsize=(12, 8),
-                    returnfig=True,
-                    warn_too_much_data=len(data) > 1000
-                )
-
-                # 添加最高价和最低价标注
-                try:
-                    ax_main = axes[0]
-                    
-                    # 找到最高价和最低价及其索引
-                    high_price = data['High'].max()
-                    low_price = data['Low'].min()
-                    
-                    # 获取对应的时间索引
-                    high_index = data['High'].idxmax()
-                    low_index = data['Low'].idxmin()
-                    
-                    # 在 mplfinance 中，x 轴是整数索引（0, 1, 2...）
-                    # 我们需要找到 high_index 和 low_index 在 data 中的整数位置
-                    high_pos = data.index.get_loc(high_index)
-                    low_pos = data.index.get_loc(low_index)
-                    
-                    # 调整 Y 轴范围，留出更多边距以防标注被遮挡
-                    ymin, ymax = ax_main.get_ylim()
-                    yrange = ymax - ymin
-                    # 上下各增加 10% 的边距
-                    ax_main.set_ylim(ymin - yrange * 0.1, ymax + yrange * 0.1)
-
-                    # 动态计算水平偏移量，避免在右边界被遮挡
-                    data_len = len(data)
-                    high_offset_x = -60 if high_pos > data_len * 0.85 else 10
-                    low_offset_x = -60 if low_pos > data_len * 0.85 else 10
-
-                    # 标注最高价
-                    ax_main.annotate(
-                        f'{high_price:.2f}',
-                        xy=(high_pos, high_price),
-                        xytext=(high_offset_x, 15),
-                        textcoords='offset points',
-                        arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=.2', color='red'),
-                        fontsize=10,
-                        color='red',
-                        fontweight='bold'
-                    )
-                    
-                    # 标注最低价
-                    ax_main.annotate(
-                        f'{low_price:.2f}',
-                        xy=(low_pos, low_price),
-                        xytext=(low_offset_x, -25),
-                        textcoords='offset points',
-                        arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=.2', color='green'),
-                        fontsize=10,
-                        color='green',
-                        fontweight='bold'
+                with self._figure(LAYOUT_KLINE) as (fig, (ax_main, ax_volume)):
+                    # 外部 Axes 模式：在模板 Axes 上重绘
+                    mpf.plot(
+                        data,
+                        type='candle',
+                        style=self.kline_style,
+                        ax=ax_main,
+                        volume=ax_volume,
+                        ylabel='价格',
+                        warn_too_much_data=len(data) > 1000
                     )
-                except Exception as e:
-                    # 标注失败不影响图表生成
-                    print(f"Failed to add price annotations: {e}")
-
-                # 优化布局
-                fig.tight_layout()
-
-                # 转换为base64
-                buffer = io.BytesIO()
-                fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-                buffer.seek(0)
-                image_base64 = base64.b64encode(buffer.getvalue()).decode()
-                plt.close(fig)
-
-                # 保存到文件（如果指定了路径）
-                if save_path:
-                    with open(save_path, 'wb') as f:
-                        f.write(base64.b64decode(image_base64))
-
-                return image_base64
+                    fig.suptitle(title)
+                    ax_main.tick_params(labelbottom=False)
+
+                    # 添加最高价和最低价标注
+                    try:
+                        # 找到最高价和最低价及其索引
+                        high_price = data['High'].max()
+                        low_price = data['Low'].min()
+
+                        # 获取对应的时间索引
+                        high_index = data['High'].idxmax()
+                        low_index = data['Low'].idxmin()
+
+                        # 在 mplfinance 中，x 轴是整数索引（0, 1, 2...）
+                        # 我们需要找到 high_index 和 low_index 在 data 中的整数位置
+                        high_pos = data.index.get_loc(high_index)
+                        low_pos = data.index.get_loc(low_index)
+
+                        # 调整 Y 轴范围，留出更多边距以防标注被遮挡
+                        ymin, ymax = ax_main.get_ylim()
+                        yrange = ymax - ymin
+                        # 上下各增加 10% 的边距
+                        ax_main.set_ylim(ymin - yrange * 0.1, ymax + yrange * 0.1)
+
+                        # 动态计算水平偏移量，避免在右边界被遮挡
+                        data_len = len(data)
+                        high_offset_x = -60 if high_pos > data_len * 0.85 else 10
+                        low_offset_x = -60 if low_pos > data_len * 0.85 else 10
+
+                        # 标注最高价
+                        ax_main.annotate(
+                            f'{high_price:.2f}',
+                            xy=(high_pos, high_price),
+                            xytext=(high_offset_x, 15),
+                            textcoords='offset points',
+                            arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=.2', color='red'),
+                            fontsize=10,
+                            color='red',
+                            fontweight='bold'
+                        )
+
+                        # 标注最低价
+                        ax_main.annotate(
+                            f'{low_price:.2f}',
+                            xy=(low_pos, low_price),
+                            xytext=(low_offset_x, -25),
+                            textcoords='offset points',
+                            arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=.2', color='green'),
+                            fontsize=10,
+                            color='green',
+                            fontweight='bold'
+                        )
+                    except Exception as e:
+                        # 标注失败不影响图表生成
+                        print(f"Failed to add price annotations: {e}")
+
+                    return self._figure_to_base64(fig, save_path)
 
         except Exception as e:
             raise ValueError(f"K线图生成失败: {str(e)}")
 
-    @performance_monitor("趋势图生成")
-    def generate_summary_chart(self, data: pd.DataFrame, indicators: dict, decision: dict,
-                           title: str = "综合分析图", save_path: Optional[str] = None) -> str:
-        """
-        生成综合分析图 (替代旧的趋势图)
-        """
-        try:
-            with monitor_image_generation("综合图"):
-                # 创建 GridSpec 布局
-                fig = plt.figure(figsize=(12, 10))
-                gs = fig.add_gridspec(4, 1, height_ratios=[3, 1, 1, 1], hspace=0.4)
-                
-                # 1. 主图 (价格 + MA)
-                ax1 = fig.add_subplot(gs[0])
-                ax1.plot(data.index, data['Close'], label='收盘价', linewidth=1.5)
-                
-                # 添加移动平均线
-                if len(data) >= 20:
-                    ma20 = data['Close'].rolling(window=20).mean()
-                    ax1.plot(data.index, ma20, label='MA20', alpha=0.7, linewidth=1)
-                
-                # 添加布林带 (如果数据足够)
-                if len(data) >= 20:
-                    std = data['Close'].rolling(window=20).std()
-                    upper = ma20 + 2 * std
-                    lower = ma20 - 2 * std
-                    ax1.fill_between(data.index, upper, lower, alpha=0.1, color='gray', label='布林带')
-                
-                ax1.set_title(title, fontsize=14, fontweight='bold')
-                ax1.legend(loc='upper left')
-                ax1.grid(True, alpha=0.3)
-                ax1.set_ylabel('价格')
-                
-                # 决策标注箱
-                action = decision.get('decision', 'N/A')
-                color = 'green' if action == '做多' else 'red' if action == '做空' else 'gray'
-                text_str = f"决策: {action}\n"
-                text_str += f"置信度: {decision.get('confidence_level', 'N/A')}\n"
-                text_str += f"止盈: {decision.get('take_profit', 'N/A')}\n"
-                text_str += f"止损: {decision.get('stop_loss', 'N/A')}"
-                
-                props = dict(boxstyle='round', facecolor=color, alpha=0.1)
-                ax1.text(0.02, 0.95, text_str, transform=ax1.transAxes, fontsize=10,
-                        verticalalignment='top', bbox=props)
-
-                # 2. RSI 子图
-                ax2 = fig.add_subplot(gs[1], sharex=ax1)
-                # 尝试从不同结构中获取 RSI 数据
-                rsi_data = None
-                if indicators and isinstance(indicators, dict):
-                    # 结构 1: indicators['rsi']['rsi']
-                    if 'rsi' in indicators and isinstance(indicators['rsi'], dict) and 'rsi' in indicators['rsi']:
-                        rsi_data = indicators['rsi']['rsi']
-                    # 结构 2: indicators 本身就是 {'rsi': [...]}
-                    elif 'rsi' in indicators and isinstance(indicators['rsi'], list):
-                        rsi_data = indicators['rsi']
-                
-                # 如果没有现成数据，现场计算一个
-                if rsi_data is None or len(rsi_data) == 0:
-                     delta = data['Close'].diff()
-                     gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                     loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                     rs = gain / loss
-                     rsi_data = 100 - (100 / (1 + rs))
-                
-                # 截取长度匹配
-                if len(rsi_data) > len(data):
-                    rsi_data = rsi_data[-len(data):]
-                elif len(rsi_data) < len(data):
-                    # 填充 NaN
-                    padding = [np.nan] * (len(data) - len(rsi_data))
-                    if isinstance(rsi_data, list):
-                        rsi_data = padding + rsi_data
-                    else:
-                        rsi_data = pd.concat([pd.Series(padding), rsi_data])
-                
-                ax2.plot(data.index, rsi_data, label='RSI (14)', color='purple')
-                ax2.axhline(70, linestyle='--', alpha=0.5, color='red')
-                ax2.axhline(30, linestyle='--', alpha=0.5, color='green')
-                ax2.set_ylabel('RSI')
-                ax2.set_ylim(0, 100)
-                ax2.grid(True, alpha=0.3)
-                
-                # 3. MACD 子图
-                ax3 = fig.add_subplot(gs[2], sharex=ax1)
-                # 简单计算 MACD
-                exp12 = data['Close'].ewm(span=12, adjust=False).mean()
-                exp26 = data['Close'].ewm(span=26, adjust=False).mean()
-                macd = exp12 - exp26
-                signal = macd.ewm(span=9, adjust=False).mean()
-                hist = macd - signal
-                
-                ax3.plot(data.index, macd, label='MACD', linewidth=1)
-                ax3.plot(data.index, signal, label='Signal', linewidth=1)
-                # 柱状图颜色
-                colors = ['red' if v < 0 else 'green' for v in hist]
-                ax3.bar(data.index, hist, color=colors, alpha=0.5, label='Hist')
-                ax3.set_ylabel('MACD')
-                ax3.grid(True, alpha=0.3)
-                
-                # 4. 成交量子图
-                ax4 = fig.add_subplot(gs[3], sharex=ax1)
-                colors = ['red' if c < o else 'green' for c, o in zip(data['Close'], data['Open'])]
-                ax4.bar(data.index, data['Volume'], color=colors, alpha=0.7)
-                ax4.set_ylabel('成交量')
-                ax4.grid(True, alpha=0.3)
-                
-                # 隐藏中间子图的 x 轴标签
-                plt.setp(ax1.get_xticklabels(), visible=False)
-                plt.setp(ax2.get_xticklabels(), visible=False)
-                plt.setp(ax3.get_xticklabels(), visible=False)
-                
-                # 旋转最底部的日期标签
-                plt.xticks(rotation=30)
-                
-                # 转换为base64
-                buffer = io.BytesIO()
-                fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-                buffer.seek(0)
-                image_base64 = base64.b64encode(buffer.getvalue()).decode()
-                plt.close(fig)
-
-                # 保存到文件
-                if save_path:
-                    with open(save_path, 'wb') as f:
-                        f.write(base64.b64decode(image_base64))
-
-                return image_base64
-
-        except Exception as e:
-            # 如果出错，返回一个简单的错误提示图或者空字符串
-            print(f"综合图表生成失败: {e}")
-            return ""
-
     @performance_monitor("趋势图生成")
     def generate_trend_chart(self, data: pd.DataFrame, indicators: dict,
                            title: str = "技术指标分析图", save_path: Optional[str] = None) -> str:
@@ -315,12 +364,11 @@ class ChartGenerator:
             Base64编码的图片字符串
         """
         try:
-            with monitor_image_generation("趋势图"):
-                fig, axes = plt.subplots(3, 1, figsize=(12, 10))
+            with monitor_image_generation("趋势图"), \
+                    self._figure(LAYOUT_TREND) as (fig, (ax1, ax2, ax3)):
                 fig.suptitle(title, fontsize=16)
 
                 # 第一个子图：价格和移动平均线
-                ax1 = axes[0]
                 ax1.plot(data.index, data['Close'], label='收盘价', linewidth=2)
 
                 # 添加移动平均线
@@ -337,7 +385,6 @@ class ChartGenerator:
                 ax1.grid(True, alpha=0.3)
 
                 # 第二个子图：RSI
-                ax2 = axes[1]
                 if "rsi" in indicators:
                     rsi_values = indicators["rsi"]["rsi"]
                     rsi_length = min(len(rsi_values), len(data))
@@ -351,7 +398,6 @@ class ChartGenerator:
                     ax2.grid(True, alpha=0.3)
 
                 # 第三个子图：MACD
-                ax3 = axes[2]
                 if "macd" in indicators:
                     macd_data = indicators["macd"]
                     macd_length = min(len(macd_data["macd"]), len(data))
@@ -371,21 +417,9 @@ class ChartGenerator:
                     ax3.legend()
                     ax3.grid(True, alpha=0.3)
 
-                plt.tight_layout()
-
-                # 转换为base64
-                buffer = io.BytesIO()
-                fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-                buffer.seek(0)
-                image_base64 = base64.b64encode(buffer.getvalue()).decode()
-                plt.close(fig)
-
-                # 保存到文件（如果指定了路径）
-                if save_path:
-                    with open(save_path, 'wb') as f:
-                        f.write(base64.b64decode(image_base64))
+                fig.tight_layout()
 
-                return image_base64
+                return self._figure_to_base64(fig, save_path)
 
         except Exception as e:
             raise ValueError(f"趋势图生成失败: {str(e)}")
@@ -405,9 +439,8 @@ class ChartGenerator:
             Base64编码的图片字符串
         """
         try:
-            with monitor_image_generation("成交量图"):
-                fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8),
-                                            gridspec_kw={'height_ratios': [3, 1]})
+            with monitor_image_generation("成交量图"), \
+                    self._figure(LAYOUT_VOLUME) as (fig, (ax1, ax2)):
                 fig.suptitle(title, fontsize=16)
 
                 # 价格图
@@ -431,21 +464,9 @@ class ChartGenerator:
                     ax2.plot(data.index, vol_ma, label='成交量MA20', color='orange', linewidth=2)
                     ax2.legend()
 
-                plt.tight_layout()
-
-                # 转换为base64
-                buffer = io.BytesIO()
-                fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-                buffer.seek(0)
-                image_base64 = base64.b64encode(buffer.getvalue()).decode()
-                plt.close(fig)
-
-                # 保存到文件（如果指定了路径）
-                if save_path:
-                    with open(save_path, 'wb') as f:
-                        f.write(base64.b64decode(image_base64))
+                fig.tight_layout()
 
-                return image_base64
+                return self._figure_to_base64(fig, save_path)
 
         except Exception as e:
             raise ValueError(f"成交量图生成失败: {str(e)}")
@@ -465,126 +486,112 @@ class ChartGenerator:
             Base64编码的图片字符串
         """
         try:
-            # 创建更大的画布来容纳更多信息
-            fig = plt.figure(figsize=(16, 12))
-            gs = fig.add_gridspec(4, 2, height_ratios=[2, 1, 1, 1], width_ratios=[3, 1])
-
-            # 主图：K线图
-            ax_main = fig.add_subplot(gs[0, 0])
-            ax_main.plot(data.index, data['Close'], label='收盘价', linewidth=2)
-
-            if len(data) >= 20:
-                ma20 = data['Close'].rolling(window=20).mean()
-                ax_main.plot(data.index, ma20, label='MA20', alpha=0.7)
-            if len(data) >= 50:
-                ma50 = data['Close'].rolling(window=50).mean()
-                ax_main.plot(data.index, ma50, label='MA50', alpha=0.7)
-
-            ax_main.set_title(f'{title} - 价格走势')
-            ax_main.set_ylabel('价格')
-            ax_main.legend()
-            ax_main.grid(True, alpha=0.3)
-
-            # 决策面板
-            ax_decision = fig.add_subplot(gs[0, 1])
-            ax_decision.axis('off')
-
-            # 安全获取置信度
-            try:
-                conf_val = float(decision.get('confidence', 0))
-            except (ValueError, TypeError):
-                conf_val = 0.0
+            with self._figure(LAYOUT_SUMMARY) as (fig, axes):
+                ax_main, ax_decision, ax_rsi, ax_signals, ax_macd, ax_volume = axes
+
+                # 主图：K线图
+                ax_main.plot(data.index, data['Close'], label='收盘价', linewidth=2)
+
+                if len(data) >= 20:
+                    ma20 = data['Close'].rolling(window=20).mean()
+                    ax_main.plot(data.index, ma20, label='MA20', alpha=0.7)
+                if len(data) >= 50:
+                    ma50 = data['Close'].rolling(window=50).mean()
+                    ax_main.plot(data.index, ma50, label='MA50', alpha=0.7)
 
-            decision_text = f"""
-            最终决策: {decision.get('action', 'UNKNOWN')}
+                ax_main.set_title(f'{title} - 价格走势')
+                ax_main.set_ylabel('价格')
+                ax_main.legend()
+                ax_main.grid(True, alpha=0.3)
 
-            置信度: {conf_val:.1%}
+                # 决策面板
+                ax_decision.axis('off')
 
-            理由: {decision.get('reasoning', '暂无')[:50]}...
+                # 安全获取置信度
+                try:
+                    conf_val = float(decision.get('confidence', 0))
+                except (ValueError, TypeError):
+                    conf_val = 0.0
 
-            风险回报比: {decision.get('risk_reward', '暂无')}
+                decision_text = f"""
+                最终决策: {decision.get('action', 'UNKNOWN')}
 
-            预测时间: {decision.get('time_horizon', '暂无')}
-            """
+                置信度: {conf_val:.1%}
 
-            decision_color = 'green' if decision.get('action') == '做多' else 'red' if decision.get('action') == '做空' else 'gray'
-            ax_decision.text(0.1, 0.5, decision_text, fontsize=12,
-                           verticalalignment='center', bbox=dict(boxstyle='round',
-                           facecolor=decision_color, alpha=0.1))
+                理由: {decision.get('reasoning', '暂无')[:50]}...
 
-            # RSI图
-            ax_rsi = fig.add_subplot(gs[1, 0])
-            if "rsi" in indicators:
-                rsi_values = indicators["rsi"]["rsi"]
-                rsi_length = min(len(rsi_values), len(data))
-                ax_rsi.plot(data.index[-rsi_length:], rsi_values[-rsi_length:], label='RSI', color='purple')
-                ax_rsi.axhline(y=70, color='red', linestyle='--', alpha=0.7)
-                ax_rsi.axhline(y=30, color='green', linestyle='--', alpha=0.7)
-                ax_rsi.set_title('RSI指标')
-                ax_rsi.set_ylabel('RSI')
-                ax_rsi.set_ylim(0, 100)
-                ax_rsi.grid(True, alpha=0.3)
+                风险回报比: {decision.get('risk_reward', '暂无')}
 
-            # 信号汇总图
-            ax_signals = fig.add_subplot(gs[1, 1])
-            ax_signals.axis('off')
+                预测时间: {decision.get('time_horizon', '暂无')}
+                """
 
-            if "summary" in indicators:
-                summary = indicators["summary"]
-                signals_text = f"""
-                技术信号汇总:
+                decision_color = 'green' if decision.get('action') == '做多' else 'red' if decision.get('action') == '做空' else 'gray'
+                ax_decision.text(0.1, 0.5, decision_text, fontsize=12,
+                               verticalalignment='center', bbox=dict(boxstyle='round',
+                               facecolor=decision_color, alpha=0.1))
 
-                总体信号: {summary.get('overall_signal', 'neutral').upper()}
+                # RSI图
+                if "rsi" in indicators:
+                    rsi_values = indicators["rsi"]["rsi"]
+                    rsi_length = min(len(rsi_values), len(data))
+                    ax_rsi.plot(data.index[-rsi_length:], rsi_values[-rsi_length:], label='RSI', color='purple')
+                    ax_rsi.axhline(y=70, color='red', linestyle='--', alpha=0.7)
+                    ax_rsi.axhline(y=30, color='green', linestyle='--', alpha=0.7)
+                    ax_rsi.set_title('RSI指标')
+                    ax_rsi.set_ylabel('RSI')
+                    ax_rsi.set_ylim(0, 100)
+                    ax_rsi.grid(True, alpha=0.3)
+
+                # 信号汇总图
+                ax_signals.axis('off')
+
+                if "summary" in indicators:
+                    summary = indicators["summary"]
+                    signals_text = f"""
+                    技术信号汇总:
+
+                    总体信号: {summary.get('overall_signal', 'neutral').upper()}
+
+                    看涨信号 ({len(summary.get('bullish_signals', []))}):
+                    {chr(10).join(f'• {s}' for s in summary.get('bullish_signals', [])[:3])}
+
+                    看跌信号 ({len(summary.get('bearish_signals', []))}):
+                    {chr(10).join(f'• {s}' for s in summary.get('bearish_signals', [])[:3])}
+                    """
+                    ax_signals.text(0.1, 0.5, signals_text, fontsize=10,
+                                  verticalalignment='center', bbox=dict(boxstyle='round',
+                                  facecolor='lightblue', alpha=0.1))
+
+                # MACD图
+                if "macd" in indicators:
+                    macd_data = indicators["macd"]
+                    macd_length = min(len(macd_data["macd"]), len(data))
 
-                看涨信号 ({len(summary.get('bullish_signals', []))}):
-                {chr(10).join(f'• {s}' for s in summary.get('bullish_signals', [])[:3])}
+                    x_axis = data.index[-macd_length:]
+                    ax_macd.plot(x_axis, macd_data["macd"][-macd_length:], label='MACD', linewidth=2)
+                    ax_macd.plot(x_axis, macd_data["signal"][-macd_length:], label='Signal', linewidth=2)
 
-                看跌信号 ({len(summary.get('bearish_signals', []))}):
-                {chr(10).join(f'• {s}' for s in summary.get('bearish_signals', [])[:3])}
-                """
-                ax_signals.text(0.1, 0.5, signals_text, fontsize=10,
-                              verticalalignment='center', bbox=dict(boxstyle='round',
-                              facecolor='lightblue', alpha=0.1))
-
-            # MACD图
-            ax_macd = fig.add_subplot(gs[2, :])
-            if "macd" in indicators:
-                macd_data = indicators["macd"]
-                macd_length = min(len(macd_data["macd"]), len(data))
-
-                x_axis = data.index[-macd_length:]
-                ax_macd.plot(x_axis, macd_data["macd"][-macd_length:], label='MACD', linewidth=2)
-                ax_macd.plot(x_axis, macd_data["signal"][-macd_length:], label='Signal', linewidth=2)
-
-                histogram = macd_data["histogram"][-macd_length:]
-                colors = ['red' if h < 0 else 'green' for h in histogram]
-                ax_macd.bar(x_axis, histogram, color=colors, alpha=0.6, label='Histogram')
-
-                ax_macd.set_title('MACD指标')
-                ax_macd.set_ylabel('MACD')
-                ax_macd.axhline(y=0, color='black', linestyle='-', alpha=0.3)
-                ax_macd.legend()
-                ax_macd.grid(True, alpha=0.3)
-
-            # 成交量图
-            ax_volume = fig.add_subplot(gs[3, :])
-            colors = ['red' if close >= open else 'green'
-                     for close, open in zip(data['Close'], data['Open'])]
-            ax_volume.bar(data.index, data['Volume'], color=colors, alpha=0.7)
-            ax_volume.set_title('成交量')
-            ax_volume.set_ylabel('成交量')
-            ax_volume.grid(True, alpha=0.3)
-
-            plt.tight_layout()
-
-            # 转换为base64
-            buffer = io.BytesIO()
-            fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close(fig)
-
-            return image_base64
+                    histogram = macd_data["histogram"][-macd_length:]
+                    colors = ['red' if h < 0 else 'green' for h in histogram]
+                    ax_macd.bar(x_axis, histogram, color=colors, alpha=0.6, label='Histogram')
+
+                    ax_macd.set_title('MACD指标')
+                    ax_macd.set_ylabel('MACD')
+                    ax_macd.axhline(y=0, color='black', linestyle='-', alpha=0.3)
+                    ax_macd.legend()
+                    ax_macd.grid(True, alpha=0.3)
+
+                # 成交量图
+                colors = ['red' if close >= open else 'green'
+                         for close, open in zip(data['Close'], data['Open'])]
+                ax_volume.bar(data.index, data['Volume'], color=colors, alpha=0.7)
+                ax_volume.set_title('成交量')
+                ax_volume.set_ylabel('成交量')
+                ax_volume.grid(True, alpha=0.3)
+
+                fig.tight_layout()
+
+                return self._figure_to_base64(fig)
 
         except Exception as e:
             raise ValueError(f"综合图表生成失败: {str(e)}")
@@ -601,4 +608,4 @@ def generate_kline_image(data: pd.DataFrame, title: str = "K线图") -> str:
 
 def generate_trend_image(data: pd.DataFrame, indicators: dict, title: str = "技术指标分析图") -> str:
     """生成趋势图（向后兼容）"""
-    return chart_generator.generate_trend_chart(data, indicators, title)
\ No newline at end of file
+    return chart_generator.generate_trend_chart(data, indicators, title)
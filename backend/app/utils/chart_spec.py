@@ -0,0 +1,194 @@
+"""
+Chart Spec - 前端可渲染的图表数据
+为 /analyze 响应生成紧凑的图表描述（OHLCV 切片、趋势线系数、标注点），
+由前端原生绘制，替代体积巨大的 base64 PNG。
+PNG 仅在 LLM 视觉分析和 HTML 导出时按需生成。
+"""
+
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .graph_util import fit_trendlines_high_low, fit_trendlines_single
+
+# 与 graph_util 中图表工具保持一致的窗口长度
+PATTERN_WINDOW = 40
+TREND_WINDOW = 50
+
+# 仅供展示的图片字段，spec 模式下不随响应返回
+CHART_IMAGE_FIELDS = (
+    "pattern_chart",
+    "pattern_image",
+    "pattern_images",
+    "trend_chart",
+    "trend_image",
+    "trend_images",
+    "future_kline_chart_base64",
+)
+
+
+def _to_frame(data: Any) -> Optional[pd.DataFrame]:
+    """把 DataFrame / list[dict] 统一转换为以时间为索引的 OHLCV DataFrame"""
+    if isinstance(data, pd.DataFrame):
+        df = data.copy()
+    elif isinstance(data, list) and data:
+        df = pd.DataFrame(data)
+    else:
+        return None
+
+    for time_col in ("Datetime", "Date", "datetime", "date"):
+        if time_col in df.columns:
+            df[time_col] = pd.to_datetime(df[time_col])
+            df = df.set_index(time_col)
+            break
+
+    df = df.rename(columns={c: str(c).capitalize() for c in df.columns})
+    if not all(col in df.columns for col in ("Open", "High", "Low", "Close")):
+        return None
+    return df
+
+
+def _round(value: float) -> float:
+    """保留足够精度（小币种价格可能很小）同时压缩 JSON 体积"""
+    return float(f"{float(value):.8g}")
+
+
+def _candles(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    has_volume = "Volume" in df.columns
+    rows = []
+    for ts, row in zip(df.index, df.itertuples(index=False)):
+        item = {
+            "time": pd.Timestamp(ts).strftime("%Y-%m-%d %H:%M:%S"),
+            "open": _round(row.Open),
+            "high": _round(row.High),
+            "low": _round(row.Low),
+            "close": _round(row.Close),
+        }
+        if has_volume and not pd.isna(row.Volume):
+            item["volume"] = _round(row.Volume)
+        rows.append(item)
+    return rows
+
+
+def _extreme_annotations(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """最高价 / 最低价标注点（与 ChartGenerator.generate_kline_chart 一致）"""
+    high_pos = int(np.argmax(df["High"].to_numpy()))
+    low_pos = int(np.argmin(df["Low"].to_numpy()))
+    return [
+        {
+            "kind": "high",
+            "index": high_pos,
+            "time": pd.Timestamp(df.index[high_pos]).strftime("%Y-%m-%d %H:%M:%S"),
+            "price": _round(df["High"].iloc[high_pos]),
+        },
+        {
+            "kind": "low",
+            "index": low_pos,
+            "time": pd.Timestamp(df.index[low_pos]).strftime("%Y-%m-%d %H:%M:%S"),
+            "price": _round(df["Low"].iloc[low_pos]),
+        },
+    ]
+
+
+def build_kline_spec(data: Any, title: str = "K线图", window: Optional[int] = PATTERN_WINDOW) -> Optional[Dict[str, Any]]:
+    """
+    生成K线图 spec
+
+    Args:
+        data: OHLCV数据（DataFrame 或 list[dict]）
+        title: 图表标题
+        window: 只保留最近 N 根K线，None 表示全部
+
+    Returns:
+        dict: {"type": "kline", "title", "candles", "annotations"}，数据不足时返回 None
+    """
+    df = _to_frame(data)
+    if df is None or df.empty:
+        return None
+    if window:
+        df = df.tail(window)
+
+    return {
+        "type": "kline",
+        "title": title,
+        "candles": _candles(df),
+        "annotations": _extreme_annotations(df),
+    }
+
+
+def build_trend_spec(data: Any, title: str = "趋势线分析", window: int = TREND_WINDOW) -> Optional[Dict[str, Any]]:
+    """
+    生成趋势图 spec：K线切片 + 支撑/阻力线系数
+
+    趋势线以 y = slope * index + intercept 表示，index 为 candles 中的位置（从 0 开始），
+    拟合方法与 TechnicalTools.generate_trend_image 完全一致。
+    """
+    df = _to_frame(data)
+    if df is None or df.empty:
+        return None
+    df = df.tail(window)
+
+    trendlines = []
+    try:
+        support_c, resist_c = fit_trendlines_single(df["Close"])
+        support_hl, resist_hl = fit_trendlines_high_low(df["High"], df["Low"], df["Close"])
+        for name, coefs, color in (
+            ("close_support", support_c, "blue"),
+            ("close_resistance", resist_c, "red"),
+            ("high_low_support", support_hl, "gray"),
+            ("high_low_resistance", resist_hl, "gray"),
+        ):
+            trendlines.append({
+                "name": name,
+                "slope": _round(coefs[0]),
+                "intercept": _round(coefs[1]),
+                "color": color,
+            })
+    except Exception as e:
+        # 趋势线拟合失败时仍返回K线数据
+        print(f"趋势线拟合失败: {e}")
+
+    return {
+        "type": "trend",
+        "title": title,
+        "candles": _candles(df),
+        "trendlines": trendlines,
+        "annotations": _extreme_annotations(df),
+    }
+
+
+def _per_timeframe(data: Union[pd.DataFrame, Dict[str, pd.DataFrame]], builder, **kwargs):
+    if isinstance(data, dict):
+        specs = {}
+        for tf, tf_data in data.items():
+            spec = builder(tf_data, **kwargs)
+            if spec:
+                specs[tf] = spec
+        return specs
+    return builder(data, **kwargs)
+
+
+def build_chart_specs(data: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
+                      future_data: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """
+    为一次分析生成全部图表 spec
+
+    多时间框架模式下 pattern / trend 为 {timeframe: spec} 字典。
+    """
+    specs = {
+        "pattern": _per_timeframe(data, build_kline_spec, title="K线形态"),
+        "trend": _per_timeframe(data, build_trend_spec, title="趋势线分析"),
+    }
+    if future_data is not None and not future_data.empty:
+        specs["future"] = build_kline_spec(
+            future_data,
+            title=f"未来{len(future_data)}根K线走势 (回测验证)",
+            window=None,
+        )
+    return specs
+
+
+def strip_chart_images(result: Dict[str, Any]) -> Dict[str, Any]:
+    """返回去掉 base64 图片字段的浅拷贝（原结果保留图片供历史记录和 HTML 导出使用）"""
+    return {k: v for k, v in result.items() if k not in CHART_IMAGE_FIELDS}
@@ -0,0 +1,68 @@
+"""
+Decision Stream - 决策 JSON 增量解析
+决策智能体流式输出时，每收到一段文本就扫描一次，
+字段的值一旦完整出现（字符串已闭合 / 数字后已出现分隔符）就立即取出，
+前端无需等待整段 JSON 输出完毕即可展示方向、止损、止盈等关键信息。
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable
+
+# 需要提前推送的字段（justification 等长文本随原始流一起展示，不单独解析）
+DECISION_STREAM_FIELDS = (
+    "decision",
+    "stop_loss",
+    "take_profit",
+    "risk_reward_ratio",
+    "confidence_level",
+    "market_environment",
+    "volatility_assessment",
+    "forecast_horizon",
+)
+
+# 字符串值必须已闭合；数字值后面必须已经出现 , } 或换行，避免把 "1.2" 当成 "1.25" 的结果
+_VALUE_PATTERN = r'"{key}"\s*:\s*("(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?(?=\s*[,}}\n]))'
+
+
+class IncrementalDecisionParser:
+    """逐段喂入决策输出文本，返回新完成的字段"""
+
+    def __init__(self, fields: Iterable[str] = DECISION_STREAM_FIELDS):
+        self.buffer = ""
+        self.values: Dict[str, Any] = {}
+        self._patterns = {
+            key: re.compile(_VALUE_PATTERN.format(key=re.escape(key))) for key in fields
+        }
+
+    def reset(self):
+        """丢弃已接收的内容（LLM 调用失败重试时使用）"""
+        self.buffer = ""
+        self.values = {}
+
+    def feed(self, delta: str) -> Dict[str, Any]:
+        """
+        追加一段文本
+
+        Returns:
+            dict: 本次新解析出的字段（没有则为空字典）
+        """
+        if not delta:
+            return {}
+        self.buffer += delta
+
+        found = {}
+        for key, pattern in self._patterns.items():
+            if key in self.values:
+                continue
+            match = pattern.search(self.buffer)
+            if not match:
+                continue
+            raw = match.group(1)
+            try:
+                value = json.loads(raw)
+            except ValueError:
+                value = raw.strip('"')
+            self.values[key] = value
+            found[key] = value
+        return found
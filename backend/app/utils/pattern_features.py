@@ -0,0 +1,296 @@
+"""
+Pattern Features - K线形态数值特征提取
+直接在 OHLC 数组上计算摆动高低点、楔形/三角形收敛、双顶/双底、旗形、V形反转等启发式特征，
+生成紧凑的文字描述，可替代（或配合）视觉模型识别 pattern_agent 中列出的经典形态。
+全部为确定性计算，不调用 LLM。
+"""
+
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# 与 generate_kline_image 的窗口保持一致
+PATTERN_WINDOW = 40
+# 摆动点左右各需比较的K线数
+PIVOT_ORDER = 3
+
+# 形态分析模式
+PATTERN_MODE_VISION = "vision"    # 仅图像 + 视觉模型（原有行为）
+PATTERN_MODE_NUMERIC = "numeric"  # 仅数值特征 + 文本模型，不生成图片
+PATTERN_MODE_HYBRID = "hybrid"    # 图像 + 数值特征一起发给视觉模型
+PATTERN_MODES = (PATTERN_MODE_VISION, PATTERN_MODE_NUMERIC, PATTERN_MODE_HYBRID)
+
+
+def _to_frame(data: Any) -> Optional[pd.DataFrame]:
+    if isinstance(data, pd.DataFrame):
+        df = data.copy()
+    elif isinstance(data, list) and data:
+        df = pd.DataFrame(data)
+    else:
+        return None
+    df = df.rename(columns={c: str(c).capitalize() for c in df.columns})
+    if not all(col in df.columns for col in ("Open", "High", "Low", "Close")):
+        return None
+    return df.reset_index(drop=True)
+
+
+def find_pivots(high: np.ndarray, low: np.ndarray, order: int = PIVOT_ORDER) -> Dict[str, np.ndarray]:
+    """
+    摆动高低点：在前后 order 根K线内为最高/最低的位置
+
+    Returns:
+        {"highs": 索引数组, "lows": 索引数组}
+    """
+    n = len(high)
+    if n < 2 * order + 1:
+        return {"highs": np.array([], dtype=int), "lows": np.array([], dtype=int)}
+
+    window = 2 * order + 1
+    high_win = np.lib.stride_tricks.sliding_window_view(high, window)
+    low_win = np.lib.stride_tricks.sliding_window_view(low, window)
+    center = np.arange(order, n - order)
+
+    is_high = high[center] >= high_win.max(axis=1)
+    is_low = low[center] <= low_win.min(axis=1)
+    return {"highs": center[is_high], "lows": center[is_low]}
+
+
+def _fit_line(idx: np.ndarray, values: np.ndarray) -> Optional[Dict[str, float]]:
+    if len(idx) < 2:
+        return None
+    slope, intercept = np.polyfit(idx.astype(float), values, 1)
+    return {"slope": float(slope), "intercept": float(intercept)}
+
+
+def _classify_convergence(upper: Dict[str, float], lower: Dict[str, float],
+                          start: int, end: int, ref_price: float) -> Optional[Dict[str, Any]]:
+    """根据上下边界斜率判断楔形 / 三角形 / 矩形 / 扩张形态"""
+    # 斜率换算为每根K线的百分比，便于跨品种比较
+    up_pct = upper["slope"] / ref_price * 100
+    low_pct = lower["slope"] / ref_price * 100
+    width_start = (upper["slope"] - lower["slope"]) * start + upper["intercept"] - lower["intercept"]
+    width_end = (upper["slope"] - lower["slope"]) * end + upper["intercept"] - lower["intercept"]
+    if width_start <= 0:
+        return None
+
+    ratio = width_end / width_start
+    flat = 0.03  # 每根K线 0.03% 以内视为水平
+    detail = f"上沿斜率 {up_pct:+.3f}%/K, 下沿斜率 {low_pct:+.3f}%/K, 通道宽度收敛比 {ratio:.2f}"
+
+    if ratio < 0.75:
+        if up_pct < -flat and low_pct < -flat:
+            name = "下降楔形"
+        elif up_pct > flat and low_pct > flat:
+            name = "上升楔形"
+        elif abs(up_pct) <= flat and low_pct > flat:
+            name = "上升三角形"
+        elif up_pct < -flat and abs(low_pct) <= flat:
+            name = "下降三角形"
+        else:
+            name = "对称三角形"
+        confidence = min(0.9, 0.5 + (0.75 - ratio))
+    elif ratio > 1.3:
+        name = "扩张三角形"
+        confidence = min(0.9, 0.4 + (ratio - 1.3) / 2)
+    elif abs(up_pct) <= flat and abs(low_pct) <= flat:
+        name = "矩形"
+        confidence = 0.6
+    else:
+        return None
+
+    return {"name": name, "confidence": round(confidence, 2), "detail": detail}
+
+
+def _double_extreme(idx: np.ndarray, prices: np.ndarray, between: np.ndarray,
+                    top: bool, tolerance: float) -> Optional[Dict[str, Any]]:
+    """双重顶/底：最近两个摆动点价格接近，且中间有足够深的回撤"""
+    if len(idx) < 2:
+        return None
+    a, b = idx[-2], idx[-1]
+    if b - a < 5:
+        return None
+    pa, pb = prices[a], prices[b]
+    if abs(pa - pb) / max(abs(pa), 1e-12) > tolerance:
+        return None
+
+    middle = between[a:b + 1]
+    depth = (min(pa, pb) - middle.min()) if top else (middle.max() - max(pa, pb))
+    depth_pct = depth / max(abs(pa), 1e-12)
+    if depth_pct < tolerance * 2:
+        return None
+
+    name = "双重顶" if top else "双重底"
+    return {
+        "name": name,
+        "confidence": round(min(0.9, 0.5 + depth_pct * 5), 2),
+        "detail": f"第 {a} 与第 {b} 根K线价格 {pa:.6g}/{pb:.6g}，中间回撤 {depth_pct:.1%}",
+    }
+
+
+def _inverse_head_shoulders(lows_idx: np.ndarray, low: np.ndarray, tolerance: float) -> Optional[Dict[str, Any]]:
+    """倒头肩形：最近三个摆动低点中间最低，两肩接近"""
+    if len(lows_idx) < 3:
+        return None
+    ls, head, rs = lows_idx[-3:]
+    if not (low[head] < low[ls] and low[head] < low[rs]):
+        return None
+    if abs(low[ls] - low[rs]) / max(abs(low[ls]), 1e-12) > tolerance * 1.5:
+        return None
+    head_depth = (min(low[ls], low[rs]) - low[head]) / max(abs(low[head]), 1e-12)
+    return {
+        "name": "倒头肩形",
+        "confidence": round(min(0.85, 0.45 + head_depth * 5), 2),
+        "detail": f"左肩/头/右肩位于第 {ls}/{head}/{rs} 根K线，头部低于两肩 {head_depth:.1%}",
+    }
+
+
+def _flag(close: np.ndarray, atr: float) -> Optional[Dict[str, Any]]:
+    """旗形：旗杆急涨/急跌后，短期小幅反向整理"""
+    n = len(close)
+    if n < 15 or atr <= 0:
+        return None
+    consolidation = min(8, n // 4)
+    pole = close[-consolidation - 1] - close[-consolidation - 1 - 7]
+    drift = close[-1] - close[-consolidation - 1]
+    body_range = close[-consolidation:].max() - close[-consolidation:].min()
+
+    if abs(pole) < 4 * atr or body_range > abs(pole) * 0.5:
+        return None
+    if np.sign(drift) == np.sign(pole) and abs(drift) > atr:
+        return None
+
+    name = "牛市旗形" if pole > 0 else "熊市旗形"
+    return {
+        "name": name,
+        "confidence": round(min(0.85, 0.4 + abs(pole) / atr / 20), 2),
+        "detail": f"旗杆幅度 {abs(pole) / atr:.1f}×ATR，随后 {consolidation} 根K线整理区间 {body_range / atr:.1f}×ATR",
+    }
+
+
+def _v_reversal(close: np.ndarray, atr: float) -> Optional[Dict[str, Any]]:
+    """V形反转：极值点两侧都出现大幅单边走势"""
+    n = len(close)
+    if n < 10 or atr <= 0:
+        return None
+    span = max(5, n // 5)
+    for pos, bottom in ((int(np.argmin(close)), True), (int(np.argmax(close)), False)):
+        if pos < span or pos > n - 3:
+            continue
+        before = close[pos - span] - close[pos]
+        after = close[min(n - 1, pos + span)] - close[pos]
+        if not bottom:
+            before, after = -before, -after
+        if before > 3 * atr and after > 2 * atr and after > before * 0.5:
+            return {
+                "name": "V形反转" + ("（底）" if bottom else "（顶）"),
+                "confidence": round(min(0.85, 0.4 + (before + after) / atr / 30), 2),
+                "detail": f"第 {pos} 根K线前后分别运行 {before / atr:.1f}×ATR / {after / atr:.1f}×ATR",
+            }
+    return None
+
+
+def extract_pattern_features(data: Any, window: int = PATTERN_WINDOW) -> Optional[Dict[str, Any]]:
+    """
+    从K线数据中提取形态特征
+
+    Args:
+        data: OHLC数据（DataFrame 或 list[dict]）
+        window: 只分析最近 N 根K线
+
+    Returns:
+        dict: 摆动点、边界线、统计量和候选形态列表；数据不足时返回 None
+    """
+    df = _to_frame(data)
+    if df is None or len(df) < 2 * PIVOT_ORDER + 1:
+        return None
+    df = df.tail(window).reset_index(drop=True)
+
+    high = df["High"].to_numpy(dtype=float)
+    low = df["Low"].to_numpy(dtype=float)
+    close = df["Close"].to_numpy(dtype=float)
+    n = len(close)
+    ref_price = float(close[-1])
+
+    prev_close = np.concatenate(([close[0]], close[:-1]))
+    true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    atr = float(true_range[-14:].mean())
+    tolerance = max(0.005, atr / ref_price) if ref_price else 0.01
+
+    pivots = find_pivots(high, low)
+    upper = _fit_line(pivots["highs"], high[pivots["highs"]])
+    lower = _fit_line(pivots["lows"], low[pivots["lows"]])
+
+    candidates: List[Dict[str, Any]] = []
+    if upper and lower and len(pivots["highs"]) >= 2 and len(pivots["lows"]) >= 2:
+        start = int(min(pivots["highs"][0], pivots["lows"][0]))
+        convergence = _classify_convergence(upper, lower, start, n - 1, ref_price)
+        if convergence:
+            candidates.append(convergence)
+
+    for detector in (
+        lambda: _double_extreme(pivots["highs"], high, low, True, tolerance),
+        lambda: _double_extreme(pivots["lows"], low, high, False, tolerance),
+        lambda: _inverse_head_shoulders(pivots["lows"], low, tolerance),
+        lambda: _flag(close, atr),
+        lambda: _v_reversal(close, atr),
+    ):
+        found = detector()
+        if found:
+            candidates.append(found)
+
+    candidates.sort(key=lambda c: c["confidence"], reverse=True)
+
+    return {
+        "window": n,
+        "last_close": ref_price,
+        "return_pct": round((close[-1] / close[0] - 1) * 100, 2) if close[0] else 0.0,
+        "range_pct": round((high.max() - low.min()) / ref_price * 100, 2) if ref_price else 0.0,
+        "atr_pct": round(atr / ref_price * 100, 3) if ref_price else 0.0,
+        "pivot_highs": [{"index": int(i), "price": float(high[i])} for i in pivots["highs"]],
+        "pivot_lows": [{"index": int(i), "price": float(low[i])} for i in pivots["lows"]],
+        "upper_line": upper,
+        "lower_line": lower,
+        "candidates": candidates,
+    }
+
+
+def describe_pattern_features(features: Optional[Dict[str, Any]], label: str = "") -> str:
+    """把形态特征压缩成几行中文描述，供文本模型使用"""
+    prefix = f"[{label}] " if label else ""
+    if not features:
+        return f"{prefix}数据不足，无法提取形态特征。"
+
+    def fmt_pivots(items: List[Dict[str, Any]]) -> str:
+        return ", ".join(f"#{p['index']}@{p['price']:.6g}" for p in items[-5:]) or "无"
+
+    lines = [
+        f"{prefix}最近 {features['window']} 根K线：区间涨跌 {features['return_pct']:+.2f}%，"
+        f"振幅 {features['range_pct']:.2f}%，ATR {features['atr_pct']:.3f}%，最新收盘 {features['last_close']:.6g}",
+        f"摆动高点（索引@价格）：{fmt_pivots(features['pivot_highs'])}",
+        f"摆动低点（索引@价格）：{fmt_pivots(features['pivot_lows'])}",
+    ]
+    if features["candidates"]:
+        lines.append("候选形态：")
+        for c in features["candidates"]:
+            lines.append(f"- {c['name']}（置信度 {c['confidence']:.2f}）：{c['detail']}")
+    else:
+        lines.append("候选形态：未检测到明显的经典形态")
+    return "\n".join(lines)
+
+
+def build_pattern_descriptor(kline_data: Union[list, pd.DataFrame, Dict[str, Any]],
+                             window: int = PATTERN_WINDOW) -> Dict[str, Any]:
+    """
+    为单时间框架或多时间框架数据生成特征和文字描述
+
+    Returns:
+        {"features": dict 或 {tf: dict}, "text": str}
+    """
+    if isinstance(kline_data, dict):
+        features = {tf: extract_pattern_features(tf_data, window) for tf, tf_data in kline_data.items()}
+        text = "\n\n".join(describe_pattern_features(f, tf) for tf, f in features.items())
+        return {"features": features, "text": text}
+
+    features = extract_pattern_features(kline_data, window)
+    return {"features": features, "text": describe_pattern_features(features)}
@@ -4,6 +4,7 @@ Performance Monitor - 性能监控系统
 作者：哈雷酱（傲娇大小姐工程师）
 """
 
+import asyncio
 import time
 import functools
 import logging
@@ -202,6 +203,24 @@ def performance_monitor(stage_name: str = None):
         stage_name: 阶段名称
     """
     def decorator(func):
+        # 异步函数需要异步包装，否则只会统计到协程对象的创建时间
+        # （LangGraph 也依赖 iscoroutinefunction 判断节点是否为异步节点）
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _global_monitor.enabled:
+                    return await func(*args, **kwargs)
+
+                name = stage_name or f"{func.__module__}.{func.__name__}"
+                _global_monitor.start_stage(name)
+
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _global_monitor.end_stage(name)
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             if not _global_monitor.enabled:
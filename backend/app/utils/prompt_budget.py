@@ -0,0 +1,234 @@
+"""
+Prompt Budget - 指标/OHLC 数据的提示词 Token 预算管理
+指标智能体和趋势智能体原先把每个指标的完整数组（MACD/信号线/柱、RSI、ROC、Stoch K/D、WillR）
+以及完整 OHLC 数据 json.dumps(indent=2) 后直接塞进提示词，数据量随K线数线性增长。
+这里把每条序列压缩为：最近 N 根K线的尾部窗口 + 全区间极值（含距今K线数）+ 均值/末值 + 近期交叉信号，
+并按供应商的 Token 预算自动缩短尾部窗口，同时给出压缩前后的 Token 估算，随分析结果一起返回。
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core import config as app_config
+from app.core.providers import PROVIDERS
+
+# 尾部窗口允许缩短到的最小K线数
+MIN_TAIL_BARS = 5
+# 在最近多少根K线内查找交叉信号，最多保留几条
+CROSSOVER_LOOKBACK = 50
+MAX_CROSSOVERS = 5
+
+# 需要检测上穿/下穿的双线组合
+LINE_PAIRS = (("macd", "macd_signal"), ("stoch_k", "stoch_d"))
+# 需要检测穿越的关键水平（超买超卖线 / 零轴）
+LEVELS = {
+    "rsi": (30, 70),
+    "stoch_k": (20, 80),
+    "willr": (-80, -20),
+    "roc": (0,),
+    "macd_hist": (0,),
+}
+
+OHLC_COLUMNS = ("Datetime", "Open", "High", "Low", "Close", "Volume")
+
+
+def estimate_text_tokens(text: str) -> int:
+    """与调度器一致的粗略估算（中英文折中约 2 字符 1 Token）"""
+    return len(text) // 2
+
+
+def budget_for(llm: Any) -> int:
+    """按模型所属供应商取提示词数据预算，未配置时使用 PROMPT_TOKEN_BUDGET"""
+    base_url = getattr(llm, "openai_api_base", None) or ""
+    for cfg in PROVIDERS.values():
+        if cfg.get("base_url") == base_url and cfg.get("prompt_token_budget"):
+            return int(cfg["prompt_token_budget"])
+    return int(app_config.settings.PROMPT_TOKEN_BUDGET)
+
+
+def _num(value: Any) -> Any:
+    """保留 5 位有效数字（兼顾 BTC 与小币种的价格量级）"""
+    if isinstance(value, (int, float)):
+        return float(f"{value:.5g}")
+    return value
+
+
+def _valid_start(values: Sequence[float]) -> int:
+    """指标预热期被 fillna(0) 填成 0，跳过开头的 0 避免污染极值和均值"""
+    for i, value in enumerate(values):
+        if value:
+            return i
+    return len(values)
+
+
+def _crosses(a: Sequence[float], b: Sequence[float], start: int) -> List[Dict[str, Any]]:
+    """最近 CROSSOVER_LOOKBACK 根K线内 a 相对 b 的上穿/下穿（b 为常数序列时即穿越水平线）"""
+    n = len(a)
+    found = []
+    for i in range(max(start + 1, n - CROSSOVER_LOOKBACK), n):
+        prev_diff = a[i - 1] - b[i - 1]
+        diff = a[i] - b[i]
+        if prev_diff <= 0 < diff:
+            found.append({"bars_ago": n - 1 - i, "type": "上穿"})
+        elif prev_diff >= 0 > diff:
+            found.append({"bars_ago": n - 1 - i, "type": "下穿"})
+    return found[-MAX_CROSSOVERS:]
+
+
+def summarize_series(values: Sequence[float], tail_bars: int) -> Dict[str, Any]:
+    """单条序列的压缩表示：尾部窗口 + 全区间极值/均值"""
+    start = _valid_start(values)
+    valid = list(values[start:])
+    if not valid:
+        return {"tail": []}
+
+    n = len(values)
+    high_idx = max(range(start, n), key=lambda i: values[i])
+    low_idx = min(range(start, n), key=lambda i: values[i])
+    return {
+        "last": _num(valid[-1]),
+        "tail": [_num(v) for v in valid[-tail_bars:]],
+        "max": {"value": _num(values[high_idx]), "bars_ago": n - 1 - high_idx},
+        "min": {"value": _num(values[low_idx]), "bars_ago": n - 1 - low_idx},
+        "mean": _num(sum(valid) / len(valid)),
+        "bars": len(valid),
+    }
+
+
+def compact_indicator(result: Any, tail_bars: int) -> Any:
+    """压缩一个指标工具的输出（{"macd": [...], "macd_signal": [...], ...}），错误结果原样保留"""
+    if not isinstance(result, dict) or "error" in result:
+        return result
+
+    series = {k: v for k, v in result.items() if isinstance(v, list)}
+    compact: Dict[str, Any] = {k: v for k, v in result.items() if k not in series}
+    for key, values in series.items():
+        compact[key] = summarize_series(values, tail_bars)
+
+    crossovers = {}
+    for line, signal in LINE_PAIRS:
+        if line in series and signal in series and len(series[line]) == len(series[signal]):
+            start = max(_valid_start(series[line]), _valid_start(series[signal]))
+            hits = _crosses(series[line], series[signal], start)
+            if hits:
+                crossovers[f"{line}/{signal}"] = hits
+    for key, levels in LEVELS.items():
+        if key not in series:
+            continue
+        values = series[key]
+        start = _valid_start(values)
+        for level in levels:
+            hits = _crosses(values, [level] * len(values), start)
+            if hits:
+                crossovers[f"{key}/{level}"] = hits
+    if crossovers:
+        compact["crossovers"] = crossovers
+    return compact
+
+
+def _ohlc_columns(kline_data: Any) -> Dict[str, list]:
+    """统一为列式（dict of lists），兼容记录式（list of dicts）"""
+    if isinstance(kline_data, list):
+        columns: Dict[str, list] = {}
+        for row in kline_data:
+            for key, value in row.items():
+                columns.setdefault(key, []).append(value)
+        return columns
+    if isinstance(kline_data, dict):
+        return {k: list(v) for k, v in kline_data.items() if isinstance(v, (list, tuple))}
+    return {}
+
+
+def compact_ohlc(kline_data: Any, tail_bars: int) -> Dict[str, Any]:
+    """OHLC 的压缩表示：全区间高低点/涨跌幅/均量 + 最近 tail_bars 根K线（按列名顺序的行数组）"""
+    columns = _ohlc_columns(kline_data)
+    closes = columns.get("Close") or []
+    if not closes:
+        return {}
+
+    n = len(closes)
+    highs = columns.get("High") or closes
+    lows = columns.get("Low") or closes
+    high_idx = max(range(n), key=lambda i: highs[i])
+    low_idx = min(range(n), key=lambda i: lows[i])
+    summary: Dict[str, Any] = {
+        "bars": n,
+        "high": {"value": _num(highs[high_idx]), "bars_ago": n - 1 - high_idx},
+        "low": {"value": _num(lows[low_idx]), "bars_ago": n - 1 - low_idx},
+        "first_close": _num(closes[0]),
+        "last_close": _num(closes[-1]),
+        "change_pct": _num((closes[-1] - closes[0]) / closes[0] * 100) if closes[0] else None,
+    }
+    volumes = columns.get("Volume")
+    if volumes:
+        summary["avg_volume"] = _num(sum(volumes) / len(volumes))
+
+    names = [c for c in OHLC_COLUMNS if c in columns]
+    rows = [
+        [str(columns[c][i]) if c == "Datetime" else _num(columns[c][i]) for c in names]
+        for i in range(max(0, n - tail_bars), n)
+    ]
+    return {"summary": summary, "columns": names, "tail": rows}
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_budgeted_sections(
+    indicators_by_tf: Dict[str, Dict[str, Any]],
+    ohlc_by_tf: Optional[Dict[str, Any]] = None,
+    budget_tokens: Optional[int] = None,
+    tail_bars: Optional[int] = None,
+) -> Tuple[Dict[str, Dict[str, str]], Dict[str, Any]]:
+    """
+    生成各时间框架下每个指标（及 OHLC）的压缩文本，总量控制在预算内
+
+    Args:
+        indicators_by_tf: {时间框架: {"MACD": 工具输出, "RSI": ...}}
+        ohlc_by_tf: {时间框架: K线数据}，不需要 OHLC 时传 None
+        budget_tokens: 所有时间框架合计的数据 Token 预算
+        tail_bars: 初始尾部窗口长度，默认 PROMPT_TAIL_BARS
+
+    Returns:
+        (sections, stats)：sections[tf][名称] 为 JSON 文本（OHLC 的名称为 "OHLC"）；
+        stats 含压缩前后的 Token 估算、预算和最终尾部窗口长度
+    """
+    settings = app_config.settings
+    budget = int(budget_tokens or settings.PROMPT_TOKEN_BUDGET)
+    tail = max(MIN_TAIL_BARS, int(tail_bars or settings.PROMPT_TAIL_BARS))
+    ohlc_by_tf = ohlc_by_tf or {}
+
+    # 压缩前：原先逐项 json.dumps(indent=2) 的完整数据
+    before = sum(
+        estimate_text_tokens(json.dumps(value, indent=2, ensure_ascii=False))
+        for indicators in indicators_by_tf.values() for value in indicators.values()
+    ) + sum(
+        estimate_text_tokens(json.dumps(value, indent=2, ensure_ascii=False))
+        for value in ohlc_by_tf.values()
+    )
+
+    def render(window: int) -> Dict[str, Dict[str, str]]:
+        sections = {}
+        for tf, indicators in indicators_by_tf.items():
+            sections[tf] = {name: _dumps(compact_indicator(value, window)) for name, value in indicators.items()}
+            if tf in ohlc_by_tf:
+                sections[tf]["OHLC"] = _dumps(compact_ohlc(ohlc_by_tf[tf], window))
+        return sections
+
+    while True:
+        sections = render(tail)
+        after = sum(estimate_text_tokens(text) for tf in sections.values() for text in tf.values())
+        if after <= budget or tail <= MIN_TAIL_BARS:
+            break
+        # 按超出比例缩短窗口（至少减半），通常一到两轮即可落入预算
+        tail = max(MIN_TAIL_BARS, min(tail // 2, int(tail * budget / after)))
+
+    stats = {
+        "before": before,
+        "after": after,
+        "budget": budget,
+        "tail_bars": tail,
+        "within_budget": after <= budget,
+    }
+    return sections, stats
@@ -1,7 +1,7 @@
 import axios from 'axios';
 
 const envApiUrl = import.meta.env.VITE_API_URL;
-const API_URL =
+export const API_URL =
   envApiUrl && envApiUrl.trim().length > 0
     ? envApiUrl
     : import.meta.env.DEV
@@ -14,3 +14,11 @@ export const apiClient = axios.create({
     'Content-Type': 'application/json',
   },
 });
+
+// WebSocket 地址与 REST 地址同源（相对路径时使用当前页面的 host）
+export const WS_URL = (() => {
+  const base = API_URL.startsWith('http')
+    ? API_URL
+    : `${window.location.origin}${API_URL}`;
+  return base.replace(/^http/, 'ws');
+})();
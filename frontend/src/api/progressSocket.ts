@@ -0,0 +1,39 @@
+import { WS_URL } from './client';
+import type { ProgressSocketMessage } from '../types';
+
+/**
+ * 连接 /ws/progress，只把属于 sessionId 的消息交给 onMessage
+ */
+export const openProgressSocket = (
+  sessionId: string,
+  onMessage: (message: ProgressSocketMessage) => void,
+) => {
+  const socket = new WebSocket(`${WS_URL}/ws/progress`);
+  socket.onmessage = (event) => {
+    try {
+      const message = JSON.parse(event.data) as ProgressSocketMessage;
+      if (message.session_id === sessionId) {
+        onMessage(message);
+      }
+    } catch (error) {
+      console.warn('Invalid progress message:', error);
+    }
+  };
+  return socket;
+};
+
+/** 等待连接建立（最多 timeoutMs），连接失败也不阻塞分析请求 */
+export const waitForOpen = (socket: WebSocket, timeoutMs = 2000) =>
+  new Promise<void>((resolve) => {
+    if (socket.readyState === WebSocket.OPEN) {
+      resolve();
+      return;
+    }
+    const timer = setTimeout(resolve, timeoutMs);
+    const done = () => {
+      clearTimeout(timer);
+      resolve();
+    };
+    socket.addEventListener('open', done, { once: true });
+    socket.addEventListener('error', done, { once: true });
+  });
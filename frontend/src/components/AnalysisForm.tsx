@@ -1,10 +1,12 @@
 import { useAppStore } from '../store/useAppStore';
 import { analyzeMarket } from '../api/analyze';
+import { openProgressSocket, waitForOpen } from '../api/progressSocket';
 import AssetAndTimeframePanel from './AssetAndTimeframePanel';
 import ConfigPanel from './ConfigPanel';
 import HistoryPanel from './HistoryPanel';
-import { useState, useEffect } from 'react';
-import type { AnalyzeRequest } from '../types';
+import LiveAnalysisPanel from './LiveAnalysisPanel';
+import { useState, useEffect, useRef } from 'react';
+import type { AnalyzeRequest, ProgressSocketMessage, StreamAgent } from '../types';
 import styles from './AnalysisForm.module.css';
 
 export default function AnalysisForm() {
@@ -22,6 +24,29 @@ export default function AnalysisForm() {
     const [progress, setProgress] = useState(0);
     const [statusMessage, setStatusMessage] = useState<string | null>(null);
 
+    // 流式输出：各智能体已收到的片段（按 seq 排列）和决策 JSON 中已解析出的字段
+    const [streams, setStreams] = useState<Partial<Record<StreamAgent, string>>>({});
+    const [finishedAgents, setFinishedAgents] = useState<Partial<Record<StreamAgent, boolean>>>({});
+    const [decisionFields, setDecisionFields] = useState<Record<string, string | number>>({});
+    const streamChunksRef = useRef<Partial<Record<StreamAgent, string[]>>>({});
+
+    const handleProgressMessage = (message: ProgressSocketMessage) => {
+        if (message.type === 'agent_stream') {
+            const chunks = message.reset ? [] : (streamChunksRef.current[message.agent] || []);
+            if (!message.reset) {
+                chunks[message.seq] = message.delta;
+            }
+            streamChunksRef.current[message.agent] = chunks;
+            setStreams(prev => ({ ...prev, [message.agent]: chunks.join('') }));
+            setFinishedAgents(prev => ({ ...prev, [message.agent]: message.done }));
+            if (message.reset && message.agent === 'decision') {
+                setDecisionFields({});
+            }
+        } else if (message.type === 'decision_fields') {
+            setDecisionFields(prev => ({ ...prev, ...message.fields }));
+        }
+    };
+
     useEffect(() => {
         let interval: ReturnType<typeof setInterval> | undefined;
         if (isLoading) {
@@ -67,6 +92,7 @@ export default function AnalysisForm() {
             future_kline_count: futureKlineCount,
             use_current_time: useCurrentTime,
             ai_version: 'original',
+            chart_mode: 'spec',
             start_date: startDate || undefined,
             start_time: startTime || undefined,
             end_date: endDate || undefined,
@@ -106,10 +132,24 @@ export default function AnalysisForm() {
         // Normal Mode: Blocking & Redirect
         setIsLoading(true);
         setAnalysisResult(null); // Clear previous result
+
+        // 打开进度通道，智能体的输出边生成边显示
+        const sessionId = `${Date.now()}-${Math.random().toString(36).slice(2, 10)}`;
+        streamChunksRef.current = {};
+        setStreams({});
+        setFinishedAgents({});
+        setDecisionFields({});
+        const socket = openProgressSocket(sessionId, handleProgressMessage);
         
         try {
-            console.log("Sending analysis request:", request);
-            const result = await analyzeMarket(request);
+            await waitForOpen(socket);
+            const streamRequest: AnalyzeRequest = {
+                ...request,
+                stream: socket.readyState === WebSocket.OPEN,
+                session_id: sessionId,
+            };
+            console.log("Sending analysis request:", streamRequest);
+            const result = await analyzeMarket(streamRequest);
             console.log("Analysis result:", result);
             
             // 注入用户选择的参数，供前端展示使用
@@ -142,6 +182,7 @@ export default function AnalysisForm() {
             console.error("Analysis failed:", error);
             // alert("Analysis failed. See console for details.");
         } finally {
+            socket.close();
             setIsLoading(false);
         }
     };
@@ -225,6 +266,14 @@ export default function AnalysisForm() {
                                 </div>
                             </div>
                         )}
+
+                        {isLoading && !continuousMode && (
+                            <LiveAnalysisPanel
+                                streams={streams}
+                                finished={finishedAgents}
+                                decisionFields={decisionFields}
+                            />
+                        )}
                     </div>
                 </div>
 
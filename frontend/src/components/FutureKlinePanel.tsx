@@ -1,5 +1,6 @@
 import { useAppStore } from '../store/useAppStore';
 import type { FutureKlineDataRow } from '../types';
+import KlineSpecChart from './KlineSpecChart';
 import styles from './FutureKlinePanel.module.css';
 
 export default function FutureKlinePanel() {
@@ -10,7 +11,8 @@ export default function FutureKlinePanel() {
         future_kline_chart_base64, 
         future_kline_data,
         latest_price,
-        decision: singleDecision
+        decision: singleDecision,
+        chart_specs
     } = analysisResult;
 
     const stopLoss = singleDecision?.stop_loss;
@@ -288,7 +290,9 @@ export default function FutureKlinePanel() {
                     <div className={styles.chartContainer}>
                         <div className={styles.chartTitle}>分析时间点后的实际K线走势</div>
                         <div className={styles.chartImageWrapper}>
-                            {future_kline_chart_base64 ? (
+                            {chart_specs?.future ? (
+                                <KlineSpecChart spec={chart_specs.future} />
+                            ) : future_kline_chart_base64 ? (
                                 <img 
                                     src={`data:image/png;base64,${future_kline_chart_base64}`} 
                                     alt="Future Kline Verification" 
@@ -0,0 +1,100 @@
+import { useEffect, useRef } from 'react';
+import { createChart, ColorType, type UTCTimestamp, type SeriesMarker, type Time } from 'lightweight-charts';
+import type { ChartSpec } from '../types';
+import styles from './KlineSpecChart.module.css';
+
+// 后端时间字符串 "YYYY-MM-DD HH:MM:SS" 按原样展示，统一当作 UTC 处理
+const toTimestamp = (time: string) => (Date.parse(time.replace(' ', 'T') + 'Z') / 1000) as UTCTimestamp;
+
+const TRENDLINE_COLORS: Record<string, string> = {
+    blue: '#2563EB',
+    red: '#DC2626',
+    gray: '#9CA3AF',
+};
+
+interface KlineSpecChartProps {
+    spec: ChartSpec;
+    height?: number;
+}
+
+export default function KlineSpecChart({ spec, height = 360 }: KlineSpecChartProps) {
+    const containerRef = useRef<HTMLDivElement>(null);
+
+    useEffect(() => {
+        if (!containerRef.current || spec.candles.length === 0) return;
+
+        const chart = createChart(containerRef.current, {
+            autoSize: true,
+            layout: { background: { type: ColorType.Solid, color: '#FFFFFF' }, textColor: '#374151' },
+            grid: { vertLines: { color: '#F3F4F6' }, horzLines: { color: '#F3F4F6' } },
+            timeScale: { timeVisible: true, secondsVisible: false },
+        });
+
+        // 红涨绿跌，与后端 mplfinance 配色保持一致
+        const candleSeries = chart.addCandlestickSeries({
+            upColor: '#A02128',
+            downColor: '#006340',
+            borderVisible: false,
+            wickUpColor: '#000000',
+            wickDownColor: '#000000',
+        });
+        const times = spec.candles.map(c => toTimestamp(c.time));
+        candleSeries.setData(spec.candles.map((c, i) => ({
+            time: times[i],
+            open: c.open,
+            high: c.high,
+            low: c.low,
+            close: c.close,
+        })));
+
+        if (spec.candles.some(c => c.volume !== undefined)) {
+            const volumeSeries = chart.addHistogramSeries({
+                priceFormat: { type: 'volume' },
+                priceScaleId: '',
+            });
+            chart.priceScale('').applyOptions({ scaleMargins: { top: 0.8, bottom: 0 } });
+            volumeSeries.setData(spec.candles.map((c, i) => ({
+                time: times[i],
+                value: c.volume ?? 0,
+                color: c.close >= c.open ? 'rgba(160, 33, 40, 0.4)' : 'rgba(0, 99, 64, 0.4)',
+            })));
+        }
+
+        // 趋势线只需首尾两点即可还原
+        const lastIndex = spec.candles.length - 1;
+        for (const line of spec.trendlines ?? []) {
+            const lineSeries = chart.addLineSeries({
+                color: TRENDLINE_COLORS[line.color] ?? line.color,
+                lineWidth: 1,
+                priceLineVisible: false,
+                lastValueVisible: false,
+                crosshairMarkerVisible: false,
+            });
+            lineSeries.setData([
+                { time: times[0], value: line.intercept },
+                { time: times[lastIndex], value: line.slope * lastIndex + line.intercept },
+            ]);
+        }
+
+        const markers: SeriesMarker<Time>[] = (spec.annotations ?? []).map(a => ({
+            time: toTimestamp(a.time),
+            position: a.kind === 'high' ? 'aboveBar' : 'belowBar',
+            color: a.kind === 'high' ? '#DC2626' : '#059669',
+            shape: a.kind === 'high' ? 'arrowDown' : 'arrowUp',
+            text: String(a.price),
+        }));
+        markers.sort((a, b) => (a.time as number) - (b.time as number));
+        candleSeries.setMarkers(markers);
+
+        chart.timeScale().fitContent();
+        return () => chart.remove();
+    }, [spec]);
+
+    return (
+        <div className={styles.specChart}>
+            <div className={styles.specChartTitle}>{spec.title}</div>
+            <div ref={containerRef} style={{ height }} />
+        </div>
+    );
+}
+
@@ -0,0 +1,83 @@
+import { useEffect, useRef } from 'react';
+import type { StreamAgent } from '../types';
+import styles from './LiveAnalysisPanel.module.css';
+
+const AGENT_LABELS: Record<StreamAgent, string> = {
+    indicator: '技术指标',
+    pattern: '形态识别',
+    trend: '趋势分析',
+    decision: '交易决策',
+};
+
+const DECISION_FIELD_LABELS: Record<string, string> = {
+    decision: '方向',
+    stop_loss: '止损',
+    take_profit: '止盈',
+    risk_reward_ratio: '风险回报比',
+    confidence_level: '信心',
+};
+
+interface LiveAnalysisPanelProps {
+    streams: Partial<Record<StreamAgent, string>>;
+    finished: Partial<Record<StreamAgent, boolean>>;
+    decisionFields: Record<string, string | number>;
+}
+
+function StreamBox({ agent, text, done }: { agent: StreamAgent; text: string; done: boolean }) {
+    const bodyRef = useRef<HTMLPreElement>(null);
+
+    // 新内容到达时保持滚动到底部
+    useEffect(() => {
+        if (bodyRef.current) {
+            bodyRef.current.scrollTop = bodyRef.current.scrollHeight;
+        }
+    }, [text]);
+
+    return (
+        <div className={styles.streamBox}>
+            <div className={styles.streamHeader}>
+                <span>{AGENT_LABELS[agent]}</span>
+                {done ? (
+                    <i className="fas fa-check-circle" />
+                ) : (
+                    <i className="fas fa-circle-notch fa-spin" />
+                )}
+            </div>
+            <pre ref={bodyRef} className={styles.streamBody}>{text}</pre>
+        </div>
+    );
+}
+
+export default function LiveAnalysisPanel({ streams, finished, decisionFields }: LiveAnalysisPanelProps) {
+    const agents = (Object.keys(AGENT_LABELS) as StreamAgent[]).filter(agent => streams[agent]);
+    const fields = Object.keys(DECISION_FIELD_LABELS).filter(key => decisionFields[key] !== undefined);
+
+    if (agents.length === 0 && fields.length === 0) {
+        return null;
+    }
+
+    return (
+        <div className={styles.livePanel}>
+            {fields.length > 0 && (
+                <div className={styles.decisionFields}>
+                    {fields.map(key => (
+                        <div key={key} className={styles.decisionField}>
+                            <span className={styles.fieldLabel}>{DECISION_FIELD_LABELS[key]}</span>
+                            <span className={styles.fieldValue}>{String(decisionFields[key])}</span>
+                        </div>
+                    ))}
+                </div>
+            )}
+            <div className={styles.streamGrid}>
+                {agents.map(agent => (
+                    <StreamBox
+                        key={agent}
+                        agent={agent}
+                        text={streams[agent] || ''}
+                        done={Boolean(finished[agent])}
+                    />
+                ))}
+            </div>
+        </div>
+    );
+}
@@ -1,5 +1,7 @@
 import { useAppStore } from '../store/useAppStore';
 import AutoBeautify from './AutoBeautify';
+import KlineSpecChart from './KlineSpecChart';
+import { isChartSpec, pickChartSpecs } from './chartSpecUtils';
 import styles from './PatternPanel.module.css';
 
 export default function PatternPanel() {
@@ -12,7 +14,8 @@ export default function PatternPanel() {
         pattern_chart, 
         pattern_image,
         pattern_images,
-        multi_timeframe_mode
+        multi_timeframe_mode,
+        chart_specs
     } = analysisResult;
     
     const content = pattern_analysis || pattern_report;
@@ -22,6 +25,8 @@ export default function PatternPanel() {
     const isMultiTF = multi_timeframe_mode && pattern_images && Object.keys(pattern_images).length > 0;
     // 单时间框架图表（兼容多个字段名）
     const singleChart = pattern_chart || pattern_image;
+    // 前端原生绘制的图表数据（chart_mode = "spec"），优先于 base64 图片
+    const specCharts = pickChartSpecs(chart_specs, 'pattern');
 
     return (
         <div className={styles.largePanel}>
@@ -62,7 +67,23 @@ export default function PatternPanel() {
                         <i className="fas fa-chart-bar"></i> 模式可视化
                     </h4>
                     <div className={styles.chartContainer}>
-                        {isMultiTF ? (
+                        {specCharts ? (
+                            isChartSpec(specCharts) ? (
+                                <div className={styles.chartWrapper}>
+                                    <KlineSpecChart spec={specCharts} />
+                                    <div className={styles.chartCaption}>模式识别可视化图表</div>
+                                </div>
+                            ) : (
+                                <div className={styles.multiChartGrid}>
+                                    {Object.entries(specCharts).map(([tf, spec]) => (
+                                        <div key={tf} className={styles.chartGridItem}>
+                                            <div className={styles.timeframeLabel}>{tf}</div>
+                                            <KlineSpecChart spec={spec} height={280} />
+                                        </div>
+                                    ))}
+                                </div>
+                            )
+                        ) : isMultiTF ? (
                             // 多时间框架模式：网格布局同时展示多张图表
                             <div className={styles.multiChartGrid}>
                                 {Object.entries(pattern_images).map(([tf, img]) => (
@@ -1,5 +1,7 @@
 import { useAppStore } from '../store/useAppStore';
 import AutoBeautify from './AutoBeautify';
+import KlineSpecChart from './KlineSpecChart';
+import { isChartSpec, pickChartSpecs } from './chartSpecUtils';
 import styles from './TrendPanel.module.css';
 
 export default function TrendPanel() {
@@ -12,7 +14,8 @@ export default function TrendPanel() {
         trend_chart,
         trend_image,
         trend_images,
-        multi_timeframe_mode
+        multi_timeframe_mode,
+        chart_specs
     } = analysisResult;
     
     const content = trend_analysis || trend_report;
@@ -21,6 +24,8 @@ export default function TrendPanel() {
     const isMultiTF = multi_timeframe_mode && trend_images && Object.keys(trend_images).length > 0;
     // 单时间框架图表（兼容多个字段名）
     const singleChart = trend_chart || trend_image;
+    // 前端原生绘制的图表数据（chart_mode = "spec"），优先于 base64 图片
+    const specCharts = pickChartSpecs(chart_specs, 'trend');
 
     return (
         <div className={styles.largePanel}>
@@ -51,7 +56,23 @@ export default function TrendPanel() {
                             <i className="fas fa-chart-line"></i> 趋势可视化
                         </h4>
                         <div className={styles.chartContainer}>
-                            {isMultiTF ? (
+                            {specCharts ? (
+                                isChartSpec(specCharts) ? (
+                                    <div className={styles.chartWrapper}>
+                                        <KlineSpecChart spec={specCharts} />
+                                        <div className={styles.chartCaption}>支撑线与阻力线分析</div>
+                                    </div>
+                                ) : (
+                                    <div className={styles.multiChartGrid}>
+                                        {Object.entries(specCharts).map(([tf, spec]) => (
+                                            <div key={tf} className={styles.chartGridItem}>
+                                                <div className={styles.timeframeLabel}>{tf}</div>
+                                                <KlineSpecChart spec={spec} height={280} />
+                                            </div>
+                                        ))}
+                                    </div>
+                                )
+                            ) : isMultiTF ? (
                                 // 多时间框架模式：网格布局同时展示多张图表
                                 <div className={styles.multiChartGrid}>
                                     {Object.entries(trend_images).map(([tf, img]) => (
@@ -0,0 +1,13 @@
+import type { ChartSpec, ChartSpecs } from '../types';
+
+// chart_specs 中 pattern / trend 在多时间框架模式下是 {timeframe: spec} 字典
+export function isChartSpec(value: unknown): value is ChartSpec {
+    return typeof value === 'object' && value !== null && Array.isArray((value as ChartSpec).candles);
+}
+
+export function pickChartSpecs(specs: ChartSpecs | undefined, key: 'pattern' | 'trend'): Record<string, ChartSpec> | ChartSpec | null {
+    const value = specs?.[key];
+    if (!value) return null;
+    if (isChartSpec(value)) return value;
+    return Object.keys(value).length > 0 ? value : null;
+}
@@ -13,6 +13,45 @@ export type FutureKlineDataRow = {
   [key: string]: unknown;
 };
 
+// 前端原生绘制的图表数据（chart_mode = "spec"）
+export interface ChartSpecCandle {
+  time: string;
+  open: number;
+  high: number;
+  low: number;
+  close: number;
+  volume?: number;
+}
+
+export interface ChartSpecAnnotation {
+  kind: 'high' | 'low';
+  index: number;
+  time: string;
+  price: number;
+}
+
+// y = slope * index + intercept，index 为 candles 中的位置
+export interface ChartSpecTrendline {
+  name: string;
+  slope: number;
+  intercept: number;
+  color: string;
+}
+
+export interface ChartSpec {
+  type: 'kline' | 'trend';
+  title: string;
+  candles: ChartSpecCandle[];
+  annotations?: ChartSpecAnnotation[];
+  trendlines?: ChartSpecTrendline[];
+}
+
+export interface ChartSpecs {
+  pattern?: ChartSpec | Record<string, ChartSpec>;
+  trend?: ChartSpec | Record<string, ChartSpec>;
+  future?: ChartSpec;
+}
+
 export interface LLMRuntimeInfo {
   provider?: string;
   name?: string;
@@ -40,8 +79,52 @@ export interface AnalyzeRequest {
   ai_version?: string;
   multi_timeframe_mode?: boolean;
   timeframes?: string[];
+  chart_mode?: "image" | "spec";
+  pattern_mode?: "vision" | "numeric" | "hybrid";
+  stream?: boolean;
+  session_id?: string;
+  use_llm_cache?: boolean;
+  // 忽略已缓存的分析结果重新执行（仅对已收盘的历史窗口有效）
+  force_refresh?: boolean;
+  // 多版本决策：分析师只运行一次，列出的决策版本并行决策（第一个为主决策）
+  ensemble_versions?: string[];
+  // 分析师截止时间（秒）：超时的报告标记为缺失，决策先行；0 为不限制
+  analyst_deadline?: number;
+}
+
+// /ws/progress 推送的流式消息
+export type StreamAgent = "indicator" | "pattern" | "trend" | "decision";
+
+export interface AgentStreamMessage {
+  type: "agent_stream";
+  agent: StreamAgent;
+  delta: string;
+  seq: number;
+  done: boolean;
+  reset: boolean;
+  session_id: string;
+  result_id: string | null;
+}
+
+export interface DecisionFieldsMessage {
+  type: "decision_fields";
+  fields: Record<string, string | number>;
+  session_id: string;
+  result_id: string | null;
 }
 
+export interface ProgressMessage {
+  type: "agent_progress" | "analysis_progress";
+  progress: number;
+  status: string;
+  agent?: string;
+  stage?: string;
+  session_id: string;
+  result_id: string | null;
+}
+
+export type ProgressSocketMessage = AgentStreamMessage | DecisionFieldsMessage | ProgressMessage;
+
 export interface DecisionResult {
   action: string;
   decision?: string; // 为了兼容性
@@ -75,6 +158,78 @@ export interface LLMConfig {
   graph: LLMRoleConfig;
 }
 
+export interface LLMUsageTotals {
+  calls: number;
+  errors: number;
+  cached_calls: number;
+  hedge_calls: number;
+  prompt_tokens: number;
+  completion_tokens: number;
+  images: number;
+  image_bytes: number;
+  queue_wait_seconds: number;
+  latency_seconds: number;
+}
+
+export interface LLMUsageCall {
+  time: string;
+  agent: string | null;
+  provider: string;
+  model: string;
+  prompt_tokens: number | null;
+  completion_tokens: number | null;
+  tokens_estimated: boolean;
+  images: number;
+  image_bytes: number;
+  queue_wait: number;
+  ttft: number | null;
+  latency: number;
+  hedge: boolean;
+  cached: boolean;
+  error: string | null;
+}
+
+// 单次分析的 LLM 用量汇总
+export interface LLMUsageSummary extends LLMUsageTotals {
+  by_agent: Record<string, LLMUsageTotals>;
+  calls_detail: LLMUsageCall[];
+}
+
+// LLM 分析前的预筛选结果（passed 为 false 时未调用 LLM，决策固定为观望）
+export interface SignalGateResult {
+  passed: boolean;
+  reasons: string[];
+  thresholds: {
+    min_signal_agreement: number;
+    min_atr_pct: number;
+    trendline_atr: number;
+  };
+  overall_signal?: string;
+  bullish_signals?: string[];
+  bearish_signals?: string[];
+  net_signal?: number;
+  atr_pct?: number;
+  support_distance_atr?: number | null;
+  resistance_distance_atr?: number | null;
+  elapsed_ms?: number;
+}
+
+// 多版本决策：各版本的决策与一致性汇总
+export interface EnsembleResult {
+  primary: string;
+  versions: string[];
+  decisions: Record<string, DecisionResult & { agent_version?: string; agent_version_name?: string; error?: string }>;
+  agreement: {
+    votes: { long: string[]; short: string[]; hold: string[] };
+    majority: "long" | "short" | "hold";
+    agreement: number | null;
+    unanimous: boolean;
+    conflict: boolean;
+    failed: string[];
+    levels: Partial<Record<"entry_point" | "stop_loss" | "take_profit", { min: number; max: number; median: number }>>;
+  };
+}
+
 export interface AnalysisResult {
   decision?: DecisionResult;
   asset?: string;
@@ -105,6 +260,15 @@ export interface AnalysisResult {
   timeframes?: string[];
 
   llm_config?: LLMRuntimeConfig;
+  llm_usage?: LLMUsageSummary;
+  signal_gate?: SignalGateResult;
+  // 命中结果缓存时存在；result_id 为首次分析的 ID
+  result_cache?: { hit: boolean; source: "stored" | "in_flight"; cached_result_id?: string };
+  data_fingerprint?: string;
+  ensemble?: EnsembleResult;
+  // 决策时未到达的报告键（如 pattern_report）；迟到报告补写到历史记录后移除
+  missing_reports?: string[];
+  late_reports?: Record<string, { report_key: string; arrived_at: string }>;
   
   // 模式识别图表
   pattern_chart?: string;              // 单时间框架(向后兼容)
@@ -115,6 +279,9 @@ export interface AnalysisResult {
   trend_chart?: string;                // 单时间框架(向后兼容)
   trend_image?: string;                // 单时间框架(向后兼容别名)
   trend_images?: Record<string, string>;   // 多时间框架
+
+  // 前端原生绘制的图表数据（chart_mode = "spec" 时替代上面的 base64 图片）
+  chart_specs?: ChartSpecs;
   
   [key: string]: unknown;
 }
@@ -0,0 +1,101 @@
+"""
+滚动回测命令行工具（进程内执行，不需要启动后端服务）
+
+在时间范围内按间隔生成决策时间点，逐点运行完整分析并用未来K线评估决策，
+每完成一个点写入 backend/data/backtests/<backtest_id>.json，中断后用 --resume 续跑。
+
+用法:
+    python tools/backtest.py -a BTC ETH -t 4h --start "2024-01-01 00:00" --end "2024-03-01 00:00" -v constrained relaxed
+    python tools/backtest.py --resume bt_20240301_120000_ab12cd
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "backend"))
+# 与后端服务使用同一个 data 目录和 .env
+os.chdir(PROJECT_ROOT / "backend")
+
+from app.models.schemas.backtest import BacktestRequest
+from app.services.backtest_service import BacktestRun, backtest_manager
+
+
+def print_summary(summary):
+    if not summary:
+        return
+    print("\n按决策版本 / 模型汇总:")
+    for key, stats in summary["by_ai_version_model"].items():
+        print(f"  {key}: 交易 {stats['trades']}/{stats['decisions']}，命中率 {stats['hit_rate']}，胜率 {stats['win_rate']}，"
+              f"总收益 {stats['total_pnl_pct']}%，MFE {stats['avg_mfe_pct']}%，MAE {stats['avg_mae_pct']}%")
+    print("\n总体:")
+    print(json.dumps(summary["overall"], ensure_ascii=False, indent=2))
+
+
+async def main(args) -> int:
+    if args.resume:
+        run = backtest_manager.load(args.resume)
+        if run is None:
+            print(f"找不到回测 {args.resume}")
+            return 1
+    else:
+        request = BacktestRequest(
+            assets=args.assets,
+            timeframe=args.timeframe,
+            start=args.start,
+            end=args.end,
+            step=args.step,
+            ai_versions=args.ai_versions,
+            kline_count=args.kline_count,
+            future_kline_count=args.future_kline_count,
+            concurrency=args.concurrency,
+            use_llm_cache=not args.no_cache,
+            force_refresh=args.refresh,
+            ensemble=args.ensemble,
+        )
+        run = BacktestRun.create(request)
+
+    view = run.view()
+    print(f"回测 {run.backtest_id}: {view['total']} 个决策点，已完成 {view['done']}")
+
+    def on_record(record):
+        current = run.view()
+        evaluation = record.get("evaluation") or {}
+        detail = f"{record.get('action')} {evaluation.get('outcome')} {evaluation.get('pnl_pct')}%" if record["status"] == "evaluated" else record["error"]
+        print(f"[{current['done']}/{current['total']}] {record['asset']} @ {record['decision_time']} ({record['ai_version']}): "
+              f"{record['status']} {detail}")
+
+    try:
+        await run.run(on_record=on_record)
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print(f"\n已中断，续跑: python tools/backtest.py --resume {run.backtest_id}")
+    print_summary(run.state["summary"])
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="滚动回测")
+    parser.add_argument("--resume", default=None, help="续跑指定的 backtest_id")
+    parser.add_argument("-a", "--assets", nargs="+", default=[])
+    parser.add_argument("-t", "--timeframe", default="1h")
+    parser.add_argument("--start", default=None, help="首个决策时间点 YYYY-MM-DD HH:MM")
+    parser.add_argument("--end", default=None, help="最后一个决策时间点 YYYY-MM-DD HH:MM")
+    parser.add_argument("--step", default=None, help="决策间隔（如 4h、1d），默认 future_kline_count 根K线")
+    parser.add_argument("-v", "--ai-versions", nargs="+", default=["constrained"])
+    parser.add_argument("--ensemble", action="store_true", help="各决策版本共享一次分析师阶段（多版本对比时大幅减少 LLM 调用）")
+    parser.add_argument("-k", "--kline-count", type=int, default=100)
+    parser.add_argument("-f", "--future-kline-count", type=int, default=13)
+    parser.add_argument("-c", "--concurrency", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true", help="忽略 LLM 响应缓存")
+    parser.add_argument("--refresh", action="store_true", help="忽略已缓存的分析结果，全部重新分析")
+    cli_args = parser.parse_args()
+    if not cli_args.resume and not (cli_args.assets and cli_args.start and cli_args.end):
+        parser.error("新建回测需要 --assets、--start 和 --end")
+    try:
+        sys.exit(asyncio.run(main(cli_args)))
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -0,0 +1,103 @@
+"""
+批量分析命令行工具
+
+读取 CSV / XLSX 表格（或命令行给出的交易对列表），提交到后端 POST /api/v1/batch/，
+逐行打印完成的结果，最后把汇总表写到本地（服务端同时保存 data/batch/<batch_id>.csv）。
+表格列名可为 asset/symbol/币种、timeframe/周期、date/日期、time/时间、ai_version/版本；
+随机表格/update_excel2.py 生成的测试表（B 列币种、C 列日期、D 列时间）可直接使用。
+
+用法:
+    python tools/batch_analyze.py 随机表格/测试表.csv -t 4h -c 3
+    python tools/batch_analyze.py -a BTC "ETH@2024-05-03 07:50" -v relaxed -o results.xlsx
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import requests
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "backend"))
+
+from app.utils.batch_table import load_batch_rows, write_table
+
+
+def parse_assets(items):
+    """ "BTC" / "BTC@2024-05-03 07:50" -> 批量行"""
+    rows = []
+    for item in items:
+        asset, _, end = item.partition("@")
+        end_date, _, end_time = end.strip().partition(" ")
+        rows.append({
+            "asset": asset.strip(),
+            "end_date": end_date or None,
+            "end_time": end_time or None,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量分析")
+    parser.add_argument("table", nargs="?", help="CSV / XLSX 表格")
+    parser.add_argument("-a", "--assets", nargs="+", default=[], help="交易对列表，可带截止时间: BTC@2024-05-03 07:50")
+    parser.add_argument("-t", "--timeframe", default="1h", help="表格未指定时使用的时间框架")
+    parser.add_argument("-v", "--ai-version", default="constrained", help="表格未指定时使用的决策版本")
+    parser.add_argument("-k", "--kline-count", type=int, default=100)
+    parser.add_argument("-f", "--future-kline-count", type=int, default=13)
+    parser.add_argument("-c", "--concurrency", type=int, default=None, help="同时执行的分析数（默认使用服务端 BATCH_CONCURRENCY）")
+    parser.add_argument("--no-cache", action="store_true", help="忽略 LLM 响应缓存")
+    parser.add_argument("--refresh", action="store_true", help="忽略已缓存的分析结果，全部重新分析")
+    parser.add_argument("--gate", action="store_true", default=None, help="开启预筛选：中性行情跳过 LLM 分析")
+    parser.add_argument("-o", "--output", default=None, help="本地汇总表路径（.csv / .xlsx）")
+    parser.add_argument("--server", default="http://localhost:8000", help="后端地址")
+    args = parser.parse_args()
+
+    rows = (load_batch_rows(args.table) if args.table else []) + parse_assets(args.assets)
+    if not rows:
+        parser.error("需要提供表格或 --assets")
+
+    payload = {
+        "rows": rows,
+        "timeframe": args.timeframe,
+        "ai_version": args.ai_version,
+        "kline_count": args.kline_count,
+        "future_kline_count": args.future_kline_count,
+        "concurrency": args.concurrency,
+        "use_llm_cache": not args.no_cache,
+        "force_refresh": args.refresh,
+        "signal_gate": args.gate,
+    }
+    print(f"提交 {len(rows)} 行到 {args.server}")
+
+    results = []
+    with requests.post(f"{args.server}/api/v1/batch/", json=payload, stream=True, timeout=(10, None)) as response:
+        if response.status_code != 200:
+            print(f"请求失败 ({response.status_code}): {response.text}")
+            return 1
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["type"] == "start":
+                print(f"批次 {event['batch_id']}: {event['rows']} 行，去重后 {event['unique_rows']} 个分析，并发 {event['concurrency']}")
+            elif event["type"] == "prefetched":
+                print(f"预取行情 {event['windows']} 个窗口")
+            elif event["type"] == "row":
+                results.append({k: v for k, v in event.items() if k != "type"})
+                end = f"{event['end_date']} {event['end_time']}" if event["end_date"] else "latest"
+                detail = event["action"] if event["status"] == "succeeded" else event["error"]
+                print(f"[{len(results)}/{len(rows)}] {event['asset']} {event['timeframe']} @ {end}: "
+                      f"{event['status']} {detail or ''} ({event['elapsed_seconds']}s, {event['result_id']})")
+            elif event["type"] == "done":
+                print(f"完成: {event['counts']}，耗时 {event['elapsed_seconds']}s，服务端汇总表 {event['table_path']}")
+
+    if args.output and results:
+        results.sort(key=lambda r: r["row"])
+        print(f"本地汇总表: {write_table(results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+ChartGenerator 图表模板池基准测试
+
+对比「每次新建 Figure」与「复用 Figure 模板」两种模式下，
+各布局（K线+成交量、综合图、趋势图、成交量图）的单图耗时与内存抖动。
+
+用法:
+    python tools/bench_chart_pool.py                  # 每种布局 1000 次
+    python tools/bench_chart_pool.py -n 200 -l kline  # 只测 K线图 200 次
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "backend"))
+
+import numpy as np
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from app.utils.chart_generator import ChartGenerator
+from app.utils.performance import disable_performance_monitoring
+
+LAYOUTS = ("kline", "summary", "trend", "volume")
+
+
+def make_ohlcv(bars: int, seed: int = 42) -> pd.DataFrame:
+    """生成随机游走的 OHLCV 数据"""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, bars))
+    open_ = close + rng.normal(0, 0.5, bars)
+    high = np.maximum(open_, close) + rng.random(bars)
+    low = np.minimum(open_, close) - rng.random(bars)
+    volume = rng.integers(1_000, 10_000, bars).astype(float)
+    index = pd.date_range("2024-01-01", periods=bars, freq="h")
+    return pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+        index=index,
+    )
+
+
+def make_indicators(data: pd.DataFrame) -> dict:
+    close = data["Close"]
+    delta = close.diff()
+    gain = delta.clip(lower=0).rolling(14).mean()
+    loss = (-delta.clip(upper=0)).rolling(14).mean()
+    rsi = (100 - 100 / (1 + gain / loss)).fillna(50).tolist()
+    macd = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    signal = macd.ewm(span=9, adjust=False).mean()
+    return {
+        "rsi": {"rsi": rsi},
+        "macd": {
+            "macd": macd.tolist(),
+            "signal": signal.tolist(),
+            "histogram": (macd - signal).tolist(),
+        },
+        "summary": {"overall_signal": "neutral", "bullish_signals": [], "bearish_signals": []},
+    }
+
+
+def render_once(generator: ChartGenerator, layout: str, data: pd.DataFrame, indicators: dict) -> str:
+    if layout == "kline":
+        return generator.generate_kline_chart(data, title="基准测试 K线图")
+    if layout == "summary":
+        decision = {"action": "做多", "confidence": 0.7, "reasoning": "基准测试"}
+        return generator.generate_summary_chart(data, indicators, decision)
+    if layout == "trend":
+        return generator.generate_trend_chart(data, indicators)
+    return generator.generate_volume_chart(data)
+
+
+def rss_mb() -> float:
+    if psutil is None:
+        return float("nan")
+    return psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024
+
+
+def bench(layout: str, use_pool: bool, renders: int, data: pd.DataFrame, indicators: dict) -> dict:
+    generator = ChartGenerator(use_pool=use_pool)
+    # 预热：加载字体缓存、填充模板池
+    render_once(generator, layout, data, indicators)
+    gc.collect()
+
+    latencies = []
+    rss_before = rss_mb()
+    tracemalloc.start()
+    alloc_start, _ = tracemalloc.get_traced_memory()
+    for _ in range(renders):
+        start = time.perf_counter()
+        render_once(generator, layout, data, indicators)
+        latencies.append((time.perf_counter() - start) * 1000)
+    alloc_end, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    rss_after = rss_mb()
+
+    latencies.sort()
+    result = {
+        "layout": layout,
+        "mode": "pool" if use_pool else "fresh",
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "alloc_growth_kb": (alloc_end - alloc_start) / 1024,
+        "alloc_peak_mb": alloc_peak / 1024 / 1024,
+        "rss_delta_mb": rss_after - rss_before,
+        "figures_created": generator.pool.stats["created"] if use_pool else renders + 1,
+    }
+    generator.pool.clear()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChartGenerator 图表模板池基准测试")
+    parser.add_argument("-n", "--renders", type=int, default=1000, help="每种布局的渲染次数")
+    parser.add_argument("-b", "--bars", type=int, default=50, help="每张图的K线数量")
+    parser.add_argument("-l", "--layouts", nargs="+", choices=LAYOUTS, default=list(LAYOUTS))
+    args = parser.parse_args()
+
+    # 基准测试时关闭全局性能监控，避免统计开销干扰结果
+    disable_performance_monitoring()
+
+    data = make_ohlcv(args.bars)
+    indicators = make_indicators(data)
+
+    print("=" * 96)
+    print(f"ChartGenerator 基准测试: 每种布局 {args.renders} 次, 每张图 {args.bars} 根K线")
+    print("=" * 96)
+    header = f"{'布局':<10}{'模式':<8}{'平均ms':>10}{'P50ms':>10}{'P95ms':>10}{'分配增长KB':>14}{'分配峰值MB':>14}{'RSS增量MB':>12}{'新建图数':>10}"
+    print(header)
+    print("-" * 96)
+
+    for layout in args.layouts:
+        rows = [bench(layout, use_pool, args.renders, data, indicators) for use_pool in (False, True)]
+        for row in rows:
+            print(f"{row['layout']:<10}{row['mode']:<8}{row['mean_ms']:>10.2f}{row['p50_ms']:>10.2f}"
+                  f"{row['p95_ms']:>10.2f}{row['alloc_growth_kb']:>14.1f}{row['alloc_peak_mb']:>14.2f}"
+                  f"{row['rss_delta_mb']:>12.1f}{row['figures_created']:>10}")
+        fresh, pooled = rows
+        speedup = fresh["mean_ms"] / pooled["mean_ms"] if pooled["mean_ms"] else float("nan")
+        print(f"{'':<10}加速比: {speedup:.2f}x")
+        print("-" * 96)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+TradingEngine 复用池基准测试
+
+对比「每个请求新建 TradingEngine」与「从 engine_pool 获取」两种模式下
+每个请求的引擎准备耗时（创建 ChatOpenAI 客户端、工具节点并编译 LangGraph），
+分别统计首个请求与稳定状态（其余请求）的延迟。
+只测引擎准备阶段，不发起任何 LLM 请求；未配置 API Key 时使用占位 Key。
+
+用法:
+    python tools/bench_engine_pool.py                 # 每种模式 200 个请求
+    python tools/bench_engine_pool.py -n 50 -v relaxed
+"""
+
+import argparse
+import asyncio
+import gc
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "backend"))
+
+from app.core import config as app_config
+from app.core.providers import get_provider_config
+from app.services.engine_pool import EnginePool
+from app.services.trading_engine import TradingEngine
+from app.utils.performance import disable_performance_monitoring
+
+
+def ensure_api_keys():
+    """引擎构建需要 API Key，基准测试不联网，缺失时填入占位值"""
+    settings = app_config.settings
+    for provider in (settings.AGENT_PROVIDER, settings.GRAPH_PROVIDER):
+        cfg = get_provider_config(provider)
+        if cfg and not getattr(settings, cfg["api_key_env"], ""):
+            setattr(settings, cfg["api_key_env"], "bench-placeholder-key")
+
+
+async def bench(mode: str, requests: int, engine_config: dict) -> dict:
+    pool = EnginePool()
+    latencies = []
+    clients = set()
+
+    gc.collect()
+    for _ in range(requests):
+        start = time.perf_counter()
+        if mode == "pool":
+            engine = await pool.get(engine_config)
+        else:
+            engine = TradingEngine(config=engine_config)
+        latencies.append((time.perf_counter() - start) * 1000)
+        clients.add(id(engine.agent_llm.client))
+        clients.add(id(engine.graph_llm.client))
+
+    first, steady = latencies[0], sorted(latencies[1:]) or [latencies[0]]
+    return {
+        "mode": mode,
+        "first_ms": first,
+        "steady_mean_ms": statistics.fmean(steady),
+        "steady_p50_ms": steady[len(steady) // 2],
+        "steady_p95_ms": steady[min(len(steady) - 1, int(len(steady) * 0.95))],
+        "total_s": sum(latencies) / 1000,
+        "llm_clients": len(clients),
+        "graphs_compiled": pool.stats["misses"] if mode == "pool" else requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TradingEngine 复用池基准测试")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="每种模式的请求数")
+    parser.add_argument("-v", "--version", default="constrained", help="决策智能体版本")
+    args = parser.parse_args()
+
+    disable_performance_monitoring()
+    ensure_api_keys()
+    engine_config = {"decision_agent_version": args.version}
+
+    # 预热一次：导入 langgraph / openai 等模块的开销不计入任何一种模式
+    TradingEngine(config=engine_config)
+
+    print("=" * 100)
+    print(f"TradingEngine 基准测试: 每种模式 {args.requests} 个请求, 决策版本 {args.version}")
+    print("=" * 100)
+    header = (f"{'模式':<8}{'首请求ms':>12}{'稳态平均ms':>14}{'稳态P50ms':>12}{'稳态P95ms':>12}"
+              f"{'总耗时s':>10}{'LLM客户端数':>14}{'编译图次数':>12}")
+    print(header)
+    print("-" * 100)
+
+    results = {}
+    for mode in ("fresh", "pool"):
+        r = asyncio.run(bench(mode, args.requests, engine_config))
+        results[mode] = r
+        print(f"{r['mode']:<8}{r['first_ms']:>12.2f}{r['steady_mean_ms']:>14.3f}{r['steady_p50_ms']:>12.3f}"
+              f"{r['steady_p95_ms']:>12.3f}{r['total_s']:>10.2f}{r['llm_clients']:>14}{r['graphs_compiled']:>12}")
+
+    fresh, pool = results["fresh"], results["pool"]
+    print("-" * 100)
+    if pool["steady_mean_ms"] > 0:
+        print(f"稳态单请求准备耗时: {fresh['steady_mean_ms']:.2f}ms -> {pool['steady_mean_ms']:.3f}ms "
+              f"({fresh['steady_mean_ms'] / pool['steady_mean_ms']:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
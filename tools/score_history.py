@@ -0,0 +1,52 @@
+"""
+历史分析批量评分
+
+用每条历史记录里的未来K线评估决策：止损/止盈谁先触发、触发用时、MFE/MAE、R 倍数，
+按决策版本 / 模型 / 交易对汇总。读取 backend/data/history，不需要启动后端服务。
+
+用法:
+    python tools/score_history.py
+    python tools/score_history.py --ambiguity open_distance --max-bars 8 -o scores.csv
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "backend"))
+os.chdir(PROJECT_ROOT / "backend")
+
+from app.services.history_scoring import history_scorer
+from app.services.trade_evaluator import AMBIGUITY_RULES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="历史分析批量评分")
+    parser.add_argument("--ambiguity", choices=AMBIGUITY_RULES, default=AMBIGUITY_RULES[0],
+                        help="同一根K线同时触及止损和止盈时的判定规则")
+    parser.add_argument("--max-bars", type=int, default=None, help="每个决策最多评估的K线数")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="解析历史文件的进程数")
+    parser.add_argument("-o", "--output", default=None, help="逐条评估结果表（.csv / .xlsx）")
+    args = parser.parse_args()
+    if args.max_bars is not None and args.max_bars < 1:
+        parser.error("--max-bars 必须 >= 1")
+
+    report = history_scorer.score(args.ambiguity, args.max_bars, args.workers, include_records=bool(args.output))
+    print(f"历史文件 {report['files']} 个，可评分 {report['scored']} 条，"
+          f"耗时 {report['elapsed_seconds']}s（解析 {report['load_seconds']}s）")
+    print(json.dumps(report["summary"], ensure_ascii=False, indent=2))
+
+    if args.output:
+        from app.utils.batch_table import write_table
+        rows = [
+            {**{k: v for k, v in record.items() if k != "evaluation"}, **record["evaluation"]}
+            for record in report["records"]
+        ]
+        print(f"逐条结果: {write_table(rows, args.output)}")
+
+
+if __name__ == "__main__":
+    main()